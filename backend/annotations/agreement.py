@@ -0,0 +1,458 @@
+"""
+Inter-annotator agreement.
+
+Every dataset item (or item-less dataset) annotated by two or more people
+gets an ``AgreementScore`` row holding its score and the statistics needed
+to aggregate it:
+
+* ``classification`` - observed agreement per item; Fleiss' kappa and
+  pairwise Cohen's kappa are computed over all items at once from the
+  label matrix.
+* ``bounding_box`` / ``segmentation`` - boxes or masks of each pair of
+  annotators are matched one-to-one on IoU (Hungarian algorithm); the item
+  score is the mean matched IoU, unmatched objects counting as 0, and F1 at
+  ``IOU_THRESHOLD`` is kept alongside.
+* ``transcription`` / ``translation`` (and ``metric='span_f1'``) - F1 of
+  exactly matching ``(start, end, label)`` spans.
+
+Items are processed in batches with NumPy. ``compute_agreement(...,
+incremental=True)`` only revisits items whose annotations changed since the
+previous run.
+"""
+from collections import defaultdict
+from itertools import combinations
+
+import numpy as np
+from django.db import transaction
+from django.db.models import Count, Q
+from django.utils import timezone
+
+from projects.models import AgreementRun, AgreementScore, Annotation, AnnotationRevision
+from projects.revisions import ACTION_DELETE
+
+from .geometry import (
+    box_array, box_iou, canvas_size, classification_labels, mask_iou, mask_shapes, rasterize,
+)
+
+try:
+    from scipy.optimize import linear_sum_assignment
+except ImportError:  # SciPy is optional; fall back to the NumPy version below
+    linear_sum_assignment = None
+
+METRICS = {
+    'classification': 'kappa',
+    'bounding_box': 'box_iou',
+    'segmentation': 'mask_iou',
+    'transcription': 'span_f1',
+    'translation': 'span_f1',
+}
+
+IOU_THRESHOLD = 0.5
+BATCH_SIZE = 500  # Items per batch
+
+
+# Assignment
+
+def hungarian(cost):
+    """
+    Minimum-cost one-to-one assignment for a rectangular cost matrix.
+
+    Returns ``(rows, cols)`` like ``scipy.optimize.linear_sum_assignment``;
+    uses SciPy when it is installed.
+    """
+    cost = np.asarray(cost, dtype=float)
+    if linear_sum_assignment is not None:
+        return linear_sum_assignment(cost)
+    transposed = cost.shape[0] > cost.shape[1]
+    if transposed:
+        cost = cost.T
+    n, m = cost.shape
+    if not n:
+        return np.empty(0, dtype=int), np.empty(0, dtype=int)
+
+    # Shortest augmenting path with potentials (O(n^2 m)), vectorized per row.
+    u = np.zeros(n + 1)
+    v = np.zeros(m + 1)
+    owner = np.zeros(m + 1, dtype=int)  # owner[j]: row (1-based) assigned to column j
+    way = np.zeros(m + 1, dtype=int)
+    for row in range(1, n + 1):
+        owner[0] = row
+        column = 0
+        slack = np.full(m + 1, np.inf)
+        used = np.zeros(m + 1, dtype=bool)
+        while True:
+            used[column] = True
+            current = owner[column]
+            reduced = cost[current - 1] - u[current] - v[1:]
+            free = ~used[1:]
+            better = free & (reduced < slack[1:])
+            slack[1:][better] = reduced[better]
+            way[1:][better] = column
+            candidates = np.where(free, slack[1:], np.inf)
+            nxt = int(np.argmin(candidates)) + 1
+            delta = candidates[nxt - 1]
+            u[owner[used]] += delta
+            v[used] -= delta
+            slack[1:][free] -= delta
+            column = nxt
+            if owner[column] == 0:
+                break
+        while column:
+            previous = way[column]
+            owner[column] = owner[previous]
+            column = previous
+
+    cols = np.flatnonzero(owner[1:])
+    rows = owner[1:][cols] - 1
+    order = np.argsort(rows)
+    rows, cols = rows[order], cols[order]
+    return (cols, rows) if transposed else (rows, cols)
+
+
+def match_iou(iou):
+    """
+    Match objects of two annotators on an IoU matrix.
+
+    Returns ``(mean_iou, f1)``: the matched IoU summed and divided by the
+    larger object count, and the F1 of matches reaching ``IOU_THRESHOLD``.
+    """
+    n, m = iou.shape
+    if not n and not m:
+        return 1.0, 1.0
+    if not n or not m:
+        return 0.0, 0.0
+    rows, cols = hungarian(-iou)
+    matched = iou[rows, cols]
+    true_positives = int((matched >= IOU_THRESHOLD).sum())
+    return float(matched.sum() / max(n, m)), 2 * true_positives / (n + m)
+
+
+# Spans
+
+def spans(content):
+    """Set of ``(start, end, label)`` spans in annotation content."""
+    if isinstance(content, dict):
+        content = content.get('spans', content.get('entities', []))
+    found = set()
+    for span in content if isinstance(content, list) else []:
+        if isinstance(span, dict) and 'start' in span and 'end' in span:
+            found.add((int(span['start']), int(span['end']), str(span.get('label', ''))))
+    return found
+
+
+# Per-item scoring
+
+def _pairwise(annotations, scorer):
+    """Score every annotator pair; returns ``[[a, b, score, f1], ...]``."""
+    return [
+        [first, second, *scorer(first_value, second_value)]
+        for (first, first_value), (second, second_value) in combinations(annotations, 2)
+    ]
+
+
+def score_kappa_batch(groups):
+    """
+    Observed agreement of a batch of classification items in one pass.
+
+    ``groups`` is a list of ``[(annotator_id, content), ...]``; returns one
+    ``(score, stats)`` per group.
+    """
+    labels = [[(annotator, classification_labels(content)) for annotator, content in group] for group in groups]
+    categories = {}
+    item_index = []
+    label_index = []
+    for index, group in enumerate(labels):
+        for _, label in group:
+            item_index.append(index)
+            label_index.append(categories.setdefault(label, len(categories)))
+
+    counts = np.zeros((len(groups), max(len(categories), 1)))
+    np.add.at(counts, (np.asarray(item_index, dtype=int), np.asarray(label_index, dtype=int)), 1)
+    raters = counts.sum(axis=1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        observed = ((counts ** 2).sum(axis=1) - raters) / (raters * (raters - 1))
+
+    return [
+        (float(observed[index]) if raters[index] >= 2 else None,
+         {'labels': {str(annotator): label for annotator, label in group}})
+        for index, group in enumerate(labels)
+    ]
+
+
+def score_boxes(group):
+    boxes = [(annotator, box_array(content)) for annotator, content in group]
+    return _pairwise(boxes, lambda a, b: match_iou(box_iou(a, b)))
+
+
+def score_masks(group):
+    shapes = [(annotator, list(mask_shapes(content))) for annotator, content in group]
+    size = canvas_size(shape for _, item_shapes in shapes for shape in item_shapes)
+    masks = [
+        (annotator, np.stack([rasterize(kind, value, size) for kind, value in item_shapes])
+         if item_shapes else np.zeros((0, size[0] * size[1]), dtype=bool))
+        for annotator, item_shapes in shapes
+    ]
+    return _pairwise(masks, lambda a, b: match_iou(mask_iou(a, b)))
+
+
+def score_spans(group):
+    def f1(a, b):
+        if not a and not b:
+            return 1.0, 1.0
+        value = 2 * len(a & b) / (len(a) + len(b))
+        return value, value
+
+    return _pairwise([(annotator, spans(content)) for annotator, content in group], f1)
+
+
+PAIR_SCORERS = {
+    'box_iou': score_boxes,
+    'mask_iou': score_masks,
+    'span_f1': score_spans,
+}
+
+
+def score_batch(metric, groups):
+    """Score a batch of items; returns ``(score, stats)`` per item."""
+    if metric == 'kappa':
+        return score_kappa_batch(groups)
+    results = []
+    for group in groups:
+        pairs = PAIR_SCORERS[metric](group) if len(group) >= 2 else []
+        score = float(np.mean([pair[2] for pair in pairs])) if pairs else None
+        results.append((score, {'pairs': pairs}))
+    return results
+
+
+# Aggregation
+
+def cohen_kappa(first, second):
+    """Cohen's kappa of two equal-length integer label arrays."""
+    categories = int(max(first.max(), second.max())) + 1
+    confusion = np.bincount(first * categories + second, minlength=categories ** 2).reshape(categories, categories)
+    total = confusion.sum()
+    observed = np.trace(confusion) / total
+    expected = (confusion.sum(axis=0) * confusion.sum(axis=1)).sum() / total ** 2
+    return 1.0 if expected == 1 else float((observed - expected) / (1 - expected))
+
+
+def kappa_report(stats):
+    """Fleiss' and pairwise Cohen's kappa over the stored label maps."""
+    annotators = sorted({int(annotator) for item in stats for annotator in item['labels']})
+    column = {annotator: index for index, annotator in enumerate(annotators)}
+    categories = {}
+    matrix = np.full((len(stats), len(annotators)), -1, dtype=int)
+    for row, item in enumerate(stats):
+        for annotator, label in item['labels'].items():
+            matrix[row, column[int(annotator)]] = categories.setdefault(label, len(categories))
+
+    report = {'fleiss_kappa': None, 'cohen_kappa': {'mean': None, 'pairs': []}}
+    if not len(stats) or not categories:
+        return report
+
+    counts = np.zeros((len(stats), len(categories)))
+    rows, cols = np.nonzero(matrix >= 0)
+    np.add.at(counts, (rows, matrix[rows, cols]), 1)
+    raters = counts.sum(axis=1)
+    rated = raters >= 2
+    if rated.any():
+        counts, raters = counts[rated], raters[rated]
+        observed = (((counts ** 2).sum(axis=1) - raters) / (raters * (raters - 1))).mean()
+        proportions = counts.sum(axis=0) / counts.sum()
+        expected = (proportions ** 2).sum()
+        report['fleiss_kappa'] = 1.0 if expected == 1 else float((observed - expected) / (1 - expected))
+
+    pairs = []
+    for first, second in combinations(range(len(annotators)), 2):
+        shared = (matrix[:, first] >= 0) & (matrix[:, second] >= 0)
+        if shared.any():
+            pairs.append({
+                'annotators': [annotators[first], annotators[second]],
+                'items': int(shared.sum()),
+                'kappa': cohen_kappa(matrix[shared, first], matrix[shared, second]),
+            })
+    report['cohen_kappa']['pairs'] = pairs
+    if pairs:
+        report['cohen_kappa']['mean'] = float(np.mean([pair['kappa'] for pair in pairs]))
+    return report
+
+
+def pair_report(stats):
+    """Mean score and F1 per annotator pair over the stored pair lists."""
+    totals = defaultdict(lambda: np.zeros(3))
+    for item in stats:
+        for first, second, score, f1 in item['pairs']:
+            totals[(first, second)] += (score, f1, 1)
+    pairs = [
+        {'annotators': list(key), 'items': int(n), 'score': float(score / n), 'f1': float(f1 / n)}
+        for key, (score, f1, n) in sorted(totals.items())
+    ]
+    return {'pairs': pairs}
+
+
+def agreement_report(scores, annotation_type, metric=None):
+    """Aggregate an ``AgreementScore`` queryset into a report dict."""
+    metric = metric or METRICS.get(annotation_type)
+    rows = list(scores.filter(annotation_type=annotation_type, metric=metric).values_list('score', 'stats'))
+    values = np.asarray([score for score, _ in rows if score is not None], dtype=float)
+    stats = [item for _, item in rows]
+    report = {
+        'annotation_type': annotation_type,
+        'metric': metric,
+        'items': len(rows),
+        'scored_items': int(values.size),
+        'score': float(values.mean()) if values.size else None,
+    }
+    report.update(kappa_report(stats) if metric == 'kappa' else pair_report(stats))
+    return report
+
+
+# Computation
+
+def _groups(annotations):
+    """Yield ``((dataset_id, item_id), [(annotator_id, content), ...])`` per item."""
+    rows = (
+        annotations.order_by('dataset_id', 'item_id', 'annotator_id')
+        .values_list('dataset_id', 'item_id', 'annotator_id', 'content')
+        .iterator(chunk_size=2000)
+    )
+    key, group = None, []
+    for dataset_id, item_id, annotator_id, content in rows:
+        if (dataset_id, item_id) != key:
+            if group:
+                yield key, group
+            key, group = (dataset_id, item_id), []
+        group.append((annotator_id, content))
+    if group:
+        yield key, group
+
+
+def _touched(annotations, scores, since):
+    """
+    Keys of items whose annotations changed since ``since`` (or were removed).
+
+    Removals leave no row behind, so stored and current annotation counts
+    are compared, but only in datasets with a deletion since ``since``.
+    """
+    touched = set(
+        annotations.filter(updated_at__gte=since).values_list('dataset_id', 'item_id').distinct()
+    )
+    deleted_in = set(
+        AnnotationRevision.objects.filter(
+            action=ACTION_DELETE, created_at__gte=since, dataset_id__in=scores.values('dataset_id')
+        ).order_by().values_list('dataset_id', flat=True).distinct()
+    )
+    if not deleted_in:
+        return touched
+    current = {
+        (dataset_id, item_id): total
+        for dataset_id, item_id, total in annotations.filter(dataset_id__in=deleted_in).order_by()
+        .values('dataset_id', 'item_id').annotate(total=Count('pk'))
+        .values_list('dataset_id', 'item_id', 'total')
+    }
+    stored = dict(
+        ((dataset_id, item_id), total)
+        for dataset_id, item_id, total in scores.filter(dataset_id__in=deleted_in)
+        .values_list('dataset_id', 'item_id', 'annotation_count')
+    )
+    touched.update(key for key, total in stored.items() if current.get(key) != total)
+    return touched
+
+
+def for_keys(queryset, keys):
+    """Filter ``queryset`` to the ``(dataset_id, item_id)`` keys given."""
+    item_ids = [item_id for _, item_id in keys if item_id is not None]
+    dataset_ids = [dataset_id for dataset_id, item_id in keys if item_id is None]
+    return queryset.filter(Q(item_id__in=item_ids) | Q(item__isnull=True, dataset_id__in=dataset_ids))
+
+
+def _save(metric, annotation_type, batch, now):
+    """Replace the stored scores of a batch of items."""
+    results = score_batch(metric, [group for _, group in batch])
+    keys = [key for key, _ in batch]
+    with transaction.atomic():
+        for_keys(AgreementScore.objects.filter(annotation_type=annotation_type, metric=metric), keys).delete()
+        AgreementScore.objects.bulk_create([
+            AgreementScore(
+                dataset_id=dataset_id,
+                item_id=item_id,
+                annotation_type=annotation_type,
+                metric=metric,
+                annotation_count=len(group),
+                score=score,
+                stats=stats,
+                computed_at=now,
+            )
+            for ((dataset_id, item_id), group), (score, stats) in zip(batch, results)
+        ])
+
+
+def compute_agreement(project, annotation_type, dataset=None, metric=None, incremental=False, batch_size=None):
+    """
+    (Re)compute item scores for a project (or one dataset) and return the report.
+
+    With ``incremental`` only items touched since the start of the previous
+    run over the same scope are recomputed; the report still covers them all.
+    """
+    metric = metric or METRICS.get(annotation_type)
+    if metric not in ('kappa', *PAIR_SCORERS):
+        raise ValueError(f"No agreement metric for '{annotation_type}'.")
+    batch_size = batch_size or BATCH_SIZE
+    run = AgreementRun.objects.create(
+        project=project,
+        dataset=dataset,
+        annotation_type=annotation_type,
+        metric=metric,
+        incremental=incremental,
+        started_at=timezone.now(),
+    )
+
+    annotations = Annotation.objects.filter(annotation_type=annotation_type, is_gold=False)
+    scores = AgreementScore.objects.filter(annotation_type=annotation_type, metric=metric)
+    if dataset is not None:
+        annotations = annotations.filter(dataset=dataset)
+        scores = scores.filter(dataset=dataset)
+    else:
+        annotations = annotations.filter(dataset__project=project)
+        scores = scores.filter(dataset__project=project)
+
+    previous = None
+    if incremental:
+        previous = (
+            AgreementRun.objects.filter(
+                project=project, annotation_type=annotation_type, metric=metric, finished_at__isnull=False
+            )
+            .filter(Q(dataset__isnull=True) | Q(dataset=dataset) if dataset is not None else Q(dataset__isnull=True))
+            .exclude(pk=run.pk)
+            .order_by('-started_at')
+            .first()
+        )
+
+    if previous is None:
+        stale = scores
+        todo = annotations
+    else:
+        keys = _touched(annotations, scores, previous.started_at)
+        stale = for_keys(scores, keys)
+        todo = for_keys(annotations, keys) if keys else annotations.none()
+
+    stale.delete()  # Items without annotations any more drop out; the rest are rewritten
+    computed = 0
+    batch = []
+    for key, group in _groups(todo):
+        batch.append((key, group))
+        if len(batch) >= batch_size:
+            _save(metric, annotation_type, batch, run.started_at)
+            computed += len(batch)
+            batch = []
+    if batch:
+        _save(metric, annotation_type, batch, run.started_at)
+        computed += len(batch)
+
+    run.items_computed = computed
+    run.finished_at = timezone.now()
+    run.save(update_fields=['items_computed', 'finished_at'])
+
+    report = agreement_report(scores, annotation_type, metric)
+    report['computed_items'] = computed
+    return report
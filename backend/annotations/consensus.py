@@ -0,0 +1,154 @@
+"""
+Consensus stage: merge every multiply-annotated item into a gold annotation.
+
+``merge_annotations`` reads a project's (or dataset's) annotations grouped
+per item, merges them in batches on a process pool (see
+``annotations.merging``) and writes the results back in bulk as verified
+annotations with ``is_gold`` set, replacing the previous gold annotation
+of each item. Merged content that does not match the project's template
+schema is not written.
+"""
+import multiprocessing
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from projects.models import Annotation
+
+from .agreement import for_keys
+from .encoding import decode_content
+from .merging import MERGEABLE_TYPES, merge_batch, run_job
+from .validation import ContentValidationError, ContentValidator
+
+BATCH_SIZE = 200  # Items per job
+
+
+def _groups(annotations, min_annotators):
+    """Yield ``((dataset_id, item_id), [(weight, content), ...])`` per item."""
+    rows = (
+        annotations.order_by('dataset_id', 'item_id', 'annotator_id')
+        .values_list('dataset_id', 'item_id', 'confidence_score', 'content')
+        .iterator(chunk_size=2000)
+    )
+    key, group = None, []
+    for dataset_id, item_id, weight, content in rows:
+        if (dataset_id, item_id) != key:
+            if len(group) >= min_annotators:
+                yield key, group
+            key, group = (dataset_id, item_id), []
+        group.append((weight, content))
+    if len(group) >= min_annotators:
+        yield key, group
+
+
+def _batches(groups, batch_size):
+    keys, batch = [], []
+    for key, group in groups:
+        keys.append(key)
+        batch.append(group)
+        if len(batch) >= batch_size:
+            yield keys, batch
+            keys, batch = [], []
+    if batch:
+        yield keys, batch
+
+
+def _write_gold(project, annotation_type, user, keys, results, validator):
+    """Create or replace the gold annotations of a batch; returns ``(created, updated, invalid)``."""
+    now = timezone.now()
+    existing = {
+        (dataset_id, item_id): pk
+        for dataset_id, item_id, pk in for_keys(
+            Annotation.objects.filter(annotation_type=annotation_type, is_gold=True), keys
+        ).values_list('dataset_id', 'item_id', 'pk')
+    }
+    to_create = []
+    to_update = []
+    invalid = 0
+    for (dataset_id, item_id), (content, confidence) in zip(keys, results):
+        try:
+            validator.validate(project.pk, annotation_type, decode_content(content))
+        except ContentValidationError:
+            invalid += 1
+            continue
+        annotation = Annotation(
+            pk=existing.get((dataset_id, item_id)),
+            dataset_id=dataset_id,
+            item_id=item_id,
+            annotator=user,
+            annotation_type=annotation_type,
+            content=content,
+            confidence_score=confidence,
+            is_verified=True,
+            verified_by=user,
+            verified_at=now,
+            is_gold=True,
+            updated_at=now,
+        )
+        (to_update if annotation.pk else to_create).append(annotation)
+
+    with transaction.atomic():
+        Annotation.objects.bulk_create(to_create)
+        if to_update:
+            Annotation.objects.bulk_update(
+                to_update,
+                ['annotator', 'content', 'confidence_score', 'verified_by', 'verified_at', 'updated_at'],
+            )
+    return len(to_create), len(to_update), invalid
+
+
+def merge_annotations(project, annotation_type, user, dataset=None, min_annotators=2, workers=None, batch_size=None):
+    """
+    Write gold annotations for items with at least ``min_annotators`` annotations.
+
+    ``user`` is recorded as annotator and verifier of the gold annotations.
+    Batches are merged on ``workers`` processes (in this process when 1).
+    Returns ``{'merged_items', 'created', 'updated', 'invalid'}``; ``invalid``
+    counts merges rejected by the template schema.
+    """
+    if annotation_type not in MERGEABLE_TYPES:
+        raise ValueError(f"annotation_type must be one of {', '.join(MERGEABLE_TYPES)}.")
+    workers = workers or settings.CONSENSUS_WORKERS
+    annotations = Annotation.objects.filter(
+        dataset__project=project, annotation_type=annotation_type, is_gold=False
+    )
+    if dataset is not None:
+        annotations = annotations.filter(dataset=dataset)
+    batches = _batches(_groups(annotations, max(min_annotators, 1)), batch_size or BATCH_SIZE)
+
+    created = updated = invalid = 0
+    validator = ContentValidator()
+
+    def write(keys, results):
+        nonlocal created, updated, invalid
+        batch_created, batch_updated, batch_invalid = _write_gold(
+            project, annotation_type, user, keys, results, validator
+        )
+        created += batch_created
+        updated += batch_updated
+        invalid += batch_invalid
+
+    if workers <= 1:
+        for keys, groups in batches:
+            write(keys, merge_batch(annotation_type, groups))
+    else:
+        context = multiprocessing.get_context('spawn')  # Workers never inherit DB connections
+        with ProcessPoolExecutor(workers, mp_context=context) as pool:
+            running = set()
+            exhausted = False
+            while running or not exhausted:
+                while not exhausted and len(running) < workers * 2:
+                    batch = next(batches, None)
+                    if batch is None:
+                        exhausted = True
+                        break
+                    running.add(pool.submit(run_job, annotation_type, *batch))
+                if not running:
+                    continue
+                done, running = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    write(*future.result())
+
+    return {'merged_items': created + updated, 'created': created, 'updated': updated, 'invalid': invalid}
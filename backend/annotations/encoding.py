@@ -0,0 +1,265 @@
+"""
+Compact encodings for dense annotation content.
+
+Masks and long coordinate lists are stored inside ``Annotation.content`` in
+compact tagged objects instead of nested JSON lists:
+
+* ``{"$rle": "<counts>", "size": [h, w]}`` - a binary mask (any ``"mask"``
+  key holding a 2-D array of 0/1 integers) as a COCO compressed RLE string;
+* ``{"$f32": "<base64>"}`` - a list of floats packed as little-endian float32;
+* ``{"$i32": "<base64>"}`` - the same for lists of integers.
+
+Only the coordinate keys (``GEOMETRY_KEYS``) of polygon and keypoint
+annotation types are packed, and only when every value survives the
+round trip exactly: all integers within int32, or all floats whose
+shortest float32 representation is the value itself. Mixed lists, other
+keys and other types are stored as they are. Packed lists may carry
+``"shape": [n, k]`` (a list of equal-length rows, e.g. ``[[x, y], ...]``)
+or ``"lengths": [...]`` (ragged rows, e.g. COCO polygons). Lists shorter
+than ``MIN_PACKED_VALUES`` are left alone, since JSON is smaller there.
+
+``encode_content`` and ``decode_content`` convert whole content trees and
+are exact inverses. The tags are reserved: client content using them is
+rejected with ``ContentEncodingError``. A stored compact object that
+cannot be decoded is returned as stored, so one bad row does not fail a
+whole listing or export.
+"""
+import base64
+import logging
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+MIN_PACKED_VALUES = 16
+
+RLE_TAG = '$rle'
+FLOAT_TAG = '$f32'
+INT_TAG = '$i32'
+PACKED_TAGS = {FLOAT_TAG: '<f4', INT_TAG: '<i4'}
+RESERVED_KEYS = (RLE_TAG, FLOAT_TAG, INT_TAG)
+MASK_KEYS = ('mask',)
+# Coordinate lists that are packed, and the annotation types they are packed for
+GEOMETRY_KEYS = ('segmentation', 'polygon', 'points', 'keypoints')
+GEOMETRY_TYPES = ('segmentation', 'keypoint')
+
+INT32_MIN, INT32_MAX = -2 ** 31, 2 ** 31 - 1
+
+
+class ContentEncodingError(ValueError):
+    """Raised when client content uses the reserved compact-encoding tags."""
+
+
+# COCO run-length encoding
+
+def rle_counts(mask):
+    """Run lengths of a 2-D mask in column-major order, starting with zeros."""
+    flat = np.asarray(mask, dtype=bool).ravel(order='F')
+    if not flat.size:
+        return []
+    changes = np.flatnonzero(flat[1:] != flat[:-1]) + 1
+    runs = np.diff(np.concatenate(([0], changes, [flat.size])))
+    if flat[0]:
+        runs = np.concatenate(([0], runs))
+    return runs.tolist()
+
+
+def counts_to_string(counts):
+    """Compress RLE counts into the COCO ``counts`` string (pycocotools format)."""
+    chars = []
+    for index, value in enumerate(counts):
+        if index > 2:
+            value -= counts[index - 2]
+        more = True
+        while more:
+            char = value & 0x1f
+            value >>= 5
+            more = value != -1 if char & 0x10 else value != 0
+            if more:
+                char |= 0x20
+            chars.append(chr(char + 48))
+    return ''.join(chars)
+
+
+def string_to_counts(string):
+    """Inverse of ``counts_to_string``."""
+    counts = []
+    position = 0
+    while position < len(string):
+        value = 0
+        shift = 0
+        more = True
+        while more:
+            char = ord(string[position]) - 48
+            value |= (char & 0x1f) << shift
+            more = char & 0x20
+            position += 1
+            shift += 5
+            if not more and char & 0x10:
+                value |= -1 << shift
+        if len(counts) > 2:
+            value += counts[-2]
+        counts.append(value)
+    return counts
+
+
+def rle_encode(mask):
+    """Encode a 2-D binary mask as ``{"$rle": counts, "size": [h, w]}``."""
+    mask = np.asarray(mask)
+    return {RLE_TAG: counts_to_string(rle_counts(mask)), 'size': list(mask.shape)}
+
+
+def rle_decode(rle):
+    """Decode an encoded mask back to a ``(h, w)`` uint8 array."""
+    height, width = rle['size']
+    counts = string_to_counts(rle[RLE_TAG])
+    values = np.zeros(len(counts), dtype=np.uint8)
+    values[1::2] = 1
+    flat = np.repeat(values, counts)
+    return flat.reshape((height, width), order='F')
+
+
+def rle_to_coco(rle):
+    """The COCO ``{"size", "counts"}`` form of an encoded mask (no decoding)."""
+    return {'size': rle['size'], 'counts': rle[RLE_TAG]}
+
+
+# Packed numeric buffers
+
+def _is_int(value):
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def _is_float(value):
+    return isinstance(value, float)
+
+
+def _numeric_rows(values):
+    """Return ``values`` as a list of numeric rows, or ``None`` if it is not one."""
+    if all(isinstance(row, list) and row for row in values):
+        return values
+    return None
+
+
+def _packed_tag(flat):
+    """The tag ``flat`` packs losslessly under, or ``None``."""
+    if all(_is_int(value) for value in flat):
+        if INT32_MIN <= min(flat) and max(flat) <= INT32_MAX:
+            return INT_TAG
+        return None
+    if all(_is_float(value) for value in flat):
+        exact = np.asarray(flat, dtype=np.float64)
+        if not np.isfinite(exact).all():
+            return None
+        # Decoding reads back the shortest repr of each float32 (see unpack_array)
+        if np.array_equal(np.asarray(flat, dtype='<f4').astype(str).astype(np.float64), exact):
+            return FLOAT_TAG
+    return None
+
+
+def pack(values):
+    """
+    Pack a numeric list (flat, or a list of numeric rows) into a tagged buffer.
+
+    Returns ``None`` when ``values`` is not numeric, too short to benefit,
+    or would not come back unchanged.
+    """
+    if not isinstance(values, list) or not values:
+        return None
+    rows = _numeric_rows(values)
+    flat = [value for row in rows for value in row] if rows is not None else values
+    if len(flat) < MIN_PACKED_VALUES:
+        return None
+    tag = _packed_tag(flat)
+    if tag is None:
+        return None
+
+    packed = {tag: base64.b64encode(np.asarray(flat, dtype=PACKED_TAGS[tag]).tobytes()).decode('ascii')}
+    if rows is not None:
+        lengths = [len(row) for row in rows]
+        if len(set(lengths)) == 1:
+            packed['shape'] = [len(rows), lengths[0]]
+        else:
+            packed['lengths'] = lengths
+    return packed
+
+
+def unpack_array(packed):
+    """Decode a tagged buffer to a flat NumPy array (float64 or int64)."""
+    tag = FLOAT_TAG if FLOAT_TAG in packed else INT_TAG
+    array = np.frombuffer(base64.b64decode(packed[tag]), dtype=PACKED_TAGS[tag])
+    if tag == INT_TAG:
+        return array.astype(np.int64)
+    # Shortest repr of each float32, so 0.1 comes back as 0.1 and not 0.10000000149.
+    return array.astype(str).astype(np.float64)
+
+
+def unpack(packed):
+    """Decode a tagged buffer back to (nested) Python lists."""
+    flat = unpack_array(packed)
+    if 'shape' in packed:
+        return flat.reshape(packed['shape']).tolist()
+    if 'lengths' in packed:
+        bounds = np.cumsum(packed['lengths'])[:-1]
+        return [part.tolist() for part in np.split(flat, bounds)]
+    return flat.tolist()
+
+
+# Whole content trees
+
+def is_encoded(value):
+    """Whether ``value`` is one of the tagged compact objects."""
+    return isinstance(value, dict) and any(tag in value for tag in RESERVED_KEYS)
+
+
+def _is_mask(value):
+    return (
+        isinstance(value, list) and value
+        and all(isinstance(row, list) and len(row) == len(value[0]) for row in value)
+        and all(_is_int(cell) and cell in (0, 1) for row in value for cell in row)
+    )
+
+
+def encode_content(content, annotation_type):
+    """
+    Replace masks, and the coordinate lists of polygon and keypoint types, by compact objects.
+
+    ``content`` is plain client JSON; raises ``ContentEncodingError`` if it
+    contains a reserved tag.
+    """
+    return _encode(content, annotation_type in GEOMETRY_TYPES, False)
+
+
+def _encode(content, geometry, packable):
+    if isinstance(content, dict):
+        reserved = [tag for tag in RESERVED_KEYS if tag in content]
+        if reserved:
+            raise ContentEncodingError(f"'{reserved[0]}' is a reserved key in annotation content.")
+        encoded = {}
+        for key, value in content.items():
+            if key in MASK_KEYS and _is_mask(value):
+                encoded[key] = rle_encode(np.array(value, dtype=np.uint8))
+            else:
+                encoded[key] = _encode(value, geometry, geometry and key in GEOMETRY_KEYS)
+        return encoded
+    if isinstance(content, list):
+        packed = pack(content) if packable else None
+        if packed is not None:
+            return packed
+        return [_encode(value, geometry, packable) for value in content]
+    return content
+
+
+def decode_content(content):
+    """Expand every compact object in ``content`` back into plain JSON."""
+    if isinstance(content, dict):
+        if is_encoded(content):
+            try:
+                return rle_decode(content).tolist() if RLE_TAG in content else unpack(content)
+            except (ValueError, TypeError, KeyError, IndexError) as e:
+                logger.warning('Could not decode compact annotation content: %s', e)
+                return content
+        return {key: decode_content(value) for key, value in content.items()}
+    if isinstance(content, list):
+        return [decode_content(value) for value in content]
+    return content
@@ -0,0 +1,218 @@
+"""
+Streaming annotation exporters.
+
+Every exporter is a generator of ``bytes`` that walks the project's
+annotations with ``.iterator(chunk_size=...)`` (a server-side cursor on
+PostgreSQL), so memory use stays flat no matter how large the project is.
+Compact content (see ``annotations.encoding``) is expanded per row; COCO
+keeps RLE masks in their native compressed form.
+"""
+import csv
+import json
+import zlib
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+
+from projects.models import Annotation, Dataset, DatasetItem
+
+from .encoding import RLE_TAG, decode_content, is_encoded, rle_to_coco
+from .geometry import classification_labels, coco_objects
+
+EXPORT_FIELDS = (
+    'id', 'dataset_id', 'dataset__name', 'dataset__file_path', 'item_id',
+    'item__ordinal', 'item__key', 'annotator_id',
+    'annotator__username', 'annotation_type', 'content', 'confidence_score',
+    'is_verified', 'is_gold', 'created_at', 'updated_at',
+)
+
+
+def annotation_rows(project, annotation_type=None, verified_only=False, gold_only=False, chunk_size=None):
+    """Yield annotation value dicts for a project in primary key order."""
+    queryset = Annotation.objects.filter(dataset__project=project)
+    if annotation_type:
+        queryset = queryset.filter(annotation_type=annotation_type)
+    if verified_only:
+        queryset = queryset.filter(is_verified=True)
+    if gold_only:
+        queryset = queryset.filter(is_gold=True)
+    return (
+        queryset.order_by('pk')
+        .values(*EXPORT_FIELDS)
+        .iterator(chunk_size=chunk_size or settings.ANNOTATION_EXPORT_CHUNK_SIZE)
+    )
+
+
+def _dumps(value):
+    return json.dumps(value, cls=DjangoJSONEncoder, separators=(',', ':'))
+
+
+def export_jsonl(project, compact=False, **filters):
+    """
+    One JSON object per annotation (text, audio and generic exports).
+
+    With ``compact`` the content is written as stored, masks and packed
+    coordinates included, which is smaller and skips the decoding.
+    """
+    for row in annotation_rows(project, **filters):
+        yield (_dumps({
+            'id': row['id'],
+            'dataset': row['dataset_id'],
+            'dataset_name': row['dataset__name'],
+            'file_path': row['dataset__file_path'],
+            'item': row['item_id'],
+            'ordinal': row['item__ordinal'],
+            'item_key': row['item__key'],
+            'annotator': row['annotator__username'],
+            'annotation_type': row['annotation_type'],
+            'content': row['content'] if compact else decode_content(row['content']),
+            'confidence_score': row['confidence_score'],
+            'is_verified': row['is_verified'],
+            'is_gold': row['is_gold'],
+            'created_at': row['created_at'],
+            'updated_at': row['updated_at'],
+        }) + '\n').encode('utf-8')
+
+
+class _Line:
+    """File-like sink so ``csv.writer`` hands back each formatted row."""
+
+    def write(self, value):
+        return value
+
+
+def export_csv(project, **filters):
+    """Flat CSV rows for classification annotations."""
+    filters.setdefault('annotation_type', 'classification')
+    writer = csv.writer(_Line())
+    yield writer.writerow([
+        'id', 'dataset', 'file_path', 'item', 'item_key', 'annotator', 'label',
+        'confidence_score', 'is_verified'
+    ]).encode('utf-8')
+    for row in annotation_rows(project, **filters):
+        yield writer.writerow([
+            row['id'],
+            row['dataset_id'],
+            row['dataset__file_path'],
+            row['item_id'],
+            row['item__key'],
+            row['annotator__username'],
+            classification_labels(row['content']),
+            row['confidence_score'],
+            row['is_verified'],
+        ]).encode('utf-8')
+
+
+def coco_geometry(value):
+    """COCO form of a possibly compact ``segmentation``/``keypoints`` value."""
+    if is_encoded(value):
+        return rle_to_coco(value) if RLE_TAG in value and 'size' in value else decode_content(value)
+    return value
+
+
+def export_coco(project, **filters):
+    """
+    COCO detection/segmentation JSON for image projects.
+
+    Images and annotations are streamed; only the category map (bounded by
+    the number of distinct labels) is held in memory and written last.
+    When the project's datasets are split into items, every item is an
+    image and annotations that are not tied to an item are left out.
+    """
+    yield b'{"info":' + _dumps({
+        'description': project.name,
+        'date_created': timezone.now().isoformat(),
+    }).encode('utf-8')
+
+    yield b',"images":['
+    per_item = DatasetItem.objects.filter(dataset__project=project).exists()
+    if per_item:
+        images = (
+            DatasetItem.objects.filter(dataset__project=project)
+            .order_by('pk')
+            .values('id', 'key', 'metadata')
+        )
+    else:
+        images = (
+            Dataset.objects.filter(project=project)
+            .order_by('pk')
+            .values('id', 'file_path', 'metadata')
+        )
+    images = images.iterator(chunk_size=settings.ANNOTATION_EXPORT_CHUNK_SIZE)
+    for index, row in enumerate(images):
+        metadata = row['metadata'] or {}
+        image = {'id': row['id'], 'file_name': row['key'] if per_item else row['file_path']}
+        for key in ('width', 'height'):
+            if key in metadata:
+                image[key] = metadata[key]
+        yield (b',' if index else b'') + _dumps(image).encode('utf-8')
+
+    yield b'],"annotations":['
+    categories = {}
+    object_id = 0
+    for row in annotation_rows(project, **filters):
+        if row['annotation_type'] not in ('bounding_box', 'segmentation', 'keypoint'):
+            continue
+        image_id = row['item_id'] if per_item else row['dataset_id']
+        if image_id is None:
+            continue
+        for obj in coco_objects(row['content']):
+            if not isinstance(obj, dict):
+                continue
+            label = str(obj.get('label', obj.get('category', 'object')))
+            category_id = categories.setdefault(label, len(categories) + 1)
+            object_id += 1
+            entry = {
+                'id': object_id,
+                'image_id': image_id,
+                'category_id': category_id,
+                'iscrowd': int(bool(obj.get('iscrowd', False))),
+                'score': row['confidence_score'],
+            }
+            bbox = obj.get('bbox')
+            if bbox and len(bbox) == 4:
+                entry['bbox'] = bbox
+                entry['area'] = bbox[2] * bbox[3]
+            for key in ('segmentation', 'keypoints', 'num_keypoints', 'area'):
+                if key in obj:
+                    entry[key] = coco_geometry(obj[key])
+            if 'segmentation' not in entry and is_encoded(obj.get('mask')):
+                entry['segmentation'] = coco_geometry(obj['mask'])
+            yield (b',' if object_id > 1 else b'') + _dumps(entry).encode('utf-8')
+
+    yield b'],"categories":' + _dumps([
+        {'id': category_id, 'name': name} for name, category_id in categories.items()
+    ]).encode('utf-8') + b'}'
+
+
+EXPORTERS = {
+    'jsonl': (export_jsonl, 'application/x-ndjson', 'jsonl'),
+    'csv': (export_csv, 'text/csv', 'csv'),
+    'coco': (export_coco, 'application/json', 'json'),
+}
+
+
+def coalesce(chunks, size=64 * 1024):
+    """Group many small chunks into writes of roughly ``size`` bytes."""
+    buffer = []
+    buffered = 0
+    for chunk in chunks:
+        buffer.append(chunk)
+        buffered += len(chunk)
+        if buffered >= size:
+            yield b''.join(buffer)
+            buffer = []
+            buffered = 0
+    if buffer:
+        yield b''.join(buffer)
+
+
+def gzip_stream(chunks, level=6):
+    """Compress a byte stream on the fly into a gzip member."""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
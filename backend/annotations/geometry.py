@@ -0,0 +1,172 @@
+"""
+Django-free helpers reading annotation content.
+
+Used by the exporters, the agreement engine and by consensus merging,
+which runs on worker processes (see ``annotations.merging``).
+"""
+import numpy as np
+from PIL import Image, ImageDraw
+
+from .encoding import RLE_TAG, decode_content, rle_decode
+
+
+def label_values(content):
+    """Label(s) of classification content as a list, and whether it is multi-label."""
+    if isinstance(content, dict):
+        for key in ('labels', 'label', 'class', 'category'):
+            if key in content:
+                content = content[key]
+                break
+        else:
+            return [], False
+    if isinstance(content, (list, tuple)):
+        return list(content), True
+    return ([] if content is None else [content]), False
+
+
+def classification_labels(content):
+    """Extract label(s) from classification content as a ``;``-joined string."""
+    values, _ = label_values(content)
+    return ';'.join(str(label) for label in values)
+
+
+def coco_objects(content):
+    """Return the list of objects (boxes/polygons) stored in an annotation."""
+    if isinstance(content, list):
+        return content
+    if isinstance(content, dict):
+        for key in ('objects', 'annotations', 'boxes', 'shapes'):
+            if isinstance(content.get(key), list):
+                return content[key]
+        return [content]
+    return []
+
+
+def object_label(obj):
+    """Label of a box, polygon or mask object (``None`` when unlabelled)."""
+    for key in ('label', 'category', 'category_id', 'class'):
+        if key in obj:
+            return obj[key]
+    return None
+
+
+def box_objects(content):
+    """
+    Boxes of annotation content as ``(boxes, labels, scores)``.
+
+    ``boxes`` is an ``(n, 4)`` array of ``x1, y1, x2, y2``; ``scores`` holds
+    each object's ``score`` or NaN.
+    """
+    boxes = []
+    labels = []
+    scores = []
+    for obj in coco_objects(decode_content(content)):
+        if not isinstance(obj, dict):
+            continue
+        bbox = obj.get('bbox')
+        if bbox is None and all(key in obj for key in ('x', 'y', 'width', 'height')):
+            bbox = [obj['x'], obj['y'], obj['width'], obj['height']]
+        if bbox and len(bbox) == 4:
+            boxes.append(bbox)
+            labels.append(object_label(obj))
+            score = obj.get('score')
+            scores.append(score if isinstance(score, (int, float)) else np.nan)
+    array = np.asarray(boxes, dtype=float).reshape(-1, 4)
+    array[:, 2:] += array[:, :2]
+    return array, labels, np.asarray(scores, dtype=float)
+
+
+def box_array(content):
+    """``(n, 4)`` array of ``x1, y1, x2, y2`` boxes from annotation content."""
+    return box_objects(content)[0]
+
+
+def box_iou(a, b):
+    """Pairwise IoU of two ``(n, 4)`` and ``(m, 4)`` box arrays."""
+    top_left = np.maximum(a[:, None, :2], b[None, :, :2])
+    bottom_right = np.minimum(a[:, None, 2:], b[None, :, 2:])
+    overlap = np.clip(bottom_right - top_left, 0, None).prod(axis=2)
+    area_a = (a[:, 2:] - a[:, :2]).prod(axis=1)
+    area_b = (b[:, 2:] - b[:, :2]).prod(axis=1)
+    union = area_a[:, None] + area_b[None, :] - overlap
+    return np.divide(overlap, union, out=np.zeros_like(overlap), where=union > 0)
+
+
+def mask_objects(content):
+    """
+    Yield ``(label, kind, value)`` per object, its mask normalised to
+    ``('rle', dict)``, ``('array', ndarray)`` or
+    ``('polygons', [[x1, y1, ...], ...])``.
+    """
+    for obj in coco_objects(content):
+        if not isinstance(obj, dict):
+            continue
+        is_mask = 'mask' in obj
+        value = obj['mask'] if is_mask else obj.get('segmentation')
+        if value is None:
+            continue
+        if isinstance(value, dict):
+            if RLE_TAG in value:
+                yield object_label(obj), 'rle', value
+                continue
+            if isinstance(value.get('counts'), str):  # COCO compressed RLE
+                yield object_label(obj), 'rle', {RLE_TAG: value['counts'], 'size': value['size']}
+                continue
+            value = decode_content(value)
+        if not isinstance(value, list) or not value:
+            continue
+        if is_mask:
+            array = np.asarray(value, dtype=bool)
+            if array.ndim == 2:
+                yield object_label(obj), 'array', array
+        else:
+            yield object_label(obj), 'polygons', value if isinstance(value[0], list) else [value]
+
+
+def mask_shapes(content):
+    """The ``(kind, value)`` pairs of ``mask_objects``."""
+    return [(kind, value) for _, kind, value in mask_objects(content)]
+
+
+def canvas_size(shapes):
+    """Smallest ``(h, w)`` that fits every mask and polygon of an item."""
+    height = width = 1
+    for kind, value in shapes:
+        if kind == 'rle':
+            h, w = value['size']
+        elif kind == 'array':
+            h, w = value.shape
+        else:
+            h = w = 0
+            for polygon in value:
+                coordinates = np.asarray(polygon, dtype=float)
+                if coordinates.size >= 2:
+                    w = max(w, int(np.ceil(coordinates[0::2].max())) + 1)
+                    h = max(h, int(np.ceil(coordinates[1::2].max())) + 1)
+        height, width = max(height, h), max(width, w)
+    return height, width
+
+
+def rasterize(kind, value, size):
+    """Render one normalised mask onto a flattened ``size = (h, w)`` canvas."""
+    height, width = size
+    if kind == 'polygons':
+        image = Image.new('1', (width, height))
+        draw = ImageDraw.Draw(image)
+        for polygon in value:
+            if len(polygon) >= 6:
+                draw.polygon([float(coordinate) for coordinate in polygon], fill=1)
+        return np.asarray(image, dtype=bool).ravel()
+    mask = rle_decode(value).astype(bool) if kind == 'rle' else value
+    canvas = np.zeros((height, width), dtype=bool)
+    canvas[:mask.shape[0], :mask.shape[1]] = mask
+    return canvas.ravel()
+
+
+def mask_iou(a, b):
+    """Pairwise IoU of ``(n, h*w)`` and ``(m, h*w)`` flattened boolean masks."""
+    a = a.astype(np.float32)
+    b = b.astype(np.float32)
+    intersection = a @ b.T
+    union = a.sum(axis=1)[:, None] + b.sum(axis=1)[None, :] - intersection
+    return np.divide(intersection, union, out=np.zeros_like(intersection), where=union > 0)
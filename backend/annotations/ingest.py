@@ -0,0 +1,289 @@
+"""
+Streaming NDJSON bulk ingest for annotations.
+
+Each line of the request body is one JSON object::
+
+    {"dataset": 1, "annotation_type": "classification",
+     "content": {"label": "cat"}, "confidence_score": 0.93}
+
+Annotations of a single dataset item add ``"item": <id>`` or
+``"ordinal": <n>``; item references are resolved once per batch.
+
+``content`` is validated against the project's template schema (see
+``annotations.validation``); masks and long coordinate lists in it are
+stored in the compact form of ``annotations.encoding``.
+
+Lines are parsed as they arrive and written in batches with ``bulk_create``.
+Existing ``(dataset, item, annotator, annotation_type)`` rows are skipped,
+updated or reported as errors depending on ``on_conflict``. Every batch commits on
+its own, so a failure part way through keeps the batches already written.
+"""
+import json
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from projects.models import Annotation, Dataset, DatasetItem, Project
+
+from .encoding import ContentEncodingError, encode_content
+from .validation import ContentValidationError, ContentValidator
+
+CONFLICT_MODES = ('skip', 'update', 'error')
+
+ANNOTATION_TYPES = {choice for choice, _ in Annotation.ANNOTATION_TYPES}
+
+
+class IngestError(Exception):
+    """Raised for a line that cannot be ingested."""
+
+
+class AnnotationIngestor:
+    """
+    Parse NDJSON annotation lines and write them in batches.
+    """
+
+    def __init__(self, user, on_conflict='skip', batch_size=None, max_errors=None):
+        if on_conflict not in CONFLICT_MODES:
+            raise ValueError(f"on_conflict must be one of {', '.join(CONFLICT_MODES)}.")
+        self.user = user
+        self.on_conflict = on_conflict
+        self.batch_size = batch_size or settings.ANNOTATION_INGEST_BATCH_SIZE
+        self.max_errors = settings.ANNOTATION_INGEST_MAX_ERRORS if max_errors is None else max_errors
+
+        self.created = 0
+        self.updated = 0
+        self.skipped = 0
+        self.error_count = 0
+        self.errors = []
+
+        self._batch = {}  # (dataset_id, item ref, annotator_id, annotation_type) -> (line_no, Annotation)
+        self._datasets = {}  # dataset_id -> project values, or None if inaccessible
+        self._members = {}  # (project_id, user_id) -> bool
+        self._validator = ContentValidator()
+
+    def ingest(self, lines):
+        """Consume an iterable of NDJSON lines (bytes or str) and return the report."""
+        for line_no, line in enumerate(lines, start=1):
+            if isinstance(line, bytes):
+                line = line.decode('utf-8', errors='replace')
+            if not line.strip():
+                continue
+            try:
+                self._add(line_no, self._parse(line))
+            except IngestError as e:
+                self._error(line_no, str(e))
+            if len(self._batch) >= self.batch_size:
+                self.flush()
+        self.flush()
+        return self.report()
+
+    def report(self):
+        """Summary of the ingest so far."""
+        return {
+            'created': self.created,
+            'updated': self.updated,
+            'skipped': self.skipped,
+            'error_count': self.error_count,
+            'errors': self.errors,
+        }
+
+    def _error(self, line_no, message):
+        self.error_count += 1
+        if len(self.errors) < self.max_errors:
+            self.errors.append({'line': line_no, 'error': message})
+
+    def _parse(self, line):
+        """Validate one line and build an unsaved ``Annotation``."""
+        try:
+            data = json.loads(line)
+        except ValueError as e:
+            raise IngestError(f'Invalid JSON: {e}')
+        if not isinstance(data, dict):
+            raise IngestError('Each line must be a JSON object.')
+
+        for field in ('dataset', 'annotation_type', 'content'):
+            if field not in data:
+                raise IngestError(f"'{field}' is required.")
+        if data['annotation_type'] not in ANNOTATION_TYPES:
+            raise IngestError(f"Unknown annotation_type '{data['annotation_type']}'.")
+
+        try:
+            dataset_id = int(data['dataset'])
+            annotator_id = int(data.get('annotator', self.user.pk))
+            confidence_score = float(data.get('confidence_score', 1.0))
+            item_ref = None
+            if data.get('item') is not None:
+                item_ref = ('item', int(data['item']))
+            elif data.get('ordinal') is not None:
+                item_ref = ('ordinal', int(data['ordinal']))
+        except (TypeError, ValueError):
+            raise IngestError(
+                "'dataset', 'item', 'ordinal' and 'annotator' must be integers and 'confidence_score' a number."
+            )
+
+        dataset = self._dataset(dataset_id)
+        if annotator_id != self.user.pk:
+            self._check_annotator(dataset, annotator_id)
+        try:
+            self._validator.validate(dataset['project_id'], data['annotation_type'], data['content'])
+        except ContentValidationError as e:
+            raise IngestError(str(e))
+
+        try:
+            content = encode_content(data['content'], data['annotation_type'])
+        except ContentEncodingError as e:
+            raise IngestError(str(e))
+
+        annotation = Annotation(
+            dataset_id=dataset_id,
+            annotator_id=annotator_id,
+            annotation_type=data['annotation_type'],
+            content=content,
+            confidence_score=confidence_score,
+        )
+        annotation.item_ref = item_ref
+        return annotation
+
+    def _dataset(self, dataset_id):
+        if dataset_id not in self._datasets:
+            self._datasets[dataset_id] = (
+                Dataset.objects.filter(pk=dataset_id, project__in=Project.objects.for_user(self.user))
+                .values('project_id', 'project__owner_id')
+                .first()
+            )
+        dataset = self._datasets[dataset_id]
+        if dataset is None:
+            raise IngestError(f'Dataset {dataset_id} does not exist or is not accessible.')
+        return dataset
+
+    def _check_annotator(self, dataset, annotator_id):
+        """Only project owners (or staff) may ingest on behalf of project members."""
+        if not (self.user.is_staff or dataset['project__owner_id'] == self.user.pk):
+            raise IngestError('Only the project owner may set a different annotator.')
+        key = (dataset['project_id'], annotator_id)
+        if key not in self._members:
+            self._members[key] = Project.objects.filter(
+                Q(owner_id=annotator_id) | Q(collaborators__pk=annotator_id),
+                pk=dataset['project_id'],
+            ).exists()
+        if not self._members[key]:
+            raise IngestError(f'User {annotator_id} is not a member of this project.')
+
+    def _add(self, line_no, annotation, batch=None):
+        batch = self._batch if batch is None else batch
+        key = (annotation.dataset_id, annotation.item_ref, annotation.annotator_id, annotation.annotation_type)
+        if key in batch:
+            if self.on_conflict == 'skip':
+                self.skipped += 1
+                return
+            if self.on_conflict == 'error':
+                raise IngestError('Duplicate annotation in the same upload.')
+        batch[key] = (line_no, annotation)
+
+    def _resolve_items(self, batch):
+        """
+        Replace item references in ``batch`` by item ids with one query.
+
+        Lines whose item does not exist in their dataset are reported as
+        errors; the returned batch is keyed by ``(dataset, item_id, ...)``.
+        """
+        refs = {key[1] for key in batch if key[1] is not None}
+        if not refs:
+            return batch
+
+        dataset_ids = {key[0] for key in batch if key[1] is not None}
+        item_ids = {value for kind, value in refs if kind == 'item'}
+        ordinals = {value for kind, value in refs if kind == 'ordinal'}
+        lookup = Q(pk__in=item_ids) | Q(ordinal__in=ordinals) if ordinals else Q(pk__in=item_ids)
+        items = {}
+        for item_id, dataset_id, ordinal in (
+            DatasetItem.objects.filter(lookup, dataset_id__in=dataset_ids)
+            .values_list('pk', 'dataset_id', 'ordinal')
+            .iterator()
+        ):
+            items[(dataset_id, ('item', item_id))] = item_id
+            items[(dataset_id, ('ordinal', ordinal))] = item_id
+
+        resolved = {}
+        for (dataset_id, item_ref, *rest), (line_no, annotation) in batch.items():
+            if item_ref is not None:
+                if (dataset_id, item_ref) not in items:
+                    self._error(line_no, f'Item {item_ref[0]} {item_ref[1]} does not exist in dataset {dataset_id}.')
+                    continue
+                annotation.item_id = items[(dataset_id, item_ref)]
+            annotation.item_ref = annotation.item_id
+            try:
+                self._add(line_no, annotation, resolved)
+            except IngestError as e:
+                self._error(line_no, str(e))
+        return resolved
+
+    def flush(self):
+        """Write the pending batch in one transaction."""
+        if not self._batch:
+            return
+        batch, self._batch = self._batch, {}
+        batch = self._resolve_items(batch)
+        if not batch:
+            return
+        try:
+            with transaction.atomic():
+                created, updated, conflicts = self._write(batch)
+        except IntegrityError:
+            # A concurrent writer inserted some of the same keys; re-resolve once.
+            with transaction.atomic():
+                created, updated, conflicts = self._write(batch)
+
+        self.created += created
+        self.updated += updated
+        for line_no in conflicts:
+            if self.on_conflict == 'skip':
+                self.skipped += 1
+            else:
+                self._error(line_no, 'Annotation already exists.')
+
+    def _write(self, batch):
+        """Insert new rows and update (or collect) conflicting ones."""
+        existing = self._existing(batch)
+        to_create = []
+        to_update = []
+        conflicts = []
+        now = timezone.now()
+        for key, (line_no, annotation) in batch.items():
+            if key not in existing:
+                to_create.append(annotation)
+            elif self.on_conflict == 'update':
+                annotation.pk = existing[key]
+                annotation.updated_at = now
+                to_update.append(annotation)
+            else:
+                conflicts.append(line_no)
+
+        Annotation.objects.bulk_create(to_create, batch_size=self.batch_size)
+        if to_update:
+            Annotation.objects.bulk_update(
+                to_update,
+                ['content', 'confidence_score', 'updated_at'],
+                batch_size=self.batch_size,
+            )
+        return len(to_create), len(to_update), conflicts
+
+    def _existing(self, batch):
+        """Map keys in ``batch`` that are already stored to their primary keys."""
+        dataset_ids = {key[0] for key in batch}
+        item_ids = {key[1] for key in batch if key[1] is not None}
+        annotator_ids = {key[2] for key in batch}
+        annotation_types = {key[3] for key in batch}
+        items = Q(item__isnull=True)
+        if item_ids:
+            items |= Q(item_id__in=item_ids)
+        rows = Annotation.objects.filter(
+            items,
+            is_gold=False,
+            dataset_id__in=dataset_ids,
+            annotator_id__in=annotator_ids,
+            annotation_type__in=annotation_types,
+        ).values_list('dataset_id', 'item_id', 'annotator_id', 'annotation_type', 'pk')
+        return {row[:4]: row[4] for row in rows.iterator() if row[:4] in batch}
@@ -0,0 +1,61 @@
+"""
+Management command to re-encode stored annotation content compactly.
+"""
+from django.core.management.base import BaseCommand
+
+from annotations.encoding import ContentEncodingError, decode_content, encode_content
+from projects.models import Annotation
+
+
+class Command(BaseCommand):
+    help = 'Rewrite masks and coordinate lists in existing annotations using the compact encoding.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=1000,
+            help='Annotations read and updated per batch.',
+        )
+        parser.add_argument(
+            '--annotation-type',
+            action='append',
+            help='Only this annotation type (repeatable; default: segmentation, keypoint, bounding_box).',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Report how many annotations would change without writing.',
+        )
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        types = options['annotation_type'] or ['segmentation', 'keypoint', 'bounding_box']
+        queryset = Annotation.objects.filter(annotation_type__in=types).order_by('pk')
+
+        changed = skipped = 0
+        last_pk = 0
+        while True:
+            rows = list(queryset.filter(pk__gt=last_pk).only('pk', 'annotation_type', 'content')[:chunk_size])
+            if not rows:
+                break
+            last_pk = rows[-1].pk
+            updates = []
+            for annotation in rows:
+                try:
+                    # Decoding first also unpacks lists an earlier encoding packed lossily or under other keys
+                    encoded = encode_content(decode_content(annotation.content), annotation.annotation_type)
+                except ContentEncodingError:
+                    skipped += 1  # Holds a compact object that cannot be decoded
+                    continue
+                if encoded != annotation.content:
+                    annotation.content = encoded
+                    updates.append(annotation)
+            changed += len(updates)
+            if updates and not options['dry_run']:
+                Annotation.objects.bulk_update(updates, ['content'], batch_size=chunk_size)
+
+        verb = 'Would compact' if options['dry_run'] else 'Compacted'
+        self.stdout.write(self.style.SUCCESS(f'{verb} {changed} annotation(s).'))
+        if skipped:
+            self.stdout.write(self.style.WARNING(f'Skipped {skipped} annotation(s) with undecodable content.'))
@@ -0,0 +1,54 @@
+"""
+Management command to compute inter-annotator agreement.
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+from annotations.agreement import METRICS, compute_agreement
+from projects.models import Project
+
+
+class Command(BaseCommand):
+    help = 'Compute inter-annotator agreement scores for a project.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('project_id', type=int)
+        parser.add_argument(
+            '--annotation-type',
+            action='append',
+            choices=sorted(METRICS),
+            help='Annotation type to score (repeatable; default: all types with a metric).',
+        )
+        parser.add_argument('--dataset', type=int, help='Only this dataset of the project.')
+        parser.add_argument('--metric', help='Override the default metric of the annotation type.')
+        parser.add_argument(
+            '--incremental',
+            action='store_true',
+            help='Only recompute items whose annotations changed since the previous run.',
+        )
+
+    def handle(self, *args, **options):
+        project = Project.objects.filter(pk=options['project_id']).first()
+        if project is None:
+            raise CommandError(f"Project {options['project_id']} does not exist.")
+        dataset = None
+        if options['dataset']:
+            dataset = project.datasets.filter(pk=options['dataset']).first()
+            if dataset is None:
+                raise CommandError(f"Dataset {options['dataset']} is not part of project {project.pk}.")
+
+        for annotation_type in options['annotation_type'] or list(METRICS):
+            try:
+                report = compute_agreement(
+                    project,
+                    annotation_type,
+                    dataset=dataset,
+                    metric=options['metric'],
+                    incremental=options['incremental'],
+                )
+            except ValueError as e:
+                raise CommandError(str(e))
+            score = 'n/a' if report['score'] is None else f"{report['score']:.3f}"
+            self.stdout.write(self.style.SUCCESS(
+                f"{annotation_type}: {report['metric']} {score} over {report['scored_items']} item(s) "
+                f"({report['computed_items']} recomputed)"
+            ))
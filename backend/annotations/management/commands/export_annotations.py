@@ -0,0 +1,53 @@
+"""
+Management command to stream a project's annotations to a file.
+"""
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from annotations.exporters import EXPORTERS, gzip_stream
+from projects.models import Project
+
+
+class Command(BaseCommand):
+    help = 'Export a project\'s annotations as COCO, JSONL or CSV without loading them into memory.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('project_id', type=int)
+        parser.add_argument('--format', choices=sorted(EXPORTERS), default='jsonl', dest='export_format')
+        parser.add_argument('--output', '-o', help='Output file (default: stdout).')
+        parser.add_argument('--annotation-type', help='Only export this annotation type.')
+        parser.add_argument('--verified', action='store_true', help='Only export verified annotations.')
+        parser.add_argument('--gold', action='store_true', help='Only export consensus (gold) annotations.')
+        parser.add_argument('--gzip', action='store_true', help='Compress the output with gzip.')
+        parser.add_argument('--compact', action='store_true', help='JSONL only: keep content in its compact stored form.')
+        parser.add_argument('--chunk-size', type=int, help='Rows fetched per database round trip.')
+
+    def handle(self, *args, **options):
+        try:
+            project = Project.objects.get(pk=options['project_id'])
+        except Project.DoesNotExist:
+            raise CommandError(f"Project {options['project_id']} does not exist.")
+
+        exporter = EXPORTERS[options['export_format']][0]
+        filters = {
+            'verified_only': options['verified'],
+            'gold_only': options['gold'],
+            'chunk_size': options['chunk_size'],
+        }
+        if options['annotation_type']:
+            filters['annotation_type'] = options['annotation_type']
+        if options['export_format'] == 'jsonl':
+            filters['compact'] = options['compact']
+
+        stream = exporter(project, **filters)
+        if options['gzip']:
+            stream = gzip_stream(stream)
+
+        output = open(options['output'], 'wb') if options['output'] else sys.stdout.buffer
+        try:
+            for chunk in stream:
+                output.write(chunk)
+        finally:
+            if options['output']:
+                output.close()
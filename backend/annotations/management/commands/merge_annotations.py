@@ -0,0 +1,58 @@
+"""
+Management command to merge annotations into gold annotations.
+"""
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from annotations.consensus import merge_annotations
+from annotations.merging import MERGEABLE_TYPES
+from projects.models import Project
+
+
+class Command(BaseCommand):
+    help = 'Merge multiply-annotated items of a project into verified gold annotations.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('project_id', type=int)
+        parser.add_argument(
+            '--annotation-type',
+            action='append',
+            choices=MERGEABLE_TYPES,
+            help='Annotation type to merge (repeatable; default: all mergeable types).',
+        )
+        parser.add_argument('--dataset', type=int, help='Only this dataset of the project.')
+        parser.add_argument('--min-annotators', type=int, default=2, help='Annotations an item needs to be merged.')
+        parser.add_argument('--workers', type=int, help='Worker processes (default: CONSENSUS_WORKERS).')
+        parser.add_argument('--user', help='Username recorded as verifier (default: the project owner).')
+
+    def handle(self, *args, **options):
+        project = Project.objects.select_related('owner').filter(pk=options['project_id']).first()
+        if project is None:
+            raise CommandError(f"Project {options['project_id']} does not exist.")
+        dataset = None
+        if options['dataset']:
+            dataset = project.datasets.filter(pk=options['dataset']).first()
+            if dataset is None:
+                raise CommandError(f"Dataset {options['dataset']} is not part of project {project.pk}.")
+        user = project.owner
+        if options['user']:
+            user = get_user_model().objects.filter(username=options['user']).first()
+            if user is None:
+                raise CommandError(f"User {options['user']} does not exist.")
+
+        for annotation_type in options['annotation_type'] or MERGEABLE_TYPES:
+            report = merge_annotations(
+                project,
+                annotation_type,
+                user,
+                dataset=dataset,
+                min_annotators=options['min_annotators'],
+                workers=options['workers'],
+            )
+            self.stdout.write(self.style.SUCCESS(
+                f"{annotation_type}: {report['created']} gold annotation(s) created, {report['updated']} updated"
+            ))
+            if report['invalid']:
+                self.stdout.write(self.style.WARNING(
+                    f"{annotation_type}: {report['invalid']} merge(s) did not match the template schema"
+                ))
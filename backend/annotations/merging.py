@@ -0,0 +1,176 @@
+"""
+Merging of several annotators' work on an item into one consensus annotation.
+
+* ``classification`` - weighted majority vote, each annotator's labels
+  weighted by its ``confidence_score``; multi-label content keeps every
+  label with more than half of the weight.
+* ``bounding_box`` - weighted box fusion: boxes of the same label are
+  clustered on IoU in descending weight order and each cluster becomes the
+  weighted average of its boxes. Clusters backed by less than half of the
+  annotator weight are dropped.
+* ``segmentation`` - pixel voting: per label, a pixel is set when
+  annotators holding more than half of the weight cover it.
+
+``merge_batch`` returns one ``(content, confidence)`` per item, the
+confidence being how strongly the annotators back the merged result. Like
+``projects.derivatives`` this module does not depend on Django, so batches
+can be merged on worker processes.
+"""
+import numpy as np
+
+from .encoding import rle_encode
+from .geometry import box_iou, box_objects, canvas_size, label_values, mask_objects, rasterize
+
+MAJORITY = 0.5
+BOX_IOU_THRESHOLD = 0.55
+
+
+def _weights(group):
+    """Non-negative annotator weights of a group; equal weights if all are zero."""
+    weights = np.clip(np.asarray([weight for weight, _ in group], dtype=float), 0, None)
+    return weights if weights.sum() > 0 else np.ones(len(group))
+
+
+def _support(shares):
+    """Mean agreement with the decisions taken on ``shares``."""
+    shares = np.asarray(shares, dtype=float)
+    return float(np.maximum(shares, 1 - shares).mean()) if shares.size else 1.0
+
+
+def vote_classification(groups):
+    """
+    Weighted majority vote over a batch of classification items at once.
+
+    ``groups`` is a list of ``[(weight, content), ...]``.
+    """
+    categories = {}
+    item_index = []
+    label_index = []
+    vote_weights = []
+    totals = np.zeros(len(groups))
+    multi_label = np.zeros(len(groups), dtype=bool)
+    for index, group in enumerate(groups):
+        weights = _weights(group)
+        totals[index] = weights.sum()
+        for weight, (_, content) in zip(weights, group):
+            values, is_multi = label_values(content)
+            multi_label[index] |= is_multi
+            for value in dict.fromkeys(values):
+                item_index.append(index)
+                label_index.append(categories.setdefault(value, len(categories)))
+                vote_weights.append(weight)
+
+    votes = np.zeros((len(groups), max(len(categories), 1)))
+    np.add.at(votes, (np.asarray(item_index, dtype=int), np.asarray(label_index, dtype=int)), vote_weights)
+    shares = votes / totals[:, None]
+    labels = list(categories)
+
+    results = []
+    for index, row in enumerate(shares):
+        if multi_label[index]:
+            voted = np.flatnonzero(votes[index])
+            chosen = voted[np.argsort(-row[voted], kind='stable')]
+            chosen = chosen[row[chosen] > MAJORITY]
+            results.append(({'labels': [labels[c] for c in chosen]}, _support(row[voted])))
+        elif votes[index].any():
+            winner = int(row.argmax())
+            results.append(({'label': labels[winner]}, float(row[winner])))
+        else:
+            results.append(({'label': None}, 0.0))
+    return results
+
+
+def fuse_boxes(group, iou_threshold=BOX_IOU_THRESHOLD):
+    """Weighted box fusion of one item's boxes."""
+    weights = _weights(group)
+    boxes, labels, scores, owners = [], [], [], []
+    for annotator, (weight, (_, content)) in enumerate(zip(weights, group)):
+        item_boxes, item_labels, item_scores = box_objects(content)
+        boxes.append(item_boxes)
+        labels.extend(item_labels)
+        scores.append(weight * np.nan_to_num(item_scores, nan=1.0))
+        owners.append(np.full(len(item_boxes), annotator))
+    boxes = np.concatenate(boxes)
+    scores = np.concatenate(scores)
+    owners = np.concatenate(owners)
+    labels = np.asarray(labels, dtype=object)
+
+    objects = []
+    shares = []
+    total = weights.sum()
+    for label in dict.fromkeys(labels.tolist()):
+        members = np.flatnonzero(labels == label)
+        members = members[np.argsort(-scores[members], kind='stable')]
+        fused = np.empty((0, 4))
+        clusters = []
+        for index in members:
+            if clusters:
+                overlap = box_iou(boxes[index:index + 1], fused)[0]
+                best = int(overlap.argmax())
+                if overlap[best] > iou_threshold:
+                    clusters[best].append(index)
+                    cluster = clusters[best]
+                    fused[best] = np.average(boxes[cluster], axis=0, weights=scores[cluster] + 1e-12)
+                    continue
+            clusters.append([index])
+            fused = np.vstack([fused, boxes[index]])
+
+        for box, cluster in zip(fused, clusters):
+            share = weights[np.unique(owners[cluster])].sum() / total
+            shares.append(share)
+            if share <= MAJORITY:
+                continue
+            x1, y1, x2, y2 = (round(float(value), 2) for value in box)
+            obj = {'bbox': [x1, y1, round(x2 - x1, 2), round(y2 - y1, 2)], 'score': round(float(share), 4)}
+            if label is not None:
+                obj['label'] = label
+            objects.append(obj)
+    return {'objects': objects}, _support(shares)
+
+
+def vote_masks(group):
+    """Weighted pixel vote of one item's masks, per label."""
+    weights = _weights(group)
+    shapes = [list(mask_objects(content)) for _, content in group]
+    size = canvas_size((kind, value) for item_shapes in shapes for _, kind, value in item_shapes)
+    total = weights.sum()
+
+    objects = []
+    covered = contested = 0
+    for label in dict.fromkeys(label for item_shapes in shapes for label, _, _ in item_shapes):
+        layers = np.zeros((len(group), size[0] * size[1]), dtype=bool)
+        for annotator, item_shapes in enumerate(shapes):
+            for shape_label, kind, value in item_shapes:
+                if shape_label == label:
+                    layers[annotator] |= rasterize(kind, value, size)
+        votes = weights @ layers / total
+        mask = votes > MAJORITY
+        touched = votes > 0
+        covered += int(touched.sum())
+        contested += float(np.minimum(votes, 1 - votes)[touched].sum())
+        if mask.any():
+            obj = {'mask': rle_encode(mask.reshape(size).astype(np.uint8))}
+            if label is not None:
+                obj['label'] = label
+            objects.append(obj)
+    confidence = 1 - contested / covered if covered else 1.0
+    return {'objects': objects}, float(confidence)
+
+
+MERGERS = {
+    'bounding_box': fuse_boxes,
+    'segmentation': vote_masks,
+}
+MERGEABLE_TYPES = ('classification', *MERGERS)
+
+
+def merge_batch(annotation_type, groups):
+    """Merge a batch of items; returns ``(content, confidence)`` per item."""
+    if annotation_type == 'classification':
+        return vote_classification(groups)
+    return [MERGERS[annotation_type](group) for group in groups]
+
+
+def run_job(annotation_type, keys, groups):
+    """Worker entry point: merge one batch and hand back its keys."""
+    return keys, merge_batch(annotation_type, groups)
@@ -0,0 +1,51 @@
+"""
+Serializers for annotations app.
+"""
+from rest_framework import serializers
+
+from projects.models import Annotation, AnnotationRevision
+
+from .encoding import decode_content
+
+
+class AnnotationContentField(serializers.JSONField):
+    """
+    Annotation content, stored compactly and returned as plain JSON.
+    
+    Stored masks and coordinate lists (see ``annotations.encoding``) are
+    expanded unless the request asks for ``?encoding=compact``. Content is
+    written through ingestion, which encodes it.
+    """
+
+    def to_representation(self, value):
+        request = self.context.get('request')
+        if request is not None and request.query_params.get('encoding') == 'compact':
+            return value
+        return decode_content(value)
+
+
+class AnnotationSerializer(serializers.ModelSerializer):
+    """
+    Serializer for listing annotations.
+    """
+    content = AnnotationContentField(read_only=True)
+
+    class Meta:
+        model = Annotation
+        fields = [
+            'id', 'dataset', 'item', 'annotator', 'annotation_type', 'content',
+            'confidence_score', 'is_verified', 'verified_by', 'verified_at',
+            'is_gold', 'created_at', 'updated_at'
+        ]
+        read_only_fields = fields
+
+
+class AnnotationRevisionSerializer(serializers.ModelSerializer):
+    """
+    Serializer for an annotation's revision log (without content).
+    """
+
+    class Meta:
+        model = AnnotationRevision
+        fields = ['id', 'annotation', 'number', 'action', 'is_checkpoint', 'author', 'created_at']
+        read_only_fields = fields
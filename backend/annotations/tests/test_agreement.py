@@ -0,0 +1,82 @@
+"""
+Tests for inter-annotator agreement.
+"""
+from itertools import permutations
+from unittest import mock
+
+import numpy as np
+from django.test import SimpleTestCase, TestCase
+
+from annotations import agreement
+from annotations.agreement import compute_agreement, hungarian, match_iou
+from authentication.models import User
+from projects.models import AgreementScore, Annotation, Dataset, DatasetItem, Project
+
+
+class HungarianTests(SimpleTestCase):
+    def brute_force(self, cost):
+        n, m = cost.shape
+        if n > m:
+            return self.brute_force(cost.T)
+        return min(cost[range(n), list(cols)].sum() for cols in permutations(range(m), n))
+
+    def test_fallback_finds_the_minimum(self):
+        rng = np.random.default_rng(7)
+        with mock.patch.object(agreement, 'linear_sum_assignment', None):
+            for shape in ((1, 1), (3, 3), (4, 6), (6, 4), (5, 5)):
+                cost = rng.random(shape)
+                rows, cols = hungarian(cost)
+                self.assertEqual(len(rows), min(shape))
+                self.assertEqual(len(set(cols.tolist())), len(cols))
+                self.assertAlmostEqual(cost[rows, cols].sum(), self.brute_force(cost))
+
+    def test_match_iou_counts_unmatched_objects(self):
+        iou = np.array([[0.9, 0.1], [0.2, 0.6], [0.0, 0.0]])
+        score, f1 = match_iou(iou)
+        self.assertAlmostEqual(score, 1.5 / 3)
+        self.assertAlmostEqual(f1, 2 * 2 / 5)
+
+
+class ComputeAgreementTests(TestCase):
+    def setUp(self):
+        self.owner = User.objects.create_user(username='owner', email='owner@example.com', password='pw-owner-1')
+        self.other = User.objects.create_user(username='other', email='other@example.com', password='pw-other-1')
+        self.project = Project.objects.create(name='pets', project_type='image', owner=self.owner)
+        dataset = Dataset.objects.create(name='pets', project=self.project, file_path='pets', file_type='png')
+        DatasetItem.objects.append(dataset, [DatasetItem(key=f'{i}.png') for i in range(4)])
+        self.annotations = {}
+        for item in dataset.items.all():
+            for user in (self.owner, self.other):
+                label = 'dog' if item.ordinal == 3 and user == self.other else 'cat'
+                self.annotations[item.ordinal, user.pk] = Annotation.objects.create(
+                    dataset=dataset, item=item, annotator=user,
+                    annotation_type='classification', content={'label': label},
+                )
+
+    def test_kappa_report(self):
+        report = compute_agreement(self.project, 'classification')
+        self.assertEqual((report['items'], report['computed_items']), (4, 4))
+        self.assertAlmostEqual(report['score'], 0.75)
+        self.assertEqual(report['cohen_kappa']['pairs'][0]['items'], 4)
+
+    def test_metrics_are_stored_side_by_side(self):
+        compute_agreement(self.project, 'classification')
+        compute_agreement(self.project, 'classification', metric='span_f1')
+        compute_agreement(self.project, 'classification')
+        self.assertEqual(AgreementScore.objects.filter(metric='kappa').count(), 4)
+        self.assertEqual(AgreementScore.objects.filter(metric='span_f1').count(), 4)
+
+    def test_incremental_runs_revisit_touched_items_only(self):
+        compute_agreement(self.project, 'classification')
+        report = compute_agreement(self.project, 'classification', incremental=True)
+        self.assertEqual(report['computed_items'], 0)
+
+        changed = self.annotations[3, self.other.pk]
+        changed.content = {'label': 'cat'}
+        changed.save()
+        self.annotations[0, self.other.pk].delete()
+        report = compute_agreement(self.project, 'classification', incremental=True)
+        self.assertEqual(report['computed_items'], 2)
+        self.assertEqual(report['items'], 4)
+        self.assertEqual(report['scored_items'], 3)
+        self.assertEqual(report['score'], 1.0)
@@ -0,0 +1,117 @@
+"""
+Tests for consensus merging and gold annotations.
+"""
+import numpy as np
+from django.test import SimpleTestCase, TestCase
+from rest_framework.test import APIClient
+
+from annotations.consensus import merge_annotations
+from annotations.encoding import rle_decode
+from annotations.merging import fuse_boxes, vote_classification, vote_masks
+from authentication.models import User
+from projects.models import Annotation, Dataset, DatasetItem, Project
+
+
+class MergingTests(SimpleTestCase):
+    def test_classification_vote_is_weighted(self):
+        results = vote_classification([
+            [(0.3, {'label': 'cat'}), (0.3, {'label': 'cat'}), (0.9, {'label': 'dog'})],
+            [(0, {'label': 'cat'}), (0, {'label': 'cat'}), (0, {'label': 'dog'})],
+            [(1, {'labels': ['a', 'b']}), (1, {'labels': ['a']}), (1, {'labels': ['c']})],
+            [(1, {}), (1, {})],
+        ])
+        (dog, dog_share), (cat, cat_share), (multi, support), (empty, none) = results
+        self.assertEqual(dog, {'label': 'dog'})
+        self.assertAlmostEqual(dog_share, 0.6)
+        # All weights zero: every annotator counts the same
+        self.assertEqual(cat, {'label': 'cat'})
+        self.assertAlmostEqual(cat_share, 2 / 3)
+        self.assertEqual(multi, {'labels': ['a']})
+        self.assertAlmostEqual(support, 2 / 3)
+        self.assertEqual((empty, none), ({'label': None}, 0.0))
+
+    def test_box_fusion_drops_minority_boxes(self):
+        content, confidence = fuse_boxes([
+            (1, {'objects': [{'bbox': [0, 0, 10, 10], 'label': 'car'}]}),
+            (1, {'objects': [{'bbox': [1, 1, 10, 10], 'label': 'car'}]}),
+            (1, {'objects': [{'bbox': [50, 50, 10, 10], 'label': 'car'}]}),
+        ])
+        self.assertEqual(content, {'objects': [{'bbox': [0.5, 0.5, 10.0, 10.0], 'score': 0.6667, 'label': 'car'}]})
+        self.assertAlmostEqual(confidence, 2 / 3)
+
+    def test_box_fusion_keeps_labels_apart(self):
+        content, _ = fuse_boxes([
+            (1, {'objects': [{'bbox': [0, 0, 10, 10], 'label': 'car'}]}),
+            (1, {'objects': [{'bbox': [0, 0, 10, 10], 'label': 'bus'}]}),
+        ])
+        self.assertEqual(content, {'objects': []})
+
+    def test_pixel_vote(self):
+        content, confidence = vote_masks([
+            (1, {'objects': [{'mask': [[1, 1], [0, 0]], 'label': 'x'}]}),
+            (1, {'objects': [{'mask': [[1, 0], [0, 0]], 'label': 'x'}]}),
+            (1, {'objects': [{'mask': [[0, 0], [0, 1]], 'label': 'x'}]}),
+        ])
+        (obj,) = content['objects']
+        self.assertEqual(obj['label'], 'x')
+        np.testing.assert_array_equal(rle_decode(obj['mask']), [[1, 0], [0, 0]])
+        self.assertAlmostEqual(confidence, 2 / 3)
+
+
+class ConsensusTests(TestCase):
+    def setUp(self):
+        self.owner = User.objects.create_user(username='owner', email='owner@example.com', password='pw-owner-1')
+        self.annotators = [
+            User.objects.create_user(username=f'ann{i}', email=f'ann{i}@example.com', password='pw-annot-1')
+            for i in range(3)
+        ]
+        self.project = Project.objects.create(name='pets', project_type='image', owner=self.owner)
+        self.dataset = Dataset.objects.create(name='pets', project=self.project, file_path='pets', file_type='png')
+        DatasetItem.objects.append(self.dataset, [DatasetItem(key=f'{i}.png') for i in range(3)])
+        self.items = list(self.dataset.items.all())
+
+    def annotate(self, item, labels, weights=(1.0, 1.0, 1.0)):
+        for user, label, weight in zip(self.annotators, labels, weights):
+            Annotation.objects.create(
+                dataset=self.dataset, item=item, annotator=user, annotation_type='classification',
+                content={'label': label}, confidence_score=weight,
+            )
+
+    def test_merge_writes_and_replaces_gold(self):
+        self.annotate(self.items[0], ['cat', 'cat', 'dog'])
+        self.annotate(self.items[1], ['cat', 'dog', 'dog'], weights=(0.9, 0.2, 0.2))
+        self.annotate(self.items[2], ['cat'])  # Below min_annotators
+
+        report = merge_annotations(self.project, 'classification', self.owner, workers=1)
+        self.assertEqual(report, {'merged_items': 2, 'created': 2, 'updated': 0, 'invalid': 0})
+        gold = {
+            annotation.item_id: annotation for annotation in Annotation.objects.filter(is_gold=True)
+        }
+        self.assertEqual(set(gold), {self.items[0].pk, self.items[1].pk})
+        self.assertEqual(gold[self.items[0].pk].content, {'label': 'cat'})
+        self.assertEqual(gold[self.items[1].pk].content, {'label': 'cat'})
+        self.assertAlmostEqual(gold[self.items[0].pk].confidence_score, 2 / 3)
+        self.assertTrue(all(
+            annotation.is_verified and annotation.verified_by_id == self.owner.pk for annotation in gold.values()
+        ))
+
+        Annotation.objects.filter(item=self.items[0], annotator=self.annotators[0]).update(content={'label': 'dog'})
+        report = merge_annotations(self.project, 'classification', self.owner, workers=2, batch_size=1)
+        self.assertEqual(report, {'merged_items': 2, 'created': 0, 'updated': 2, 'invalid': 0})
+        self.assertEqual(Annotation.objects.get(is_gold=True, item=self.items[0]).content, {'label': 'dog'})
+        self.assertEqual(Annotation.objects.filter(is_gold=True).count(), 2)
+
+    def test_endpoint(self):
+        self.annotate(self.items[0], ['cat', 'cat', 'dog'])
+        client = APIClient()
+        url = f'/api/v1/projects/{self.project.pk}/consensus/'
+
+        client.force_authenticate(self.annotators[0])
+        self.assertEqual(client.post(url, {'annotation_type': 'classification'}).status_code, 404)
+
+        client.force_authenticate(self.owner)
+        self.assertEqual(client.post(url, {'annotation_type': 'transcription'}).status_code, 400)
+        response = client.post(url, {'annotation_type': 'classification', 'min_annotators': 4})
+        self.assertEqual((response.status_code, response.data['merged_items']), (200, 0))
+        response = client.post(url, {'annotation_type': 'classification'})
+        self.assertEqual((response.status_code, response.data['created']), (200, 1))
@@ -0,0 +1,116 @@
+"""
+Tests for the compact annotation content encoding.
+"""
+import json
+
+from django.test import SimpleTestCase, TestCase
+from rest_framework.test import APIClient
+
+from annotations.encoding import (
+    FLOAT_TAG, INT_TAG, RLE_TAG, ContentEncodingError, decode_content, encode_content,
+)
+from annotations.exporters import export_jsonl
+from authentication.models import User
+from projects.models import Annotation, Dataset, Project
+
+
+def round_trip(content, annotation_type='segmentation'):
+    encoded = encode_content(content, annotation_type)
+    return encoded, decode_content(json.loads(json.dumps(encoded)))
+
+
+class EncodeContentTests(SimpleTestCase):
+    def test_polygons_and_keypoints_are_packed(self):
+        polygon = [[float(i) + 0.5 for i in range(20)], [1.25, 2.5, 3.75, 4.0, 5.5, 6.0]]
+        encoded, decoded = round_trip({'objects': [{'segmentation': polygon}]})
+        self.assertIn(FLOAT_TAG, encoded['objects'][0]['segmentation'])
+        self.assertEqual(decoded, {'objects': [{'segmentation': polygon}]})
+
+        keypoints = [[i, i + 1, 2] for i in range(10)]
+        encoded, decoded = round_trip({'keypoints': keypoints}, 'keypoint')
+        self.assertEqual(encoded['keypoints']['shape'], [10, 3])
+        self.assertIn(INT_TAG, encoded['keypoints'])
+        self.assertEqual(decoded, {'keypoints': keypoints})
+
+    def test_values_that_do_not_fit_are_stored_as_sent(self):
+        for values in (
+            [3000000001 + i for i in range(16)],  # Beyond int32
+            [1, 2.5] * 8,  # Mixed ints and floats
+            [123456.789] * 16,  # Not representable in float32
+            [True, False] * 8,
+        ):
+            content = {'segmentation': values}
+            encoded, decoded = round_trip(content)
+            self.assertEqual(encoded, content)
+            self.assertEqual(decoded, content)
+            self.assertEqual([type(value) for value in decoded['segmentation']], [type(value) for value in values])
+
+    def test_only_geometry_of_polygon_and_keypoint_types_is_packed(self):
+        values = [float(i) for i in range(32)]
+        self.assertEqual(encode_content({'scores': values}, 'segmentation'), {'scores': values})
+        self.assertEqual(encode_content({'points': values}, 'transcription'), {'points': values})
+        self.assertEqual(encode_content({'segmentation': values}, 'bounding_box'), {'segmentation': values})
+
+    def test_masks_are_run_length_encoded(self):
+        mask = [[0, 1, 1, 0], [1, 1, 0, 0], [0, 0, 0, 1]]
+        encoded, decoded = round_trip({'mask': mask}, 'classification')
+        self.assertEqual(encoded['mask']['size'], [3, 4])
+        self.assertEqual(decoded, {'mask': mask})
+        # Not integer 0/1 cells: stored as sent
+        self.assertEqual(encode_content({'mask': [[0.0, 1.0]]}, 'segmentation'), {'mask': [[0.0, 1.0]]})
+
+    def test_reserved_keys_are_rejected(self):
+        for tag in (RLE_TAG, FLOAT_TAG, INT_TAG):
+            with self.assertRaises(ContentEncodingError):
+                encode_content({'objects': [{'segmentation': {tag: 'abc'}}]}, 'segmentation')
+
+    def test_undecodable_objects_are_returned_as_stored(self):
+        content = {'label': 'cat', 'points': {FLOAT_TAG: 'abc'}, 'mask': {RLE_TAG: 'x'}}
+        with self.assertLogs('annotations.encoding', 'WARNING'):
+            self.assertEqual(decode_content(content), content)
+
+
+class StoredContentTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='annotator', email='a@example.com', password='pw-annot-1')
+        self.project = Project.objects.create(name='shapes', project_type='image', owner=self.user)
+        self.dataset = Dataset.objects.create(
+            name='shapes.png', project=self.project, file_path='shapes.png', file_type='png'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def ingest(self, *lines):
+        body = '\n'.join(json.dumps(line) for line in lines)
+        return self.client.post('/api/v1/annotations/ingest/', body, content_type='application/x-ndjson').json()
+
+    def test_ingest_rejects_reserved_keys(self):
+        report = self.ingest(
+            {'dataset': self.dataset.pk, 'annotation_type': 'segmentation', 'content': {'points': {FLOAT_TAG: 'abc'}}},
+        )
+        self.assertEqual(report['error_count'], 1)
+        self.assertFalse(Annotation.objects.exists())
+
+    def test_ingest_keeps_values_exact(self):
+        values = [3000000001 + i for i in range(16)]
+        report = self.ingest(
+            {'dataset': self.dataset.pk, 'annotation_type': 'segmentation', 'content': {'segmentation': values}},
+        )
+        self.assertEqual(report['error_count'], 0, report)
+        response = self.client.get('/api/v1/annotations/')
+        self.assertEqual(response.json()['results'][0]['content'], {'segmentation': values})
+
+    def test_bad_stored_object_fails_only_its_row(self):
+        bad = {'points': {FLOAT_TAG: 'abc'}}
+        Annotation.objects.create(dataset=self.dataset, annotator=self.user, annotation_type='keypoint', content=bad)
+        Annotation.objects.create(
+            dataset=self.dataset, annotator=self.user, annotation_type='classification', content={'label': 'cat'}
+        )
+        with self.assertLogs('annotations.encoding', 'WARNING'):
+            response = self.client.get('/api/v1/annotations/')
+        self.assertEqual(response.status_code, 200)
+        self.assertCountEqual([row['content'] for row in response.json()['results']], [bad, {'label': 'cat'}])
+
+        with self.assertLogs('annotations.encoding', 'WARNING'):
+            lines = [json.loads(line) for line in b''.join(export_jsonl(self.project)).splitlines()]
+        self.assertEqual(len(lines), 2)
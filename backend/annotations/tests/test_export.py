@@ -0,0 +1,78 @@
+"""
+Tests for the streaming annotation exports.
+"""
+import csv
+import gzip
+import io
+import json
+
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from annotations.encoding import RLE_TAG, encode_content
+from authentication.models import User
+from projects.models import Annotation, Dataset, DatasetItem, Project
+
+
+class ExportTests(TestCase):
+    def setUp(self):
+        self.owner = User.objects.create_user(username='owner', email='owner@example.com', password='pw-owner-1')
+        self.stranger = User.objects.create_user(username='x', email='x@example.com', password='pw-stranger-1')
+        self.project = Project.objects.create(name='pets', project_type='image', owner=self.owner)
+        self.dataset = Dataset.objects.create(name='pets', project=self.project, file_path='pets', file_type='png')
+        DatasetItem.objects.append(self.dataset, [DatasetItem(key=f'{i}.png') for i in range(2)])
+        self.first, self.second = self.dataset.items.order_by('ordinal')
+
+        self.label = Annotation.objects.create(
+            dataset=self.dataset, item=self.first, annotator=self.owner, annotation_type='classification',
+            content={'label': 'cat'}, is_verified=True,
+        )
+        mask = [[0, 1, 1], [0, 1, 0]]
+        self.objects = Annotation.objects.create(
+            dataset=self.dataset, item=self.second, annotator=self.owner, annotation_type='segmentation',
+            content=encode_content({'objects': [
+                {'label': 'cat', 'bbox': [0, 0, 2, 3], 'mask': mask},
+                {'label': 'dog', 'segmentation': [[0.5, 0.5, 2.0, 0.5, 2.0, 1.5]]},
+            ]}, 'segmentation'),
+        )
+
+    def export(self, export_format, user=None, **params):
+        client = APIClient()
+        client.force_authenticate(user or self.owner)
+        return client.get(f'/api/v1/projects/{self.project.pk}/export/{export_format}/', params)
+
+    def body(self, response):
+        self.assertEqual(response.status_code, 200)
+        return b''.join(response.streaming_content)
+
+    def test_jsonl(self):
+        lines = [json.loads(line) for line in self.body(self.export('jsonl')).splitlines()]
+        self.assertEqual([line['id'] for line in lines], [self.label.pk, self.objects.pk])
+        self.assertEqual(lines[1]['content']['objects'][0]['mask'], [[0, 1, 1], [0, 1, 0]])
+        self.assertEqual((lines[0]['item_key'], lines[0]['annotator']), ('0.png', 'owner'))
+
+        lines = self.body(self.export('jsonl', encoding='compact', verified='true')).splitlines()
+        self.assertEqual(len(lines), 1)
+
+    def test_csv(self):
+        rows = list(csv.reader(io.StringIO(self.body(self.export('csv')).decode())))
+        self.assertEqual(rows[0][:3], ['id', 'dataset', 'file_path'])
+        self.assertEqual(len(rows), 2)
+        self.assertEqual((rows[1][0], rows[1][6]), (str(self.label.pk), 'cat'))
+
+    def test_coco(self):
+        response = self.export('coco', gzip='1')
+        self.assertEqual(response['Content-Type'], 'application/gzip')
+        coco = json.loads(gzip.decompress(self.body(response)))
+        self.assertEqual([image['file_name'] for image in coco['images']], ['0.png', '1.png'])
+        self.assertEqual([category['name'] for category in coco['categories']], ['cat', 'dog'])
+        cat, dog = coco['annotations']
+        self.assertEqual((cat['image_id'], cat['bbox'], cat['area']), (self.second.pk, [0, 0, 2, 3], 6))
+        self.assertEqual(cat['segmentation']['size'], [2, 3])
+        self.assertIsInstance(cat['segmentation']['counts'], str)
+        self.assertNotIn(RLE_TAG, cat['segmentation'])
+        self.assertEqual(dog['segmentation'], [[0.5, 0.5, 2.0, 0.5, 2.0, 1.5]])
+
+    def test_access_and_formats(self):
+        self.assertEqual(self.export('jsonl', user=self.stranger).status_code, 404)
+        self.assertEqual(self.export('xml').status_code, 400)
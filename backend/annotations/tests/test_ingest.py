@@ -0,0 +1,79 @@
+"""
+Tests for the streaming NDJSON annotation ingest.
+"""
+import json
+
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from authentication.models import User
+from projects.models import Annotation, AnnotationTemplate, Dataset, DatasetItem, Project
+
+
+class IngestTests(TestCase):
+    def setUp(self):
+        self.owner = User.objects.create_user(username='owner', email='owner@example.com', password='pw-owner-1')
+        self.member = User.objects.create_user(username='member', email='member@example.com', password='pw-member-1')
+        self.stranger = User.objects.create_user(username='x', email='x@example.com', password='pw-stranger-1')
+        self.project = Project.objects.create(name='pets', project_type='image', owner=self.owner)
+        self.project.collaborators.add(self.member)
+        self.dataset = Dataset.objects.create(name='pets', project=self.project, file_path='pets', file_type='png')
+        DatasetItem.objects.append(self.dataset, [DatasetItem(key=f'{i}.png') for i in range(5)])
+
+    def ingest(self, lines, user=None, **params):
+        client = APIClient()
+        client.force_authenticate(user or self.owner)
+        body = '\n'.join(line if isinstance(line, str) else json.dumps(line) for line in lines)
+        query = '&'.join(f'{key}={value}' for key, value in params.items())
+        response = client.post(
+            f'/api/v1/annotations/ingest/?{query}', body.encode(), content_type='application/x-ndjson'
+        )
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json()
+
+    def line(self, ordinal, label='cat', **extra):
+        return {
+            'dataset': self.dataset.pk, 'ordinal': ordinal, 'annotation_type': 'classification',
+            'content': {'label': label}, **extra,
+        }
+
+    def test_lines_are_written_in_batches(self):
+        report = self.ingest([self.line(i) for i in range(5)] + ['', '{not json', self.line(9)], batch_size=2)
+        self.assertEqual((report['created'], report['error_count']), (5, 2))
+        self.assertEqual([error['line'] for error in report['errors']], [7, 8])
+        self.assertEqual(
+            sorted(Annotation.objects.values_list('item__ordinal', flat=True)), [0, 1, 2, 3, 4]
+        )
+        self.dataset.refresh_from_db()
+        self.assertEqual(self.dataset.annotation_count, 5)
+
+    def test_conflicts(self):
+        self.ingest([self.line(0), self.line(1)])
+        report = self.ingest([self.line(0, 'dog'), self.line(2)])
+        self.assertEqual((report['created'], report['skipped']), (1, 1))
+
+        report = self.ingest([self.line(0, 'dog')], on_conflict='update')
+        self.assertEqual(report['updated'], 1)
+        self.assertEqual(Annotation.objects.get(item__ordinal=0).content, {'label': 'dog'})
+
+        report = self.ingest([self.line(1), self.line(3), self.line(3)], on_conflict='error')
+        self.assertEqual((report['created'], report['error_count'], report['success']), (1, 2, False))
+
+    def test_access_and_annotators(self):
+        report = self.ingest([self.line(0)], user=self.stranger)
+        self.assertEqual((report['created'], report['error_count']), (0, 1))
+
+        report = self.ingest([self.line(0, annotator=self.owner.pk)], user=self.member)
+        self.assertEqual((report['created'], report['error_count']), (0, 1))
+        report = self.ingest([self.line(0, annotator=self.member.pk), self.line(1, annotator=self.stranger.pk)])
+        self.assertEqual((report['created'], report['error_count']), (1, 1))
+        self.assertEqual(Annotation.objects.get().annotator, self.member)
+
+    def test_content_is_validated(self):
+        AnnotationTemplate.objects.create(
+            name='pets', project=self.project, annotation_type='classification',
+            schema={'type': 'object', 'properties': {'label': {'enum': ['cat']}}, 'required': ['label']},
+        )
+        report = self.ingest([self.line(0), self.line(1, 'dog')])
+        self.assertEqual((report['created'], report['error_count']), (1, 1))
+        self.assertEqual(report['errors'][0]['line'], 2)
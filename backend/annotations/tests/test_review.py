@@ -0,0 +1,91 @@
+"""
+Tests for bulk review (verify and reject).
+"""
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from authentication.models import User
+from projects.models import Annotation, Dataset, DatasetItem, Project
+
+
+class ReviewTests(TestCase):
+    def setUp(self):
+        self.owner = User.objects.create_user(username='owner', email='owner@example.com', password='pw-owner-1')
+        self.other = User.objects.create_user(username='other', email='other@example.com', password='pw-other-1')
+        self.annotator = User.objects.create_user(username='ann', email='ann@example.com', password='pw-annot-1')
+        project = Project.objects.create(name='pets', project_type='image', owner=self.owner)
+        project.collaborators.add(self.annotator)
+        self.dataset = Dataset.objects.create(name='pets', project=project, file_path='pets', file_type='png')
+        DatasetItem.objects.append(self.dataset, [DatasetItem(key=f'{i}.png') for i in range(4)])
+        self.annotations = [
+            Annotation.objects.create(
+                dataset=self.dataset, item=item, annotator=self.annotator, annotation_type='classification',
+                content={'label': 'cat'}, confidence_score=score,
+            )
+            for item, score in zip(self.dataset.items.all(), (0.5, 0.9, 0.95, 1.0))
+        ]
+        elsewhere = Project.objects.create(name='private', project_type='image', owner=self.other)
+        self.foreign = Annotation.objects.create(
+            dataset=Dataset.objects.create(name='private', project=elsewhere, file_path='private', file_type='png'),
+            annotator=self.other, annotation_type='classification', content={'label': 'dog'},
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.owner)
+
+    def review(self, **data):
+        return self.client.post('/api/v1/annotations/review/', data, format='json')
+
+    def test_verify_ids_in_one_update(self):
+        ids = [self.annotations[0].pk, self.annotations[1].pk, self.foreign.pk]
+        with CaptureQueriesContext(connection) as queries:
+            response = self.review(action='verify', ids=ids)
+        self.assertEqual((response.status_code, response.data['updated']), (200, 2))
+        updates = [query['sql'] for query in queries if query['sql'].startswith('UPDATE "annotations"')]
+        self.assertEqual(len(updates), 1)
+
+        verified = Annotation.objects.filter(is_verified=True)
+        self.assertEqual(set(verified.values_list('pk', flat=True)), set(ids[:2]))
+        self.assertTrue(all(annotation.verified_by_id == self.owner.pk and annotation.verified_at
+                            for annotation in verified))
+
+    def test_verify_by_filter(self):
+        response = self.review(action='verify', filter={'dataset': self.dataset.pk, 'min_confidence': 0.95})
+        self.assertEqual(response.data['updated'], 2)
+        self.assertEqual(
+            set(Annotation.objects.filter(is_verified=True).values_list('pk', flat=True)),
+            {self.annotations[2].pk, self.annotations[3].pk},
+        )
+
+    def test_reject_keeps_the_review(self):
+        Annotation.objects.filter(pk=self.annotations[0].pk).verify(self.other)
+        response = self.review(action='reject', ids=[self.annotations[0].pk])
+        self.assertEqual(response.data['updated'], 1)
+        annotation = Annotation.objects.get(pk=self.annotations[0].pk)
+        self.assertEqual((annotation.is_verified, annotation.verified_by_id), (False, self.owner.pk))
+        self.assertIsNotNone(annotation.verified_at)
+
+    def test_only_owners_review_and_never_their_own(self):
+        own = Annotation.objects.create(
+            dataset=self.dataset, annotator=self.owner, annotation_type='classification', content={'label': 'cat'}
+        )
+        response = self.review(action='verify', ids=[own.pk, self.annotations[0].pk])
+        self.assertEqual(response.data['updated'], 1)
+        self.assertFalse(Annotation.objects.get(pk=own.pk).is_verified)
+
+        self.client.force_authenticate(self.annotator)
+        for action in ('verify', 'reject'):
+            response = self.review(action=action, filter={'dataset': self.dataset.pk})
+            self.assertEqual((response.status_code, response.data['updated']), (200, 0))
+
+    def test_invalid_requests(self):
+        for data in (
+            {'action': 'approve', 'ids': [1]},
+            {'action': 'verify'},
+            {'action': 'verify', 'ids': ['1']},
+            {'action': 'verify', 'filter': {'min_confidence': 0.9}},
+            {'action': 'verify', 'filter': {'dataset': self.dataset.pk, 'min_confidence': 'high'}},
+        ):
+            self.assertEqual(self.review(**data).status_code, 400, data)
+        self.assertFalse(Annotation.objects.filter(is_verified=True).exists())
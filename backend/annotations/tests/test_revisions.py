@@ -0,0 +1,75 @@
+"""
+Tests for annotation revisions and restoring an earlier revision.
+"""
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from authentication.models import User
+from projects.models import Annotation, AnnotationRevision, Dataset, Project
+from projects.revisions import ACTION_CREATE, ACTION_UPDATE, revision_content
+from projects.search import search
+
+
+class RevisionTests(TestCase):
+    def setUp(self):
+        self.owner = User.objects.create_user(username='owner', email='owner@example.com', password='pw-owner-1')
+        self.annotator = User.objects.create_user(username='ann', email='ann@example.com', password='pw-annot-1')
+        self.project = Project.objects.create(name='letters', project_type='text', owner=self.owner)
+        self.dataset = Dataset.objects.create(
+            name='letters', project=self.project, file_path='letters.txt', file_type='txt'
+        )
+        self.annotation = Annotation.objects.create(
+            dataset=self.dataset, annotator=self.annotator,
+            annotation_type='transcription', content={'text': 'dear aunt agatha'},
+        )
+
+    def edit(self, text):
+        self.annotation.content = {'text': text}
+        self.annotation.save()
+
+    def test_every_revision_is_rebuilt(self):
+        texts = ['dear aunt agatha'] + [f'draft {n}' for n in range(2, 25)]
+        for text in texts[1:]:
+            self.edit(text)
+        numbers = list(self.annotation.revisions.order_by('number').values_list('number', flat=True))
+        self.assertEqual(numbers, list(range(1, len(texts) + 1)))
+        for number, text in enumerate(texts, 1):
+            self.assertEqual(revision_content(self.annotation.pk, number), {'text': text})
+
+    def test_restore_goes_through_the_write_path(self):
+        self.edit('dear uncle tom')
+        client = APIClient()
+        client.force_authenticate(self.owner)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = client.post(f'/api/v1/annotations/{self.annotation.pk}/revisions/1/restore/')
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(response.json()['content'], {'text': 'dear aunt agatha'})
+
+        self.annotation.refresh_from_db()
+        self.assertEqual(self.annotation.content, {'text': 'dear aunt agatha'})
+        restored = AnnotationRevision.objects.get(annotation=self.annotation, number=3)
+        self.assertEqual((restored.action, restored.author_id), (ACTION_UPDATE, self.owner.pk))
+        self.assertEqual(
+            AnnotationRevision.objects.get(annotation=self.annotation, number=1).action, ACTION_CREATE
+        )
+        # Re-indexed: the restored text is found, the replaced one is not
+        self.assertEqual([row[0] for row in search(self.project.pk, 'agatha')], [self.annotation.pk])
+        self.assertEqual(search(self.project.pk, 'uncle'), [])
+
+    def test_restore_is_limited_to_annotator_and_owner(self):
+        stranger = User.objects.create_user(username='x', email='x@example.com', password='pw-strange-1')
+        self.project.collaborators.add(stranger)
+        client = APIClient()
+        client.force_authenticate(stranger)
+        response = client.post(f'/api/v1/annotations/{self.annotation.pk}/revisions/1/restore/')
+        self.assertEqual(response.status_code, 403)
+
+    def test_history_outlives_the_annotation(self):
+        self.edit('dear uncle tom')
+        annotation_id = self.annotation.pk
+        self.annotation.delete()
+        client = APIClient()
+        client.force_authenticate(self.owner)
+        response = client.get(f'/api/v1/annotations/{annotation_id}/revisions/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([row['number'] for row in response.json()['results']], [1, 2, 3])
@@ -0,0 +1,58 @@
+"""
+Tests for template schema validation on the annotation write paths.
+"""
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from annotations.consensus import merge_annotations
+from authentication.models import User
+from projects.models import Annotation, AnnotationTemplate, Dataset, DatasetItem, Project
+
+CAT_ONLY = {'type': 'object', 'properties': {'label': {'enum': ['cat']}}, 'required': ['label']}
+
+
+class ValidationTestCase(TestCase):
+    def setUp(self):
+        self.owner = User.objects.create_user(username='owner', email='owner@example.com', password='pw-owner-1')
+        self.other = User.objects.create_user(username='other', email='other@example.com', password='pw-other-1')
+        self.project = Project.objects.create(name='pets', project_type='image', owner=self.owner)
+        self.dataset = Dataset.objects.create(name='pets', project=self.project, file_path='pets', file_type='png')
+
+    def require(self, schema):
+        AnnotationTemplate.objects.create(
+            name='pets', project=self.project, annotation_type='classification', schema=schema
+        )
+
+
+class RestoreValidationTests(ValidationTestCase):
+    def test_restore_refuses_content_the_template_rejects(self):
+        annotation = Annotation.objects.create(
+            dataset=self.dataset, annotator=self.owner, annotation_type='classification', content={'label': 'dog'}
+        )
+        annotation.content = {'label': 'cat'}
+        annotation.save()
+        self.require(CAT_ONLY)
+
+        client = APIClient()
+        client.force_authenticate(self.owner)
+        response = client.post(f'/api/v1/annotations/{annotation.pk}/revisions/1/restore/')
+        self.assertEqual(response.status_code, 400, response.content)
+        annotation.refresh_from_db()
+        self.assertEqual(annotation.content, {'label': 'cat'})
+
+
+class ConsensusValidationTests(ValidationTestCase):
+    def test_gold_annotations_must_match_the_template(self):
+        cat, dog = (DatasetItem.objects.create(dataset=self.dataset, ordinal=i, key=f'{i}.png') for i in range(2))
+        for user in (self.owner, self.other):
+            for item, label in ((cat, 'cat'), (dog, 'dog')):
+                Annotation.objects.create(
+                    dataset=self.dataset, item=item, annotator=user,
+                    annotation_type='classification', content={'label': label},
+                )
+        self.require(CAT_ONLY)
+
+        report = merge_annotations(self.project, 'classification', self.owner, workers=1)
+        self.assertEqual((report['created'], report['invalid']), (1, 1))
+        gold = Annotation.objects.get(is_gold=True)
+        self.assertEqual((gold.item_id, gold.content), (cat.pk, {'label': 'cat'}))
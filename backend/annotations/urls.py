@@ -2,10 +2,27 @@
 URL patterns for annotations app.
 """
 from django.urls import path
+from . import views
 
 app_name = 'annotations'
 
 urlpatterns = [
-    # Placeholder for annotation-specific endpoints
-    # These will be implemented as needed
+    path('annotations/', views.AnnotationListView.as_view(), name='annotation_list'),
+    
+    # Bulk operations
+    path('annotations/ingest/', views.AnnotationIngestView.as_view(), name='annotation_ingest'),
+    path('annotations/review/', views.AnnotationReviewView.as_view(), name='annotation_review'),
+    
+    # Revision history
+    path('annotations/<int:annotation_id>/revisions/', views.AnnotationRevisionListView.as_view(), name='annotation_revisions'),
+    path('annotations/<int:annotation_id>/revisions/<int:number>/', views.AnnotationRevisionDetailView.as_view(), name='annotation_revision'),
+    path('annotations/<int:annotation_id>/revisions/<int:number>/restore/', views.AnnotationRestoreView.as_view(), name='annotation_restore'),
+    path('datasets/<int:dataset_id>/annotations/history/', views.DatasetHistoryView.as_view(), name='dataset_annotation_history'),
+    
+    # Streaming export
+    path('projects/<int:project_id>/export/<str:export_format>/', views.AnnotationExportView.as_view(), name='annotation_export'),
+    
+    # Inter-annotator agreement
+    path('projects/<int:project_id>/agreement/', views.ProjectAgreementView.as_view(), name='project_agreement'),
+    path('projects/<int:project_id>/consensus/', views.ProjectConsensusView.as_view(), name='project_consensus'),
 ]
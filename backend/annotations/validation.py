@@ -0,0 +1,131 @@
+"""
+Validation of annotation content against annotation template schemas.
+
+The schema of a project's required ``AnnotationTemplate`` for an annotation
+type (a type-specific template first, then one for every type, the default
+one first) is compiled once into a Python function with fastjsonschema.
+Compiled validators are kept in an LRU cache keyed by ``(template id,
+updated_at)``, so editing a template changes its key and the stale
+validator simply ages out; checking a piece of content then costs a
+function call.
+"""
+import threading
+from collections import OrderedDict
+
+import fastjsonschema
+from django.conf import settings
+
+from projects.models import AnnotationTemplate
+
+
+class ContentValidationError(Exception):
+    """Raised when annotation content does not match its template schema."""
+
+
+class _NoRemoteRefs(dict):
+    """fastjsonschema handlers that refuse to fetch ``$ref`` URIs of any scheme."""
+
+    def __contains__(self, scheme):
+        return True
+
+    def __getitem__(self, scheme):
+        def refuse(uri):
+            raise fastjsonschema.JsonSchemaDefinitionException(f'Remote $ref {uri} is not allowed.')
+        return refuse
+
+
+def compile_schema(schema):
+    """
+    Compile a JSON schema into a validation function.
+
+    Raises ``ContentValidationError`` when the schema itself is invalid.
+    """
+    try:
+        # use_default=False: validation must never rewrite the content.
+        return fastjsonschema.compile(schema, handlers=_NoRemoteRefs(), use_default=False)
+    except (fastjsonschema.JsonSchemaDefinitionException, TypeError, ValueError) as e:
+        raise ContentValidationError(f'Invalid template schema: {e}')
+
+
+class ValidatorCache:
+    """
+    Thread-safe LRU cache of compiled schemas keyed by ``(template_id, updated_at)``.
+    """
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._validators = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, template_id, updated_at):
+        key = (template_id, updated_at)
+        with self._lock:
+            validator = self._validators.get(key)
+            if validator is not None:
+                self._validators.move_to_end(key)
+                self.hits += 1
+                return validator
+            self.misses += 1
+
+        schema = AnnotationTemplate.objects.filter(pk=template_id).values_list('schema', flat=True).first()
+        try:
+            validator = compile_schema(schema if schema is not None else {})
+        except ContentValidationError as e:
+            def validator(content, error=str(e)):
+                raise ContentValidationError(f'Template {template_id}: {error}')
+
+        with self._lock:
+            self._validators[key] = validator
+            self._validators.move_to_end(key)
+            while len(self._validators) > self.maxsize:
+                self._validators.popitem(last=False)
+        return validator
+
+    def clear(self):
+        with self._lock:
+            self._validators.clear()
+
+
+validators = ValidatorCache(settings.ANNOTATION_SCHEMA_CACHE_SIZE)
+
+
+class ContentValidator:
+    """
+    Validate annotation content for any number of projects.
+
+    Template ids and timestamps (not schemas) are read once per project for
+    the lifetime of the validator, e.g. one ingest request.
+    """
+
+    def __init__(self):
+        self._templates = {}  # project_id -> [(annotation_type, is_default, id, updated_at), ...]
+
+    def template_for(self, project_id, annotation_type):
+        """``(template_id, updated_at)`` of the schema that applies, or ``None``."""
+        if project_id not in self._templates:
+            self._templates[project_id] = sorted(
+                AnnotationTemplate.objects.filter(project_id=project_id, is_required=True)
+                .values_list('annotation_type', 'is_default', 'pk', 'updated_at'),
+                key=lambda row: (not row[0], not row[1], row[2]),
+            )
+        for template_type, _, template_id, updated_at in self._templates[project_id]:
+            if template_type in ('', annotation_type):
+                return template_id, updated_at
+        return None
+
+    def validate(self, project_id, annotation_type, content):
+        """Raise ``ContentValidationError`` if ``content`` does not match the schema."""
+        template = self.template_for(project_id, annotation_type)
+        if template is None:
+            return
+        try:
+            validators.get(*template)(content)
+        except fastjsonschema.JsonSchemaValueException as e:
+            raise ContentValidationError(f"Content does not match template {template[0]}: {e.message}")
+
+
+def validate_content(project_id, annotation_type, content):
+    """Validate one annotation's content (see ``ContentValidator``)."""
+    ContentValidator().validate(project_id, annotation_type, content)
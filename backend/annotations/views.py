@@ -0,0 +1,447 @@
+"""
+Views for annotations app.
+"""
+from django.http import StreamingHttpResponse
+from django.shortcuts import get_object_or_404
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from rest_framework import generics, permissions, status
+from rest_framework.exceptions import ValidationError
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from projects.models import AgreementScore, Annotation, AnnotationRevision, Dataset, Project
+from projects.revisions import ACTION_DELETE, dataset_state, revision_content
+from sernion_mark.async_views import AsyncAPIView, aget_object_or_404, streaming_body
+
+from .agreement import METRICS, agreement_report, compute_agreement
+from .consensus import merge_annotations
+from .encoding import ContentEncodingError, decode_content, encode_content
+from .exporters import EXPORTERS, coalesce, gzip_stream
+from .ingest import CONFLICT_MODES, AnnotationIngestor
+from .serializers import AnnotationRevisionSerializer, AnnotationSerializer
+from .validation import ContentValidationError, validate_content
+
+
+ANNOTATION_FILTERS = {
+    'project': 'dataset__project_id',
+    'dataset': 'dataset_id',
+    'item': 'item_id',
+    'annotator': 'annotator_id',
+    'annotation_type': 'annotation_type',
+}
+
+
+def annotations_for(user):
+    """Annotations in the projects ``user`` owns or collaborates on."""
+    return Annotation.objects.filter(
+        dataset_id__in=Dataset.objects.filter(project__in=Project.objects.for_user(user)).values('pk')
+    )
+
+
+def filter_annotations(queryset, params):
+    """
+    Apply the list filters in ``params`` to an annotation queryset.
+
+    Raises ``ValueError`` for a malformed ``min_confidence``.
+    """
+    for param, lookup in ANNOTATION_FILTERS.items():
+        if params.get(param) not in (None, ''):
+            queryset = queryset.filter(**{lookup: params[param]})
+    for flag in ('is_verified', 'is_gold'):
+        value = params.get(flag)
+        if value in (True, False, 'true', 'false'):
+            queryset = queryset.filter(**{flag: value in (True, 'true')})
+    if params.get('min_confidence') not in (None, ''):
+        try:
+            min_confidence = float(params['min_confidence'])
+        except (TypeError, ValueError):
+            raise ValueError('min_confidence must be a number.')
+        queryset = queryset.filter(confidence_score__gte=min_confidence)
+    return queryset
+
+
+class AnnotationListView(generics.ListAPIView):
+    """
+    List annotations in the user's projects, newest first.
+    
+    Filters: ``project``, ``dataset``, ``item``, ``annotator``,
+    ``annotation_type``, ``is_verified``, ``is_gold`` and ``min_confidence``.
+    Paginated by keyset cursor (see ``KeysetPagination``).
+    ``?encoding=compact`` returns masks and coordinates in their stored
+    compact form instead of expanding them.
+    """
+    serializer_class = AnnotationSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    ordering = '-created_at'
+
+    def get_queryset(self):
+        try:
+            return filter_annotations(annotations_for(self.request.user), self.request.query_params)
+        except ValueError as e:
+            raise ValidationError({'success': False, 'message': str(e)})
+
+
+class AnnotationReviewView(APIView):
+    """
+    Verify or reject many annotations at once (project owners only).
+    """
+    permission_classes = [permissions.IsAuthenticated]
+    ACTIONS = ('verify', 'reject')
+
+    def post(self, request):
+        """
+        Apply a review decision with a single UPDATE.
+
+        Body: ``action`` (verify or reject) and either ``ids`` (annotation
+        ids) or ``filter`` (the list filters, e.g. ``{"dataset": 4,
+        "min_confidence": 0.95}``; must include ``project`` or ``dataset``).
+        Only annotations in projects the user owns are touched, and nobody
+        verifies their own annotations.
+        """
+        action = request.data.get('action')
+        if action not in self.ACTIONS:
+            return Response({
+                'success': False,
+                'message': f"action must be one of {', '.join(self.ACTIONS)}."
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        ids = request.data.get('ids')
+        filters = request.data.get('filter')
+        queryset = Annotation.objects.filter(
+            dataset_id__in=Dataset.objects.filter(project__owner=request.user).values('pk')
+        )
+        if action == 'verify':
+            queryset = queryset.exclude(annotator=request.user)
+        try:
+            if ids is not None:
+                if not isinstance(ids, list) or not all(isinstance(pk, int) for pk in ids):
+                    raise ValueError('ids must be a list of annotation ids.')
+                queryset = queryset.filter(pk__in=ids)
+            elif isinstance(filters, dict):
+                if not filters.get('project') and not filters.get('dataset'):
+                    raise ValueError('filter must include project or dataset.')
+                queryset = filter_annotations(queryset, filters)
+            else:
+                raise ValueError('Provide ids or filter.')
+            updated = getattr(queryset, action)(request.user)
+        except (TypeError, ValueError) as e:
+            return Response({'success': False, 'message': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response({
+            'success': True,
+            'message': f"{updated} annotation(s) {'verified' if action == 'verify' else 'rejected'}",
+            'updated': updated
+        }, status=status.HTTP_200_OK)
+
+
+class AnnotationIngestView(APIView):
+    """
+    Bulk ingest annotations from a newline-delimited JSON body.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request):
+        """
+        Stream NDJSON lines from the request body into batched inserts.
+
+        Query parameters: ``on_conflict`` (skip, update or error; default
+        skip) and ``batch_size``.
+        """
+        on_conflict = request.query_params.get('on_conflict', 'skip')
+        if on_conflict not in CONFLICT_MODES:
+            return Response({
+                'success': False,
+                'message': f"on_conflict must be one of {', '.join(CONFLICT_MODES)}."
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            batch_size = int(request.query_params.get('batch_size', 0)) or None
+        except ValueError:
+            return Response({
+                'success': False,
+                'message': 'batch_size must be an integer.'
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        ingestor = AnnotationIngestor(request.user, on_conflict=on_conflict, batch_size=batch_size)
+        report = ingestor.ingest(request.stream or [])
+
+        return Response({
+            'success': report['error_count'] == 0,
+            'message': 'Ingest finished',
+            **report
+        }, status=status.HTTP_200_OK)
+
+
+class AnnotationExportView(AsyncAPIView):
+    """
+    Stream a project's annotations as COCO, JSONL or CSV.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    async def get(self, request, project_id, export_format):
+        """
+        Export annotations without building the file in memory.
+
+        Query parameters: ``annotation_type``, ``verified`` (only verified
+        annotations), ``gold`` (only consensus annotations), ``gzip`` (compress on the fly) and, for JSONL,
+        ``encoding=compact`` (content as stored).
+        """
+        project = await aget_object_or_404(Project.objects.for_user(request.user), pk=project_id)
+        if export_format not in EXPORTERS:
+            return Response({
+                'success': False,
+                'message': f"Unsupported export format. Use one of {', '.join(EXPORTERS)}."
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        exporter, content_type, extension = EXPORTERS[export_format]
+        filters = {
+            'verified_only': request.query_params.get('verified') in ('1', 'true'),
+            'gold_only': request.query_params.get('gold') in ('1', 'true'),
+        }
+        if request.query_params.get('annotation_type'):
+            filters['annotation_type'] = request.query_params['annotation_type']
+        if export_format == 'jsonl':
+            filters['compact'] = request.query_params.get('encoding') == 'compact'
+
+        stream = exporter(project, **filters)
+        filename = f'project-{project.pk}-annotations.{extension}'
+        if request.query_params.get('gzip') in ('1', 'true'):
+            stream = gzip_stream(stream)
+            content_type = 'application/gzip'
+            filename += '.gz'
+
+        response = StreamingHttpResponse(streaming_body(request, coalesce(stream)), content_type=content_type)
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
+
+
+class ProjectAgreementView(APIView):
+    """
+    Inter-annotator agreement of a project.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def _scope(self, project, params):
+        annotation_type = params.get('annotation_type')
+        if annotation_type not in METRICS:
+            raise ValueError(f"annotation_type must be one of {', '.join(METRICS)}.")
+        dataset = None
+        if params.get('dataset'):
+            dataset = get_object_or_404(project.datasets, pk=params['dataset'])
+        return annotation_type, dataset, params.get('metric') or None
+
+    def get(self, request, project_id):
+        """
+        Report from the stored item scores (see ``compute_agreement``).
+
+        Query parameters: ``annotation_type`` (required), ``dataset`` and
+        ``metric``.
+        """
+        project = get_object_or_404(Project.objects.for_user(request.user), pk=project_id)
+        try:
+            annotation_type, dataset, metric = self._scope(project, request.query_params)
+        except ValueError as e:
+            return Response({'success': False, 'message': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        scores = AgreementScore.objects.filter(dataset__project=project)
+        if dataset is not None:
+            scores = scores.filter(dataset=dataset)
+        last_run = project.agreement_runs.filter(
+            annotation_type=annotation_type, finished_at__isnull=False
+        ).first()
+        return Response({
+            'success': True,
+            'computed_at': last_run.finished_at if last_run else None,
+            **agreement_report(scores, annotation_type, metric)
+        }, status=status.HTTP_200_OK)
+
+    def post(self, request, project_id):
+        """
+        Recompute agreement (owner only) and return the report.
+
+        Body: ``annotation_type`` (required), ``dataset``, ``metric`` and
+        ``incremental`` (only items changed since the previous run).
+        """
+        project = get_object_or_404(Project, pk=project_id, owner=request.user)
+        try:
+            annotation_type, dataset, metric = self._scope(project, request.data)
+            report = compute_agreement(
+                project,
+                annotation_type,
+                dataset=dataset,
+                metric=metric,
+                incremental=request.data.get('incremental') in (True, '1', 'true'),
+            )
+        except ValueError as e:
+            return Response({'success': False, 'message': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response({
+            'success': True,
+            'message': f"Agreement computed for {report['computed_items']} item(s)",
+            **report
+        }, status=status.HTTP_200_OK)
+
+
+class ProjectConsensusView(APIView):
+    """
+    Merge a project's annotations into gold annotations (owner only).
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request, project_id):
+        """
+        Run the consensus stage and report how many items were merged.
+
+        Body: ``annotation_type`` (required), ``dataset`` and
+        ``min_annotators`` (default 2). Merging runs in the request; use the
+        ``merge_annotations`` command to spread large projects over worker
+        processes.
+        """
+        project = get_object_or_404(Project, pk=project_id, owner=request.user)
+        dataset = None
+        if request.data.get('dataset'):
+            dataset = get_object_or_404(project.datasets, pk=request.data['dataset'])
+        try:
+            min_annotators = int(request.data.get('min_annotators', 2))
+            report = merge_annotations(
+                project,
+                request.data.get('annotation_type'),
+                request.user,
+                dataset=dataset,
+                min_annotators=min_annotators,
+                workers=1,
+            )
+        except (TypeError, ValueError) as e:
+            return Response({'success': False, 'message': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response({
+            'success': True,
+            'message': f"Gold annotations written for {report['merged_items']} item(s)",
+            **report
+        }, status=status.HTTP_200_OK)
+
+
+def revisions_for(user, annotation_id):
+    """Revisions of an annotation (deleted or not) in the user's projects."""
+    return AnnotationRevision.objects.filter(
+        annotation_id=annotation_id,
+        dataset_id__in=Dataset.objects.filter(project__in=Project.objects.for_user(user)).values('pk'),
+    )
+
+
+def content_for(request, content):
+    """Expand compact content unless the request asks for ``?encoding=compact``."""
+    return content if request.query_params.get('encoding') == 'compact' else decode_content(content)
+
+
+class AnnotationRevisionListView(generics.ListAPIView):
+    """
+    Revision log of an annotation, oldest first; kept after deletion.
+    """
+    serializer_class = AnnotationRevisionSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    ordering = 'number'
+
+    def get_queryset(self):
+        return revisions_for(self.request.user, self.kwargs['annotation_id'])
+
+
+class AnnotationRevisionDetailView(APIView):
+    """
+    Content of one revision of an annotation.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request, annotation_id, number):
+        """Rebuild the content from the nearest checkpoint (``?encoding=compact`` as stored)."""
+        revision = get_object_or_404(revisions_for(request.user, annotation_id), number=number)
+        return Response({
+            'success': True,
+            **AnnotationRevisionSerializer(revision).data,
+            'content': content_for(request, revision_content(annotation_id, number)),
+        }, status=status.HTTP_200_OK)
+
+
+class AnnotationRestoreView(APIView):
+    """
+    Roll an annotation back to an earlier revision.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request, annotation_id, number):
+        """
+        Replace the content by that of revision ``number`` (annotator or
+        project owner only). The rollback is appended as a new revision;
+        content that no longer matches the template schema is refused.
+        """
+        annotation = get_object_or_404(
+            annotations_for(request.user).select_related('dataset__project'), pk=annotation_id
+        )
+        if request.user.pk not in (annotation.annotator_id, annotation.dataset.project.owner_id):
+            return Response({
+                'success': False,
+                'message': 'Only the annotator or the project owner can restore an annotation.'
+            }, status=status.HTTP_403_FORBIDDEN)
+        revision = get_object_or_404(annotation.revisions, number=number)
+        if revision.action == ACTION_DELETE:
+            return Response({
+                'success': False,
+                'message': 'Cannot restore a deleted revision.'
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        content = decode_content(revision_content(annotation.pk, number))
+        try:
+            validate_content(annotation.dataset.project_id, annotation.annotation_type, content)
+            annotation.content = encode_content(content, annotation.annotation_type)
+        except (ContentValidationError, ContentEncodingError) as e:
+            return Response({
+                'success': False,
+                'message': str(e)
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        # The same write path as any edit: revision, statistics, search index and feed
+        annotation.revision_author_id = request.user.pk
+        annotation.save(update_fields=['content', 'updated_at'])
+
+        return Response({
+            'success': True,
+            'message': f'Annotation restored to revision {number}',
+            'content': content_for(request, annotation.content),
+        }, status=status.HTTP_200_OK)
+
+
+class DatasetHistoryView(APIView):
+    """
+    Time travel: a dataset's annotations as they were at a given time.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request, dataset_id):
+        """
+        Query parameters: ``at`` (ISO 8601 timestamp, required) and
+        ``encoding=compact``. Annotations deleted by then are left out.
+        """
+        dataset = get_object_or_404(
+            Dataset.objects.filter(project__in=Project.objects.for_user(request.user)), pk=dataset_id
+        )
+        at = parse_datetime(request.query_params.get('at') or '')
+        if at is None:
+            return Response({
+                'success': False,
+                'message': 'at must be an ISO 8601 timestamp.'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        if timezone.is_naive(at):
+            at = timezone.make_aware(at)
+
+        annotations = [
+            {'annotation': annotation_id, 'revision': number, 'content': content_for(request, content)}
+            for annotation_id, number, content in dataset_state(dataset.pk, at)
+        ]
+        return Response({
+            'success': True,
+            'dataset': dataset.pk,
+            'at': at,
+            'count': len(annotations),
+            'annotations': annotations
+        }, status=status.HTTP_200_OK)
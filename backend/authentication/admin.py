@@ -4,7 +4,9 @@ Admin configuration for authentication app.
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
 
-from .models import LoginHistory, PasswordResetToken, User, UserProfile
+from .jwt_auth import revoke_sessions
+from .models import (LoginHistory, LoginHistoryDaily, PasswordResetToken,
+                     User, UserProfile, UserSession)
 
 
 @admin.register(User)
@@ -90,3 +92,42 @@ class LoginHistoryAdmin(admin.ModelAdmin):
     def has_change_permission(self, request, obj=None):
         """Disable editing login history."""
         return False
+
+
+@admin.register(LoginHistoryDaily)
+class LoginHistoryDailyAdmin(admin.ModelAdmin):
+    """Admin configuration for LoginHistoryDaily model."""
+    list_display = ['user', 'date', 'successful_count', 'failed_count']
+    list_filter = ['date']
+    search_fields = ['user__username', 'user__email']
+    ordering = ['-date']
+    
+    readonly_fields = ['user', 'date', 'successful_count', 'failed_count', 'first_attempt_at', 'last_attempt_at']
+    
+    def has_add_permission(self, request):
+        """Daily rows are rolled up from login history."""
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        """Disable editing daily login history."""
+        return False
+
+
+@admin.register(UserSession)
+class UserSessionAdmin(admin.ModelAdmin):
+    """Admin configuration for UserSession model."""
+    list_display = ['user', 'sid', 'created_at', 'expires_at', 'revoked_at']
+    list_filter = ['revoked_at', 'created_at']
+    search_fields = ['user__username', 'user__email', 'sid']
+    ordering = ['-created_at']
+    
+    readonly_fields = ['user', 'sid', 'refresh_jti', 'created_at', 'expires_at', 'revoked_at']
+    actions = ['revoke']
+    
+    def has_add_permission(self, request):
+        """Sessions are created by logging in and refreshing."""
+        return False
+    
+    @admin.action(description='Revoke selected sessions')
+    def revoke(self, request, queryset):
+        revoke_sessions(queryset)
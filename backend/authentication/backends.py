@@ -0,0 +1,39 @@
+"""
+Authentication backends for Sernion Mark.
+"""
+from django.contrib.auth.backends import ModelBackend
+from django.db.models import Case, IntegerField, Q, Value, When
+
+from .models import User
+
+
+def find_user(identifier):
+    """The user whose username, or else email, is ``identifier``; one query."""
+    return (
+        User.objects.filter(Q(username=identifier) | Q(email=identifier))
+        .order_by(Case(When(username=identifier, then=Value(0)), default=Value(1), output_field=IntegerField()))
+        .first()
+    )
+
+
+class UsernameOrEmailBackend(ModelBackend):
+    """
+    Log in with a username or an email address.
+
+    Resolves the user in one query and checks the password once, where
+    trying the username and then the email would hash it twice.
+    """
+
+    def authenticate(self, request, username=None, password=None, **kwargs):
+        if username is None:
+            username = kwargs.get(User.USERNAME_FIELD)
+        if username is None or password is None:
+            return None
+        user = find_user(username)
+        if user is None:
+            # Hash anyway, so unknown users take as long as wrong passwords
+            User().set_password(password)
+            return None
+        if user.check_password(password) and self.user_can_authenticate(user):
+            return user
+        return None
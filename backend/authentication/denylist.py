@@ -0,0 +1,170 @@
+"""
+Denylist of revoked JWT login sessions.
+
+Access tokens are verified without the database, so revoking one means
+denying its session id (``sid`` claim) until the token expires; signing a
+user out everywhere denies every session of the user that started
+(``auth_time`` claim) before a cutoff. Only revocations within the last
+``ACCESS_TOKEN_LIFETIME`` matter: access tokens issued before that have
+expired, and revoked sessions cannot refresh.
+
+Each process keeps a copy of the revocations recorded in the database
+(``UserSession.revoked_at``, ``User.sessions_revoked_at``), loaded on first
+use and reloaded by a background thread every
+``JWT_DENYLIST_REFRESH_SECONDS``; revocations made in the process are added
+to it at once, those made elsewhere are picked up by the next reload.
+Requests are answered from the copy alone, without I/O. Revoked session
+ids are checked through a Bloom filter: a session that is not revoked is
+answered from a few bit probes, and the rare positive is confirmed against
+the exact set.
+"""
+import hashlib
+import logging
+import math
+import os
+import threading
+import time
+
+from django.conf import settings
+from django.db import DatabaseError, connection
+from django.utils import timezone
+from rest_framework_simplejwt.settings import api_settings
+
+logger = logging.getLogger(__name__)
+
+
+class BloomFilter:
+    """Bloom filter over strings with a false positive rate of about ``error_rate`` at ``capacity`` items."""
+
+    def __init__(self, capacity, error_rate=0.01):
+        capacity = max(capacity, 1)
+        self.size = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, value):
+        digest = hashlib.blake2b(value.encode(), digest_size=16).digest()
+        first, second = int.from_bytes(digest[:8], 'little'), int.from_bytes(digest[8:], 'little') | 1
+        return ((first + i * second) % self.size for i in range(self.hashes))
+
+    def add(self, value):
+        for position in self._positions(value):
+            self.bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, value):
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(value))
+
+
+class Denylist:
+    """
+    This process's copy of the revoked sessions.
+
+    A session is revoked by its id, or with every session of its user that
+    started before a cutoff. The copy is reloaded every ``interval``
+    seconds in a background thread; revocations added in this process are
+    kept across reloads until their access tokens expire, in case a reload
+    runs before they are committed.
+    """
+
+    def __init__(self, interval):
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._start_lock = threading.Lock()
+        self._pid = None  # Process the reloader thread runs in
+        self._thread = None
+        self._added = {}  # sid -> when its access tokens have expired (monotonic)
+        self._added_users = {}  # user id -> (cutoff, expiry)
+        self._state = self._build(set(), {})
+
+    @staticmethod
+    def _build(sids, users):
+        bloom = BloomFilter(max(2 * len(sids), 1024))
+        for sid in sids:
+            bloom.add(sid)
+        return bloom, frozenset(sids), users
+
+    def load(self):
+        """Read the sessions and users revoked within an access token lifetime."""
+        from .models import User, UserSession
+
+        since = timezone.now() - api_settings.ACCESS_TOKEN_LIFETIME
+        sids = set(UserSession.objects.filter(revoked_at__gte=since).values_list('sid', flat=True))
+        users = {
+            user_id: revoked_at.timestamp()
+            for user_id, revoked_at in User.objects.filter(sessions_revoked_at__gte=since)
+            .values_list('pk', 'sessions_revoked_at')
+        }
+        with self._lock:
+            now = time.monotonic()
+            self._added = {sid: expiry for sid, expiry in self._added.items() if expiry > now}
+            self._added_users = {
+                user_id: entry for user_id, entry in self._added_users.items() if entry[1] > now
+            }
+            for user_id, (cutoff, _) in self._added_users.items():
+                users[user_id] = max(users.get(user_id, cutoff), cutoff)
+            self._state = self._build(sids | set(self._added), users)
+
+    def start(self):
+        """Load the copy in this process (once) and start the thread reloading it."""
+        with self._start_lock:
+            if self._pid == os.getpid():
+                return
+            self.load()
+            self._pid = os.getpid()
+            self._thread = threading.Thread(
+                target=self._reload_periodically, name='jwt-denylist-reloader', daemon=True
+            )
+            self._thread.start()
+
+    def _reload_periodically(self):
+        while True:
+            time.sleep(self.interval)
+            if self._thread is not threading.current_thread():
+                return  # Replaced by ``clear``
+            try:
+                self.load()
+            except DatabaseError:
+                logger.exception('Could not reload the JWT denylist')
+            finally:
+                connection.close()
+
+    def add(self, *sids):
+        """Deny sessions in this process at once (before the revocation is even committed)."""
+        expiry = time.monotonic() + api_settings.ACCESS_TOKEN_LIFETIME.total_seconds()
+        with self._lock:
+            self._added.update(dict.fromkeys(sids, expiry))
+            bloom, exact, users = self._state
+            self._state = self._build(exact | set(sids), users)
+
+    def add_user(self, user_id, revoked_at):
+        """Deny the sessions of a user that started before ``revoked_at``."""
+        cutoff = revoked_at.timestamp()
+        expiry = time.monotonic() + api_settings.ACCESS_TOKEN_LIFETIME.total_seconds()
+        with self._lock:
+            self._added_users[user_id] = (cutoff, expiry)
+            bloom, exact, users = self._state
+            self._state = (bloom, exact, {**users, user_id: cutoff})
+
+    def is_revoked(self, sid, user_id, started):
+        """
+        Whether session ``sid`` of a user, started at ``started`` (epoch seconds), is revoked.
+
+        Only the first call in a process reads the database; the others are
+        answered from memory.
+        """
+        if self._pid != os.getpid():
+            self.start()
+        bloom, exact, users = self._state
+        return sid in bloom and sid in exact or started < users.get(user_id, float('-inf'))
+
+    def clear(self):
+        """Forget this process's copy; it is loaded again on the next check."""
+        with self._start_lock, self._lock:
+            self._state = self._build(set(), {})
+            self._added = {}
+            self._added_users = {}
+            self._pid = None
+            self._thread = None
+
+
+denylist = Denylist(settings.JWT_DENYLIST_REFRESH_SECONDS)
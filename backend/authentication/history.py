@@ -0,0 +1,169 @@
+"""
+Buffered login history and its retention.
+
+Registrations and logins append their ``LoginHistory`` row to an
+in-process buffer instead of inserting it with the request. The buffer is
+written with one ``bulk_create`` when it holds ``LOGIN_HISTORY_BATCH_SIZE``
+rows, by a background thread every ``LOGIN_HISTORY_FLUSH_SECONDS``, and at
+exit. Rows keep the time of the login, not of the flush.
+
+Rows older than ``LOGIN_HISTORY_RETENTION_DAYS`` are rolled up into one
+``LoginHistoryDaily`` row per user and day and deleted (``rollup_history``),
+so the raw table only holds recent attempts.
+"""
+import atexit
+import logging
+import os
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import DatabaseError, IntegrityError, connection, transaction
+from django.db.models import Count, Max, Min, Q
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import LoginHistory, LoginHistoryDaily, User
+
+logger = logging.getLogger(__name__)
+
+
+class HistoryBuffer:
+    """Thread-safe buffer of unsaved ``LoginHistory`` rows."""
+
+    def __init__(self, batch_size, interval):
+        self.batch_size = batch_size
+        self.interval = interval
+        self.max_rows = 10 * batch_size  # Kept for retry while the database is unavailable
+        self._rows = []
+        self._lock = threading.Lock()
+        self._pid = None  # Process the flusher thread runs in
+
+    def __len__(self):
+        return len(self._rows)
+
+    def add(self, row):
+        with self._lock:
+            if self._pid != os.getpid():
+                # First row in this process (or in a forked worker, whose copied rows belong to the parent)
+                self._rows = []
+                self._pid = os.getpid()
+                threading.Thread(target=self._flush_periodically, name='login-history-flusher', daemon=True).start()
+            self._rows.append(row)
+            due = len(self._rows) >= self.batch_size
+        if due:
+            self.flush()
+
+    def _flush_periodically(self):
+        pid = os.getpid()
+        while self._pid == pid:
+            time.sleep(self.interval)
+            if self._rows:
+                self.flush()
+                connection.close()
+
+    def flush(self):
+        """Write the buffered rows; returns how many were written."""
+        with self._lock:
+            rows, self._rows = self._rows, []
+        if not rows:
+            return 0
+        try:
+            try:
+                with transaction.atomic():
+                    LoginHistory.objects.bulk_create(rows, batch_size=self.batch_size)
+            except IntegrityError:
+                # A user was deleted while their rows were buffered
+                users = set(User.objects.filter(pk__in={row.user_id for row in rows}).values_list('pk', flat=True))
+                rows = [row for row in rows if row.user_id in users]
+                LoginHistory.objects.bulk_create(rows, batch_size=self.batch_size)
+        except DatabaseError:
+            logger.exception('Could not write %d login history rows', len(rows))
+            with self._lock:
+                self._rows[:0] = rows[-self.max_rows:]
+                del self._rows[self.max_rows:]
+            return 0
+        return len(rows)
+
+
+history = HistoryBuffer(settings.LOGIN_HISTORY_BATCH_SIZE, settings.LOGIN_HISTORY_FLUSH_SECONDS)
+atexit.register(history.flush)
+
+
+def log_login(user, ip_address, user_agent, successful):
+    """Record a login attempt of ``user``."""
+    history.add(LoginHistory(
+        user_id=user.pk,
+        ip_address=ip_address,
+        user_agent=user_agent,
+        login_successful=successful,
+    ))
+
+
+def rollup_history(before=None, chunk_size=None):
+    """
+    Fold login history older than ``before`` into daily per-user rows and delete it.
+
+    Works through ``chunk_size`` rows at a time, each chunk in its own
+    transaction, so the table is never locked for long; returns how many
+    rows were rolled up.
+    """
+    if before is None:
+        before = timezone.now() - timedelta(days=settings.LOGIN_HISTORY_RETENTION_DAYS)
+    chunk_size = chunk_size or settings.LOGIN_HISTORY_ROLLUP_CHUNK_SIZE
+    old = LoginHistory.objects.filter(created_at__lt=before)
+    total = 0
+    while True:
+        with transaction.atomic():
+            ids = list(old.order_by('pk').values_list('pk', flat=True)[:chunk_size])
+            if not ids:
+                return total
+            chunk = old.filter(pk__lte=ids[-1])
+            days = (
+                chunk.annotate(date=TruncDate('created_at'))
+                .values('user_id', 'date')
+                .annotate(
+                    successful=Count('pk', filter=Q(login_successful=True)),
+                    failed=Count('pk', filter=Q(login_successful=False)),
+                    first=Min('created_at'),
+                    last=Max('created_at'),
+                )
+                .order_by()
+            )
+            add_daily(days)
+            chunk.delete()
+        total += len(ids)
+
+
+def add_daily(days):
+    """Add per-user, per-day counts to ``LoginHistoryDaily``."""
+    days = {(day['user_id'], day['date']): day for day in days}
+    existing = LoginHistoryDaily.objects.select_for_update().filter(
+        user_id__in={user_id for user_id, _ in days},
+        date__in={date for _, date in days},
+    )
+    changed = []
+    for row in existing:
+        day = days.pop((row.user_id, row.date), None)
+        if day is None:
+            continue
+        row.successful_count += day['successful']
+        row.failed_count += day['failed']
+        row.first_attempt_at = min(row.first_attempt_at, day['first'])
+        row.last_attempt_at = max(row.last_attempt_at, day['last'])
+        changed.append(row)
+    LoginHistoryDaily.objects.bulk_update(
+        changed, ['successful_count', 'failed_count', 'first_attempt_at', 'last_attempt_at']
+    )
+    LoginHistoryDaily.objects.bulk_create([
+        LoginHistoryDaily(
+            user_id=user_id,
+            date=date,
+            successful_count=day['successful'],
+            failed_count=day['failed'],
+            first_attempt_at=day['first'],
+            last_attempt_at=day['last'],
+        )
+        for (user_id, date), day in days.items()
+    ])
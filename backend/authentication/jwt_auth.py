@@ -0,0 +1,177 @@
+"""
+JWT login sessions: short-lived access tokens and rotating refresh tokens.
+
+A login starts a session: its id is the ``sid`` claim of every token
+issued for it, and its start the ``auth_time`` claim. Logging in writes
+nothing for it; its ``UserSession`` row is created when it is first
+refreshed or revoked. Signing a user out everywhere sets
+``User.sessions_revoked_at``, which also covers sessions without a row.
+
+Access tokens carry the user's identity claims and
+are verified without the database (``JWTUserAuthentication``): the user
+is built from the claims (``User.from_claims``), the other fields load on
+first access, and the session is checked against the ``denylist``.
+Deactivating a user revokes their sessions, so ``is_active`` in a token
+that is still accepted is current.
+
+Refreshing rotates the refresh token: the session records the ``jti`` of
+its one valid refresh token and the swap is a single conditional UPDATE.
+Presenting a refresh token that was already rotated out means it leaked,
+so the whole session is revoked.
+"""
+import uuid
+
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+from rest_framework import serializers
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import (AuthenticationFailed,
+                                                 InvalidToken, TokenError)
+from rest_framework_simplejwt.serializers import TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.state import token_backend
+from rest_framework_simplejwt.tokens import RefreshToken
+from rest_framework_simplejwt.utils import datetime_from_epoch
+
+from .denylist import denylist
+from .models import User, UserSession
+
+SESSION_CLAIM = 'sid'
+AUTH_TIME_CLAIM = 'auth_time'  # When the session started (epoch seconds)
+# User fields copied into tokens, enough for permission checks and ``verify`` without a query
+USER_CLAIMS = ('username', 'email', 'first_name', 'last_name', 'is_active', 'is_staff', 'is_superuser', 'is_verified')
+
+
+def set_user_claims(token, user):
+    for name in USER_CLAIMS:
+        token[name] = getattr(user, name)
+
+
+def issue_tokens(user):
+    """Start a session for ``user`` without writing to the database; returns ``{'access': ..., 'refresh': ...}``."""
+    refresh = RefreshToken.for_user(user)
+    refresh[SESSION_CLAIM] = uuid.uuid4().hex
+    refresh[AUTH_TIME_CLAIM] = timezone.now().timestamp()
+    set_user_claims(refresh, user)
+    return {'access': str(refresh.access_token), 'refresh': str(refresh)}
+
+
+def session_for(refresh):
+    """
+    The session of a refresh token and its user, creating the session on its first refresh.
+
+    ``(None, None)`` if the session was revoked or the user deactivated.
+    """
+    sid = refresh.get(SESSION_CLAIM)
+    user = User.objects.filter(pk=refresh[api_settings.USER_ID_CLAIM]).first() if sid else None
+    if user is None or not user.is_active or (
+        user.sessions_revoked_at is not None
+        and refresh.get(AUTH_TIME_CLAIM, 0) < user.sessions_revoked_at.timestamp()
+    ):
+        return None, None
+    session, _ = UserSession.objects.get_or_create(
+        sid=sid,
+        defaults={
+            'user': user,
+            'refresh_jti': refresh[api_settings.JTI_CLAIM],
+            'expires_at': datetime_from_epoch(refresh['exp']),
+        },
+    )
+    if session.revoked_at is not None or session.user_id != user.pk:
+        return None, None
+    return session, user
+
+
+def revoke_sessions(sessions):
+    """Revoke a ``UserSession`` queryset; their access tokens stop working at once."""
+    sids = list(sessions.filter(revoked_at__isnull=True).values_list('sid', flat=True))
+    if sids:
+        UserSession.objects.filter(sid__in=sids).update(revoked_at=timezone.now())
+        denylist.add(*sids)
+    return len(sids)
+
+
+def end_sessions(user_id, sids):
+    """Revoke sessions of a user by id, whether or not they have a row yet."""
+    sids = [sid for sid in sids if sid]
+    UserSession.objects.bulk_create([
+        UserSession(user_id=user_id, sid=sid, expires_at=timezone.now() + api_settings.REFRESH_TOKEN_LIFETIME)
+        for sid in sids
+    ], ignore_conflicts=True)
+    return revoke_sessions(UserSession.objects.filter(user_id=user_id, sid__in=sids))
+
+
+def revoke_user_sessions(user):
+    """Sign ``user`` out everywhere: every session started until now, saved or not."""
+    now = timezone.now()
+    User.objects.filter(pk=user.pk).update(sessions_revoked_at=now)
+    user.sessions_revoked_at = now
+    denylist.add_user(user.pk, now)
+    return revoke_sessions(UserSession.objects.filter(user=user))
+
+
+class JWTUserAuthentication(JWTAuthentication):
+    """
+    ``Authorization: Bearer <access token>`` authentication without a database query.
+
+    ``request.user`` is a ``User`` holding the token's claims; the other
+    fields are read from the database when one is first used.
+    """
+
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+            sid = validated_token[SESSION_CLAIM]
+            claims = {name: validated_token[name] for name in USER_CLAIMS}
+        except KeyError:
+            raise InvalidToken(_('Token contained no recognizable user identification'))
+        if denylist.is_revoked(sid, user_id, validated_token.get(AUTH_TIME_CLAIM, 0)):
+            raise InvalidToken(_('Session has been revoked'))
+        if not claims['is_active']:
+            raise AuthenticationFailed(_('User is inactive'), code='user_inactive')
+        return User.from_claims({api_settings.USER_ID_FIELD: user_id, **claims})
+
+
+class SessionTokenRefreshSerializer(TokenRefreshSerializer):
+    """Refresh an access token, rotating the refresh token within its session."""
+
+    def validate(self, attrs):
+        try:
+            refresh = self.token_class(attrs['refresh'])
+        except TokenError as e:
+            raise InvalidToken(e.args[0])
+        jti = refresh[api_settings.JTI_CLAIM]
+        session, user = session_for(refresh)
+        if session is None:
+            raise InvalidToken(_('Session has been revoked'))
+        if session.refresh_jti != jti:
+            revoke_sessions(UserSession.objects.filter(pk=session.pk))
+            raise InvalidToken(_('Refresh token was already used; the session has been revoked'))
+
+        set_user_claims(refresh, user)  # Pick up profile changes
+        data = {'access': str(refresh.access_token)}
+        if api_settings.ROTATE_REFRESH_TOKENS:
+            refresh.set_jti()
+            refresh.set_exp()
+            refresh.set_iat()
+            rotated = UserSession.objects.filter(pk=session.pk, refresh_jti=jti, revoked_at__isnull=True).update(
+                refresh_jti=refresh[api_settings.JTI_CLAIM],
+                expires_at=timezone.now() + api_settings.REFRESH_TOKEN_LIFETIME,
+            )
+            if not rotated:  # A concurrent refresh with the same token won
+                raise InvalidToken(_('Refresh token was already used'))
+            data['refresh'] = str(refresh)
+        return data
+
+
+class SessionTokenBlacklistSerializer(serializers.Serializer):
+    """Revoke the session of a refresh token (logout)."""
+    refresh = serializers.CharField(write_only=True)
+
+    def validate(self, attrs):
+        try:
+            payload = token_backend.decode(attrs['refresh'], verify=True)
+        except TokenError as e:
+            raise InvalidToken(e.args[0])
+        end_sessions(payload.get(api_settings.USER_ID_CLAIM), [payload.get(SESSION_CLAIM)])
+        return {}
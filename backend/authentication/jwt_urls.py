@@ -7,7 +7,9 @@ from rest_framework_simplejwt.views import (
     TokenBlacklistView,
 )
 
+from .jwt_auth import SessionTokenBlacklistSerializer, SessionTokenRefreshSerializer
+
 urlpatterns = [
-    path('refresh/', TokenRefreshView.as_view(), name='token_refresh'),
-    path('blacklist/', TokenBlacklistView.as_view(), name='token_blacklist'),
+    path('refresh/', TokenRefreshView.as_view(serializer_class=SessionTokenRefreshSerializer), name='token_refresh'),
+    path('blacklist/', TokenBlacklistView.as_view(serializer_class=SessionTokenBlacklistSerializer), name='token_blacklist'),
 ]
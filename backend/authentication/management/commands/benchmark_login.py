@@ -0,0 +1,169 @@
+"""
+Management command comparing login throughput before and after the single-write login path.
+"""
+import json
+import shutil
+import statistics
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from django.contrib.auth import authenticate
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.utils import timezone
+from rest_framework import serializers, status
+from rest_framework.response import Response
+
+from authentication.history import history
+from authentication.jwt_auth import issue_tokens
+from authentication.models import LoginHistory, User
+from authentication.tokens import issue_token
+from authentication.views import UserLoginView
+
+
+class LegacyLoginSerializer(serializers.Serializer):
+    """Login validation as it was: the email fallback authenticates a second time."""
+    username = serializers.CharField(max_length=150)
+    password = serializers.CharField(max_length=128, write_only=True)
+
+    def validate(self, attrs):
+        user = authenticate(username=attrs['username'], password=attrs['password'])
+        if not user:
+            user_obj = User.objects.filter(email=attrs['username']).first()
+            if user_obj:
+                user = authenticate(username=user_obj.username, password=attrs['password'])
+        if not user or user.is_account_locked():
+            raise serializers.ValidationError('Invalid credentials.')
+        attrs['user'] = user
+        return attrs
+
+
+class LegacyLoginView(UserLoginView):
+    """The successful login path as it was: a separate write per change."""
+
+    def post(self, request):
+        serializer = LegacyLoginSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response({'success': False, 'errors': serializer.errors}, status=status.HTTP_401_UNAUTHORIZED)
+        user = serializer.validated_data['user']
+        user.failed_login_attempts = 0
+        user.account_locked_until = None
+        user.save(update_fields=['failed_login_attempts', 'account_locked_until'])
+        user.last_login = timezone.now()
+        user.save(update_fields=['last_login'])
+        token = issue_token(user)
+        LoginHistory.objects.create(
+            user=user,
+            ip_address=self.get_client_ip(request),
+            user_agent=request.META.get('HTTP_USER_AGENT', ''),
+            login_successful=True
+        )
+        return Response({'success': True, 'token': token.key, 'tokens': issue_tokens(user)})
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmark concurrent logins through the previous and the current login path, '
+        'in process, against a temporary test database.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=500, help='Logins per login path.')
+        parser.add_argument('--threads', type=int, default=8, help='Worker threads (like gunicorn --threads).')
+        parser.add_argument('--users', type=int, default=50, help='Distinct users logging in.')
+        parser.add_argument(
+            '--login-with',
+            choices=['username', 'email'],
+            default='email',
+            help='Identifier sent as "username" (the previous path authenticated twice for an email).',
+        )
+        parser.add_argument(
+            '--hasher',
+            choices=['fast', 'default'],
+            default='fast',
+            help='"fast" hashes passwords with MD5 so the database work dominates; "default" uses PASSWORD_HASHERS.',
+        )
+
+    def handle(self, *args, **options):
+        workdir = tempfile.mkdtemp()
+        if connection.vendor == 'sqlite':
+            # A file, not the shared in-memory database, so concurrent writers wait for the lock.
+            connection.settings_dict['TEST']['NAME'] = str(Path(workdir) / 'benchmark.sqlite3')
+        test_db = connection.creation.create_test_db(verbosity=0, serialize=False)
+        hashers = {'PASSWORD_HASHERS': ['django.contrib.auth.hashers.MD5PasswordHasher']}
+        if options['hasher'] == 'default':
+            hashers = {}
+        try:
+            with override_settings(DEBUG=False, **hashers):
+                bodies = self.prepare(options['users'], options['login_with'])
+                runs = (
+                    # The previous path tried the username, then the email
+                    ('previous', LegacyLoginView.as_view(), ['django.contrib.auth.backends.ModelBackend']),
+                    ('current', UserLoginView.as_view(), ['authentication.backends.UsernameOrEmailBackend']),
+                )
+                for name, view, backends in runs:
+                    with override_settings(AUTHENTICATION_BACKENDS=backends):
+                        writes = self.count_writes(view, bodies[0])
+                        started = time.perf_counter()
+                        latencies, statuses = self.run(view, bodies, options)
+                        history.flush()
+                        elapsed = time.perf_counter() - started
+                    self.report(name, elapsed, latencies, statuses, writes)
+        finally:
+            history.flush()
+            connection.creation.destroy_test_db(test_db, verbosity=0)
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    def prepare(self, count, login_with):
+        """Create users; returns a login request body per user."""
+        bodies = []
+        for i in range(count):
+            user = User.objects.create_user(
+                username=f'benchmark{i}', email=f'benchmark{i}@example.com', password='benchmark-pw-1'
+            )
+            identifier = user.email if login_with == 'email' else user.username
+            bodies.append(json.dumps({'username': identifier, 'password': 'benchmark-pw-1'}).encode())
+        return bodies
+
+    def request(self, view, body):
+        request = RequestFactory().post('/api/v1/auth/login/', body, content_type='application/json')
+        return view(request).status_code
+
+    def count_writes(self, view, body):
+        """Write statements of a repeat login, including its share of the history buffer's batches."""
+        self.request(view, body)
+        with CaptureQueriesContext(connection) as queries:
+            self.request(view, body)
+        writes = sum(query['sql'].split(None, 1)[0] in ('INSERT', 'UPDATE', 'DELETE') for query in queries)
+        if len(history):
+            writes += 1 / history.batch_size
+        return writes
+
+    def run(self, view, bodies, options):
+        def login(i):
+            started = time.perf_counter()
+            try:
+                code = self.request(view, bodies[i % len(bodies)])
+            except Exception:  # e.g. "database is locked" under write contention
+                code = 500
+            finally:
+                connection.close()
+            return time.perf_counter() - started, code
+
+        with ThreadPoolExecutor(options['threads']) as pool:
+            results = list(pool.map(login, range(options['requests'])))
+        return [latency for latency, _ in results], [code for _, code in results]
+
+    def report(self, name, elapsed, latencies, statuses, writes):
+        latencies = sorted(latencies)
+        failed = sum(code >= 400 for code in statuses)
+        self.stdout.write(
+            f'{name:>9}: {len(latencies) / elapsed:8.1f} logins/s  '
+            f'p50 {statistics.median(latencies) * 1000:7.1f} ms  '
+            f'p95 {latencies[int(len(latencies) * 0.95) - 1] * 1000:7.1f} ms  '
+            f'{writes:5.2f} writes/login  {failed} failed'
+        )
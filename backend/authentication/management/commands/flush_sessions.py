@@ -0,0 +1,21 @@
+"""
+Management command to delete JWT login sessions that can no longer be used.
+"""
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+from django.utils import timezone
+from rest_framework_simplejwt.settings import api_settings
+
+from authentication.models import UserSession
+
+
+class Command(BaseCommand):
+    help = 'Delete expired JWT sessions, and revoked ones once their access tokens have expired.'
+
+    def handle(self, *args, **options):
+        now = timezone.now()
+        # Revoked sessions stay on the denylist while their access tokens are still valid
+        deleted, _ = UserSession.objects.filter(
+            Q(expires_at__lt=now) | Q(revoked_at__lt=now - api_settings.ACCESS_TOKEN_LIFETIME)
+        ).delete()
+        self.stdout.write(self.style.SUCCESS(f'Deleted {deleted} sessions'))
@@ -0,0 +1,45 @@
+# Generated by Django 4.2.7 on 2026-10-17 03:19
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('authentication', '0003_login_history_created_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LoginHistoryDaily',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('successful_count', models.PositiveIntegerField(default=0)),
+                ('failed_count', models.PositiveIntegerField(default=0)),
+                ('first_attempt_at', models.DateTimeField()),
+                ('last_attempt_at', models.DateTimeField()),
+            ],
+            options={
+                'verbose_name': 'Daily Login History',
+                'verbose_name_plural': 'Daily Login Histories',
+                'db_table': 'login_history_daily',
+                'ordering': ['-date'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='loginhistory',
+            index=models.Index(fields=['created_at'], name='login_history_created_at'),
+        ),
+        migrations.AddField(
+            model_name='loginhistorydaily',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='login_history_daily', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddConstraint(
+            model_name='loginhistorydaily',
+            constraint=models.UniqueConstraint(fields=('user', 'date'), name='login_history_daily_user_date'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-17 03:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('authentication', '0004_login_history_daily'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='sessions_revoked_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
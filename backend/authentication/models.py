@@ -1,9 +1,13 @@
 """
 Authentication models for Sernion Mark.
 """
+import warnings
+from datetime import timedelta
+
 from django.contrib.auth.models import AbstractUser
 from django.core.validators import RegexValidator
-from django.db import models
+from django.db import DEFAULT_DB_ALIAS, models
+from django.db.models import Case, F, Q, Value, When
 from django.utils import timezone
 
 
@@ -39,6 +43,9 @@ class User(AbstractUser):
     failed_login_attempts = models.PositiveIntegerField(default=0)
     account_locked_until = models.DateTimeField(blank=True, null=True)
     
+    # JWT sessions that started before this time are revoked
+    sessions_revoked_at = models.DateTimeField(blank=True, null=True)
+    
     class Meta:
         db_table = 'auth_user'
         verbose_name = 'User'
@@ -47,6 +54,36 @@ class User(AbstractUser):
     def __str__(self):
         return self.username
     
+    @classmethod
+    def from_claims(cls, claims):
+        """
+        A user holding only ``claims``, field values copied into a token or cache entry.
+        
+        The other fields load together on first use. ``save()`` does not write
+        back claims left unchanged, since they may be older than the row.
+        """
+        names = [field.attname for field in cls._meta.concrete_fields if field.attname in claims]
+        user = cls.from_db(DEFAULT_DB_ALIAS, names, [claims[name] for name in names])
+        user.token_claims = claims
+        return user
+    
+    def refresh_from_db(self, using=None, fields=None):
+        if fields is not None and getattr(self, 'token_claims', None) is not None:
+            # One query for the rest of the row, not one per field used
+            fields = set(fields) | self.get_deferred_fields()
+        super().refresh_from_db(using=using, fields=fields)
+    
+    def save(self, *args, **kwargs):
+        claims = getattr(self, 'token_claims', None)
+        if claims is not None and kwargs.get('update_fields') is None and not kwargs.get('force_insert'):
+            deferred = self.get_deferred_fields()
+            kwargs['update_fields'] = [
+                field.attname for field in self._meta.concrete_fields
+                if not field.primary_key and field.attname not in deferred
+                and (field.attname not in claims or getattr(self, field.attname) != claims[field.attname])
+            ]
+        super().save(*args, **kwargs)
+    
     @property
     def full_name(self):
         """Return the user's full name."""
@@ -58,22 +95,61 @@ class User(AbstractUser):
             return True
         return False
     
-    def increment_failed_attempts(self):
-        """Increment failed login attempts."""
-        self.failed_login_attempts += 1
-        self.save(update_fields=['failed_login_attempts'])
+    def record_login(self):
+        """
+        Set ``last_login`` and clear failed attempts in one conditional UPDATE.
+        
+        Returns False, changing nothing, if the account was locked or
+        disabled since it was read.
+        """
+        now = timezone.now()
+        updated = User.objects.filter(pk=self.pk, is_active=True).filter(
+            Q(account_locked_until__isnull=True) | Q(account_locked_until__lte=now)
+        ).update(last_login=now, failed_login_attempts=0, account_locked_until=None)
+        if updated:
+            self.last_login, self.failed_login_attempts, self.account_locked_until = now, 0, None
+        return bool(updated)
     
+    def record_failed_login(self, max_attempts=5, lock_minutes=15):
+        """Count a failed login, locking the account from ``max_attempts`` on, in one UPDATE."""
+        locked_until = timezone.now() + timedelta(minutes=lock_minutes)
+        User.objects.filter(pk=self.pk).update(
+            failed_login_attempts=F('failed_login_attempts') + 1,
+            # The right-hand side reads the row before the increment
+            account_locked_until=Case(
+                When(failed_login_attempts__gte=max_attempts - 1, then=Value(locked_until)),
+                default=F('account_locked_until'),
+            ),
+        )
+
+    # Deprecated: kept for callers of the old per-field API, each is one UPDATE like the methods above.
+
+    def increment_failed_attempts(self):
+        """Deprecated, use ``record_failed_login``."""
+        warnings.warn(
+            'User.increment_failed_attempts() is deprecated, use record_failed_login().',
+            DeprecationWarning, stacklevel=2,
+        )
+        self.record_failed_login()
+        self.refresh_from_db(fields=['failed_login_attempts', 'account_locked_until'])
+
     def reset_failed_attempts(self):
-        """Reset failed login attempts."""
-        self.failed_login_attempts = 0
-        self.account_locked_until = None
-        self.save(update_fields=['failed_login_attempts', 'account_locked_until'])
-    
+        """Deprecated, ``record_login`` clears failed attempts."""
+        warnings.warn(
+            'User.reset_failed_attempts() is deprecated, use record_login().',
+            DeprecationWarning, stacklevel=2,
+        )
+        User.objects.filter(pk=self.pk).update(failed_login_attempts=0, account_locked_until=None)
+        self.failed_login_attempts, self.account_locked_until = 0, None
+
     def lock_account(self, duration_minutes=15):
-        """Lock the account for a specified duration."""
-        from datetime import timedelta
+        """Deprecated, ``record_failed_login`` locks the account."""
+        warnings.warn(
+            'User.lock_account() is deprecated, use record_failed_login().',
+            DeprecationWarning, stacklevel=2,
+        )
         self.account_locked_until = timezone.now() + timedelta(minutes=duration_minutes)
-        self.save(update_fields=['account_locked_until'])
+        User.objects.filter(pk=self.pk).update(account_locked_until=self.account_locked_until)
 
 
 class UserProfile(models.Model):
@@ -149,14 +225,66 @@ class LoginHistory(models.Model):
     ip_address = models.GenericIPAddressField()
     user_agent = models.TextField()
     login_successful = models.BooleanField()
-    created_at = models.DateTimeField(auto_now_add=True)
+    created_at = models.DateTimeField(default=timezone.now)  # When it happened, not when the buffer was flushed
     
     class Meta:
         db_table = 'login_history'
         verbose_name = 'Login History'
         verbose_name_plural = 'Login Histories'
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['created_at'], name='login_history_created_at'),
+        ]
     
     def __str__(self):
         status = "Success" if self.login_successful else "Failed"
         return f"{self.user.username} - {status} - {self.created_at}"
+
+
+class LoginHistoryDaily(models.Model):
+    """
+    A user's login attempts on one day, rolled up from login history past its retention.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='login_history_daily')
+    date = models.DateField()
+    successful_count = models.PositiveIntegerField(default=0)
+    failed_count = models.PositiveIntegerField(default=0)
+    first_attempt_at = models.DateTimeField()
+    last_attempt_at = models.DateTimeField()
+    
+    class Meta:
+        db_table = 'login_history_daily'
+        verbose_name = 'Daily Login History'
+        verbose_name_plural = 'Daily Login Histories'
+        ordering = ['-date']
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'date'], name='login_history_daily_user_date'),
+        ]
+    
+    def __str__(self):
+        return f"{self.user.username} - {self.date} - {self.successful_count} ok, {self.failed_count} failed"
+
+
+class UserSession(models.Model):
+    """
+    A JWT login session; its tokens carry ``sid``.
+    
+    Created when the session is first refreshed or revoked, not at login.
+    ``refresh_jti`` is the one refresh token that may still be used;
+    refreshing replaces it.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='sessions')
+    sid = models.CharField(max_length=32, unique=True)
+    refresh_jti = models.CharField(max_length=255)
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField()
+    revoked_at = models.DateTimeField(blank=True, null=True)
+    
+    class Meta:
+        db_table = 'user_sessions'
+        indexes = [
+            models.Index(fields=['revoked_at'], name='user_sessions_revoked_at'),
+        ]
+    
+    def __str__(self):
+        return f"Session {self.sid} for {self.user.username}"
@@ -85,16 +85,8 @@ class UserLoginSerializer(serializers.Serializer):
         password = attrs.get('password')
         
         if username and password:
-            # Try to authenticate with username or email
-            user = authenticate(username=username, password=password)
-            
-            if not user:
-                # Try with email
-                try:
-                    user_obj = User.objects.get(email=username)
-                    user = authenticate(username=user_obj.username, password=password)
-                except User.DoesNotExist:
-                    pass
+            # The backend accepts a username or an email address
+            user = authenticate(self.context.get('request'), username=username, password=password)
             
             if not user:
                 raise serializers.ValidationError('Invalid credentials.')
@@ -234,7 +226,7 @@ class UserListSerializer(serializers.ModelSerializer):
     """
     Serializer for listing users (limited information).
     """
-    full_name = serializers.CharField(source='full_name', read_only=True)
+    full_name = serializers.CharField(read_only=True)
     
     class Meta:
         model = User
@@ -0,0 +1,30 @@
+"""
+Signal handlers for authentication app.
+"""
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from .jwt_auth import revoke_user_sessions
+from .models import User
+from .tokens import forget, forget_user
+
+
+@receiver(post_delete, sender=Token)
+def forget_deleted_token(sender, instance, **kwargs):
+    """Stop accepting a deleted token from the cache, however it was deleted."""
+    forget(instance.key)
+
+
+@receiver(post_save, sender=User)
+def forget_user_tokens(sender, instance, created, **kwargs):
+    """Drop cached copies of a changed user (e.g. deactivated)."""
+    if not created:
+        forget_user(instance)
+
+
+@receiver(post_save, sender=User)
+def revoke_inactive_user_sessions(sender, instance, created, **kwargs):
+    """End the JWT sessions of a deactivated user; their access tokens are denied at once."""
+    if not created and not instance.is_active:
+        revoke_user_sessions(instance)
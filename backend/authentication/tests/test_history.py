@@ -0,0 +1,80 @@
+"""
+Tests for buffered login history and its daily rollup.
+"""
+from datetime import timedelta
+from unittest import mock
+
+from django.db import DatabaseError
+from django.test import TestCase
+from django.utils import timezone
+
+from authentication.history import HistoryBuffer, rollup_history
+from authentication.models import LoginHistory, LoginHistoryDaily, User
+
+
+class HistoryBufferTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='alice', email='alice@example.com', password='pw-alice-1')
+        self.buffer = HistoryBuffer(batch_size=3, interval=3600)
+
+    def attempt(self, successful=True, created_at=None):
+        return LoginHistory(
+            user_id=self.user.pk, ip_address='127.0.0.1', user_agent='test', login_successful=successful,
+            created_at=created_at or timezone.now(),
+        )
+
+    def test_flushes_when_full(self):
+        self.buffer.add(self.attempt())
+        self.buffer.add(self.attempt())
+        self.assertEqual((len(self.buffer), LoginHistory.objects.count()), (2, 0))
+        self.buffer.add(self.attempt(successful=False))
+        self.assertEqual((len(self.buffer), LoginHistory.objects.count()), (0, 3))
+
+    def test_rows_keep_the_time_of_the_login(self):
+        at = timezone.now() - timedelta(minutes=5)
+        self.buffer.add(self.attempt(created_at=at))
+        self.assertEqual(self.buffer.flush(), 1)
+        self.assertEqual(LoginHistory.objects.get().created_at, at)
+
+    def test_rows_are_kept_while_the_database_fails(self):
+        self.buffer.add(self.attempt())
+        with mock.patch.object(LoginHistory.objects, 'bulk_create', side_effect=DatabaseError):
+            with self.assertLogs('authentication.history', 'ERROR'):
+                self.assertEqual(self.buffer.flush(), 0)
+        self.assertEqual(len(self.buffer), 1)
+        self.assertEqual(self.buffer.flush(), 1)
+        self.assertEqual(LoginHistory.objects.count(), 1)
+
+
+class RollupTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='alice', email='alice@example.com', password='pw-alice-1')
+        self.day = timezone.localtime(timezone.now() - timedelta(days=100)).replace(hour=12, minute=0, second=0, microsecond=0)
+
+    def log(self, successful, created_at):
+        LoginHistory.objects.create(
+            user=self.user, ip_address='127.0.0.1', user_agent='test', login_successful=successful,
+            created_at=created_at,
+        )
+
+    def test_old_rows_become_daily_counts(self):
+        for minutes, successful in ((0, True), (10, False), (20, True)):
+            self.log(successful, self.day + timedelta(minutes=minutes))
+        self.log(True, self.day + timedelta(days=1))
+        self.log(True, timezone.now())
+
+        self.assertEqual(rollup_history(chunk_size=2), 4)
+        self.assertEqual(LoginHistory.objects.count(), 1)
+        daily = LoginHistoryDaily.objects.get(user=self.user, date=self.day.date())
+        self.assertEqual((daily.successful_count, daily.failed_count), (2, 1))
+        self.assertEqual((daily.first_attempt_at, daily.last_attempt_at), (self.day, self.day + timedelta(minutes=20)))
+        self.assertEqual(LoginHistoryDaily.objects.count(), 2)
+
+    def test_later_rollups_add_to_the_day(self):
+        self.log(True, self.day)
+        rollup_history()
+        self.log(False, self.day - timedelta(hours=1))
+        self.assertEqual(rollup_history(), 1)
+        daily = LoginHistoryDaily.objects.get()
+        self.assertEqual((daily.successful_count, daily.failed_count), (1, 1))
+        self.assertEqual(daily.first_attempt_at, self.day - timedelta(hours=1))
@@ -0,0 +1,108 @@
+"""
+Tests for JWT login sessions: stateless access tokens, rotation and revocation.
+"""
+import time
+from unittest import mock
+
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient, APIRequestFactory
+
+from authentication.denylist import Denylist, denylist
+from authentication.jwt_auth import JWTUserAuthentication
+from authentication.models import User, UserSession
+from authentication.tokens import shared_cache
+
+
+@mock.patch('authentication.views.log_login')
+class JWTSessionTests(TestCase):
+    def setUp(self):
+        denylist.clear()
+        self.addCleanup(denylist.clear)  # Stops the reloader thread
+        shared_cache().clear()
+        self.user = User.objects.create_user(username='alice', email='alice@example.com', password='pw-alice-1')
+        self.client = APIClient()
+
+    def login(self):
+        response = self.client.post('/api/v1/auth/login/', {'username': 'alice', 'password': 'pw-alice-1'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def verify(self, access):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {access}')
+        try:
+            return self.client.get('/api/v1/auth/verify/').status_code
+        finally:
+            self.client.credentials()
+
+    def refresh(self, refresh):
+        return self.client.post('/api/token/refresh/', {'refresh': refresh}, format='json')
+
+    def test_login_issues_only_jwt_tokens_by_default(self, log_login):
+        data = self.login()
+        self.assertNotIn('token', data)
+        self.assertEqual(self.verify(data['tokens']['access']), 200)
+        with override_settings(LEGACY_API_TOKENS=True):
+            self.assertIn('token', self.login())
+
+    def test_access_token_is_verified_without_queries(self, log_login):
+        access = self.login()['tokens']['access']
+        request = APIRequestFactory().get('/', HTTP_AUTHORIZATION=f'Bearer {access}')
+        auth = JWTUserAuthentication()
+        auth.authenticate(request)  # Loads the denylist
+        with self.assertNumQueries(0):
+            user, _ = auth.authenticate(request)
+            self.assertEqual((user.pk, user.username, user.is_active), (self.user.pk, 'alice', True))
+
+    def test_refresh_rotates_and_reuse_revokes_the_session(self, log_login):
+        tokens = self.login()['tokens']
+        response = self.refresh(tokens['refresh'])
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response.data['refresh'], tokens['refresh'])
+
+        self.assertEqual(self.refresh(tokens['refresh']).status_code, 401)
+        self.assertEqual(self.refresh(response.data['refresh']).status_code, 401)
+        self.assertEqual(self.verify(response.data['access']), 401)
+        self.assertIsNotNone(UserSession.objects.get(user=self.user).revoked_at)
+
+    def test_logout_denies_the_session_everywhere(self, log_login):
+        access = self.login()['tokens']['access']
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {access}')
+        self.assertEqual(self.client.post('/api/v1/auth/logout/').status_code, 200)
+        self.client.credentials()
+        self.assertEqual(self.verify(access), 401)
+
+        # Another process loads the revocation from the database, then answers from memory
+        other = Denylist(60)
+        self.addCleanup(other.clear)
+        sid = UserSession.objects.get(user=self.user).sid
+        self.assertTrue(other.is_revoked(sid, self.user.pk, time.time()))
+        with self.assertNumQueries(0):
+            self.assertFalse(other.is_revoked('unknown', self.user.pk, time.time()))
+            self.assertTrue(other.is_revoked(sid, self.user.pk, time.time()))
+
+    def test_reloads_keep_revocations_not_yet_committed(self, log_login):
+        other = Denylist(60)
+        self.addCleanup(other.clear)
+        other.add('uncommitted')
+        other.add_user(self.user.pk, timezone.now())
+        other.load()
+        self.assertTrue(other.is_revoked('uncommitted', 0, time.time()))
+        self.assertTrue(other.is_revoked('any', self.user.pk, time.time() - 1))
+        self.assertFalse(other.is_revoked('any', self.user.pk, time.time() + 1))
+
+    def test_deactivated_user_is_signed_out(self, log_login):
+        tokens = self.login()['tokens']
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.verify(tokens['access']), 401)
+        self.assertEqual(self.refresh(tokens['refresh']).status_code, 401)
+
+    def test_profile_update_keeps_fields_changed_elsewhere(self, log_login):
+        access = self.login()['tokens']['access']
+        User.objects.filter(pk=self.user.pk).update(first_name='Alicia')
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {access}')
+        response = self.client.put('/api/v1/user/profile/', {'phone_number': '+123456789'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.user.refresh_from_db()
+        self.assertEqual((self.user.first_name, self.user.phone_number), ('Alicia', '+123456789'))
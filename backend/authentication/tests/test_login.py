@@ -0,0 +1,100 @@
+"""
+Tests for the single-write login path and signing users out everywhere.
+"""
+from datetime import timedelta
+from unittest import mock
+
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from authentication.denylist import denylist
+from authentication.models import User, UserSession
+from authentication.tokens import shared_cache
+
+WRITES = ('INSERT', 'UPDATE', 'DELETE')
+
+
+@mock.patch('authentication.views.log_login')
+class LoginTests(TestCase):
+    def setUp(self):
+        denylist.clear()
+        self.addCleanup(denylist.clear)  # Stops the reloader thread
+        shared_cache().clear()
+        self.user = User.objects.create_user(username='alice', email='alice@example.com', password='pw-alice-1')
+        self.client = APIClient()
+
+    def login(self, username='alice', password='pw-alice-1'):
+        return self.client.post('/api/v1/auth/login/', {'username': username, 'password': password}, format='json')
+
+    def call(self, method, url, access, data=None):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {access}')
+        try:
+            return getattr(self.client, method)(url, data, format='json')
+        finally:
+            self.client.credentials()
+
+    def test_login_is_one_update(self, log_login):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.login(username='alice@example.com')
+        self.assertEqual(response.status_code, 200)
+        writes = [query['sql'] for query in queries if query['sql'].split(None, 1)[0] in WRITES]
+        self.assertEqual(len(writes), 1, writes)
+        self.assertTrue(writes[0].startswith('UPDATE'))
+        self.assertFalse(UserSession.objects.exists())
+        log_login.assert_called_once()
+
+    def test_failed_logins_lock_the_account(self, log_login):
+        for _ in range(5):
+            self.assertEqual(self.login(password='wrong').status_code, 401)
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.is_account_locked())
+        self.assertEqual(self.login().status_code, 401)
+
+        User.objects.filter(pk=self.user.pk).update(account_locked_until=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(self.login().status_code, 200)
+        self.user.refresh_from_db()
+        self.assertEqual((self.user.failed_login_attempts, self.user.account_locked_until), (0, None))
+
+    def test_deprecated_lockout_methods(self, log_login):
+        with self.assertWarns(DeprecationWarning):
+            for _ in range(5):
+                self.user.increment_failed_attempts()
+        self.assertTrue(self.user.is_account_locked())
+        self.assertEqual(self.user.failed_login_attempts, 5)
+
+        with self.assertWarns(DeprecationWarning):
+            self.user.reset_failed_attempts()
+        self.user.refresh_from_db()
+        self.assertEqual((self.user.failed_login_attempts, self.user.account_locked_until), (0, None))
+
+        with self.assertWarns(DeprecationWarning):
+            self.user.lock_account(duration_minutes=1)
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.is_account_locked())
+
+    def test_password_change_ends_sessions_without_rows(self, log_login):
+        other = self.login().data['tokens']
+        current = self.login().data['tokens']
+        response = self.call('post', '/api/v1/user/change-password/', current['access'], {
+            'current_password': 'pw-alice-1', 'new_password': 'pw-alice-2', 'new_password_confirm': 'pw-alice-2',
+        })
+        self.assertEqual(response.status_code, 200)
+
+        for tokens in (other, current):
+            self.assertEqual(self.call('get', '/api/v1/auth/verify/', tokens['access']).status_code, 401)
+            refreshed = self.client.post('/api/token/refresh/', {'refresh': tokens['refresh']}, format='json')
+            self.assertEqual(refreshed.status_code, 401)
+        self.assertEqual(self.call('get', '/api/v1/auth/verify/', response.data['tokens']['access']).status_code, 200)
+        refreshed = self.client.post('/api/token/refresh/', {'refresh': response.data['tokens']['refresh']}, format='json')
+        self.assertEqual(refreshed.status_code, 200)
+
+    def test_first_refresh_saves_the_session(self, log_login):
+        tokens = self.login().data['tokens']
+        response = self.client.post('/api/token/refresh/', {'refresh': tokens['refresh']}, format='json')
+        self.assertEqual(response.status_code, 200)
+        session = UserSession.objects.get(user=self.user)
+        self.assertIsNone(session.revoked_at)
+        self.assertGreater(session.expires_at, timezone.now() + timedelta(days=6))
@@ -0,0 +1,74 @@
+"""
+Tests for cached, expiring API token authentication.
+"""
+from datetime import timedelta
+
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework import exceptions
+from rest_framework.authtoken.models import Token
+
+from authentication.models import User
+from authentication.tokens import (CachedTokenAuthentication, issue_token,
+                                   revoke_tokens, shared_cache, shared_key,
+                                   tokens)
+
+
+class CachedTokenAuthenticationTests(TestCase):
+    def setUp(self):
+        tokens.clear()
+        shared_cache().clear()
+        self.user = User.objects.create_user(username='alice', email='alice@example.com', password='pw-alice-1')
+        self.token = issue_token(self.user)
+        self.auth = CachedTokenAuthentication()
+
+    def test_cache_hit_skips_the_database(self):
+        user, key = self.auth.authenticate_credentials(self.token.key)
+        self.assertEqual((user.pk, user.username, key), (self.user.pk, 'alice', self.token.key))
+        with self.assertNumQueries(0):
+            user = self.auth.authenticate_credentials(self.token.key)[0]
+            self.assertEqual((user.email, user.is_staff, user.is_active), ('alice@example.com', False, True))
+
+    def test_shared_entry_holds_fields_not_the_user(self):
+        self.auth.authenticate_credentials(self.token.key)
+        fields, _ = shared_cache().get(shared_key(self.token.key))
+        self.assertIsInstance(fields, dict)
+        self.assertNotIn('password', fields)
+        self.assertEqual(fields['username'], 'alice')
+
+    def test_other_fields_load_in_one_query(self):
+        user = self.auth.authenticate_credentials(self.token.key)[0]
+        with CaptureQueriesContext(connection) as queries:
+            user.phone_number, user.bio, user.created_at
+        self.assertEqual(len(queries), 1)
+        self.assertTrue(user.check_password('pw-alice-1'))
+
+    def test_save_does_not_write_back_stale_fields(self):
+        user = self.auth.authenticate_credentials(self.token.key)[0]
+        User.objects.filter(pk=self.user.pk).update(email='new@example.com')
+        user.phone_number = '+123456789'
+        user.save()
+        self.user.refresh_from_db()
+        self.assertEqual((self.user.email, self.user.phone_number), ('new@example.com', '+123456789'))
+
+    def test_revoked_token_is_rejected_at_once(self):
+        self.auth.authenticate_credentials(self.token.key)
+        revoke_tokens(self.user)
+        with self.assertRaises(exceptions.AuthenticationFailed):
+            self.auth.authenticate_credentials(self.token.key)
+
+    def test_deactivated_user_is_rejected(self):
+        self.auth.authenticate_credentials(self.token.key)
+        self.user.is_active = False
+        self.user.save()
+        with self.assertRaises(exceptions.AuthenticationFailed):
+            self.auth.authenticate_credentials(self.token.key)
+
+    def test_expired_token_is_deleted_and_replaced(self):
+        Token.objects.filter(pk=self.token.pk).update(created=timezone.now() - timedelta(days=2))
+        with self.assertRaises(exceptions.AuthenticationFailed):
+            self.auth.authenticate_credentials(self.token.key)
+        self.assertFalse(Token.objects.filter(key=self.token.key).exists())
+        self.assertNotEqual(issue_token(self.user).key, self.token.key)
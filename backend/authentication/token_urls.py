@@ -1,9 +0,0 @@
-"""
-Token URL patterns for authentication app.
-"""
-from django.urls import path
-
-urlpatterns = [
-    # Placeholder for token endpoints
-    # These will be implemented as needed
-]
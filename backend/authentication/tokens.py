@@ -0,0 +1,173 @@
+"""
+Expiring API tokens resolved through a two-tier cache.
+
+``CachedTokenAuthentication`` replaces DRF's ``TokenAuthentication``, which
+joins ``Token`` and ``User`` on every request. A token is looked up in:
+
+1. a bounded in-process LRU (``TOKEN_CACHE_SIZE`` entries, each kept for
+   ``TOKEN_CACHE_LOCAL_SECONDS``);
+2. the shared cache ``TOKEN_CACHE_ALIAS`` (``TOKEN_CACHE_SECONDS``), so a
+   token resolved by one process is known to all;
+3. the database, filling both tiers.
+
+Tokens expire ``REST_FRAMEWORK_TOKEN_EXPIRE_HOURS`` after they were
+issued; an expired token is deleted on use and replaced at the next login.
+
+Entries hold the token's expiry and a few user fields (``USER_FIELDS``,
+never the password hash); ``request.user`` is built from them with
+``User.from_claims`` and loads any other field on first use.
+
+Deleting a token (logout, password change) or saving its user drops it
+from this process's LRU and marks it changed in the shared cache at once;
+while marked, it is read from the database and not shared again, so a
+request racing the change cannot put the old entry back. Other processes
+may still accept it from their LRU for up to ``TOKEN_CACHE_LOCAL_SECONDS``.
+"""
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+from .models import User
+
+
+class TokenCache:
+    """
+    Thread-safe LRU of ``key -> (user fields, expires_at)`` whose entries are dropped after ``ttl`` seconds.
+
+    ``generation`` changes with every ``discard``; ``set`` ignores values
+    read from the database before the last one.
+    """
+
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.generation = 0
+        self._entries = OrderedDict()  # key -> (deadline, value)
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def set(self, key, value, generation=None):
+        with self._lock:
+            if generation is not None and generation != self.generation:
+                return
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def discard(self, *keys):
+        with self._lock:
+            self.generation += 1
+            for key in keys:
+                self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+# User fields kept with a cached token: enough for permission checks and ``verify``
+USER_FIELDS = ('id', 'username', 'email', 'first_name', 'last_name', 'is_active', 'is_staff', 'is_superuser', 'is_verified')
+
+# Shared-cache value of a token that changed recently: read it from the database
+CHANGED = 'changed'
+
+tokens = TokenCache(settings.TOKEN_CACHE_SIZE, settings.TOKEN_CACHE_LOCAL_SECONDS)
+
+
+def shared_cache():
+    return caches[settings.TOKEN_CACHE_ALIAS]
+
+
+def shared_key(key):
+    """Shared cache key of a token (its hash: keys are credentials)."""
+    return 'auth:token:' + hashlib.sha256(key.encode()).hexdigest()
+
+
+def expires_at(created):
+    """When a token created at ``created`` stops being accepted."""
+    return created + timedelta(hours=settings.REST_FRAMEWORK_TOKEN_EXPIRE_HOURS)
+
+
+def forget(*keys):
+    """Drop tokens from both cache tiers."""
+    if keys:
+        tokens.discard(*keys)
+        shared_cache().set_many({shared_key(key): CHANGED for key in keys}, settings.TOKEN_CACHE_SECONDS)
+
+
+def forget_user(user):
+    """Drop the user's tokens from both cache tiers (the cached user is stale)."""
+    forget(*Token.objects.filter(user=user).values_list('key', flat=True))
+
+
+def issue_token(user):
+    """The user's token, replaced by a new one when it has expired."""
+    token, created = Token.objects.get_or_create(user=user)
+    if not created and expires_at(token.created) <= timezone.now():
+        token.delete()
+        token = Token.objects.create(user=user)
+    return token
+
+
+def revoke_tokens(user):
+    """Delete the user's tokens; they stop working at once."""
+    Token.objects.filter(user=user).delete()  # The post_delete signal forgets them
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    ``Authorization: Token <key>`` authentication with expiry, served from cache on hits.
+    """
+
+    def authenticate_credentials(self, key):
+        entry = tokens.get(key)
+        if entry is None:
+            generation = tokens.generation
+            entry = shared_cache().get(shared_key(key))
+            if entry is None or entry == CHANGED:
+                entry = self.load(key, share=entry is None)
+            tokens.set(key, entry, generation)
+        fields, expiry = entry
+
+        if expiry <= timezone.now():
+            Token.objects.filter(key=key).delete()
+            raise exceptions.AuthenticationFailed(_('Token has expired.'))
+        if not fields['is_active']:
+            raise exceptions.AuthenticationFailed(_('User inactive or deleted.'))
+        return User.from_claims(fields), key
+
+    def load(self, key, share=True):
+        """Read a token and its user's fields from the database, sharing the entry unless it changed meanwhile."""
+        row = Token.objects.filter(key=key).values_list('created', *('user__' + name for name in USER_FIELDS)).first()
+        if row is None:
+            raise exceptions.AuthenticationFailed(_('Invalid token.'))
+        entry = (dict(zip(USER_FIELDS, row[1:])), expires_at(row[0]))
+        remaining = (entry[1] - timezone.now()).total_seconds()
+        if share and remaining > 0:
+            # add() leaves a CHANGED mark written since the read in place.
+            shared_cache().add(shared_key(key), entry, min(settings.TOKEN_CACHE_SECONDS, remaining))
+        return entry
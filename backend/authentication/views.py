@@ -4,22 +4,32 @@ Views for authentication app.
 import secrets
 import string
 
+from asgiref.sync import sync_to_async
 from django.conf import settings
 from django.contrib.auth import login, logout
 from django.core.mail import send_mail
+from django.db import transaction
 from django.utils import timezone
 from rest_framework import generics, permissions, status
-from rest_framework.authtoken.models import Token
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
 from rest_framework.views import APIView
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
 
-from .models import LoginHistory, PasswordResetToken, User, UserProfile
+from sernion_mark.async_views import AsyncAPIView, blocking_io
+
+from .backends import find_user
+from .history import log_login
+from .jwt_auth import (SESSION_CLAIM, end_sessions, issue_tokens,
+                       revoke_user_sessions)
+from .models import PasswordResetToken, User, UserProfile
 from .serializers import (PasswordChangeSerializer,
                           PasswordResetConfirmSerializer,
                           PasswordResetRequestSerializer, UserListSerializer,
                           UserLoginSerializer, UserProfileSerializer,
                           UserRegistrationSerializer, UserUpdateSerializer)
+from .tokens import issue_token, revoke_tokens
 
 
 class UserRegistrationView(APIView):
@@ -34,18 +44,10 @@ class UserRegistrationView(APIView):
         if serializer.is_valid():
             user = serializer.save()
             
-            # Generate token
-            token, created = Token.objects.get_or_create(user=user)
+            # Buffered login history entry
+            log_login(user, self.get_client_ip(request), request.META.get('HTTP_USER_AGENT', ''), True)
             
-            # Create login history entry
-            LoginHistory.objects.create(
-                user=user,
-                ip_address=self.get_client_ip(request),
-                user_agent=request.META.get('HTTP_USER_AGENT', ''),
-                login_successful=True
-            )
-            
-            return Response({
+            data = {
                 'success': True,
                 'message': 'User registered successfully',
                 'user': {
@@ -54,8 +56,11 @@ class UserRegistrationView(APIView):
                     'email': user.email,
                     'full_name': user.full_name,
                 },
-                'token': token.key
-            }, status=status.HTTP_201_CREATED)
+                'tokens': issue_tokens(user)
+            }
+            if settings.LEGACY_API_TOKENS:
+                data['token'] = issue_token(user).key
+            return Response(data, status=status.HTTP_201_CREATED)
         
         return Response({
             'success': False,
@@ -80,67 +85,53 @@ class UserLoginView(APIView):
     
     def post(self, request):
         """Authenticate and login user."""
-        serializer = UserLoginSerializer(data=request.data)
+        serializer = UserLoginSerializer(data=request.data, context={'request': request})
         if serializer.is_valid():
             user = serializer.validated_data['user']
             
-            # Reset failed login attempts
-            user.reset_failed_attempts()
+            # Last login and failed attempts in a single conditional UPDATE (no-op if the
+            # account was locked meanwhile); the JWT session is saved when first refreshed
+            with transaction.atomic():
+                logged_in = user.record_login()
+                if logged_in:
+                    tokens = issue_tokens(user)
+                    # API token (a new one once the previous has expired), if still issued
+                    token = issue_token(user) if settings.LEGACY_API_TOKENS else None
             
-            # Update last login
-            user.last_login = timezone.now()
-            user.save(update_fields=['last_login'])
-            
-            # Generate token
-            token, created = Token.objects.get_or_create(user=user)
-            
-            # Create login history entry
-            LoginHistory.objects.create(
-                user=user,
-                ip_address=self.get_client_ip(request),
-                user_agent=request.META.get('HTTP_USER_AGENT', ''),
-                login_successful=True
-            )
+            if logged_in:
+                # Buffered login history entry
+                log_login(user, self.get_client_ip(request), request.META.get('HTTP_USER_AGENT', ''), True)
+                
+                data = {
+                    'success': True,
+                    'message': 'Login successful',
+                    'user': {
+                        'id': user.id,
+                        'username': user.username,
+                        'email': user.email,
+                        'full_name': user.full_name,
+                        'is_verified': user.is_verified,
+                    },
+                    'tokens': tokens
+                }
+                if token is not None:
+                    data['token'] = token.key
+                return Response(data, status=status.HTTP_200_OK)
             
             return Response({
-                'success': True,
-                'message': 'Login successful',
-                'user': {
-                    'id': user.id,
-                    'username': user.username,
-                    'email': user.email,
-                    'full_name': user.full_name,
-                    'is_verified': user.is_verified,
-                },
-                'token': token.key
-            }, status=status.HTTP_200_OK)
+                'success': False,
+                'errors': {'non_field_errors': ['Account is temporarily locked or disabled.']}
+            }, status=status.HTTP_401_UNAUTHORIZED)
         
         # Handle failed login
         username = request.data.get('username')
-        if username:
-            try:
-                user = User.objects.get(username=username)
-            except User.DoesNotExist:
-                try:
-                    user = User.objects.get(email=username)
-                except User.DoesNotExist:
-                    user = None
+        user = find_user(username) if username else None
+        if user:
+            # Count the failed attempt, locking the account after too many, in one UPDATE
+            user.record_failed_login()
             
-            if user:
-                # Increment failed login attempts
-                user.increment_failed_attempts()
-                
-                # Lock account if too many failed attempts
-                if user.failed_login_attempts >= 5:
-                    user.lock_account()
-                
-                # Create failed login history entry
-                LoginHistory.objects.create(
-                    user=user,
-                    ip_address=self.get_client_ip(request),
-                    user_agent=request.META.get('HTTP_USER_AGENT', ''),
-                    login_successful=False
-                )
+            # Buffered failed login history entry
+            log_login(user, self.get_client_ip(request), request.META.get('HTTP_USER_AGENT', ''), False)
         
         return Response({
             'success': False,
@@ -164,10 +155,22 @@ class UserLogoutView(APIView):
     permission_classes = [permissions.IsAuthenticated]
     
     def post(self, request):
-        """Logout user and delete token."""
+        """Logout user, delete token and end the JWT session."""
         try:
-            # Delete the user's token
-            Token.objects.filter(user=request.user).delete()
+            # Delete the user's token (and drop it from the token cache)
+            revoke_tokens(request.user)
+            
+            # End the session of the access token used, and of the refresh token sent
+            sids = []
+            if isinstance(request.auth, AccessToken):
+                sids.append(request.auth.get(SESSION_CLAIM))
+            refresh_token = request.data.get('refresh_token')
+            if refresh_token:
+                try:
+                    sids.append(RefreshToken(refresh_token).get(SESSION_CLAIM))
+                except TokenError:
+                    pass
+            end_sessions(request.user.pk, sids)
             
             return Response({
                 'success': True,
@@ -255,12 +258,20 @@ class PasswordChangeView(APIView):
             
             # Change password
             user.set_password(new_password)
-            user.save()
+            user.save(update_fields=['password'])
             
-            return Response({
+            # Sign out every client holding the old tokens; this one gets new tokens
+            revoke_tokens(user)
+            revoke_user_sessions(user)
+            
+            data = {
                 'success': True,
-                'message': 'Password changed successfully'
-            }, status=status.HTTP_200_OK)
+                'message': 'Password changed successfully',
+                'tokens': issue_tokens(user)
+            }
+            if settings.LEGACY_API_TOKENS:
+                data['token'] = issue_token(user).key
+            return Response(data, status=status.HTTP_200_OK)
         
         return Response({
             'success': False,
@@ -268,41 +279,36 @@ class PasswordChangeView(APIView):
         }, status=status.HTTP_400_BAD_REQUEST)
 
 
-class PasswordResetRequestView(APIView):
+class PasswordResetRequestView(AsyncAPIView):
     """
     Password reset request endpoint.
+    
+    Asynchronous: waiting on the SMTP server holds no worker thread under ASGI.
     """
     permission_classes = [permissions.AllowAny]
     
-    def post(self, request):
+    async def post(self, request):
         """Request password reset."""
         serializer = PasswordResetRequestSerializer(data=request.data)
-        if serializer.is_valid():
+        if await sync_to_async(serializer.is_valid)():
             email = serializer.validated_data['email']
-            user = User.objects.get(email=email)
+            user = await User.objects.aget(email=email)
             
             # Generate reset token
             token = ''.join(secrets.choice(string.ascii_letters + string.digits) for _ in range(32))
             
-            # Create or update reset token
-            reset_token, created = PasswordResetToken.objects.get_or_create(
+            # Replace any previous reset token
+            await PasswordResetToken.objects.filter(user=user).adelete()
+            await PasswordResetToken.objects.acreate(
                 user=user,
-                defaults={
-                    'token': token,
-                    'expires_at': timezone.now() + timezone.timedelta(hours=24)
-                }
+                token=token,
+                expires_at=timezone.now() + timezone.timedelta(hours=24)
             )
             
-            if not created:
-                reset_token.token = token
-                reset_token.expires_at = timezone.now() + timezone.timedelta(hours=24)
-                reset_token.is_used = False
-                reset_token.save()
-            
             # Send email (in production, use proper email templates)
             try:
                 reset_url = f"{settings.FRONTEND_URL}/reset-password?token={token}"
-                send_mail(
+                await blocking_io(send_mail)(
                     'Password Reset Request',
                     f'Click the following link to reset your password: {reset_url}',
                     settings.DEFAULT_FROM_EMAIL,
@@ -352,6 +358,8 @@ class PasswordResetConfirmView(APIView):
                 user = reset_token.user
                 user.set_password(new_password)
                 user.save()
+                revoke_tokens(user)
+                revoke_user_sessions(user)
                 
                 # Mark token as used
                 reset_token.is_used = True
@@ -381,6 +389,7 @@ class UserListView(generics.ListAPIView):
     queryset = User.objects.filter(is_active=True)
     serializer_class = UserListSerializer
     permission_classes = [permissions.IsAdminUser]
+    ordering = '-created_at'  # Keyset pagination order (id is the tiebreaker)
 
 
 @api_view(['GET'])
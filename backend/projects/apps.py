@@ -8,3 +8,6 @@ class ProjectsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'projects'
     verbose_name = 'Projects'
+
+    def ready(self):
+        from . import signals  # noqa: F401
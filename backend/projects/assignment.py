@@ -0,0 +1,208 @@
+"""
+Leased work assignment for annotation tasks.
+
+``claim_task`` hands an annotator the highest priority open task they have
+not been leased before. On databases with ``SELECT ... FOR UPDATE SKIP
+LOCKED`` (PostgreSQL) concurrent claimers skip each other's candidate rows;
+elsewhere (SQLite) a conditional ``UPDATE ... WHERE assigned_count <
+required`` makes the claim atomic and a lost race moves on to the next
+candidate, which only ends when no open task is left. Either way a task is
+never assigned beyond its overlap.
+
+Leases are never deleted: an expired or released lease keeps its row (with
+status ``expired`` or ``released``), so the task is not handed to the same
+annotator again. Only active leases that have not expired can be renewed
+or completed.
+"""
+from collections import Counter
+from datetime import timedelta
+from itertools import chain
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Case, Exists, F, OuterRef, Value, When
+from django.utils import timezone
+
+from .models import AnnotationTask, DatasetItem, TaskLease
+
+
+def create_tasks(project, required_annotations=1, priority=0, datasets=None):
+    """
+    Create the missing tasks for a project's datasets.
+
+    Datasets split into items get one task per item; the others get a
+    single task for the whole dataset.
+    """
+    datasets = project.datasets.all() if datasets is None else datasets
+    existing = AnnotationTask.objects.filter(project=project)
+    missing_datasets = datasets.filter(item_count=0).exclude(
+        pk__in=existing.values('dataset_id')
+    ).values_list('pk', flat=True)
+    missing_items = DatasetItem.objects.filter(
+        dataset__in=datasets.filter(item_count__gt=0).values('pk')
+    ).exclude(
+        pk__in=existing.filter(item__isnull=False).values('item_id')
+    ).order_by('pk').values_list('dataset_id', 'pk')
+
+    rows = chain(
+        ((dataset_id, None) for dataset_id in missing_datasets.iterator()),
+        missing_items.iterator(),
+    )
+    return AnnotationTask.objects.bulk_create([
+        AnnotationTask(
+            project=project,
+            dataset_id=dataset_id,
+            item_id=item_id,
+            required_annotations=required_annotations,
+            priority=priority,
+        )
+        for dataset_id, item_id in rows
+    ], batch_size=1000)
+
+
+def _open_tasks(project, user):
+    """Open tasks in ``project`` the user has never leased (in any status), best first."""
+    already_leased = TaskLease.objects.filter(task=OuterRef('pk'), annotator=user)
+    return (
+        AnnotationTask.objects.filter(project=project, is_open=True)
+        .filter(~Exists(already_leased))
+        .order_by('-priority', 'pk')
+    )
+
+
+def _take_slot(task_id):
+    """Atomically take one assignment slot on a task; False (and the task closed) if it filled up."""
+    taken = bool(
+        AnnotationTask.objects.filter(
+            pk=task_id,
+            is_open=True,
+            assigned_count__lt=F('required_annotations'),
+        ).update(
+            assigned_count=F('assigned_count') + 1,
+            # Right-hand sides see the old row, so this is "new count < required".
+            is_open=Case(
+                When(assigned_count__lt=F('required_annotations') - 1, then=Value(True)),
+                default=Value(False),
+            ),
+            updated_at=timezone.now(),
+        )
+    )
+    if not taken:
+        # Never offered again while full, so every lost race shrinks the candidates
+        AnnotationTask.objects.filter(
+            pk=task_id, is_open=True, assigned_count__gte=F('required_annotations')
+        ).update(is_open=False, updated_at=timezone.now())
+    return taken
+
+
+def claim_task(project, user, lease_seconds=None):
+    """
+    Lease the next task in ``project`` to ``user``.
+
+    Returns the user's still-active lease if they already hold one, a new
+    lease otherwise, or ``None`` when no work is left.
+    """
+    now = timezone.now()
+    current = (
+        TaskLease.objects.filter(task__project=project, annotator=user, status='active', expires_at__gt=now)
+        .select_related('task', 'task__dataset', 'task__item')
+        .first()
+    )
+    if current is not None:
+        return current
+
+    lease_seconds = lease_seconds or settings.TASK_LEASE_SECONDS
+    skip_locked = connection.features.has_select_for_update_skip_locked
+    reclaimed = False
+
+    while True:
+        with transaction.atomic():
+            candidates = _open_tasks(project, user)
+            if skip_locked:
+                candidates = candidates.select_for_update(skip_locked=True, of=('self',))
+            task_id = candidates.values_list('pk', flat=True).first()
+
+            if task_id is None:
+                if reclaimed:
+                    return None
+                # Nothing open: expired leases may be holding the remaining slots.
+                reclaimed = True
+                reclaim_expired_leases(project=project)
+                continue
+
+            if not _take_slot(task_id):
+                continue  # Lost the race for the last slot; try the next task.
+
+            lease = TaskLease.objects.create(
+                task_id=task_id,
+                annotator=user,
+                expires_at=now + timedelta(seconds=lease_seconds),
+            )
+        return TaskLease.objects.select_related('task', 'task__dataset', 'task__item').get(pk=lease.pk)
+
+
+def renew_lease(lease, lease_seconds=None):
+    """Push back the expiry of an active lease; ``None`` if it has expired."""
+    lease_seconds = lease_seconds or settings.TASK_LEASE_SECONDS
+    now = timezone.now()
+    expires_at = now + timedelta(seconds=lease_seconds)
+    if not TaskLease.objects.filter(pk=lease.pk, status='active', expires_at__gt=now).update(expires_at=expires_at):
+        return None
+    lease.expires_at = expires_at
+    return lease
+
+
+def complete_lease(lease):
+    """Mark a lease as done and count the submission on its task; ``None`` if it has expired."""
+    now = timezone.now()
+    with transaction.atomic():
+        updated = TaskLease.objects.filter(pk=lease.pk, status='active', expires_at__gt=now).update(
+            status='completed',
+            completed_at=now,
+        )
+        if not updated:
+            return None
+        AnnotationTask.objects.filter(pk=lease.task_id).update(
+            completed_count=F('completed_count') + 1,
+            updated_at=now,
+        )
+    lease.refresh_from_db()
+    return lease
+
+
+def _free_slots(leases, status):
+    """End active leases with ``status`` and give their slots back to the tasks."""
+    leases = list(
+        leases.filter(status='active').select_for_update().values_list('pk', 'task_id')
+    )
+    # Kept rather than deleted, so the annotator is not offered the task again
+    TaskLease.objects.filter(pk__in=[lease_id for lease_id, _ in leases]).update(status=status)
+    for task_id, count in Counter(task_id for _, task_id in leases).items():
+        AnnotationTask.objects.filter(pk=task_id).update(
+            assigned_count=F('assigned_count') - count,
+            is_open=True,
+            updated_at=timezone.now(),
+        )
+    return len(leases)
+
+
+def release_lease(lease):
+    """Give a task back before finishing it."""
+    with transaction.atomic():
+        return _free_slots(TaskLease.objects.filter(pk=lease.pk), 'released')
+
+
+def reclaim_expired_leases(project=None, batch_size=None):
+    """Free the slots held by expired leases; returns the number reclaimed."""
+    batch_size = batch_size or settings.TASK_RECLAIM_BATCH_SIZE
+    expired = TaskLease.objects.filter(status='active', expires_at__lte=timezone.now())
+    if project is not None:
+        expired = expired.filter(task__project=project)
+
+    reclaimed = 0
+    while True:
+        with transaction.atomic():
+            batch = list(expired.order_by('pk').values_list('pk', flat=True)[:batch_size])
+            if not batch:
+                return reclaimed
+            reclaimed += _free_slots(TaskLease.objects.filter(pk__in=batch), 'expired')
@@ -0,0 +1,422 @@
+"""
+Media derivative generators.
+
+These functions run inside worker processes (see ``projects.processing``)
+and therefore only touch the filesystem: no Django settings or ORM. Each
+takes a source file and an output directory, writes its files atomically
+and returns a JSON-serialisable manifest describing what it produced.
+
+* images: downscaled JPEG thumbnail and preview (Pillow), plus a deep
+  zoom tile archive for large images (``projects.tiles``)
+* audio: multi-resolution waveform peaks (min/max int16 pairs)
+* video: a keyframe sprite sheet plus the timestamp of every tile
+
+Decoding anything other than images and 16-bit PCM WAV needs ``ffmpeg``.
+"""
+import json
+import logging
+import math
+import os
+import re
+import shutil
+import subprocess
+import tempfile
+import wave
+from pathlib import Path
+
+import numpy as np
+from PIL import Image, ImageOps
+
+from .tiles import ORIENTATION, TileArchive, allow_large_images, build_pyramid, check_size, level_size
+
+logger = logging.getLogger(__name__)
+
+IMAGE_SIZES = {'thumbnail': 256, 'preview': 1024}
+JPEG_QUALITY = 85
+TILE_MIN_SIZE = 4096  # Images with a longer side than this also get a tile pyramid
+
+WAVEFORM_BASE_SAMPLES = 256  # Samples per peak at the finest level
+WAVEFORM_LEVELS = 8  # Each level halves the resolution of the previous one
+AUDIO_BLOCK_PEAKS = 4096  # Peaks computed per decoded block
+AUDIO_SAMPLE_RATE = 16000  # ffmpeg resamples compressed audio to this rate
+
+SPRITE_TILE = (160, 90)
+SPRITE_COLUMNS = 10
+SPRITE_MAX_FRAMES = 100
+
+PROGRESS_STEP = 0.1
+
+
+class DerivativeError(Exception):
+    """Raised when a derivative cannot be generated."""
+
+
+def _write_json(path, data):
+    _atomic_write(path, lambda fh: fh.write(json.dumps(data).encode('utf-8')))
+
+
+def _atomic_write(path, write):
+    """Write via a temp file in the same directory and rename into place."""
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix='.tmp-')
+    try:
+        with os.fdopen(fd, 'wb') as fh:
+            write(fh)
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+
+class _Progress:
+    """Forward progress in ``PROGRESS_STEP`` increments to a callback."""
+
+    def __init__(self, callback):
+        self.callback = callback
+        self.reported = 0.0
+
+    def __call__(self, fraction):
+        fraction = min(max(fraction, 0.0), 1.0)
+        if self.callback is not None and fraction - self.reported >= PROGRESS_STEP:
+            self.reported = fraction
+            self.callback(fraction)
+
+
+def _ffmpeg():
+    path = shutil.which('ffmpeg')
+    if path is None:
+        raise DerivativeError('ffmpeg is required to decode this file type.')
+    return path
+
+
+def _probe_duration(source):
+    """Duration in seconds according to ffprobe, or ``None`` if unknown."""
+    ffprobe = shutil.which('ffprobe')
+    if ffprobe is None:
+        return None
+    result = subprocess.run(
+        [ffprobe, '-v', 'error', '-show_entries', 'format=duration', '-of', 'csv=p=0', str(source)],
+        capture_output=True, text=True,
+    )
+    try:
+        return float(result.stdout.strip())
+    except ValueError:
+        return None
+
+
+# Images
+
+def _upright_size(image):
+    """Size of ``image`` once its EXIF orientation is applied."""
+    # Recent Pillow reports TIFFs rotated already; the tiles are always laid out as stored.
+    width = max((tile[1][2] for tile in image.tile), default=image.width)
+    height = max((tile[1][3] for tile in image.tile), default=image.height)
+    if (image.getexif().get(ORIENTATION) or 1) in (5, 6, 7, 8):
+        return height, width
+    return width, height
+
+
+def _level_for(width, height, size):
+    """Smallest pyramid level whose longer side is at least ``size``."""
+    level = 0
+    while max(level_size(width, height, level)) < size:
+        level += 1
+    return level
+
+
+def image_derivatives(source, out_dir, progress=None, sizes=None):
+    """
+    Write a JPEG per entry in ``sizes`` (longest side in pixels).
+
+    Images larger than ``TILE_MIN_SIZE`` are first cut into a DZI tile
+    archive, ``tiles.dzt``, and the JPEGs are scaled from one of its
+    levels, so the source is read once and in strips. When an image is too
+    large to tile (see ``projects.tiles``) the manifest says why in
+    ``tiles_skipped`` and the JPEGs are decoded from the source.
+    """
+    sizes = sizes or IMAGE_SIZES
+    out_dir = Path(out_dir)
+    progress = _Progress(progress)
+    largest = max(sizes.values())
+    try:
+        with allow_large_images(unlimited=True), Image.open(source) as image:  # Reads the header only
+            width, height = _upright_size(image)
+    except OSError:
+        raise DerivativeError('Cannot read image.')
+
+    files = {}
+    skipped = None
+    image = None
+    if max(width, height) > TILE_MIN_SIZE:
+        try:
+            tiles = build_pyramid(source, out_dir / 'tiles.dzt', progress=lambda fraction: progress(0.9 * fraction))
+        except Image.DecompressionBombError as error:
+            logger.warning('No tile pyramid for %s: %s', source, error)
+            skipped = f'{error} Install pyvips to tile images this large.'
+        else:
+            files['tiles'] = {'file': 'tiles.dzt', **tiles}
+            archive = TileArchive(out_dir / 'tiles.dzt')
+            try:
+                image = archive.level_image(_level_for(width, height, largest))
+            finally:
+                archive.close()
+
+    if image is None:
+        try:
+            with allow_large_images(unlimited=True), Image.open(source) as original:
+                # JPEG can decode straight at a reduced scale, much faster than a full decode.
+                scale = min(largest / max(width, height), 1)
+                original.draft('RGB', tuple(math.ceil(side * scale) for side in original.size))
+                check_size(*original.size)
+                image = ImageOps.exif_transpose(original)
+        except Image.DecompressionBombError:
+            raise DerivativeError('Image is too large to decode; install pyvips to process it.')
+        except OSError:
+            raise DerivativeError('Cannot read image.')
+        if image.mode not in ('RGB', 'L'):
+            background = Image.new('RGB', image.size, 'white')
+            rgba = image.convert('RGBA')
+            background.paste(rgba, mask=rgba.getchannel('A'))
+            image = background
+
+    for name, size in sorted(sizes.items(), key=lambda entry: -entry[1]):
+        image.thumbnail((size, size), Image.LANCZOS)
+        filename = f'{name}.jpg'
+        _atomic_write(
+            out_dir / filename,
+            lambda fh: image.save(fh, 'JPEG', quality=JPEG_QUALITY, optimize=True),
+        )
+        files[name] = {'file': filename, 'width': image.width, 'height': image.height}
+    progress(1.0)
+    manifest = {'kind': 'image', 'width': width, 'height': height, 'files': files}
+    if skipped:
+        manifest['tiles_skipped'] = skipped
+    return manifest
+
+
+# Audio
+
+def _wav_blocks(source, block_samples):
+    """Yield mono int16 sample blocks from a 16-bit PCM WAV file."""
+    with wave.open(str(source), 'rb') as wav:
+        if wav.getsampwidth() != 2:
+            raise ValueError('not 16-bit PCM')
+        channels = wav.getnchannels()
+        yield wav.getframerate(), wav.getnframes()
+        while True:
+            frames = wav.readframes(block_samples)
+            if not frames:
+                return
+            samples = np.frombuffer(frames, dtype='<i2')
+            if channels > 1:
+                samples = samples.reshape(-1, channels).mean(axis=1).astype(np.int16)
+            yield samples
+
+
+def _ffmpeg_blocks(source, block_samples):
+    """Yield mono int16 sample blocks decoded (and resampled) by ffmpeg."""
+    duration = _probe_duration(source)
+    yield AUDIO_SAMPLE_RATE, int(duration * AUDIO_SAMPLE_RATE) if duration else 0
+    process = subprocess.Popen(
+        [_ffmpeg(), '-v', 'error', '-i', str(source), '-ac', '1', '-ar', str(AUDIO_SAMPLE_RATE),
+         '-f', 's16le', '-acodec', 'pcm_s16le', 'pipe:1'],
+        stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+    )
+    try:
+        while True:
+            data = process.stdout.read(block_samples * 2)
+            if not data:
+                break
+            yield np.frombuffer(data[:len(data) - len(data) % 2], dtype='<i2')
+    finally:
+        process.stdout.close()
+        if process.wait() != 0:
+            raise DerivativeError('ffmpeg could not decode the audio.')
+
+
+def _peaks(samples, samples_per_peak):
+    """Min/max of each ``samples_per_peak`` window as an ``(n, 2)`` int16 array."""
+    remainder = len(samples) % samples_per_peak
+    if remainder:
+        padding = np.full(samples_per_peak - remainder, samples[-1], dtype=samples.dtype)
+        samples = np.concatenate([samples, padding])
+    windows = samples.reshape(-1, samples_per_peak)
+    return np.stack([windows.min(axis=1), windows.max(axis=1)], axis=1)
+
+
+def _downsample(peaks):
+    """Merge neighbouring peak pairs into the next coarser level."""
+    if len(peaks) % 2:
+        peaks = np.concatenate([peaks, peaks[-1:]])
+    pairs = peaks.reshape(-1, 2, 2)
+    return np.stack([pairs[:, :, 0].min(axis=1), pairs[:, :, 1].max(axis=1)], axis=1)
+
+
+def audio_waveform(source, out_dir, progress=None):
+    """
+    Write ``waveform.dat``: int16 ``(min, max)`` pairs for every level.
+
+    Level ``n`` covers ``WAVEFORM_BASE_SAMPLES * 2**n`` samples per peak.
+    Levels are stored back to back; the manifest gives each one's byte
+    offset so players can fetch just the resolution they need with a Range
+    request. Audio is decoded in blocks, so memory is bounded by the size of
+    the finest level, not the length of the recording.
+    """
+    out_dir = Path(out_dir)
+    progress = _Progress(progress)
+    block_samples = WAVEFORM_BASE_SAMPLES * AUDIO_BLOCK_PEAKS
+
+    try:
+        blocks = _wav_blocks(source, block_samples)
+        sample_rate, expected = next(blocks)
+    except (wave.Error, ValueError, EOFError):
+        blocks = _ffmpeg_blocks(source, block_samples)
+        sample_rate, expected = next(blocks)
+
+    finest = []
+    total = 0
+    for samples in blocks:
+        if len(samples):
+            finest.append(_peaks(samples, WAVEFORM_BASE_SAMPLES))
+            total += len(samples)
+            if expected:
+                progress(0.9 * total / expected)
+    if not total:
+        raise DerivativeError('Audio contains no samples.')
+
+    levels = [np.concatenate(finest)]
+    for _ in range(WAVEFORM_LEVELS - 1):
+        if len(levels[-1]) <= 1:
+            break
+        levels.append(_downsample(levels[-1]))
+
+    manifest_levels = []
+    offset = 0
+    for index, peaks in enumerate(levels):
+        manifest_levels.append({
+            'samples_per_peak': WAVEFORM_BASE_SAMPLES << index,
+            'peaks': len(peaks),
+            'offset': offset,
+        })
+        offset += peaks.astype('<i2').nbytes
+
+    _atomic_write(
+        out_dir / 'waveform.dat',
+        lambda fh: [fh.write(peaks.astype('<i2').tobytes()) for peaks in levels],
+    )
+    progress(1.0)
+    return {
+        'kind': 'audio',
+        'duration': total / sample_rate,
+        'sample_rate': sample_rate,
+        'files': {'waveform': {'file': 'waveform.dat', 'format': 'int16le-minmax', 'levels': manifest_levels}},
+    }
+
+
+# Video
+
+PTS_TIME = re.compile(r'pts_time:\s*([0-9.]+)')
+
+
+def video_keyframes(source, out_dir, progress=None):
+    """
+    Write ``keyframes.jpg``: a sprite sheet of keyframes across the video.
+
+    ffmpeg only decodes keyframes (``-skip_frame nokey``) and keeps those at
+    least ``duration / SPRITE_MAX_FRAMES`` apart, so the cost grows with the
+    number of keyframes rather than the number of frames.
+    """
+    out_dir = Path(out_dir)
+    progress = _Progress(progress)
+    duration = _probe_duration(source)
+    if not duration:
+        raise DerivativeError('Cannot determine the video duration.')
+
+    tile_width, tile_height = SPRITE_TILE
+    interval = duration / SPRITE_MAX_FRAMES
+    video_filter = (
+        f"select='isnan(prev_selected_t)+gte(t-prev_selected_t\\,{interval:.3f})',"
+        f'scale={tile_width}:{tile_height}:force_original_aspect_ratio=decrease,'
+        f'pad={tile_width}:{tile_height}:(ow-iw)/2:(oh-ih)/2,showinfo'
+    )
+    rows = math.ceil(SPRITE_MAX_FRAMES / SPRITE_COLUMNS)
+    sprite = Image.new('RGB', (tile_width * SPRITE_COLUMNS, tile_height * rows))
+    frame_bytes = tile_width * tile_height * 3
+
+    with tempfile.TemporaryFile() as log:
+        process = subprocess.Popen(
+            [_ffmpeg(), '-hide_banner', '-skip_frame', 'nokey', '-i', str(source),
+             '-an', '-vf', video_filter, '-vsync', 'vfr',
+             '-frames:v', str(SPRITE_MAX_FRAMES), '-f', 'rawvideo', '-pix_fmt', 'rgb24', 'pipe:1'],
+            stdout=subprocess.PIPE, stderr=log,
+        )
+        count = 0
+        while True:
+            data = process.stdout.read(frame_bytes)
+            if len(data) < frame_bytes:
+                break
+            frame = Image.frombuffer('RGB', SPRITE_TILE, data, 'raw', 'RGB', 0, 1)
+            sprite.paste(frame, ((count % SPRITE_COLUMNS) * tile_width, (count // SPRITE_COLUMNS) * tile_height))
+            count += 1
+            progress(0.9 * count / SPRITE_MAX_FRAMES)
+        process.stdout.close()
+        if process.wait() != 0 or not count:
+            raise DerivativeError('ffmpeg could not extract keyframes.')
+        log.seek(0)
+        times = [
+            float(match.group(1))
+            for line in log.read().decode('utf-8', errors='replace').splitlines()
+            if 'Parsed_showinfo' in line
+            for match in [PTS_TIME.search(line)] if match
+        ]
+
+    sprite = sprite.crop((0, 0, sprite.width, tile_height * math.ceil(count / SPRITE_COLUMNS)))
+    _atomic_write(out_dir / 'keyframes.jpg', lambda fh: sprite.save(fh, 'JPEG', quality=JPEG_QUALITY))
+    progress(1.0)
+    return {
+        'kind': 'video',
+        'duration': duration,
+        'files': {'keyframes': {
+            'file': 'keyframes.jpg',
+            'tile_width': tile_width,
+            'tile_height': tile_height,
+            'columns': SPRITE_COLUMNS,
+            'times': times[:count],
+        }},
+    }
+
+
+GENERATORS = {
+    'image': image_derivatives,
+    'audio': audio_waveform,
+    'video': video_keyframes,
+}
+
+MANIFEST = 'manifest.json'
+
+
+def generate(kind, source, out_dir, progress=None):
+    """
+    Produce the derivatives of ``kind`` for ``source`` in ``out_dir``.
+
+    A manifest left by an earlier run is returned as is, so derivatives of
+    deduplicated blobs are only ever computed once.
+    """
+    out_dir = Path(out_dir)
+    manifest_path = out_dir / MANIFEST
+    if manifest_path.exists():
+        with open(manifest_path, encoding='utf-8') as fh:
+            return json.load(fh)
+
+    if not Path(source).is_file():
+        raise DerivativeError('Source file is missing.')
+    out_dir.mkdir(parents=True, exist_ok=True)
+    manifest = GENERATORS[kind](source, out_dir, progress=progress)
+    _write_json(manifest_path, manifest)
+    return manifest
+
+
+def run_job(job_id, kind, source, out_dir, queue=None):
+    """Process pool entry point; progress is sent as ``(job_id, fraction)``."""
+    progress = None if queue is None else (lambda fraction: queue.put((job_id, fraction)))
+    return generate(kind, source, out_dir, progress=progress)
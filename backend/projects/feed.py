@@ -0,0 +1,79 @@
+"""
+Annotation change events for the per-project feed.
+
+Writes to annotations publish, once their transaction commits, one event
+per dataset and batch on the project's channel (see
+``sernion_mark.events``)::
+
+    {"type": "annotation.created", "project": 1, "dataset": 4,
+     "annotations": [{"id": 9, "item": 17, "annotator": 2,
+                      "annotation_type": "bounding_box"}], "at": "..."}
+
+Types are ``annotation.created``, ``.updated``, ``.deleted``,
+``.verified`` and ``.rejected``. Bulk reviews carry ``count`` and
+``user`` instead of the annotation list, since they never load rows.
+"""
+from collections import defaultdict
+
+from django.db import transaction
+from django.utils import timezone
+
+from sernion_mark.events import publish
+
+CREATED = 'annotation.created'
+UPDATED = 'annotation.updated'
+DELETED = 'annotation.deleted'
+VERIFIED = 'annotation.verified'
+REJECTED = 'annotation.rejected'
+
+
+def project_channel(project_id):
+    return f'project.{project_id}'
+
+
+def _projects(dataset_ids):
+    from .models import Dataset
+
+    return dict(Dataset.objects.filter(pk__in=dataset_ids).values_list('pk', 'project_id'))
+
+
+def _send(event_type, by_dataset, extra=None):
+    projects = _projects(by_dataset)
+    now = timezone.now()
+    for dataset_id, payload in by_dataset.items():
+        if dataset_id not in projects:
+            continue
+        event = {'type': event_type, 'project': projects[dataset_id], 'dataset': dataset_id, **payload, 'at': now}
+        if extra:
+            event.update(extra)
+        publish(project_channel(projects[dataset_id]), event)
+
+
+def publish_annotations(event_type, rows):
+    """
+    Publish ``rows`` of ``(id, dataset_id, item_id, annotator_id,
+    annotation_type)`` after the current transaction commits.
+    """
+    by_dataset = defaultdict(lambda: {'annotations': []})
+    for pk, dataset_id, item_id, annotator_id, annotation_type in rows:
+        if pk is not None:
+            by_dataset[dataset_id]['annotations'].append({
+                'id': pk, 'item': item_id, 'annotator': annotator_id, 'annotation_type': annotation_type,
+            })
+    if by_dataset:
+        transaction.on_commit(lambda: _send(event_type, dict(by_dataset)))
+
+
+def annotation_rows(annotations):
+    """``publish_annotations`` rows for model instances."""
+    return [
+        (annotation.pk, annotation.dataset_id, annotation.item_id, annotation.annotator_id, annotation.annotation_type)
+        for annotation in annotations
+    ]
+
+
+def publish_review(event_type, counts, user_id):
+    """Publish a bulk review of ``counts`` (dataset id -> annotations) after commit."""
+    by_dataset = {dataset_id: {'count': count} for dataset_id, count in counts.items() if count}
+    if by_dataset:
+        transaction.on_commit(lambda: _send(event_type, by_dataset, {'user': user_id}))
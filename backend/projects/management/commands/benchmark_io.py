@@ -0,0 +1,179 @@
+"""
+Management command comparing sync (WSGI) and async (ASGI) request throughput.
+"""
+import asyncio
+import shutil
+import statistics
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from django.core.handlers.asgi import ASGIHandler
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.mail.backends.locmem import EmailBackend
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import RequestFactory
+from django.test.utils import override_settings
+from rest_framework.authtoken.models import Token
+
+from authentication.models import User
+from projects.models import Dataset, Project
+
+
+class SlowEmailBackend(EmailBackend):
+    """In-memory mail backend that takes ``latency`` seconds per send, like a remote SMTP server."""
+    latency = 0.1
+
+    def send_messages(self, messages):
+        time.sleep(self.latency)
+        return super().send_messages(messages)
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmark concurrent requests to an I/O-bound endpoint served by the WSGI and the '
+        'ASGI application, in process, against a temporary test database.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--endpoint', choices=['password-reset', 'media'], default='password-reset')
+        parser.add_argument('--requests', type=int, default=200, help='Requests per deployment.')
+        parser.add_argument('--concurrency', type=int, default=50, help='Requests in flight at once.')
+        parser.add_argument(
+            '--threads',
+            type=int,
+            default=8,
+            help='Worker threads of the sync deployment (like gunicorn --threads).',
+        )
+        parser.add_argument(
+            '--smtp-latency',
+            type=float,
+            default=0.1,
+            metavar='SECONDS',
+            help='Simulated SMTP round trip for password-reset.',
+        )
+        parser.add_argument('--media-size', type=int, default=1024 * 1024, help='Bytes per media file.')
+
+    def handle(self, *args, **options):
+        media_root = tempfile.mkdtemp()
+        SlowEmailBackend.latency = options['smtp_latency']
+        if connection.vendor == 'sqlite':
+            # A file, not the shared in-memory database, so concurrent writers wait for the lock.
+            connection.settings_dict['TEST']['NAME'] = str(Path(media_root) / 'benchmark.sqlite3')
+        test_db = connection.creation.create_test_db(verbosity=0, serialize=False)
+        try:
+            with override_settings(
+                MEDIA_ROOT=media_root,
+                EMAIL_BACKEND=f'{__name__}.SlowEmailBackend',
+                MEDIA_SENDFILE_BACKEND='',
+                DEBUG=False,
+            ):
+                method, path, body, headers = self.prepare(options['endpoint'], Path(media_root), options['media_size'])
+                for name, run in (('sync (WSGI)', self.run_wsgi), ('async (ASGI)', self.run_asgi)):
+                    started = time.perf_counter()
+                    latencies, statuses = run(method, path, body, headers, options)
+                    elapsed = time.perf_counter() - started
+                    self.report(name, elapsed, latencies, statuses)
+        finally:
+            connection.creation.destroy_test_db(test_db, verbosity=0)
+            shutil.rmtree(media_root, ignore_errors=True)
+
+    def prepare(self, endpoint, media_root, media_size):
+        """Create fixtures; returns ``(method, path, body, headers)`` of the request."""
+        user = User.objects.create_user(username='benchmark', email='benchmark@example.com', password='benchmark-pw-1')
+        if endpoint == 'password-reset':
+            return 'POST', '/api/v1/auth/password-reset/', b'{"email": "benchmark@example.com"}', {
+                'content-type': 'application/json',
+            }
+
+        (media_root / 'benchmark.mp3').write_bytes(b'\0' * media_size)
+        project = Project.objects.create(name='benchmark', owner=user, project_type='audio')
+        dataset = Dataset.objects.create(name='benchmark', project=project, file_path='benchmark.mp3', file_type='mp3')
+        token = Token.objects.create(user=user)
+        return 'GET', f'/api/v1/datasets/{dataset.pk}/media/', b'', {'authorization': f'Token {token.key}'}
+
+    def run_wsgi(self, method, path, body, headers, options):
+        application = WSGIHandler()
+        factory = RequestFactory()
+        extra = {'HTTP_' + name.upper().replace('-', '_'): value for name, value in headers.items()}
+        content_type = extra.pop('HTTP_CONTENT_TYPE', 'application/octet-stream')
+
+        def request(_):
+            started = time.perf_counter()
+            environ = factory.generic(method, path, body, content_type, **extra).environ
+            result = {}
+
+            def start_response(status, response_headers, exc_info=None):
+                result['status'] = int(status.split()[0])
+
+            chunks = application(environ, start_response)
+            try:
+                for _ in chunks:
+                    pass
+            finally:
+                getattr(chunks, 'close', lambda: None)()
+            return time.perf_counter() - started, result['status']
+
+        # Clients queue on the server's worker threads, as behind a WSGI server.
+        with ThreadPoolExecutor(options['threads']) as pool:
+            results = list(pool.map(request, range(options['requests'])))
+        return [latency for latency, _ in results], [status for _, status in results]
+
+    def run_asgi(self, method, path, body, headers, options):
+        application = ASGIHandler()
+        scope = {
+            'type': 'http',
+            'asgi': {'version': '3.0'},
+            'http_version': '1.1',
+            'method': method,
+            'scheme': 'http',
+            'path': path,
+            'raw_path': path.encode(),
+            'query_string': b'',
+            'root_path': '',
+            'headers': [
+                (b'host', b'testserver'),
+                (b'content-length', str(len(body)).encode()),
+                *((name.encode(), value.encode()) for name, value in headers.items()),
+            ],
+            'client': ('127.0.0.1', 0),
+            'server': ('testserver', 80),
+        }
+
+        async def request(limit):
+            async with limit:
+                started = time.perf_counter()
+                sent = asyncio.Event()
+                result = {}
+
+                async def receive():
+                    if not sent.is_set():
+                        sent.set()
+                        return {'type': 'http.request', 'body': body, 'more_body': False}
+                    await asyncio.Future()  # The client never disconnects
+
+                async def send(message):
+                    if message['type'] == 'http.response.start':
+                        result['status'] = message['status']
+
+                await application(dict(scope), receive, send)
+                return time.perf_counter() - started, result['status']
+
+        async def main():
+            limit = asyncio.Semaphore(options['concurrency'])
+            return await asyncio.gather(*(request(limit) for _ in range(options['requests'])))
+
+        results = asyncio.run(main())
+        return [latency for latency, _ in results], [status for _, status in results]
+
+    def report(self, name, elapsed, latencies, statuses):
+        latencies = sorted(latencies)
+        failed = sum(status >= 400 for status in statuses)
+        self.stdout.write(
+            f'{name:>13}: {len(latencies) / elapsed:8.1f} req/s  '
+            f'p50 {statistics.median(latencies) * 1000:7.1f} ms  '
+            f'p95 {latencies[int(len(latencies) * 0.95) - 1] * 1000:7.1f} ms  '
+            f'{failed} failed'
+        )
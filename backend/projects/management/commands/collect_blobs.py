@@ -0,0 +1,46 @@
+"""
+Management command to garbage-collect unreferenced dataset media blobs.
+"""
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count
+
+from projects.models import MediaBlob
+from projects.storage import collect_blobs
+
+
+class Command(BaseCommand):
+    help = 'Recount blob references from datasets and delete unreferenced blobs.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=1000,
+            help='Number of blobs to recount per transaction (default: 1000).',
+        )
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        fixed = 0
+        last_pk = 0
+        while True:
+            blobs = list(
+                MediaBlob.objects.filter(pk__gt=last_pk)
+                .order_by('pk')
+                .annotate(actual=Count('datasets'))[:chunk_size]
+            )
+            if not blobs:
+                break
+            drifted = [blob for blob in blobs if blob.ref_count != blob.actual]
+            for blob in drifted:
+                blob.ref_count = blob.actual
+            with transaction.atomic():
+                MediaBlob.objects.bulk_update(drifted, ['ref_count'])
+            fixed += len(drifted)
+            last_pk = blobs[-1].pk
+
+        removed = collect_blobs()
+        self.stdout.write(self.style.SUCCESS(
+            f'Fixed {fixed} blob reference count(s) and removed {removed} unreferenced blob(s).'
+        ))
@@ -0,0 +1,53 @@
+"""
+Management command to fold pending project statistics deltas into the rollup.
+"""
+import time
+
+from django.core.management.base import BaseCommand
+
+from projects.models import Project
+from projects.stats import compact_project, pending_projects, rebuild_project
+
+
+class Command(BaseCommand):
+    help = 'Compact the annotation statistics delta log into one row per project, annotator and type.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--project',
+            type=int,
+            action='append',
+            dest='projects',
+            help='Only compact the given project id (may be repeated).',
+        )
+        parser.add_argument(
+            '--rebuild',
+            action='store_true',
+            help='Recompute the statistics from the annotations instead (repairs drift).',
+        )
+        parser.add_argument(
+            '--watch',
+            type=float,
+            default=0,
+            metavar='SECONDS',
+            help='Keep running, compacting every SECONDS.',
+        )
+
+    def handle(self, *args, **options):
+        if options['rebuild']:
+            projects = options['projects'] or list(Project.objects.values_list('pk', flat=True))
+            for project_id in projects:
+                rebuild_project(project_id)
+            self.stdout.write(self.style.SUCCESS(f'Rebuilt the statistics of {len(projects)} project(s).'))
+            return
+
+        while True:
+            projects = options['projects'] or list(pending_projects())
+            folded = sum(compact_project(project_id) for project_id in projects)
+            if folded or not options['watch']:
+                self.stdout.write(self.style.SUCCESS(
+                    f'Folded {folded} delta(s) into the statistics of {len(projects)} project(s).'
+                ))
+            if not options['watch'] or options['projects']:
+                return
+            time.sleep(options['watch'])
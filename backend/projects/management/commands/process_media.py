@@ -0,0 +1,56 @@
+"""
+Management command to generate media derivatives for uploaded datasets.
+"""
+import time
+
+from django.core.management.base import BaseCommand
+
+from projects.models import Dataset
+from projects.processing import pending_datasets, process_datasets
+
+
+class Command(BaseCommand):
+    help = 'Generate thumbnails, waveforms and keyframe sprites for datasets waiting to be processed.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=None,
+            help='Worker processes (default: MEDIA_PROCESSING_WORKERS).',
+        )
+        parser.add_argument(
+            '--dataset',
+            type=int,
+            action='append',
+            help='Only process this dataset (repeatable), whatever its status.',
+        )
+        parser.add_argument(
+            '--retry-failed',
+            action='store_true',
+            help='Also retry datasets whose processing failed.',
+        )
+        parser.add_argument(
+            '--watch',
+            type=float,
+            default=0,
+            metavar='SECONDS',
+            help='Keep running, polling for new datasets every SECONDS.',
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            if options['dataset']:
+                queryset = Dataset.objects.filter(pk__in=options['dataset'])
+            else:
+                queryset = pending_datasets(retry_failed=options['retry_failed'])
+
+            processed = failed = 0
+            if queryset.exists():  # Avoid starting a pool for nothing while watching
+                processed, failed = process_datasets(queryset, workers=options['workers'])
+            if processed or failed or not options['watch']:
+                style = self.style.SUCCESS if not failed else self.style.WARNING
+                self.stdout.write(style(f'Processed {processed} dataset(s), {failed} failed.'))
+            if not options['watch'] or options['dataset']:
+                return
+            time.sleep(options['watch'])
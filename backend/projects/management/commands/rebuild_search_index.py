@@ -0,0 +1,45 @@
+"""
+Management command to rebuild the annotation full-text search index.
+"""
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from projects.models import Annotation
+from projects.search import clear_index, get_backend, index_queryset
+
+
+class Command(BaseCommand):
+    help = 'Re-extract and index the text and labels of annotations, dropping stale index entries.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--project',
+            type=int,
+            action='append',
+            dest='projects',
+            help='Only rebuild the given project id (may be repeated).',
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=1000,
+            help='Annotations indexed per query (default: 1000).',
+        )
+
+    def handle(self, *args, **options):
+        if get_backend() is None:
+            self.stderr.write(self.style.ERROR('No search backend for this database; set SEARCH_BACKEND.'))
+            return
+
+        projects = options['projects'] or [None]
+        indexed = 0
+        for project_id in projects:
+            # One transaction per project, so searches never see it half indexed.
+            with transaction.atomic():
+                clear_index(project_id)
+                annotations = Annotation.objects.all()
+                if project_id is not None:
+                    annotations = annotations.filter(dataset__project_id=project_id)
+                indexed += index_queryset(annotations, chunk_size=options['chunk_size'])
+
+        self.stdout.write(self.style.SUCCESS(f'Indexed {indexed} annotation(s).'))
@@ -0,0 +1,22 @@
+"""
+Management command to free task slots held by expired leases.
+"""
+from django.core.management.base import BaseCommand
+
+from projects.assignment import reclaim_expired_leases
+
+
+class Command(BaseCommand):
+    help = 'Reclaim expired annotation task leases so their tasks can be handed out again.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=None,
+            help='Leases reclaimed per transaction (default: TASK_RECLAIM_BATCH_SIZE).',
+        )
+
+    def handle(self, *args, **options):
+        reclaimed = reclaim_expired_leases(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Reclaimed {reclaimed} expired lease(s).'))
@@ -0,0 +1,116 @@
+"""
+Management command to repair drift in the denormalized project/dataset counters.
+"""
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, Sum
+
+from projects.models import Annotation, Dataset, DatasetItem, Project
+
+
+class Command(BaseCommand):
+    help = 'Recompute Project and Dataset annotation/dataset/item counters in chunks.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=1000,
+            help='Number of rows to reconcile per transaction (default: 1000).',
+        )
+        parser.add_argument(
+            '--project',
+            type=int,
+            action='append',
+            dest='projects',
+            help='Only reconcile the given project id (may be repeated).',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Report drift without writing any changes.',
+        )
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        dry_run = options['dry_run']
+
+        datasets = Dataset.objects.all()
+        projects = Project.objects.all()
+        if options['projects']:
+            datasets = datasets.filter(project_id__in=options['projects'])
+            projects = projects.filter(pk__in=options['projects'])
+
+        fixed_datasets = self._reconcile(
+            datasets, chunk_size, dry_run, self._dataset_chunk
+        )
+        fixed_projects = self._reconcile(
+            projects, chunk_size, dry_run, self._project_chunk
+        )
+
+        verb = 'Found' if dry_run else 'Fixed'
+        self.stdout.write(self.style.SUCCESS(
+            f'{verb} {fixed_datasets} dataset(s) and {fixed_projects} project(s) with drifted counters.'
+        ))
+
+    def _reconcile(self, queryset, chunk_size, dry_run, reconcile_chunk):
+        """Walk ``queryset`` in primary key order, one chunk per transaction."""
+        fixed = 0
+        last_pk = 0
+        while True:
+            pks = list(
+                queryset.filter(pk__gt=last_pk)
+                .order_by('pk')
+                .values_list('pk', flat=True)[:chunk_size]
+            )
+            if not pks:
+                break
+            with transaction.atomic():
+                fixed += reconcile_chunk(pks, dry_run)
+            last_pk = pks[-1]
+        return fixed
+
+    def _dataset_chunk(self, pks, dry_run):
+        def totals(model):
+            return dict(
+                model.objects.filter(dataset_id__in=pks)
+                .order_by()
+                .values('dataset_id')
+                .annotate(total=Count('id'))
+                .values_list('dataset_id', 'total')
+            )
+
+        annotations = totals(Annotation)
+        items = totals(DatasetItem)
+        drifted = []
+        for dataset in Dataset.objects.filter(pk__in=pks).only('pk', 'annotation_count', 'item_count'):
+            expected = (annotations.get(dataset.pk, 0), items.get(dataset.pk, 0))
+            if (dataset.annotation_count, dataset.item_count) != expected:
+                dataset.annotation_count, dataset.item_count = expected
+                drifted.append(dataset)
+        if drifted and not dry_run:
+            Dataset.objects.bulk_update(drifted, ['annotation_count', 'item_count'])
+        return len(drifted)
+
+    def _project_chunk(self, pks, dry_run):
+        actual = {
+            row['project_id']: row
+            for row in Dataset.objects.filter(project_id__in=pks)
+            .order_by()
+            .values('project_id')
+            .annotate(datasets=Count('id'), annotations=Sum('annotation_count'))
+        }
+        drifted = []
+        for project in Project.objects.filter(pk__in=pks).only(
+            'pk', 'dataset_count', 'annotation_count'
+        ):
+            row = actual.get(project.pk, {})
+            datasets = row.get('datasets') or 0
+            annotations = row.get('annotations') or 0
+            if (project.dataset_count, project.annotation_count) != (datasets, annotations):
+                project.dataset_count = datasets
+                project.annotation_count = annotations
+                drifted.append(project)
+        if drifted and not dry_run:
+            Project.objects.bulk_update(drifted, ['dataset_count', 'annotation_count'])
+        return len(drifted)
@@ -0,0 +1,309 @@
+"""
+Custom querysets and managers for projects app.
+"""
+from collections import Counter
+
+from django.db import models, transaction
+from django.db.models import Count, F, Max, Sum
+from django.utils import timezone
+
+from . import feed, search, stats
+from .revisions import ACTION_CREATE, ACTION_DELETE, ACTION_UPDATE, record_revisions
+
+
+def apply_annotation_deltas(deltas):
+    """
+    Apply per-dataset annotation count deltas to the stored counters.
+
+    ``deltas`` maps dataset ids to the number of annotations added (positive)
+    or removed (negative). Each dataset and its project is updated with a
+    single ``F()`` expression so concurrent writers never lose increments.
+    """
+    from .models import Dataset, Project
+
+    deltas = {dataset_id: delta for dataset_id, delta in deltas.items() if delta}
+    if not deltas:
+        return
+
+    with transaction.atomic():
+        for dataset_id, delta in deltas.items():
+            Dataset.objects.filter(pk=dataset_id).update(
+                annotation_count=F('annotation_count') + delta
+            )
+            Project.objects.filter(datasets__pk=dataset_id).update(
+                annotation_count=F('annotation_count') + delta
+            )
+
+
+def apply_dataset_deltas(deltas):
+    """
+    Apply per-project dataset and annotation count deltas.
+
+    ``deltas`` maps project ids to ``(datasets, annotations)`` tuples.
+    """
+    from .models import Project
+
+    with transaction.atomic():
+        for project_id, (datasets, annotations) in deltas.items():
+            if not datasets and not annotations:
+                continue
+            Project.objects.filter(pk=project_id).update(
+                dataset_count=F('dataset_count') + datasets,
+                annotation_count=F('annotation_count') + annotations,
+            )
+
+
+def refresh_project_counters(project_ids):
+    """Recompute the stored counters of the given projects from their datasets."""
+    from .models import Dataset, Project
+
+    project_ids = set(project_ids)
+    if not project_ids:
+        return
+
+    totals = {
+        row['project_id']: row
+        for row in Dataset.objects.filter(project_id__in=project_ids)
+        .values('project_id')
+        .annotate(datasets=Count('id'), annotations=Sum('annotation_count'))
+    }
+    projects = list(Project.objects.filter(pk__in=project_ids).only('pk'))
+    for project in projects:
+        row = totals.get(project.pk, {})
+        project.dataset_count = row.get('datasets') or 0
+        project.annotation_count = row.get('annotations') or 0
+    Project.objects.bulk_update(projects, ['dataset_count', 'annotation_count'])
+
+
+class ProjectQuerySet(models.QuerySet):
+    """
+    QuerySet for projects.
+    """
+
+    def for_user(self, user):
+        """Projects the user owns or collaborates on."""
+        if not user.is_authenticated:
+            return self.none()
+        member_of = self.model.collaborators.through.objects.filter(
+            user_id=user.pk
+        ).values('project_id')
+        return self.filter(models.Q(owner_id=user.pk) | models.Q(pk__in=member_of))
+
+
+class DatasetQuerySet(models.QuerySet):
+    """
+    QuerySet for datasets that keeps project counters in sync on bulk writes.
+    """
+
+    def bulk_create(self, objs, *args, **kwargs):
+        """Create datasets in bulk and bump the owning projects' counters."""
+        with transaction.atomic():
+            objs = super().bulk_create(objs, *args, **kwargs)
+            if kwargs.get('ignore_conflicts') or kwargs.get('update_conflicts'):
+                refresh_project_counters({obj.project_id for obj in objs})
+            else:
+                deltas = Counter(obj.project_id for obj in objs)
+                apply_dataset_deltas({
+                    project_id: (count, 0) for project_id, count in deltas.items()
+                })
+        return objs
+
+    def delete(self):
+        """Delete datasets and subtract them (and their annotations) from projects."""
+        from .models import Annotation
+
+        with transaction.atomic():
+            stats.record_deltas(stats.grouped(Annotation.objects.filter(dataset__in=self.values('pk')), sign=-1))
+            search.remove_annotations(
+                Annotation.objects.filter(dataset__in=self.values('pk')).values_list('pk', flat=True)
+            )
+            removed = {
+                row['project_id']: (-row['datasets'], -(row['annotations'] or 0))
+                for row in self.order_by()
+                .values('project_id')
+                .annotate(datasets=Count('id'), annotations=Sum('annotation_count'))
+            }
+            result = super().delete()
+            apply_dataset_deltas(removed)
+        return result
+
+    delete.alters_data = True
+    delete.queryset_only = True
+
+
+class DatasetItemQuerySet(models.QuerySet):
+    """
+    QuerySet for dataset items.
+    """
+
+    def append(self, dataset, items, batch_size=1000):
+        """
+        Append items to a dataset, numbering them after the current last ordinal.
+
+        ``items`` is an iterable of unsaved ``DatasetItem`` instances (their
+        ``dataset`` and ``ordinal`` are filled in). The dataset row is locked
+        while ordinals are allocated so concurrent appends never collide.
+        """
+        from .models import Dataset
+
+        created = 0
+        with transaction.atomic():
+            Dataset.objects.select_for_update().filter(pk=dataset.pk).values_list('pk').get()
+            last = self.model.objects.filter(dataset=dataset).aggregate(last=Max('ordinal'))['last']
+            next_ordinal = 0 if last is None else last + 1
+
+            batch = []
+            for item in items:
+                item.dataset_id = dataset.pk
+                item.ordinal = next_ordinal
+                next_ordinal += 1
+                batch.append(item)
+                if len(batch) >= batch_size:
+                    created += len(super().bulk_create(batch))
+                    batch = []
+            if batch:
+                created += len(super().bulk_create(batch))
+
+            Dataset.objects.filter(pk=dataset.pk).update(item_count=F('item_count') + created)
+        return created
+
+    def status_counts(self, dataset):
+        """Map each status to its item count (index-only on ``(dataset, status)``)."""
+        counts = dict.fromkeys((value for value, _ in self.model.STATUS_CHOICES), 0)
+        rows = (
+            self.model.objects.filter(dataset=dataset)
+            .order_by()
+            .values('status')
+            .annotate(total=Count('pk'))
+            .values_list('status', 'total')
+        )
+        counts.update(rows)
+        return counts
+
+    def delete(self):
+        """Delete items and their annotations, decrementing each dataset's item and annotation counters."""
+        from .models import Annotation, Dataset
+
+        with transaction.atomic():
+            Annotation.objects.filter(item__in=self.values('pk')).delete()
+            removed = dict(
+                self.order_by().values('dataset_id').annotate(total=Count('id')).values_list('dataset_id', 'total')
+            )
+            result = super().delete()
+            for dataset_id, total in removed.items():
+                Dataset.objects.filter(pk=dataset_id).update(item_count=F('item_count') - total)
+        return result
+
+    delete.alters_data = True
+    delete.queryset_only = True
+
+
+class AnnotationQuerySet(models.QuerySet):
+    """
+    QuerySet for annotations that keeps dataset/project counters in sync.
+    """
+
+    def bulk_create(self, objs, *args, **kwargs):
+        """
+        Create annotations in bulk, bump the counters once per dataset and record revisions.
+
+        Conflict handling is not supported: which rows were written would be
+        unknown. Upserts go through ``annotations.ingest``.
+        """
+        if kwargs.get('ignore_conflicts') or kwargs.get('update_conflicts'):
+            raise ValueError('Annotation bulk_create() does not support ignore_conflicts or update_conflicts.')
+        with transaction.atomic():
+            objs = super().bulk_create(objs, *args, **kwargs)
+            apply_annotation_deltas(Counter(obj.dataset_id for obj in objs))
+            stats.record_deltas(stats.state_deltas(stats.state(obj) for obj in objs))
+            search.index_annotations(objs)
+            record_revisions(
+                (obj.pk, obj.dataset_id, obj.annotator_id, ACTION_CREATE, None, obj.content)
+                for obj in objs
+            )
+            feed.publish_annotations(feed.CREATED, feed.annotation_rows(objs))
+        return objs
+
+    def bulk_update(self, objs, fields, *args, **kwargs):
+        """Update annotations in bulk, keeping revisions, statistics and the search index in step."""
+        tracked = 'content' in fields
+        counted = stats.writes_state(fields)
+        indexed = search.writes_document(fields)
+        if not tracked and not counted and not indexed:
+            return super().bulk_update(objs, fields, *args, **kwargs)
+        objs = list(objs)
+        with transaction.atomic():
+            previous = {
+                row[0]: row[1:]
+                for row in self.model.objects.select_for_update().filter(pk__in=[obj.pk for obj in objs])
+                .order_by('pk').values_list('pk', 'content', *stats.STATE_FIELDS)
+            }
+            result = super().bulk_update(objs, fields, *args, **kwargs)
+            if counted:
+                stats.record_deltas(stats.change_deltas(
+                    (previous[obj.pk][1:], stats.state(obj, fields, previous[obj.pk][1:]))
+                    for obj in objs if obj.pk in previous
+                ))
+            if indexed:
+                search.index_queryset(self.model.objects.filter(pk__in=[obj.pk for obj in objs]))
+            if tracked:
+                record_revisions(
+                    (obj.pk, obj.dataset_id, obj.annotator_id, ACTION_UPDATE, previous.get(obj.pk, (None,))[0], obj.content)
+                    for obj in objs
+                )
+                feed.publish_annotations(feed.UPDATED, feed.annotation_rows(objs))
+        return result
+
+    def delete(self):
+        """Delete annotations, decrement the counters once per dataset and record the deletions."""
+        with transaction.atomic():
+            removed = {
+                row['dataset_id']: -row['total']
+                for row in self.order_by().values('dataset_id').annotate(total=Count('id'))
+            }
+            rows = list(
+                self.select_for_update().order_by('pk')
+                .values_list('pk', 'dataset_id', 'item_id', 'annotator_id', 'annotation_type')
+            )
+            record_revisions((pk, dataset_id, annotator_id, ACTION_DELETE, None, None)
+                             for pk, dataset_id, _, annotator_id, _ in rows)
+            feed.publish_annotations(feed.DELETED, rows)
+            stats.record_deltas(stats.grouped(self, sign=-1))
+            search.remove_annotations(pk for pk, *_ in rows)
+            result = super().delete()
+            apply_annotation_deltas(removed)
+        return result
+
+    delete.alters_data = True
+    delete.queryset_only = True
+
+    def _review_counts(self):
+        return dict(self.order_by().values('dataset_id').annotate(total=Count('id')).values_list('dataset_id', 'total'))
+
+    def verify(self, user):
+        """Mark every annotation in the queryset verified by ``user`` in one UPDATE."""
+        with transaction.atomic():
+            counts = self._review_counts()
+            stats.record_deltas(stats.review_deltas(self, True))
+            updated = self.update(is_verified=True, verified_by=user, verified_at=timezone.now())
+            feed.publish_review(feed.VERIFIED, counts, user.pk)
+        return updated
+
+    verify.alters_data = True
+
+    def reject(self, user):
+        """
+        Mark every annotation in the queryset rejected by ``user`` in one UPDATE.
+
+        A rejected annotation is a reviewed one that is not verified:
+        ``is_verified`` is false and ``verified_by``/``verified_at`` record
+        the review.
+        """
+        with transaction.atomic():
+            counts = self._review_counts()
+            stats.record_deltas(stats.review_deltas(self, False))
+            updated = self.update(is_verified=False, verified_by=user, verified_at=timezone.now())
+            feed.publish_review(feed.REJECTED, counts, user.pk)
+        return updated
+
+    reject.alters_data = True
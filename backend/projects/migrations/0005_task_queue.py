@@ -0,0 +1,57 @@
+# Generated by Django 4.2.7 on 2026-10-17 02:22
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('projects', '0004_annotation_keyset_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AnnotationTask',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('required_annotations', models.PositiveSmallIntegerField(default=1)),
+                ('assigned_count', models.IntegerField(default=0)),
+                ('completed_count', models.IntegerField(default=0)),
+                ('is_open', models.BooleanField(default=True)),
+                ('priority', models.IntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('dataset', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='tasks', to='projects.dataset')),
+                ('project', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='tasks', to='projects.project')),
+            ],
+            options={
+                'db_table': 'annotation_tasks',
+                'ordering': ['-priority', 'id'],
+            },
+        ),
+        migrations.CreateModel(
+            name='TaskLease',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('active', 'Active'), ('completed', 'Completed')], default='active', max_length=20)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('expires_at', models.DateTimeField()),
+                ('completed_at', models.DateTimeField(blank=True, null=True)),
+                ('annotator', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='task_leases', to=settings.AUTH_USER_MODEL)),
+                ('task', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='leases', to='projects.annotationtask')),
+            ],
+            options={
+                'db_table': 'task_leases',
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['status', 'expires_at'], name='task_leases_expiry'), models.Index(fields=['annotator', 'status'], name='task_leases_annotator')],
+                'unique_together': {('task', 'annotator')},
+            },
+        ),
+        migrations.AddIndex(
+            model_name='annotationtask',
+            index=models.Index(fields=['project', 'is_open', '-priority', 'id'], name='tasks_next_open'),
+        ),
+    ]
@@ -0,0 +1,69 @@
+# Generated by Django 4.2.7 on 2026-10-17 02:25
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0005_task_queue'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DatasetItem',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('ordinal', models.PositiveIntegerField()),
+                ('status', models.PositiveSmallIntegerField(choices=[(0, 'Pending'), (1, 'In Progress'), (2, 'Annotated'), (3, 'Reviewed'), (4, 'Skipped')], default=0)),
+                ('key', models.CharField(max_length=500)),
+                ('size', models.BigIntegerField(default=0)),
+                ('metadata', models.JSONField(blank=True, null=True)),
+            ],
+            options={
+                'db_table': 'dataset_items',
+                'ordering': ['ordinal'],
+            },
+        ),
+        migrations.AlterUniqueTogether(
+            name='annotation',
+            unique_together=set(),
+        ),
+        migrations.AddField(
+            model_name='dataset',
+            name='item_count',
+            field=models.BigIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='datasetitem',
+            name='dataset',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='items', to='projects.dataset'),
+        ),
+        migrations.AddField(
+            model_name='annotation',
+            name='item',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='annotations', to='projects.datasetitem'),
+        ),
+        migrations.AddField(
+            model_name='annotationtask',
+            name='item',
+            field=models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='task', to='projects.datasetitem'),
+        ),
+        migrations.AddConstraint(
+            model_name='annotation',
+            constraint=models.UniqueConstraint(condition=models.Q(('item__isnull', True)), fields=('dataset', 'annotator', 'annotation_type'), name='annotations_unique_per_dataset'),
+        ),
+        migrations.AddConstraint(
+            model_name='annotation',
+            constraint=models.UniqueConstraint(condition=models.Q(('item__isnull', False)), fields=('item', 'annotator', 'annotation_type'), name='annotations_unique_per_item'),
+        ),
+        migrations.AddIndex(
+            model_name='datasetitem',
+            index=models.Index(fields=['dataset', 'status', 'ordinal'], name='dataset_items_status'),
+        ),
+        migrations.AddConstraint(
+            model_name='datasetitem',
+            constraint=models.UniqueConstraint(fields=('dataset', 'ordinal'), name='dataset_items_unique_ordinal'),
+        ),
+    ]
@@ -0,0 +1,76 @@
+# Generated by Django 4.2.7 on 2026-10-17 02:33
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0006_dataset_items'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AgreementRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('annotation_type', models.CharField(choices=[('classification', 'Classification'), ('segmentation', 'Segmentation'), ('bounding_box', 'Bounding Box'), ('keypoint', 'Keypoint'), ('transcription', 'Transcription'), ('translation', 'Translation')], max_length=20)),
+                ('incremental', models.BooleanField(default=False)),
+                ('items_computed', models.PositiveIntegerField(default=0)),
+                ('started_at', models.DateTimeField()),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'db_table': 'agreement_runs',
+                'ordering': ['-started_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='AgreementScore',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('annotation_type', models.CharField(choices=[('classification', 'Classification'), ('segmentation', 'Segmentation'), ('bounding_box', 'Bounding Box'), ('keypoint', 'Keypoint'), ('transcription', 'Transcription'), ('translation', 'Translation')], max_length=20)),
+                ('metric', models.CharField(max_length=20)),
+                ('annotation_count', models.PositiveIntegerField(default=0)),
+                ('score', models.FloatField(null=True)),
+                ('stats', models.JSONField(default=dict)),
+                ('computed_at', models.DateTimeField()),
+            ],
+            options={
+                'db_table': 'agreement_scores',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='annotation',
+            index=models.Index(fields=['annotation_type', 'updated_at'], name='annotations_type_updated'),
+        ),
+        migrations.AddField(
+            model_name='agreementscore',
+            name='dataset',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='agreement_scores', to='projects.dataset'),
+        ),
+        migrations.AddField(
+            model_name='agreementscore',
+            name='item',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='agreement_scores', to='projects.datasetitem'),
+        ),
+        migrations.AddField(
+            model_name='agreementrun',
+            name='dataset',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='agreement_runs', to='projects.dataset'),
+        ),
+        migrations.AddField(
+            model_name='agreementrun',
+            name='project',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='agreement_runs', to='projects.project'),
+        ),
+        migrations.AddConstraint(
+            model_name='agreementscore',
+            constraint=models.UniqueConstraint(condition=models.Q(('item__isnull', True)), fields=('dataset', 'annotation_type'), name='agreement_unique_per_dataset'),
+        ),
+        migrations.AddConstraint(
+            model_name='agreementscore',
+            constraint=models.UniqueConstraint(condition=models.Q(('item__isnull', False)), fields=('item', 'annotation_type'), name='agreement_unique_per_item'),
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 4.2.7 on 2026-10-17 02:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0007_agreement'),
+    ]
+
+    operations = [
+        migrations.RemoveConstraint(
+            model_name='annotation',
+            name='annotations_unique_per_dataset',
+        ),
+        migrations.RemoveConstraint(
+            model_name='annotation',
+            name='annotations_unique_per_item',
+        ),
+        migrations.AddField(
+            model_name='annotation',
+            name='is_gold',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddConstraint(
+            model_name='annotation',
+            constraint=models.UniqueConstraint(condition=models.Q(('is_gold', False), ('item__isnull', True)), fields=('dataset', 'annotator', 'annotation_type'), name='annotations_unique_per_dataset'),
+        ),
+        migrations.AddConstraint(
+            model_name='annotation',
+            constraint=models.UniqueConstraint(condition=models.Q(('is_gold', False), ('item__isnull', False)), fields=('item', 'annotator', 'annotation_type'), name='annotations_unique_per_item'),
+        ),
+        migrations.AddConstraint(
+            model_name='annotation',
+            constraint=models.UniqueConstraint(condition=models.Q(('is_gold', True), ('item__isnull', True)), fields=('dataset', 'annotation_type'), name='annotations_gold_per_dataset'),
+        ),
+        migrations.AddConstraint(
+            model_name='annotation',
+            constraint=models.UniqueConstraint(condition=models.Q(('is_gold', True), ('item__isnull', False)), fields=('item', 'annotation_type'), name='annotations_gold_per_item'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-17 02:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0008_annotation_gold'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='annotationtemplate',
+            name='annotation_type',
+            field=models.CharField(blank=True, choices=[('classification', 'Classification'), ('segmentation', 'Segmentation'), ('bounding_box', 'Bounding Box'), ('keypoint', 'Keypoint'), ('transcription', 'Transcription'), ('translation', 'Translation')], help_text='Annotation type the schema applies to; blank for every type.', max_length=20),
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 4.2.7 on 2026-10-17 02:44
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('projects', '0009_template_annotation_type'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AnnotationRevision',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('number', models.PositiveIntegerField()),
+                ('action', models.CharField(choices=[('create', 'Created'), ('update', 'Updated'), ('delete', 'Deleted')], max_length=10)),
+                ('is_checkpoint', models.BooleanField(default=False)),
+                ('data', models.JSONField(null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('annotation', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='revisions', to='projects.annotation')),
+                ('author', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='annotation_revisions', to=settings.AUTH_USER_MODEL)),
+                ('dataset', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='annotation_revisions', to='projects.dataset')),
+            ],
+            options={
+                'db_table': 'annotation_revisions',
+                'ordering': ['annotation', 'number'],
+                'indexes': [models.Index(fields=['dataset', 'created_at'], name='annotation_revisions_dataset')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='annotationrevision',
+            constraint=models.UniqueConstraint(fields=('annotation', 'number'), name='annotation_revisions_unique_number'),
+        ),
+    ]
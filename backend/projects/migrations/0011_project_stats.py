@@ -0,0 +1,78 @@
+# Generated by Django 4.2.7 on 2026-10-17 03:03
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Q
+import django.db.models.deletion
+
+
+def backfill_stats(apps, schema_editor):
+    Annotation = apps.get_model('projects', 'Annotation')
+    ProjectStat = apps.get_model('projects', 'ProjectStat')
+    rows = (
+        Annotation.objects.order_by()
+        .values('dataset__project_id', 'annotator_id', 'annotation_type', 'is_gold')
+        .annotate(total=Count('id'), verified=Count('id', filter=Q(is_verified=True)))
+    )
+    ProjectStat.objects.bulk_create(
+        (
+            ProjectStat(
+                project_id=row['dataset__project_id'],
+                annotator_id=row['annotator_id'],
+                annotation_type=row['annotation_type'],
+                is_gold=row['is_gold'],
+                annotations=row['total'],
+                verified=row['verified'],
+            )
+            for row in rows.iterator()
+        ),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('projects', '0010_annotation_revisions'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProjectStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('annotation_type', models.CharField(choices=[('classification', 'Classification'), ('segmentation', 'Segmentation'), ('bounding_box', 'Bounding Box'), ('keypoint', 'Keypoint'), ('transcription', 'Transcription'), ('translation', 'Translation')], max_length=20)),
+                ('is_gold', models.BooleanField(default=False)),
+                ('annotations', models.IntegerField(default=0)),
+                ('verified', models.IntegerField(default=0)),
+                ('annotator', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='project_stats', to=settings.AUTH_USER_MODEL)),
+                ('project', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stats', to='projects.project')),
+            ],
+            options={
+                'db_table': 'project_stats',
+            },
+        ),
+        migrations.CreateModel(
+            name='ProjectStatDelta',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('annotation_type', models.CharField(choices=[('classification', 'Classification'), ('segmentation', 'Segmentation'), ('bounding_box', 'Bounding Box'), ('keypoint', 'Keypoint'), ('transcription', 'Transcription'), ('translation', 'Translation')], max_length=20)),
+                ('is_gold', models.BooleanField(default=False)),
+                ('annotations', models.IntegerField(default=0)),
+                ('verified', models.IntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('annotator', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='project_stat_deltas', to=settings.AUTH_USER_MODEL)),
+                ('project', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stat_deltas', to='projects.project')),
+            ],
+            options={
+                'db_table': 'project_stat_deltas',
+                'indexes': [models.Index(fields=['project', 'id'], name='project_stat_deltas_project')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='projectstat',
+            constraint=models.UniqueConstraint(fields=('project', 'annotator', 'annotation_type', 'is_gold'), name='project_stats_unique_key'),
+        ),
+        migrations.RunPython(backfill_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,35 @@
+from django.db import migrations
+
+
+def create_index(apps, schema_editor):
+    from projects.search import get_backend
+
+    backend = get_backend()
+    if backend is not None:
+        backend.create(schema_editor)
+
+
+def drop_index(apps, schema_editor):
+    from projects.search import get_backend
+
+    backend = get_backend()
+    if backend is not None:
+        backend.drop(schema_editor)
+
+
+def index_annotations(apps, schema_editor):
+    from projects.search import index_queryset
+
+    index_queryset(apps.get_model('projects', 'Annotation').objects.all())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0011_project_stats'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_index, drop_index),
+        migrations.RunPython(index_annotations, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-17 03:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0012_annotation_search'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='tasklease',
+            name='status',
+            field=models.CharField(choices=[('active', 'Active'), ('completed', 'Completed'), ('released', 'Released'), ('expired', 'Expired')], default='active', max_length=20),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 4.2.7 on 2026-10-17 03:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0013_task_lease_statuses'),
+    ]
+
+    operations = [
+        migrations.RemoveConstraint(
+            model_name='agreementscore',
+            name='agreement_unique_per_dataset',
+        ),
+        migrations.RemoveConstraint(
+            model_name='agreementscore',
+            name='agreement_unique_per_item',
+        ),
+        migrations.AddField(
+            model_name='agreementrun',
+            name='metric',
+            field=models.CharField(blank=True, max_length=20),
+        ),
+        migrations.AddConstraint(
+            model_name='agreementscore',
+            constraint=models.UniqueConstraint(condition=models.Q(('item__isnull', True)), fields=('dataset', 'annotation_type', 'metric'), name='agreement_unique_per_dataset'),
+        ),
+        migrations.AddConstraint(
+            model_name='agreementscore',
+            constraint=models.UniqueConstraint(condition=models.Q(('item__isnull', False)), fields=('item', 'annotation_type', 'metric'), name='agreement_unique_per_item'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.7 on 2026-10-17 03:43
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0014_agreement_metric'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='annotationrevision',
+            options={'ordering': ['annotation_id', 'number']},
+        ),
+    ]
@@ -1,10 +1,19 @@
 """
 Models for projects app.
 """
-from django.db import models
+import uuid
+
+from django.db import models, transaction
+from django.db.models import F
 from django.conf import settings
 from django.utils import timezone
 
+from .managers import (AnnotationQuerySet, DatasetItemQuerySet,
+                       DatasetQuerySet, ProjectQuerySet,
+                       apply_annotation_deltas, apply_dataset_deltas)
+from . import feed, search, stats
+from .revisions import ACTION_CREATE, ACTION_DELETE, ACTION_UPDATE, record_revisions
+
 
 class Project(models.Model):
     """
@@ -39,10 +48,16 @@ class Project(models.Model):
     is_public = models.BooleanField(default=False)
     allow_anonymous_annotations = models.BooleanField(default=False)
     
+    # Denormalized counters (maintained incrementally, see projects.managers)
+    dataset_count = models.IntegerField(default=0, editable=False)
+    annotation_count = models.BigIntegerField(default=0, editable=False)
+    
     # Timestamps
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    objects = ProjectQuerySet.as_manager()
+    
     class Meta:
         db_table = 'projects'
         ordering = ['-updated_at']
@@ -53,12 +68,31 @@ class Project(models.Model):
     @property
     def total_datasets(self):
         """Get total number of datasets in this project."""
-        return self.datasets.count()
+        return self.dataset_count
     
     @property
     def total_annotations(self):
         """Get total number of annotations in this project."""
-        return sum(dataset.total_annotations for dataset in self.datasets.all())
+        return self.annotation_count
+
+
+class MediaBlob(models.Model):
+    """
+    Model for content-addressed media files shared between datasets.
+    """
+    sha256 = models.CharField(max_length=64, unique=True)
+    size = models.BigIntegerField()  # Size in bytes
+    path = models.CharField(max_length=500)  # Path relative to MEDIA_ROOT
+    ref_count = models.IntegerField(default=0)  # Number of datasets linking here
+    
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        db_table = 'media_blobs'
+        ordering = ['-created_at']
+    
+    def __str__(self):
+        return f"{self.sha256} ({self.ref_count} refs)"
 
 
 class Dataset(models.Model):
@@ -73,6 +107,13 @@ class Dataset(models.Model):
     file_path = models.CharField(max_length=500)  # Path to the dataset file
     file_size = models.BigIntegerField(default=0)  # Size in bytes
     file_type = models.CharField(max_length=50)  # Type of file (mp3, mp4, jpg, etc.)
+    blob = models.ForeignKey(
+        MediaBlob,
+        on_delete=models.PROTECT,
+        null=True,
+        blank=True,
+        related_name='datasets'
+    )  # Deduplicated content, see projects.storage
     
     # Metadata
     metadata = models.JSONField(default=dict, blank=True)  # Additional metadata
@@ -81,10 +122,16 @@ class Dataset(models.Model):
     is_processed = models.BooleanField(default=False)
     processing_status = models.CharField(max_length=50, default='pending')
     
+    # Denormalized counters (maintained incrementally, see projects.managers)
+    annotation_count = models.BigIntegerField(default=0, editable=False)
+    item_count = models.BigIntegerField(default=0, editable=False)
+    
     # Timestamps
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    objects = DatasetQuerySet.as_manager()
+    
     class Meta:
         db_table = 'datasets'
         ordering = ['-created_at']
@@ -92,15 +139,95 @@ class Dataset(models.Model):
     def __str__(self):
         return f"{self.name} - {self.project.name}"
     
+    def save(self, *args, **kwargs):
+        """Save dataset and bump the project's dataset counter on creation."""
+        adding = self._state.adding
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            if adding:
+                apply_dataset_deltas({self.project_id: (1, 0)})
+    
+    def delete(self, *args, **kwargs):
+        """Delete dataset and subtract it and its annotations from the project."""
+        with transaction.atomic():
+            # The in-memory counter may be stale; use the stored value.
+            self.refresh_from_db(fields=['annotation_count'])
+            stats.record_deltas(stats.grouped(Annotation.objects.filter(dataset=self), sign=-1))
+            search.remove_annotations(Annotation.objects.filter(dataset=self).values_list('pk', flat=True))
+            result = super().delete(*args, **kwargs)
+            apply_dataset_deltas({self.project_id: (-1, -self.annotation_count)})
+        return result
+    
     @property
     def total_annotations(self):
         """Get total number of annotations for this dataset."""
-        return self.annotations.count()
+        return self.annotation_count
+
+
+class DatasetItem(models.Model):
+    """
+    Model for a single item (image, clip, document, ...) inside a dataset.
+    
+    Rows are kept deliberately narrow (no timestamps, small-int status,
+    nullable metadata) because datasets can hold tens of millions of items.
+    """
+    STATUS_PENDING = 0
+    STATUS_IN_PROGRESS = 1
+    STATUS_ANNOTATED = 2
+    STATUS_REVIEWED = 3
+    STATUS_SKIPPED = 4
+    
+    STATUS_CHOICES = [
+        (STATUS_PENDING, 'Pending'),
+        (STATUS_IN_PROGRESS, 'In Progress'),
+        (STATUS_ANNOTATED, 'Annotated'),
+        (STATUS_REVIEWED, 'Reviewed'),
+        (STATUS_SKIPPED, 'Skipped'),
+    ]
+    
+    dataset = models.ForeignKey(Dataset, on_delete=models.CASCADE, related_name='items')
+    ordinal = models.PositiveIntegerField()  # Position within the dataset, 0-based
+    status = models.PositiveSmallIntegerField(choices=STATUS_CHOICES, default=STATUS_PENDING)
+    
+    # Item location and size
+    key = models.CharField(max_length=500)  # Path inside the dataset, URL or external id
+    size = models.BigIntegerField(default=0)  # Size in bytes
+    
+    # Metadata
+    metadata = models.JSONField(null=True, blank=True)  # NULL instead of {} keeps rows small
+    
+    objects = DatasetItemQuerySet.as_manager()
+    
+    class Meta:
+        db_table = 'dataset_items'
+        ordering = ['ordinal']
+        constraints = [
+            models.UniqueConstraint(fields=['dataset', 'ordinal'], name='dataset_items_unique_ordinal'),
+        ]
+        indexes = [
+            models.Index(fields=['dataset', 'status', 'ordinal'], name='dataset_items_status'),
+        ]
+    
+    def __str__(self):
+        return f"{self.key} (#{self.ordinal} of {self.dataset_id})"
+    
+    def delete(self, *args, **kwargs):
+        """Delete item and its annotations, decrementing the dataset's counters."""
+        with transaction.atomic():
+            Annotation.objects.filter(item=self).delete()
+            result = super().delete(*args, **kwargs)
+            Dataset.objects.filter(pk=self.dataset_id).update(item_count=F('item_count') - 1)
+        return result
 
 
 class Annotation(models.Model):
     """
     Model for annotations.
+    
+    An annotation targets a whole dataset, or one of its items when ``item``
+    is set. Gold annotations (``is_gold``) are the verified consensus of the
+    other annotations of the same item and type (see
+    ``annotations.consensus``); there is at most one per item and type.
     """
     ANNOTATION_TYPES = [
         ('classification', 'Classification'),
@@ -113,6 +240,13 @@ class Annotation(models.Model):
     
     # Basic information
     dataset = models.ForeignKey(Dataset, on_delete=models.CASCADE, related_name='annotations')
+    item = models.ForeignKey(
+        DatasetItem,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='annotations'
+    )
     annotator = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='annotations')
     annotation_type = models.CharField(max_length=20, choices=ANNOTATION_TYPES)
     
@@ -130,34 +264,177 @@ class Annotation(models.Model):
         related_name='verified_annotations'
     )
     verified_at = models.DateTimeField(null=True, blank=True)
+    is_gold = models.BooleanField(default=False)
     
     # Timestamps
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    objects = AnnotationQuerySet.as_manager()
+    
     class Meta:
         db_table = 'annotations'
         ordering = ['-created_at']
-        unique_together = ['dataset', 'annotator', 'annotation_type']
+        constraints = [
+            # One annotation of each type per annotator, per dataset or per item
+            models.UniqueConstraint(
+                fields=['dataset', 'annotator', 'annotation_type'],
+                condition=models.Q(item__isnull=True, is_gold=False),
+                name='annotations_unique_per_dataset',
+            ),
+            models.UniqueConstraint(
+                fields=['item', 'annotator', 'annotation_type'],
+                condition=models.Q(item__isnull=False, is_gold=False),
+                name='annotations_unique_per_item',
+            ),
+            # One gold annotation of each type per dataset or per item
+            models.UniqueConstraint(
+                fields=['dataset', 'annotation_type'],
+                condition=models.Q(item__isnull=True, is_gold=True),
+                name='annotations_gold_per_dataset',
+            ),
+            models.UniqueConstraint(
+                fields=['item', 'annotation_type'],
+                condition=models.Q(item__isnull=False, is_gold=True),
+                name='annotations_gold_per_item',
+            ),
+        ]
+        indexes = [
+            # Keyset pagination of a dataset's annotations, newest first
+            models.Index(fields=['dataset', '-created_at', '-id'], name='annotations_dataset_recent'),
+            models.Index(fields=['annotation_type', 'updated_at'], name='annotations_type_updated'),
+        ]
     
     def __str__(self):
         return f"{self.annotation_type} by {self.annotator.username} on {self.dataset.name}"
     
+    def save(self, *args, **kwargs):
+        """
+        Save annotation, bump the counters on creation, record the revision, index it and notify the feed.
+        
+        The revision's author is the annotator, or ``revision_author_id``
+        when set (e.g. the user restoring an earlier revision).
+        """
+        adding = self._state.adding
+        update_fields = kwargs.get('update_fields')
+        tracked = update_fields is None or 'content' in update_fields
+        counted = stats.writes_state(update_fields)
+        with transaction.atomic():
+            previous = before = None
+            if (tracked or counted) and not adding:
+                # Locked, so concurrent saves number their revisions one after the other
+                row = (
+                    Annotation.objects.select_for_update().filter(pk=self.pk)
+                    .values_list('content', *stats.STATE_FIELDS).first()
+                )
+                if row is not None:
+                    previous, before = row[0], row[1:]
+            super().save(*args, **kwargs)
+            if adding:
+                apply_annotation_deltas({self.dataset_id: 1})
+                stats.record_deltas(stats.state_deltas([stats.state(self)]))
+            elif counted and before is not None:
+                stats.record_deltas(stats.change_deltas([(before, stats.state(self, update_fields, before))]))
+            if update_fields is None:
+                search.index_annotations([self])
+            elif search.writes_document(update_fields):
+                # Fields not saved may be stale in memory; index what was stored.
+                search.index_queryset(Annotation.objects.filter(pk=self.pk))
+            if tracked:
+                record_revisions([(
+                    self.pk, self.dataset_id, getattr(self, 'revision_author_id', self.annotator_id),
+                    ACTION_CREATE if adding else ACTION_UPDATE, previous, self.content,
+                )])
+                feed.publish_annotations(feed.CREATED if adding else feed.UPDATED, feed.annotation_rows([self]))
+    
+    def delete(self, *args, **kwargs):
+        """Delete annotation, decrement the counters and record the deletion."""
+        with transaction.atomic():
+            Annotation.objects.select_for_update().filter(pk=self.pk).values_list('pk').first()
+            record_revisions([(self.pk, self.dataset_id, self.annotator_id, ACTION_DELETE, None, None)])
+            feed.publish_annotations(feed.DELETED, feed.annotation_rows([self]))
+            stats.record_deltas(stats.grouped(Annotation.objects.filter(pk=self.pk), sign=-1))
+            search.remove_annotations([self.pk])
+            result = super().delete(*args, **kwargs)
+            apply_annotation_deltas({self.dataset_id: -1})
+        return result
+    
     def verify(self, verified_by_user):
-        """Mark annotation as verified."""
+        """Mark annotation as verified (see ``AnnotationQuerySet.verify`` for many)."""
         self.is_verified = True
         self.verified_by = verified_by_user
         self.verified_at = timezone.now()
-        self.save()
+        with transaction.atomic():
+            self.save(update_fields=['is_verified', 'verified_by', 'verified_at'])
+            feed.publish_annotations(feed.VERIFIED, feed.annotation_rows([self]))
+
+
+class AnnotationRevision(models.Model):
+    """
+    One entry of an annotation's append-only edit history.
+    
+    ``data`` holds the full content on checkpoints and a JSON patch against
+    the previous revision otherwise (see ``projects.revisions``). Rows
+    outlive the annotation, so deleted annotations keep their history.
+    """
+    ACTION_CHOICES = [
+        (ACTION_CREATE, 'Created'),
+        (ACTION_UPDATE, 'Updated'),
+        (ACTION_DELETE, 'Deleted'),
+    ]
+    
+    annotation = models.ForeignKey(
+        Annotation,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        related_name='revisions'
+    )
+    dataset = models.ForeignKey(Dataset, on_delete=models.CASCADE, related_name='annotation_revisions')
+    number = models.PositiveIntegerField()  # 1, 2, ... per annotation
+    action = models.CharField(max_length=10, choices=ACTION_CHOICES)
+    is_checkpoint = models.BooleanField(default=False)
+    data = models.JSONField(null=True)
+    author = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='annotation_revisions'
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        db_table = 'annotation_revisions'
+        ordering = ['annotation_id', 'number']  # The column, not a join that would drop deleted annotations
+        constraints = [
+            models.UniqueConstraint(fields=['annotation', 'number'], name='annotation_revisions_unique_number'),
+        ]
+        indexes = [
+            # Time travel over a dataset
+            models.Index(fields=['dataset', 'created_at'], name='annotation_revisions_dataset'),
+        ]
+    
+    def __str__(self):
+        return f"Revision {self.number} of annotation {self.annotation_id}"
 
 
 class AnnotationTemplate(models.Model):
     """
     Model for annotation templates/schemas.
+    
+    Required templates are enforced on ingest: annotation content must
+    validate against the schema of the project's template for its type
+    (see ``annotations.validation``).
     """
     name = models.CharField(max_length=200)
     description = models.TextField(blank=True)
     project = models.ForeignKey(Project, on_delete=models.CASCADE, related_name='annotation_templates')
+    annotation_type = models.CharField(
+        max_length=20,
+        choices=Annotation.ANNOTATION_TYPES,
+        blank=True,
+        help_text='Annotation type the schema applies to; blank for every type.'
+    )
     
     # Schema definition
     schema = models.JSONField()  # JSON schema for the annotation structure
@@ -224,3 +501,294 @@ class ProjectInvitation(models.Model):
     def is_expired(self):
         """Check if invitation has expired."""
         return timezone.now() > self.expires_at
+
+
+class UploadSession(models.Model):
+    """
+    Model for resumable, chunked dataset uploads.
+    """
+    STATUS_CHOICES = [
+        ('uploading', 'Uploading'),
+        ('completed', 'Completed'),
+        ('aborted', 'Aborted'),
+    ]
+    
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    project = models.ForeignKey(Project, on_delete=models.CASCADE, related_name='upload_sessions')
+    dataset = models.OneToOneField(
+        Dataset,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='upload_session'
+    )
+    uploaded_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='upload_sessions')
+    
+    # File information
+    filename = models.CharField(max_length=255)
+    file_size = models.BigIntegerField()  # Declared total size in bytes
+    chunk_size = models.PositiveIntegerField()  # Suggested chunk size in bytes
+    temp_path = models.CharField(max_length=500)  # Partial file on disk
+    sha256 = models.CharField(max_length=64, blank=True)  # Expected or computed digest
+    
+    # Status
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='uploading')
+    
+    # Timestamps
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    expires_at = models.DateTimeField()
+    completed_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        db_table = 'upload_sessions'
+        ordering = ['-created_at']
+    
+    def __str__(self):
+        return f"Upload of {self.filename} ({self.status})"
+    
+    @property
+    def is_expired(self):
+        """Check if the upload session has expired."""
+        return timezone.now() > self.expires_at
+
+
+class UploadChunk(models.Model):
+    """
+    Model recording a byte range received for an upload session.
+    
+    Each chunk has its own row, keyed by offset, so parallel PUTs never
+    contend on the session row; a chunk sent again updates its row.
+    """
+    session = models.ForeignKey(UploadSession, on_delete=models.CASCADE, related_name='chunks')
+    offset = models.BigIntegerField()
+    length = models.PositiveIntegerField()
+    sha256 = models.CharField(max_length=64)
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        db_table = 'upload_chunks'
+        ordering = ['offset']
+        unique_together = ['session', 'offset']
+    
+    def __str__(self):
+        return f"Chunk {self.offset}+{self.length} of {self.session_id}"
+
+
+class AnnotationTask(models.Model):
+    """
+    Model for a unit of annotation work handed out through leases.
+    
+    ``required_annotations`` is the overlap (how many distinct annotators
+    should label the item). ``is_open`` is kept in sync with
+    ``assigned_count < required_annotations`` so that finding the next task
+    is a single index scan.
+    """
+    project = models.ForeignKey(Project, on_delete=models.CASCADE, related_name='tasks')
+    dataset = models.ForeignKey(Dataset, on_delete=models.CASCADE, related_name='tasks')
+    item = models.OneToOneField(
+        DatasetItem,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='task'
+    )  # Set when the dataset is split into items
+    
+    # Assignment state
+    required_annotations = models.PositiveSmallIntegerField(default=1)
+    assigned_count = models.IntegerField(default=0)  # Active plus completed leases
+    completed_count = models.IntegerField(default=0)
+    is_open = models.BooleanField(default=True)
+    priority = models.IntegerField(default=0)
+    
+    # Timestamps
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        db_table = 'annotation_tasks'
+        ordering = ['-priority', 'id']
+        indexes = [
+            models.Index(fields=['project', 'is_open', '-priority', 'id'], name='tasks_next_open'),
+        ]
+    
+    def __str__(self):
+        return f"Task {self.pk} on {self.dataset_id} ({self.assigned_count}/{self.required_annotations})"
+    
+    @property
+    def is_complete(self):
+        """Check if every required annotation has been submitted."""
+        return self.completed_count >= self.required_annotations
+
+
+class TaskLease(models.Model):
+    """
+    Model for a time-limited claim of a task by one annotator.
+    
+    Released and expired leases are kept, so a task is leased to an
+    annotator at most once.
+    """
+    STATUS_CHOICES = [
+        ('active', 'Active'),
+        ('completed', 'Completed'),
+        ('released', 'Released'),
+        ('expired', 'Expired'),
+    ]
+    
+    task = models.ForeignKey(AnnotationTask, on_delete=models.CASCADE, related_name='leases')
+    annotator = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='task_leases')
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='active')
+    
+    # Timestamps
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField()
+    completed_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        db_table = 'task_leases'
+        ordering = ['-created_at']
+        unique_together = ['task', 'annotator']
+        indexes = [
+            models.Index(fields=['status', 'expires_at'], name='task_leases_expiry'),
+            models.Index(fields=['annotator', 'status'], name='task_leases_annotator'),
+        ]
+    
+    def __str__(self):
+        return f"Lease of task {self.task_id} by {self.annotator_id} ({self.status})"
+    
+    @property
+    def is_expired(self):
+        """Check if the lease has run out."""
+        return self.status == 'expired' or (self.status == 'active' and timezone.now() > self.expires_at)
+
+
+class AgreementScore(models.Model):
+    """
+    Model for the inter-annotator agreement on one item (or item-less dataset).
+    
+    ``stats`` keeps the sufficient statistics (labels per annotator, pairwise
+    scores) so dataset and project reports are rebuilt from these rows
+    without re-reading annotations; see annotations.agreement.
+    """
+    dataset = models.ForeignKey(Dataset, on_delete=models.CASCADE, related_name='agreement_scores')
+    item = models.ForeignKey(
+        DatasetItem,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='agreement_scores'
+    )
+    annotation_type = models.CharField(max_length=20, choices=Annotation.ANNOTATION_TYPES)
+    metric = models.CharField(max_length=20)
+    
+    # Result
+    annotation_count = models.PositiveIntegerField(default=0)
+    score = models.FloatField(null=True)  # None when fewer than two annotators
+    stats = models.JSONField(default=dict)
+    
+    # Timestamps
+    computed_at = models.DateTimeField()
+    
+    class Meta:
+        db_table = 'agreement_scores'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['dataset', 'annotation_type', 'metric'],
+                condition=models.Q(item__isnull=True),
+                name='agreement_unique_per_dataset'
+            ),
+            models.UniqueConstraint(
+                fields=['item', 'annotation_type', 'metric'],
+                condition=models.Q(item__isnull=False),
+                name='agreement_unique_per_item'
+            ),
+        ]
+    
+    def __str__(self):
+        return f"{self.metric} {self.score} on {self.dataset_id}/{self.item_id}"
+
+
+class AgreementRun(models.Model):
+    """
+    Model for one computation of agreement scores over a project.
+    
+    Incremental runs only revisit items whose annotations changed since the
+    start of the previous run with the same scope and metric.
+    """
+    project = models.ForeignKey(Project, on_delete=models.CASCADE, related_name='agreement_runs')
+    dataset = models.ForeignKey(
+        Dataset,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='agreement_runs'
+    )  # None for the whole project
+    annotation_type = models.CharField(max_length=20, choices=Annotation.ANNOTATION_TYPES)
+    metric = models.CharField(max_length=20, blank=True)
+    incremental = models.BooleanField(default=False)
+    items_computed = models.PositiveIntegerField(default=0)
+    
+    # Timestamps
+    started_at = models.DateTimeField()
+    finished_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        db_table = 'agreement_runs'
+        ordering = ['-started_at']
+    
+    def __str__(self):
+        return f"Agreement run on {self.project_id} ({self.annotation_type})"
+
+
+class ProjectStat(models.Model):
+    """
+    Model for the compacted annotation statistics of a project.
+    
+    One row per annotator, annotation type and gold flag; the pending
+    ``ProjectStatDelta`` rows are added on read (see ``projects.stats``).
+    """
+    project = models.ForeignKey(Project, on_delete=models.CASCADE, related_name='stats')
+    annotator = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='project_stats')
+    annotation_type = models.CharField(max_length=20, choices=Annotation.ANNOTATION_TYPES)
+    is_gold = models.BooleanField(default=False)
+    annotations = models.IntegerField(default=0)
+    verified = models.IntegerField(default=0)
+    
+    class Meta:
+        db_table = 'project_stats'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['project', 'annotator', 'annotation_type', 'is_gold'],
+                name='project_stats_unique_key'
+            ),
+        ]
+    
+    def __str__(self):
+        return f"{self.project_id}/{self.annotator_id}/{self.annotation_type}: {self.annotations}"
+
+
+class ProjectStatDelta(models.Model):
+    """
+    Model for a pending change to a project's statistics.
+    
+    Written by annotation writes in their transaction and folded into
+    ``ProjectStat`` by ``compact_stats``.
+    """
+    project = models.ForeignKey(Project, on_delete=models.CASCADE, related_name='stat_deltas')
+    annotator = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='project_stat_deltas')
+    annotation_type = models.CharField(max_length=20, choices=Annotation.ANNOTATION_TYPES)
+    is_gold = models.BooleanField(default=False)
+    annotations = models.IntegerField(default=0)  # Signed
+    verified = models.IntegerField(default=0)  # Signed
+    
+    # Timestamps
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        db_table = 'project_stat_deltas'
+        indexes = [
+            models.Index(fields=['project', 'id'], name='project_stat_deltas_project'),
+        ]
+    
+    def __str__(self):
+        return f"{self.project_id}/{self.annotator_id}/{self.annotation_type}: {self.annotations:+d}"
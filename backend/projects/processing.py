@@ -0,0 +1,164 @@
+"""
+Background media processing for datasets.
+
+``process_datasets`` claims datasets whose media is ready, generates their
+derivatives on a process pool (see ``projects.derivatives``) and records the
+result in ``Dataset.metadata['derivatives']``. While a dataset is worked on
+its ``processing_status`` reads ``processing <n>%``; it ends as
+``processed`` or ``failed``. Derivatives are cached next to the media file,
+so datasets sharing a blob reuse them.
+"""
+import logging
+import multiprocessing
+import queue as queue_module
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from datetime import timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+
+from .derivatives import run_job
+from .models import Dataset
+from .storage import derivative_relative_path
+
+logger = logging.getLogger(__name__)
+
+READY_STATUSES = ('uploaded',)
+PROCESSING_PREFIX = 'processing'
+
+
+def media_kind(file_type):
+    """Return ``image``, ``audio`` or ``video`` for a file type, else ``None``."""
+    extension = f".{file_type.lower().lstrip('.')}"
+    for kind in ('image', 'audio', 'video'):
+        if extension in settings.ALLOWED_EXTENSIONS.get(kind, ()):
+            return kind
+    return None
+
+
+def media_relative_path(dataset):
+    """Path of the dataset's media relative to ``MEDIA_ROOT``."""
+    return dataset.blob.path if dataset.blob_id else dataset.file_path
+
+
+def pending_datasets(retry_failed=False):
+    """Datasets waiting for processing, including abandoned runs."""
+    statuses = READY_STATUSES + (('failed',) if retry_failed else ())
+    stale = timezone.now() - timedelta(seconds=settings.MEDIA_PROCESSING_STALE_SECONDS)
+    return Dataset.objects.filter(
+        Q(processing_status__in=statuses)
+        | Q(processing_status__startswith=PROCESSING_PREFIX, updated_at__lt=stale)
+    )
+
+
+def _claim(dataset):
+    """Mark a dataset as being processed; False if another runner got it first."""
+    return bool(
+        Dataset.objects.filter(pk=dataset.pk, processing_status=dataset.processing_status).update(
+            processing_status=f'{PROCESSING_PREFIX} 0%',
+            updated_at=timezone.now(),
+        )
+    )
+
+
+def _report_progress(dataset_id, fraction):
+    Dataset.objects.filter(
+        pk=dataset_id, processing_status__startswith=PROCESSING_PREFIX
+    ).update(
+        processing_status=f'{PROCESSING_PREFIX} {int(fraction * 100)}%',
+        updated_at=timezone.now(),
+    )
+
+
+def _finish(dataset_id, relative_dir, manifest=None, error=None):
+    """Store the manifest (or the error) on the dataset."""
+    dataset = Dataset.objects.filter(pk=dataset_id).first()
+    if dataset is None:
+        return
+    metadata = dict(dataset.metadata or {})
+    metadata.pop('processing_error', None)
+    if error is not None:
+        metadata['processing_error'] = error
+        dataset.processing_status = 'failed'
+    else:
+        if manifest is not None:
+            metadata['derivatives'] = {'path': relative_dir, **manifest}
+            for key in ('width', 'height', 'duration'):
+                if key in manifest:
+                    metadata[key] = manifest[key]
+        dataset.is_processed = True
+        dataset.processing_status = 'processed'
+    dataset.metadata = metadata
+    dataset.save(update_fields=['metadata', 'is_processed', 'processing_status', 'updated_at'])
+
+
+def process_datasets(queryset=None, workers=None, max_in_flight=None):
+    """
+    Generate derivatives for ``queryset`` (default: all pending datasets).
+
+    Returns ``(processed, failed)``. Work is submitted to a pool of
+    ``workers`` processes with at most ``max_in_flight`` jobs queued, and
+    progress messages from the workers are written back as they arrive.
+    """
+    queryset = pending_datasets() if queryset is None else queryset
+    workers = workers or settings.MEDIA_PROCESSING_WORKERS
+    max_in_flight = max_in_flight or workers * 2
+    context = multiprocessing.get_context('spawn')  # Workers never inherit DB connections
+
+    processed = failed = 0
+    with context.Manager() as manager, ProcessPoolExecutor(workers, mp_context=context) as pool:
+        progress = manager.Queue()
+        running = {}
+        datasets = queryset.select_related('blob').order_by('pk').iterator(chunk_size=max_in_flight)
+
+        def drain():
+            latest = {}
+            while True:
+                try:
+                    dataset_id, fraction = progress.get_nowait()
+                except queue_module.Empty:
+                    break
+                latest[dataset_id] = fraction
+            for dataset_id, fraction in latest.items():
+                _report_progress(dataset_id, fraction)
+
+        exhausted = False
+        while running or not exhausted:
+            while not exhausted and len(running) < max_in_flight:
+                dataset = next(datasets, None)
+                if dataset is None:
+                    exhausted = True
+                    break
+                kind = media_kind(dataset.file_type)
+                relative = media_relative_path(dataset)
+                if not _claim(dataset):
+                    continue
+                relative_dir = derivative_relative_path(relative)
+                if kind is None or not relative:
+                    _finish(dataset.pk, relative_dir)  # Nothing to derive (e.g. text)
+                    processed += 1
+                    continue
+                media_root = Path(settings.MEDIA_ROOT)
+                future = pool.submit(
+                    run_job, dataset.pk, kind, str(media_root / relative), str(media_root / relative_dir), progress
+                )
+                running[future] = (dataset.pk, relative_dir)
+
+            if not running:
+                continue
+            done, _ = wait(running, timeout=0.5, return_when=FIRST_COMPLETED)
+            drain()
+            for future in done:
+                dataset_id, relative_dir = running.pop(future)
+                try:
+                    manifest = future.result()
+                except Exception as e:
+                    logger.warning('Processing dataset %s failed: %s', dataset_id, e)
+                    _finish(dataset_id, relative_dir, error=str(e) or e.__class__.__name__)
+                    failed += 1
+                else:
+                    _finish(dataset_id, relative_dir, manifest=manifest)
+                    processed += 1
+    return processed, failed
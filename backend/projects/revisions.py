@@ -0,0 +1,211 @@
+"""
+Append-only revision history of annotation content.
+
+Every create, content change and delete of an annotation appends an
+``AnnotationRevision``. Revision 1 and every
+``ANNOTATION_REVISION_CHECKPOINT_INTERVAL``-th revision after it store the
+full content (a checkpoint); the others store an RFC 6902 JSON patch
+against the previous revision, so editing a large mask or transcript adds
+only the changed parts. A patch larger than the content is stored as a
+checkpoint instead.
+
+Checkpoint positions are fixed, so any revision is rebuilt from at most
+``interval`` rows read in one query.
+
+Revisions are written by ``Annotation.save``/``delete`` and by the
+annotation queryset's ``bulk_create``, ``bulk_update`` and ``delete``,
+which lock the annotation rows first so concurrent writes to one
+annotation get consecutive numbers; content changed with
+``QuerySet.update()`` is not tracked.
+"""
+import copy
+import json
+
+from django.conf import settings
+from django.db.models import Max, Q
+
+ACTION_CREATE = 'create'
+ACTION_UPDATE = 'update'
+ACTION_DELETE = 'delete'
+
+
+# JSON patch (RFC 6902, add/remove/replace operations)
+
+def _escape(key):
+    return str(key).replace('~', '~0').replace('/', '~1')
+
+
+def _unescape(token):
+    return token.replace('~1', '/').replace('~0', '~')
+
+
+def make_patch(old, new, path=''):
+    """Operations turning ``old`` into ``new``."""
+    if type(old) is not type(new):
+        return [{'op': 'replace', 'path': path, 'value': new}]
+    if isinstance(old, dict):
+        ops = []
+        for key in old:
+            if key not in new:
+                ops.append({'op': 'remove', 'path': f'{path}/{_escape(key)}'})
+        for key, value in new.items():
+            if key not in old:
+                ops.append({'op': 'add', 'path': f'{path}/{_escape(key)}', 'value': value})
+            else:
+                ops.extend(make_patch(old[key], value, f'{path}/{_escape(key)}'))
+        return ops
+    if isinstance(old, list):
+        ops = []
+        shared = min(len(old), len(new))
+        for index in range(shared):
+            ops.extend(make_patch(old[index], new[index], f'{path}/{index}'))
+        for index in range(len(old) - 1, shared - 1, -1):
+            ops.append({'op': 'remove', 'path': f'{path}/{index}'})
+        for index in range(shared, len(new)):
+            ops.append({'op': 'add', 'path': f'{path}/{index}', 'value': new[index]})
+        return ops
+    if old != new:
+        return [{'op': 'replace', 'path': path, 'value': new}]
+    return []
+
+
+def apply_patch(document, ops):
+    """Apply ``add``/``remove``/``replace`` operations to a copy of ``document``."""
+    document = copy.deepcopy(document)
+    for op in ops:
+        if not op['path']:
+            document = copy.deepcopy(op.get('value'))
+            continue
+        *parents, last = [_unescape(token) for token in op['path'].split('/')[1:]]
+        target = document
+        for token in parents:
+            target = target[int(token)] if isinstance(target, list) else target[token]
+        if isinstance(target, list):
+            index = len(target) if last == '-' else int(last)
+            if op['op'] == 'add':
+                target.insert(index, copy.deepcopy(op['value']))
+            elif op['op'] == 'remove':
+                del target[index]
+            else:
+                target[index] = copy.deepcopy(op['value'])
+        elif op['op'] == 'remove':
+            del target[last]
+        else:
+            target[last] = copy.deepcopy(op['value'])
+    return document
+
+
+# Recording
+
+def _size(value):
+    return len(json.dumps(value, separators=(',', ':')))
+
+
+def record_revisions(changes):
+    """
+    Append one revision per change.
+
+    ``changes`` holds ``(annotation_id, dataset_id, author_id, action,
+    old_content, new_content)`` tuples; updates that leave the content
+    unchanged are skipped.
+    """
+    from .models import AnnotationRevision
+
+    changes = [change for change in changes if change[0] is not None]  # e.g. bulk_create without returned pks
+    if not changes:
+        return []
+    interval = settings.ANNOTATION_REVISION_CHECKPOINT_INTERVAL
+    last = dict(
+        AnnotationRevision.objects.filter(annotation_id__in={change[0] for change in changes})
+        .values('annotation_id').annotate(last=Max('number'))
+        .values_list('annotation_id', 'last')
+    )
+
+    revisions = []
+    for annotation_id, dataset_id, author_id, action, old, new in changes:
+        if action == ACTION_UPDATE and old == new:
+            continue
+        number = last.get(annotation_id, 0) + 1
+        is_checkpoint = (number - 1) % interval == 0
+        data = None
+        if action != ACTION_DELETE:
+            data = new
+            if not is_checkpoint:
+                patch = make_patch(old, new)
+                if _size(patch) < _size(new):
+                    data = patch
+                else:
+                    is_checkpoint = True
+        last[annotation_id] = number
+        revisions.append(AnnotationRevision(
+            annotation_id=annotation_id,
+            dataset_id=dataset_id,
+            number=number,
+            action=action,
+            is_checkpoint=is_checkpoint,
+            data=data,
+            author_id=author_id,
+        ))
+    return AnnotationRevision.objects.bulk_create(revisions)
+
+
+# Reconstruction
+
+def _replay(rows):
+    """Content after the last of ``(number, action, is_checkpoint, data)`` rows."""
+    content = None
+    for _, action, is_checkpoint, data in rows:
+        if action == ACTION_DELETE:
+            content = None
+        elif is_checkpoint:
+            content = data
+        else:
+            content = apply_patch(content, data)
+    return content
+
+
+def _window(annotation_id, number):
+    """Rows from the scheduled checkpoint preceding revision ``number`` up to it."""
+    interval = settings.ANNOTATION_REVISION_CHECKPOINT_INTERVAL
+    checkpoint = number - (number - 1) % interval
+    return Q(annotation_id=annotation_id, number__gte=checkpoint, number__lte=number)
+
+
+def _rows(queryset):
+    return queryset.order_by('annotation_id', 'number').values_list(
+        'annotation_id', 'number', 'action', 'is_checkpoint', 'data'
+    )
+
+
+def revision_content(annotation_id, number):
+    """Content of revision ``number`` of an annotation (``None`` once deleted)."""
+    from .models import AnnotationRevision
+
+    rows = _rows(AnnotationRevision.objects.filter(_window(annotation_id, number)))
+    return _replay(row[1:] for row in rows)
+
+
+def dataset_state(dataset_id, at, chunk_size=500):
+    """
+    Yield ``(annotation_id, number, content)`` for every annotation of a
+    dataset as it was at time ``at``.
+    """
+    from .models import AnnotationRevision
+
+    revisions = AnnotationRevision.objects.filter(dataset_id=dataset_id, created_at__lte=at)
+    targets = list(
+        revisions.values('annotation_id').annotate(number=Max('number'))
+        .order_by('annotation_id').values_list('annotation_id', 'number')
+    )
+    for start in range(0, len(targets), chunk_size):
+        chunk = targets[start:start + chunk_size]
+        window = Q()
+        for annotation_id, number in chunk:
+            window |= _window(annotation_id, number)
+        rows = {}
+        for annotation_id, *row in _rows(AnnotationRevision.objects.filter(window)):
+            rows.setdefault(annotation_id, []).append(row)
+        for annotation_id, number in chunk:
+            annotation_rows = rows.get(annotation_id, [])
+            if annotation_rows and annotation_rows[-1][1] != ACTION_DELETE:
+                yield annotation_id, number, _replay(annotation_rows)
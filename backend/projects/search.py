@@ -0,0 +1,324 @@
+"""
+Full-text search over annotation content.
+
+The text of an annotation (transcripts, span and answer text...) and its
+labels (``label``, ``labels``, ``class``, ``category``...) are extracted
+from ``Annotation.content`` and indexed in the same transaction as the
+write, by ``Annotation.save``/``delete`` and the annotation, dataset and
+item querysets. Content changed with ``QuerySet.update()`` is not indexed;
+``rebuild_search_index`` repairs that.
+
+The index lives in the ``annotation_search`` table, managed by the backend
+(``SEARCH_BACKEND``, by default the one matching the database):
+
+* ``SQLiteBackend`` - an FTS5 virtual table ranked with BM25. The project,
+  dataset and type are indexed as tokens of a ``scope`` column, so the
+  scope is part of the full-text match rather than a filter applied after.
+* ``PostgresBackend`` - a ``tsvector`` column (labels weighted above text)
+  with a GIN index, ranked with ``ts_rank_cd``.
+
+Matched terms in snippets are wrapped in ``<mark>``; the rest is escaped.
+"""
+import html
+import re
+from functools import lru_cache
+
+from django.conf import settings
+from django.db import connection
+from django.utils.module_loading import import_string
+
+from annotations.encoding import MASK_KEYS
+
+# Annotation fields the index depends on (``update_fields`` may name either form)
+INDEXED_FIELDS = ('content', 'dataset', 'dataset_id', 'annotation_type')
+LABEL_KEYS = ('label', 'labels', 'class', 'category', 'entity', 'tag', 'tags')
+MAX_QUERY_TERMS = 16
+CHUNK_SIZE = 1000
+
+# Snippet markers, replaced by ``<mark>``/``</mark>`` once the snippet is escaped
+MARK_START = '\x02'
+MARK_END = '\x03'
+
+TERM = re.compile(r'(\w+)(\*?)')
+
+
+def extract(content):
+    """``(text, labels)`` of annotation content, each as one string."""
+    text, labels = [], []
+
+    def walk(value, is_label):
+        if isinstance(value, str):
+            (labels if is_label else text).append(value)
+        elif isinstance(value, dict):
+            if any(isinstance(key, str) and key.startswith('$') for key in value):
+                return  # Packed coordinates or an RLE mask
+            for key, child in value.items():
+                if key not in MASK_KEYS:
+                    walk(child, is_label or key in LABEL_KEYS)
+        elif isinstance(value, list):
+            for child in value:
+                walk(child, is_label)
+
+    walk(content, False)
+    limit = settings.SEARCH_MAX_DOCUMENT_CHARS
+    return ' '.join(text)[:limit], ' '.join(labels)[:limit]
+
+
+def writes_document(fields):
+    """Whether saving ``fields`` (``None`` for all) changes what is indexed."""
+    return fields is None or any(name in fields for name in INDEXED_FIELDS)
+
+
+def parse_query(query):
+    """Terms of a user query as ``(term, is_prefix)`` pairs; a trailing ``*`` asks for a prefix match."""
+    return [(term.lower(), bool(star)) for term, star in TERM.findall(query or '')][:MAX_QUERY_TERMS]
+
+
+def markup(snippet):
+    """Escape a snippet and turn its match markers into ``<mark>`` tags."""
+    return html.escape(snippet or '').replace(MARK_START, '<mark>').replace(MARK_END, '</mark>')
+
+
+class SQLiteBackend:
+    """Search with an SQLite FTS5 virtual table."""
+    table = 'annotation_search'
+
+    def create(self, schema_editor):
+        schema_editor.execute(
+            f"CREATE VIRTUAL TABLE {self.table} USING fts5("
+            f"scope, body, labels, tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+        )
+
+    def drop(self, schema_editor):
+        schema_editor.execute(f'DROP TABLE IF EXISTS {self.table}')
+
+    @staticmethod
+    def _scope(project_id, dataset_id=None, annotation_type=None):
+        """Scope tokens; only ids and the letters of the type go in, so they are safe in a MATCH string."""
+        tokens = [f'p{int(project_id)}']
+        if dataset_id is not None:
+            tokens.append(f'd{int(dataset_id)}')
+        if annotation_type:
+            tokens.append('t' + re.sub(r'[^0-9a-z]', '', annotation_type.lower()))
+        return tokens
+
+    def upsert(self, rows):
+        self.delete([row[0] for row in rows])  # FTS5 has no upsert
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                f'INSERT INTO {self.table} (rowid, scope, body, labels) VALUES (%s, %s, %s, %s)',
+                [
+                    (pk, ' '.join(self._scope(project_id, dataset_id, annotation_type)), text, labels)
+                    for pk, project_id, dataset_id, annotation_type, text, labels in rows
+                ],
+            )
+
+    def delete(self, ids):
+        ids = list(ids)
+        if not ids:
+            return
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'DELETE FROM {self.table} WHERE rowid IN ({", ".join(["%s"] * len(ids))})', ids
+            )
+
+    def clear(self, project_id=None):
+        with connection.cursor() as cursor:
+            if project_id is None:
+                cursor.execute(f'DELETE FROM {self.table}')
+            else:
+                cursor.execute(
+                    f'DELETE FROM {self.table} WHERE rowid IN '
+                    f'(SELECT rowid FROM {self.table} WHERE {self.table} MATCH %s)',
+                    [f'scope : "p{int(project_id)}"'],
+                )
+
+    def search(self, terms, project_id, dataset_id=None, annotation_type=None, limit=20, offset=0):
+        scope = ' AND '.join(f'"{token}"' for token in self._scope(project_id, dataset_id, annotation_type))
+        words = ' AND '.join(f'"{term}"' + (' *' if prefix else '') for term, prefix in terms)
+        rank = f'bm25({self.table}, 0.0, 1.0, 2.0)'  # Labels weigh twice the text, the scope nothing
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT rowid, -{rank}, '
+                f'snippet({self.table}, 1, %s, %s, %s, 24), highlight({self.table}, 2, %s, %s) '
+                f'FROM {self.table} WHERE {self.table} MATCH %s ORDER BY {rank}, rowid LIMIT %s OFFSET %s',
+                [
+                    MARK_START, MARK_END, '…', MARK_START, MARK_END,
+                    f'scope : ({scope}) AND {{body labels}} : ({words})', limit, offset,
+                ],
+            )
+            return cursor.fetchall()
+
+
+class PostgresBackend:
+    """Search with a ``tsvector`` column and a GIN index (PostgreSQL)."""
+    table = 'annotation_search'
+
+    @property
+    def config(self):
+        return settings.SEARCH_POSTGRES_CONFIG
+
+    def create(self, schema_editor):
+        schema_editor.execute(
+            f'CREATE TABLE {self.table} ('
+            f'annotation_id bigint PRIMARY KEY, project_id bigint NOT NULL, dataset_id bigint NOT NULL, '
+            f'annotation_type varchar(20) NOT NULL, body text NOT NULL, labels text NOT NULL, '
+            f'document tsvector NOT NULL)'
+        )
+        schema_editor.execute(f'CREATE INDEX {self.table}_document ON {self.table} USING GIN (document)')
+        schema_editor.execute(f'CREATE INDEX {self.table}_project ON {self.table} (project_id, dataset_id)')
+
+    def drop(self, schema_editor):
+        schema_editor.execute(f'DROP TABLE IF EXISTS {self.table}')
+
+    def upsert(self, rows):
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                f'INSERT INTO {self.table} '
+                f'(annotation_id, project_id, dataset_id, annotation_type, body, labels, document) '
+                f"VALUES (%s, %s, %s, %s, %s, %s, setweight(to_tsvector(%s::regconfig, %s), 'A') "
+                f"|| setweight(to_tsvector(%s::regconfig, %s), 'B')) "
+                f'ON CONFLICT (annotation_id) DO UPDATE SET project_id = EXCLUDED.project_id, '
+                f'dataset_id = EXCLUDED.dataset_id, annotation_type = EXCLUDED.annotation_type, '
+                f'body = EXCLUDED.body, labels = EXCLUDED.labels, document = EXCLUDED.document',
+                [
+                    (pk, project_id, dataset_id, annotation_type, text, labels,
+                     self.config, labels, self.config, text)
+                    for pk, project_id, dataset_id, annotation_type, text, labels in (
+                        (*row[:4], row[4].replace('\0', ''), row[5].replace('\0', '')) for row in rows
+                    )
+                ],
+            )
+
+    def delete(self, ids):
+        ids = list(ids)
+        if not ids:
+            return
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {self.table} WHERE annotation_id = ANY(%s)', [ids])
+
+    def clear(self, project_id=None):
+        with connection.cursor() as cursor:
+            if project_id is None:
+                cursor.execute(f'TRUNCATE {self.table}')
+            else:
+                cursor.execute(f'DELETE FROM {self.table} WHERE project_id = %s', [project_id])
+
+    def search(self, terms, project_id, dataset_id=None, annotation_type=None, limit=20, offset=0):
+        query = ' & '.join(f"'{term}'" + (':*' if prefix else '') for term, prefix in terms)
+        where, params = ['project_id = %s'], [project_id]
+        if dataset_id is not None:
+            where.append('dataset_id = %s')
+            params.append(dataset_id)
+        if annotation_type:
+            where.append('annotation_type = %s')
+            params.append(annotation_type)
+        options = f'StartSel={MARK_START}, StopSel={MARK_END}'
+        with connection.cursor() as cursor:
+            # Headlines re-parse the text, so only build them for the page.
+            cursor.execute(
+                f'WITH query AS (SELECT to_tsquery(%s::regconfig, %s) AS q), '
+                f'hits AS (SELECT annotation_id, body, labels, ts_rank_cd(document, q) AS score '
+                f'FROM {self.table}, query WHERE {" AND ".join(where)} AND document @@ q '
+                f'ORDER BY score DESC, annotation_id LIMIT %s OFFSET %s) '
+                f'SELECT annotation_id, score, '
+                f'ts_headline(%s::regconfig, body, q, %s), ts_headline(%s::regconfig, labels, q, %s) '
+                f'FROM hits, query ORDER BY score DESC, annotation_id',
+                [
+                    self.config, query, *params, limit, offset,
+                    self.config, f'{options}, MaxFragments=1, MaxWords=32, MinWords=8',
+                    self.config, f'{options}, HighlightAll=true',
+                ],
+            )
+            return cursor.fetchall()
+
+
+VENDOR_BACKENDS = {
+    'sqlite': 'projects.search.SQLiteBackend',
+    'postgresql': 'projects.search.PostgresBackend',
+}
+
+
+@lru_cache(maxsize=None)
+def get_backend():
+    """The search backend (``SEARCH_BACKEND``, or the one for the database), or ``None``."""
+    path = settings.SEARCH_BACKEND or VENDOR_BACKENDS.get(connection.vendor)
+    return import_string(path)() if path else None
+
+
+def _rows(values):
+    for pk, project_id, dataset_id, annotation_type, content in values:
+        yield (pk, project_id, dataset_id, annotation_type, *extract(content))
+
+
+def index_annotations(annotations):
+    """Index (or re-index) saved annotation instances."""
+    from .stats import projects_of
+
+    backend = get_backend()
+    annotations = [annotation for annotation in annotations if annotation.pk is not None]
+    if backend is None or not annotations:
+        return
+    projects = projects_of(annotation.dataset_id for annotation in annotations)
+    rows = list(_rows(
+        (annotation.pk, projects.get(annotation.dataset_id), annotation.dataset_id,
+         annotation.annotation_type, annotation.content)
+        for annotation in annotations
+    ))
+    for start in range(0, len(rows), CHUNK_SIZE):
+        backend.upsert(rows[start:start + CHUNK_SIZE])
+
+
+def index_queryset(annotations, chunk_size=CHUNK_SIZE):
+    """Index every annotation of a queryset in primary key order; returns how many."""
+    backend = get_backend()
+    if backend is None:
+        return 0
+    indexed = last_pk = 0
+    while True:
+        values = list(
+            annotations.filter(pk__gt=last_pk).order_by('pk')
+            .values_list('pk', 'dataset__project_id', 'dataset_id', 'annotation_type', 'content')[:chunk_size]
+        )
+        if not values:
+            return indexed
+        backend.upsert(list(_rows(values)))
+        indexed += len(values)
+        last_pk = values[-1][0]
+
+
+def remove_annotations(ids):
+    """Drop annotations from the index."""
+    backend = get_backend()
+    if backend is None:
+        return
+    ids = list(ids)
+    for start in range(0, len(ids), CHUNK_SIZE):
+        backend.delete(ids[start:start + CHUNK_SIZE])
+
+
+def clear_index(project_id=None):
+    """Drop a project's annotations (or all of them) from the index."""
+    backend = get_backend()
+    if backend is not None:
+        backend.clear(project_id)
+
+
+def search(project_id, query, dataset_id=None, annotation_type=None, limit=20, offset=0):
+    """
+    Ranked matches of ``query`` in a project, best first.
+
+    Returns ``(annotation_id, score, snippet, labels)`` tuples; the snippet
+    and labels are HTML with matches in ``<mark>``. Every term must match
+    (in the text or the labels).
+    """
+    backend = get_backend()
+    terms = parse_query(query)
+    if backend is None or not terms:
+        return []
+    return [
+        (pk, float(score), markup(snippet), markup(labels))
+        for pk, score, snippet, labels in backend.search(
+            terms, project_id, dataset_id, annotation_type, limit=limit, offset=offset
+        )
+    ]
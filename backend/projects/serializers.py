@@ -0,0 +1,134 @@
+"""
+Serializers for projects app.
+"""
+from django.conf import settings
+from rest_framework import serializers
+
+from .models import (AnnotationTask, Dataset, DatasetItem, Project, TaskLease,
+                     UploadSession)
+from .uploads import missing_ranges, received_ranges
+
+
+class DatasetSerializer(serializers.ModelSerializer):
+    """
+    Serializer for datasets.
+    """
+
+    class Meta:
+        model = Dataset
+        fields = [
+            'id', 'name', 'description', 'project', 'file_path', 'file_size',
+            'file_type', 'metadata', 'is_processed', 'processing_status',
+            'annotation_count', 'item_count', 'created_at', 'updated_at'
+        ]
+        read_only_fields = fields
+
+
+class DatasetItemSerializer(serializers.ModelSerializer):
+    """
+    Serializer for dataset items.
+    """
+    status = serializers.ChoiceField(choices=DatasetItem.STATUS_CHOICES, required=False)
+
+    class Meta:
+        model = DatasetItem
+        fields = ['id', 'dataset', 'ordinal', 'status', 'key', 'size', 'metadata']
+        read_only_fields = ['id', 'dataset', 'ordinal']
+
+
+class UploadStartSerializer(serializers.Serializer):
+    """
+    Serializer for initiating a chunked dataset upload.
+    """
+    project = serializers.PrimaryKeyRelatedField(queryset=Project.objects.all())
+    filename = serializers.CharField(max_length=255)
+    file_size = serializers.IntegerField(min_value=1)
+    name = serializers.CharField(max_length=200, required=False, allow_blank=True)
+    description = serializers.CharField(required=False, allow_blank=True)
+    sha256 = serializers.RegexField(r'^[0-9a-fA-F]{64}$', required=False, allow_blank=True)
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        request = self.context.get('request')
+        if request is not None:
+            self.fields['project'].queryset = Project.objects.for_user(request.user)
+
+    def validate_file_size(self, value):
+        """Refuse files larger than ``UPLOAD_MAX_FILE_SIZE``."""
+        if value > settings.UPLOAD_MAX_FILE_SIZE:
+            raise serializers.ValidationError(
+                f'Files may not exceed {settings.UPLOAD_MAX_FILE_SIZE} bytes.'
+            )
+        return value
+
+
+class UploadSessionSerializer(serializers.ModelSerializer):
+    """
+    Serializer for upload session status.
+    """
+    received_ranges = serializers.SerializerMethodField()
+    missing_ranges = serializers.SerializerMethodField()
+    received_bytes = serializers.SerializerMethodField()
+
+    class Meta:
+        model = UploadSession
+        fields = [
+            'id', 'project', 'dataset', 'filename', 'file_size', 'chunk_size',
+            'sha256', 'status', 'received_bytes', 'received_ranges',
+            'missing_ranges', 'created_at', 'expires_at', 'completed_at'
+        ]
+        read_only_fields = fields
+
+    def _ranges(self, obj):
+        if not hasattr(obj, '_received_ranges'):
+            obj._received_ranges = received_ranges(obj)
+        return obj._received_ranges
+
+    def get_received_ranges(self, obj):
+        return self._ranges(obj)
+
+    def get_missing_ranges(self, obj):
+        if obj.status != 'uploading':
+            return []
+        return missing_ranges(obj, self._ranges(obj))
+
+    def get_received_bytes(self, obj):
+        if obj.status == 'completed':
+            return obj.file_size
+        return sum(end - start for start, end in self._ranges(obj))
+
+
+class AnnotationTaskSerializer(serializers.ModelSerializer):
+    """
+    Serializer for annotation tasks.
+    """
+    dataset = DatasetSerializer(read_only=True)
+    item = DatasetItemSerializer(read_only=True)
+
+    class Meta:
+        model = AnnotationTask
+        fields = [
+            'id', 'project', 'dataset', 'item', 'required_annotations', 'assigned_count',
+            'completed_count', 'is_open', 'priority', 'created_at'
+        ]
+        read_only_fields = fields
+
+
+class TaskLeaseSerializer(serializers.ModelSerializer):
+    """
+    Serializer for task leases.
+    """
+    task = AnnotationTaskSerializer(read_only=True)
+
+    class Meta:
+        model = TaskLease
+        fields = ['id', 'task', 'annotator', 'status', 'created_at', 'expires_at', 'completed_at']
+        read_only_fields = fields
+
+
+class TaskCreateSerializer(serializers.Serializer):
+    """
+    Serializer for generating tasks for a project's datasets.
+    """
+    required_annotations = serializers.IntegerField(min_value=1, max_value=100, default=1)
+    priority = serializers.IntegerField(default=0)
@@ -0,0 +1,193 @@
+"""
+Conditional, byte-range aware file responses for dataset media.
+
+``serve_file`` answers ``If-None-Match``/``If-Modified-Since`` with ``304``,
+single ``Range`` requests with ``206 Partial Content`` and everything else
+with the whole file. Open-ended ranges (``bytes=N-``, what media elements
+send while seeking) go through ``FileResponse`` so the WSGI server can use
+``sendfile``. With ``MEDIA_SENDFILE_BACKEND`` set, Django only checks
+permissions and hands the transfer to the front-end server through
+``X-Accel-Redirect`` (nginx) or ``X-Sendfile`` (Apache, lighttpd), which
+then deals with ranges itself. Under the ASGI server, where there is no
+``sendfile``, the file is read in blocks on the blocking I/O pool.
+"""
+import mimetypes
+import re
+from pathlib import Path
+
+from django.conf import settings
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, parse_http_date_safe
+
+from sernion_mark.async_views import aiterate, is_asgi
+
+ASYNC_BLOCK_SIZE = 64 * 1024  # Bytes read per thread hop when streaming under ASGI
+
+RANGE_HEADER = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+class RangeNotSatisfiable(Exception):
+    """Raised when a requested byte range lies outside the file."""
+
+
+def parse_range(header, size):
+    """
+    Parse a single-range ``Range`` header into inclusive ``(start, end)``.
+
+    Returns ``None`` for a missing, malformed or multi-range header (the
+    caller then serves the whole file, as RFC 9110 allows).
+    """
+    match = RANGE_HEADER.match((header or '').strip())
+    if not match:
+        return None
+    first, last = match.groups()
+    if not first:
+        if not last:
+            return None
+        length = int(last)  # Suffix range: the final ``length`` bytes
+        if length == 0:
+            raise RangeNotSatisfiable()
+        return max(size - length, 0), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        raise RangeNotSatisfiable()
+    return start, end
+
+
+class _FileRange:
+    """Read-only view on ``length`` bytes of an open file."""
+
+    def __init__(self, fh, start, length):
+        fh.seek(start)
+        self.fh = fh
+        self.remaining = length
+
+    def read(self, size=-1):
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.fh.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def close(self):
+        self.fh.close()
+
+
+def _blocks(fh, start, length, block_size=ASYNC_BLOCK_SIZE):
+    """Yield ``length`` bytes of ``fh`` from ``start``, closing it afterwards."""
+    try:
+        fh.seek(start)
+        while length:
+            block = fh.read(min(block_size, length))
+            if not block:
+                break
+            length -= len(block)
+            yield block
+    finally:
+        fh.close()
+
+
+def _if_range_matches(request, etag, last_modified):
+    """Whether a ``Range`` request may be honoured under ``If-Range``."""
+    value = request.META.get('HTTP_IF_RANGE')
+    if not value:
+        return True
+    if value.startswith(('"', 'W/')):
+        return value == etag  # Only strong validators match
+    return parse_http_date_safe(value) == last_modified
+
+
+def serve_file(request, path, content_type=None, etag=None, filename=None):
+    """
+    Serve ``path`` (resolved, inside ``MEDIA_ROOT``) with ranges and validators.
+
+    ``etag`` should be a strong validator when one is known (the SHA-256 of
+    a blob); otherwise it is derived from the file's size and mtime.
+    """
+    path = Path(path)
+    try:
+        stat = path.stat()
+    except FileNotFoundError:
+        return HttpResponse(status=404)
+
+    last_modified = int(stat.st_mtime)
+    etag = f'"{etag}"' if etag else f'"{stat.st_size:x}-{stat.st_mtime_ns:x}"'
+    content_type = content_type or mimetypes.guess_type(path.name)[0] or 'application/octet-stream'
+
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        response = _file_response(request, path, stat.st_size, content_type, etag, last_modified)
+        if filename:
+            response['Content-Disposition'] = f'inline; filename="{filename}"'
+
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    response['Accept-Ranges'] = 'bytes'
+    patch_cache_control(response, private=True, max_age=settings.MEDIA_CACHE_SECONDS)
+    return response
+
+
+def _file_response(request, path, size, content_type, etag, last_modified):
+    backend = settings.MEDIA_SENDFILE_BACKEND
+    if backend:
+        response = HttpResponse(content_type=content_type)
+        if backend == 'nginx':
+            relative = path.relative_to(Path(settings.MEDIA_ROOT).resolve()).as_posix()
+            response['X-Accel-Redirect'] = settings.MEDIA_ACCEL_REDIRECT_PREFIX.rstrip('/') + '/' + relative
+        else:
+            response['X-Sendfile'] = str(path)
+        return response
+
+    try:
+        byte_range = None
+        if _if_range_matches(request, etag, last_modified):
+            byte_range = parse_range(request.META.get('HTTP_RANGE'), size)
+    except RangeNotSatisfiable:
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{size}'
+        return response
+
+    fh = open(path, 'rb')
+    if is_asgi(request):
+        start, end = byte_range or (0, size - 1)
+        response = StreamingHttpResponse(
+            aiterate(_blocks(fh, start, end - start + 1), thread_sensitive=False),
+            content_type=content_type,
+            status=206 if byte_range else 200,
+        )
+        response['Content-Length'] = end - start + 1
+        if byte_range:
+            response['Content-Range'] = f'bytes {start}-{end}/{size}'
+        return response
+
+    if byte_range is None:
+        return FileResponse(fh, content_type=content_type)
+
+    start, end = byte_range
+    if end == size - 1:
+        # Runs to the end of the file: keep the real file object so the
+        # server's wsgi.file_wrapper can sendfile() from the current offset.
+        fh.seek(start)
+        response = FileResponse(fh, content_type=content_type, status=206)
+    else:
+        response = FileResponse(_FileRange(fh, start, end - start + 1), content_type=content_type, status=206)
+        response['Content-Length'] = end - start + 1
+    response['Content-Range'] = f'bytes {start}-{end}/{size}'
+    return response
+
+
+def media_path(relative_path):
+    """Resolve a path relative to ``MEDIA_ROOT``, refusing to leave it."""
+    root = Path(settings.MEDIA_ROOT).resolve()
+    path = (root / relative_path).resolve()
+    if root not in path.parents:
+        return None
+    return path
+
+
+def content_type_for(file_type):
+    """Guess the MIME type of a dataset from its ``file_type``."""
+    return mimetypes.guess_type(f'media.{file_type}')[0]
+
@@ -0,0 +1,22 @@
+"""
+Signal handlers for projects app.
+"""
+from django.conf import settings
+from django.db.models.signals import post_delete, pre_delete
+from django.dispatch import receiver
+
+from .models import Annotation, Dataset
+from .storage import release_blob
+
+
+@receiver(pre_delete, sender=settings.AUTH_USER_MODEL)
+def delete_user_annotations(sender, instance, **kwargs):
+    """Delete a user's annotations through the queryset, so counters, statistics and the index follow."""
+    Annotation.objects.filter(annotator=instance).delete()
+
+
+@receiver(post_delete, sender=Dataset)
+def release_dataset_blob(sender, instance, **kwargs):
+    """Drop the dataset's blob reference, however the dataset was deleted."""
+    if instance.blob_id:
+        release_blob(instance.blob_id)
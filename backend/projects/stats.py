@@ -0,0 +1,251 @@
+"""
+Materialized per-project annotation statistics.
+
+Annotation writes append signed deltas to ``ProjectStatDelta`` in the same
+transaction, keyed by ``(project, annotator, annotation_type, is_gold)``.
+The log is append-only, so concurrent writers never wait on a shared
+counter row. ``compact_stats`` folds it into ``ProjectStat``, one row per
+key.
+
+A read sums a project's rollup rows and its pending deltas, so it is
+exact. Its cost depends on the number of annotators and types, plus the
+deltas since the last compaction, and not on the number of annotations. A
+project with more than ``PROJECT_STATS_COMPACT_THRESHOLD`` pending deltas
+is compacted before it is read.
+"""
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Q, Sum
+from django.utils import timezone
+
+KEY_FIELDS = ('annotator_id', 'annotation_type', 'is_gold')
+# Annotation fields the statistics depend on, in the order of a row's state tuple
+STATE_FIELDS = ('dataset_id', 'annotator_id', 'annotation_type', 'is_gold', 'is_verified')
+
+
+def _add(deltas, key, annotations, verified):
+    current = deltas.get(key, (0, 0))
+    deltas[key] = (current[0] + annotations, current[1] + verified)
+
+
+def grouped(annotations, sign=1):
+    """``{(project_id, annotator_id, annotation_type, is_gold): (annotations, verified)}`` of a queryset."""
+    rows = (
+        annotations.order_by()
+        .values('dataset__project_id', *KEY_FIELDS)
+        .annotate(total=Count('id'), verified=Count('id', filter=Q(is_verified=True)))
+    )
+    return {
+        (row['dataset__project_id'], row['annotator_id'], row['annotation_type'], row['is_gold']):
+            (sign * row['total'], sign * row['verified'])
+        for row in rows
+    }
+
+
+def state(annotation, fields=None, previous=None):
+    """
+    State tuple (see ``STATE_FIELDS``) of an annotation instance.
+
+    With ``fields`` (as passed to ``save``/``bulk_update``), fields not
+    written keep their ``previous`` value.
+    """
+    if fields is None or previous is None:
+        return tuple(getattr(annotation, name) for name in STATE_FIELDS)
+    fields = set(fields)
+    return tuple(
+        getattr(annotation, name) if name in fields or name.removesuffix('_id') in fields else old
+        for name, old in zip(STATE_FIELDS, previous)
+    )
+
+
+def writes_state(fields):
+    """Whether saving ``fields`` (``None`` for all) can change the statistics."""
+    return fields is None or any(name in fields or name.removesuffix('_id') in fields for name in STATE_FIELDS)
+
+
+def projects_of(dataset_ids):
+    """``{dataset_id: project_id}`` of the given datasets."""
+    from .models import Dataset
+
+    dataset_ids = set(dataset_ids)
+    if not dataset_ids:
+        return {}
+    return dict(Dataset.objects.filter(pk__in=dataset_ids).values_list('pk', 'project_id'))
+
+
+def state_deltas(states, sign=1):
+    """Deltas counting (or, with ``sign=-1``, discounting) annotations in the given states."""
+    states = list(states)
+    projects = projects_of(row[0] for row in states)
+    deltas = {}
+    for dataset_id, annotator_id, annotation_type, is_gold, is_verified in states:
+        _add(deltas, (projects.get(dataset_id), annotator_id, annotation_type, is_gold), sign, sign * bool(is_verified))
+    return deltas
+
+
+def change_deltas(changes):
+    """Deltas of ``(old_state, new_state)`` pairs."""
+    changes = [(old, new) for old, new in changes if old != new]
+    deltas = state_deltas((new for _, new in changes))
+    for key, (annotations, verified) in state_deltas((old for old, _ in changes), sign=-1).items():
+        _add(deltas, key, annotations, verified)
+    return deltas
+
+
+def review_deltas(annotations, verified):
+    """Deltas of setting ``is_verified`` to ``verified`` on a queryset, read before the UPDATE."""
+    flipped = grouped(annotations.filter(is_verified=not verified))
+    sign = 1 if verified else -1
+    return {key: (0, sign * total) for key, (total, _) in flipped.items()}
+
+
+def record_deltas(deltas):
+    """Append non-zero deltas to the log."""
+    from .models import ProjectStatDelta
+
+    ProjectStatDelta.objects.bulk_create([
+        ProjectStatDelta(
+            project_id=project_id,
+            annotator_id=annotator_id,
+            annotation_type=annotation_type,
+            is_gold=is_gold,
+            annotations=annotations,
+            verified=verified,
+        )
+        for (project_id, annotator_id, annotation_type, is_gold), (annotations, verified) in deltas.items()
+        if project_id is not None and (annotations or verified)
+    ])
+
+
+def compact_project(project_id):
+    """Fold a project's pending deltas into its rollup; returns how many were folded."""
+    from .models import Project, ProjectStat, ProjectStatDelta
+
+    with transaction.atomic():
+        # Compactions of one project run one at a time.
+        if Project.objects.select_for_update().filter(pk=project_id).values_list('pk').first() is None:
+            return 0
+        # Sum and delete exactly the rows read, so deltas committed meanwhile are left for next time.
+        pending = list(
+            ProjectStatDelta.objects.filter(project_id=project_id)
+            .values_list('pk', *KEY_FIELDS, 'annotations', 'verified')
+        )
+        if not pending:
+            return 0
+        deltas = {}
+        for _, annotator_id, annotation_type, is_gold, annotations, verified in pending:
+            _add(deltas, (annotator_id, annotation_type, is_gold), annotations, verified)
+
+        stats = {
+            (stat.annotator_id, stat.annotation_type, stat.is_gold): stat
+            for stat in ProjectStat.objects.filter(project_id=project_id)
+        }
+        to_create, to_update, to_delete = [], [], []
+        for key, (annotations, verified) in deltas.items():
+            stat = stats.get(key)
+            if stat is None:
+                stat = ProjectStat(project_id=project_id, annotator_id=key[0], annotation_type=key[1], is_gold=key[2])
+                to_create.append(stat)
+            elif annotations or verified:
+                to_update.append(stat)
+            stat.annotations += annotations
+            stat.verified += verified
+        for stat in to_update:
+            if not stat.annotations:
+                to_delete.append(stat.pk)
+        ProjectStat.objects.bulk_create([stat for stat in to_create if stat.annotations])
+        ProjectStat.objects.bulk_update([stat for stat in to_update if stat.annotations], ['annotations', 'verified'])
+        ProjectStat.objects.filter(pk__in=to_delete).delete()
+
+        ids = [row[0] for row in pending]
+        for start in range(0, len(ids), 1000):
+            ProjectStatDelta.objects.filter(pk__in=ids[start:start + 1000]).delete()
+    return len(pending)
+
+
+def pending_projects():
+    """Ids of projects with deltas waiting to be compacted."""
+    from .models import ProjectStatDelta
+
+    return ProjectStatDelta.objects.order_by('project_id').values_list('project_id', flat=True).distinct()
+
+
+def rebuild_project(project_id):
+    """Recompute a project's rollup from its annotations, dropping its delta log."""
+    from .models import Annotation, Project, ProjectStat, ProjectStatDelta
+
+    with transaction.atomic():
+        if Project.objects.select_for_update().filter(pk=project_id).values_list('pk').first() is None:
+            return
+        ProjectStatDelta.objects.filter(project_id=project_id).delete()
+        ProjectStat.objects.filter(project_id=project_id).delete()
+        ProjectStat.objects.bulk_create([
+            ProjectStat(
+                project_id=project_id,
+                annotator_id=annotator_id,
+                annotation_type=annotation_type,
+                is_gold=is_gold,
+                annotations=annotations,
+                verified=verified,
+            )
+            for (_, annotator_id, annotation_type, is_gold), (annotations, verified)
+            in grouped(Annotation.objects.filter(dataset__project_id=project_id)).items()
+        ])
+
+
+def project_stats(project):
+    """Dashboard statistics of a project, exact as of the read."""
+    from authentication.models import User
+
+    from .models import ProjectStat, ProjectStatDelta
+
+    pending = list(
+        ProjectStatDelta.objects.filter(project=project).order_by()
+        .values(*KEY_FIELDS)
+        .annotate(annotations=Sum('annotations'), verified=Sum('verified'), rows=Count('id'))
+    )
+    if sum(row['rows'] for row in pending) > settings.PROJECT_STATS_COMPACT_THRESHOLD:
+        compact_project(project.pk)
+        pending = []
+
+    totals = {}
+    for row in [*ProjectStat.objects.filter(project=project).values(*KEY_FIELDS, 'annotations', 'verified'), *pending]:
+        _add(totals, tuple(row[field] for field in KEY_FIELDS), row['annotations'], row['verified'])
+
+    by_annotator, by_type = {}, {}
+    annotations = verified = gold = 0
+    for (annotator_id, annotation_type, is_gold), (count, verified_count) in totals.items():
+        if not count:
+            continue
+        annotations += count
+        verified += verified_count
+        entry = by_type.setdefault(annotation_type, {'annotations': 0, 'verified': 0, 'gold': 0})
+        entry['annotations'] += count
+        entry['verified'] += verified_count
+        if is_gold:
+            gold += count
+            entry['gold'] += count
+        else:  # Gold annotations are the merged work of everyone, not of their creator
+            _add(by_annotator, annotator_id, count, verified_count)
+
+    usernames = dict(User.objects.filter(pk__in=by_annotator).values_list('pk', 'username'))
+    return {
+        'project': project.pk,
+        'datasets': project.dataset_count,
+        'annotations': annotations,
+        'verified': verified,
+        'verified_percentage': round(100 * verified / annotations, 1) if annotations else 0.0,
+        'gold': gold,
+        'by_annotator': sorted(
+            (
+                {'annotator': annotator_id, 'username': usernames.get(annotator_id), 'annotations': count, 'verified': v}
+                for annotator_id, (count, v) in by_annotator.items()
+            ),
+            key=lambda entry: (-entry['annotations'], entry['annotator']),
+        ),
+        'by_type': [
+            {'annotation_type': annotation_type, **entry}
+            for annotation_type, entry in sorted(by_type.items())
+        ],
+        'computed_at': timezone.now(),
+    }
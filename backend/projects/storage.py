@@ -0,0 +1,129 @@
+"""
+Content-addressed, reference-counted blob storage for dataset media.
+
+Files are stored once under ``MEDIA_ROOT/<BLOB_STORE_DIR>/ab/cd/<sha256>``
+no matter how many datasets use them. Each ``Dataset`` linking to a blob
+holds one reference; the file is removed when the last reference goes away.
+Derivatives (thumbnails, waveforms, ...) live next to it in ``<sha256>.d/``.
+
+Blobs are only ever created or reused from bytes the server has received
+and hashed itself (``store_file``): a digest a client merely announces
+proves nothing about possessing the content.
+"""
+import os
+import shutil
+from pathlib import Path
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F
+
+from .models import MediaBlob
+
+
+def blob_relative_path(sha256):
+    """Return the path of a blob relative to ``MEDIA_ROOT``."""
+    return (Path(settings.BLOB_STORE_DIR) / sha256[:2] / sha256[2:4] / sha256).as_posix()
+
+
+def blob_absolute_path(sha256):
+    """Return the absolute filesystem path of a blob."""
+    return Path(settings.MEDIA_ROOT) / blob_relative_path(sha256)
+
+
+def derivative_relative_path(relative_path):
+    """Return the derivative directory of a media file, relative to ``MEDIA_ROOT``."""
+    return f'{relative_path}.d'
+
+
+def acquire_blob(sha256):
+    """
+    Take a reference on an existing blob.
+
+    Returns the blob, or ``None`` if no blob with that digest is stored.
+    """
+    with transaction.atomic():
+        updated = MediaBlob.objects.filter(sha256=sha256).update(ref_count=F('ref_count') + 1)
+        if not updated:
+            return None
+        return MediaBlob.objects.get(sha256=sha256)
+
+
+def store_file(path, sha256, size):
+    """
+    Move a fully written file into the store and take a reference on it.
+
+    ``sha256`` must be the digest of the file as computed by the server. If
+    a blob with the same digest already exists the file is discarded and the
+    existing blob is reused, so the data is never written twice.
+    """
+    destination = blob_absolute_path(sha256)
+    blob = acquire_blob(sha256)
+    if blob is not None:
+        if destination.exists():
+            os.remove(path)
+        else:
+            # The file of a row that was being collected is gone; we hold the same bytes.
+            destination.parent.mkdir(parents=True, exist_ok=True)
+            os.replace(path, destination)
+        return blob
+
+    destination.parent.mkdir(parents=True, exist_ok=True)
+    os.replace(path, destination)
+    try:
+        with transaction.atomic():
+            return MediaBlob.objects.create(
+                sha256=sha256,
+                size=size,
+                path=blob_relative_path(sha256),
+                ref_count=1,
+            )
+    except IntegrityError:
+        # A concurrent upload of the same content created the row first;
+        # both wrote identical bytes to the same path.
+        return acquire_blob(sha256)
+
+
+def release_blob(blob_id):
+    """
+    Drop a reference on a blob and delete it once it is unreferenced.
+
+    The blob is collected only after the surrounding transaction commits.
+    """
+    MediaBlob.objects.filter(pk=blob_id).update(ref_count=F('ref_count') - 1)
+    transaction.on_commit(lambda: collect_blobs(MediaBlob.objects.filter(pk=blob_id)))
+
+
+def collect_blobs(queryset=None):
+    """
+    Delete unreferenced blobs and their files; returns the number removed.
+
+    Each blob is removed in its own transaction holding its row lock: the
+    reference count is re-checked, then the file is unlinked, then the row
+    deleted. A concurrent ``store_file`` of the same content waits on that
+    lock in ``acquire_blob`` and, once the row is gone, writes a fresh file,
+    so a file stored meanwhile is never unlinked.
+    """
+    if queryset is None:
+        queryset = MediaBlob.objects.all()
+
+    removed = 0
+    unreferenced = queryset.filter(ref_count__lte=0, datasets__isnull=True)
+    for pk in list(unreferenced.values_list('pk', flat=True)):
+        with transaction.atomic():
+            # Re-check under the row lock; a concurrent acquire may have won.
+            blob = unreferenced.select_for_update(of=('self',)).filter(pk=pk).first()
+            if blob is None:
+                continue
+            _remove_file(blob.path)
+            MediaBlob.objects.filter(pk=pk).delete()
+            removed += 1
+    return removed
+
+
+def _remove_file(relative_path):
+    try:
+        os.remove(Path(settings.MEDIA_ROOT) / relative_path)
+    except FileNotFoundError:
+        pass
+    shutil.rmtree(Path(settings.MEDIA_ROOT) / derivative_relative_path(relative_path), ignore_errors=True)
@@ -0,0 +1,93 @@
+"""
+Tests for leased task assignment.
+"""
+from datetime import timedelta
+
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from authentication.models import User
+from projects.assignment import (
+    claim_task, complete_lease, create_tasks, reclaim_expired_leases, release_lease, renew_lease,
+)
+from projects.models import AnnotationTask, Dataset, DatasetItem, Project, TaskLease
+
+
+class AssignmentTests(TestCase):
+    def setUp(self):
+        self.owner = User.objects.create_user(username='owner', email='owner@example.com', password='pw-owner-1')
+        self.annotators = [
+            User.objects.create_user(username=f'ann{i}', email=f'ann{i}@example.com', password='pw-annot-1')
+            for i in range(3)
+        ]
+        self.project = Project.objects.create(name='queue', project_type='image', owner=self.owner)
+        dataset = Dataset.objects.create(name='queue', project=self.project, file_path='queue', file_type='png')
+        DatasetItem.objects.bulk_create(
+            DatasetItem(dataset=dataset, ordinal=i, key=f'{i}.png') for i in range(3)
+        )
+        dataset.item_count = 3
+        dataset.save(update_fields=['item_count'])
+
+    def expire(self, lease):
+        TaskLease.objects.filter(pk=lease.pk).update(expires_at=timezone.now() - timedelta(seconds=1))
+
+    def test_tasks_are_assigned_up_to_their_overlap(self):
+        create_tasks(self.project, required_annotations=2)
+        first, second, third = self.annotators
+        for annotator in self.annotators:
+            for _ in range(3):
+                lease = claim_task(self.project, annotator)
+                if lease is None:
+                    break
+                complete_lease(lease)
+        self.assertEqual(TaskLease.objects.filter(annotator=first).count(), 3)
+        self.assertEqual(TaskLease.objects.filter(annotator=second).count(), 3)
+        self.assertIsNone(claim_task(self.project, third))
+        self.assertFalse(AnnotationTask.objects.filter(is_open=True).exists())
+        self.assertEqual(set(AnnotationTask.objects.values_list('completed_count', flat=True)), {2})
+
+    def test_claim_returns_the_active_lease(self):
+        create_tasks(self.project)
+        lease = claim_task(self.project, self.annotators[0])
+        self.assertEqual(claim_task(self.project, self.annotators[0]).pk, lease.pk)
+
+    def test_claim_moves_past_filled_tasks(self):
+        create_tasks(self.project)
+        # Tasks that filled up behind the claimer's back, e.g. concurrent claims on SQLite
+        AnnotationTask.objects.filter(item__ordinal__lt=2).update(assigned_count=1)
+        lease = claim_task(self.project, self.annotators[0])
+        self.assertEqual(lease.task.item.ordinal, 2)
+
+    def test_expired_and_released_tasks_go_to_someone_else(self):
+        create_tasks(self.project)
+        annotator, other = self.annotators[:2]
+        expired = claim_task(self.project, annotator)
+        self.expire(expired)
+        self.assertIsNone(renew_lease(expired))
+        self.assertIsNone(complete_lease(expired))
+
+        self.assertEqual(reclaim_expired_leases(project=self.project), 1)
+        released = claim_task(self.project, annotator)
+        release_lease(released)
+        self.assertEqual(
+            dict(TaskLease.objects.values_list('pk', 'status')), {expired.pk: 'expired', released.pk: 'released'}
+        )
+
+        last = claim_task(self.project, annotator)
+        self.assertNotIn(last.task_id, (expired.task_id, released.task_id))
+        complete_lease(last)
+        self.assertIsNone(claim_task(self.project, annotator))
+        self.assertEqual(claim_task(self.project, other).task_id, expired.task_id)
+
+    def test_expired_lease_actions_conflict(self):
+        create_tasks(self.project)
+        lease = claim_task(self.project, self.annotators[0])
+        self.expire(lease)
+        client = APIClient()
+        client.force_authenticate(self.annotators[0])
+        for action in ('renew', 'complete'):
+            response = client.post(f'/api/v1/tasks/leases/{lease.pk}/{action}/')
+            self.assertEqual(response.status_code, 409, response.content)
+        lease.refresh_from_db()
+        self.assertEqual(lease.status, 'active')
@@ -0,0 +1,72 @@
+"""
+Tests for the denormalized dataset and project counters.
+"""
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from authentication.models import User
+from projects.models import Annotation, Dataset, DatasetItem, Project
+
+
+class CounterTests(TestCase):
+    def setUp(self):
+        self.owner = User.objects.create_user(username='owner', email='owner@example.com', password='pw-owner-1')
+        self.annotator = User.objects.create_user(username='ann', email='ann@example.com', password='pw-annot-1')
+        self.project = Project.objects.create(name='counted', project_type='image', owner=self.owner)
+        self.dataset = Dataset.objects.create(
+            name='counted', project=self.project, file_path='counted', file_type='png'
+        )
+        DatasetItem.objects.append(self.dataset, [DatasetItem(key=f'{i}.png') for i in range(3)])
+        self.items = list(self.dataset.items.all())
+        for user in (self.owner, self.annotator):
+            for item in self.items:
+                self.annotate(user, item)
+
+    def annotate(self, user, item=None):
+        return Annotation.objects.create(
+            dataset=self.dataset, item=item, annotator=user, annotation_type='classification', content={'label': 'a'}
+        )
+
+    def assertCounts(self, annotations, items=None):
+        self.dataset.refresh_from_db()
+        self.project.refresh_from_db()
+        self.assertEqual(Annotation.objects.filter(dataset=self.dataset).count(), annotations)
+        self.assertEqual((self.dataset.annotation_count, self.project.annotation_count), (annotations, annotations))
+        if items is not None:
+            self.assertEqual(self.dataset.item_count, items)
+
+    def test_create_and_delete(self):
+        self.assertCounts(6, items=3)
+        Annotation.objects.filter(annotator=self.owner).first().delete()
+        self.assertCounts(5)
+        Annotation.objects.filter(annotator=self.owner).delete()
+        self.assertCounts(3)
+
+    def test_user_delete_cascades_through_the_counters(self):
+        self.annotator.delete()
+        self.assertCounts(3)
+
+    def test_item_delete_cascades_through_the_counters(self):
+        self.items[0].delete()
+        self.assertCounts(4, items=2)
+        DatasetItem.objects.filter(dataset=self.dataset).delete()
+        self.assertCounts(0, items=0)
+
+    def test_bulk_create_refuses_conflict_handling(self):
+        with self.assertRaises(ValueError):
+            Annotation.objects.bulk_create([Annotation(
+                dataset=self.dataset, annotator=self.owner, annotation_type='transcription', content={},
+            )], ignore_conflicts=True)
+
+    def test_reconcile_repairs_drift(self):
+        Dataset.objects.filter(pk=self.dataset.pk).update(annotation_count=1, item_count=9)
+        out = StringIO()
+        call_command('reconcile_counters', '--dry-run', stdout=out)
+        self.assertIn('Found 1 dataset(s)', out.getvalue())
+        self.dataset.refresh_from_db()
+        self.assertEqual(self.dataset.item_count, 9)
+
+        call_command('reconcile_counters', stdout=StringIO())
+        self.assertCounts(6, items=3)
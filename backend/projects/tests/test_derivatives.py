@@ -0,0 +1,159 @@
+"""
+Tests for media derivatives and the processing pipeline.
+"""
+import json
+import shutil
+import tempfile
+import wave
+from pathlib import Path
+from unittest import mock
+
+import numpy as np
+from django.test import SimpleTestCase, TestCase, override_settings
+from PIL import Image, ImageOps
+
+from authentication.models import User
+from projects import derivatives, tiles
+from projects.models import Dataset, Project
+from projects.processing import process_datasets
+
+
+class DerivativeTests(SimpleTestCase):
+    def setUp(self):
+        self.dir = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.dir, ignore_errors=True)
+
+    def write_wav(self, samples, channels=1):
+        path = self.dir / 'clip.wav'
+        with wave.open(str(path), 'wb') as wav:
+            wav.setnchannels(channels)
+            wav.setsampwidth(2)
+            wav.setframerate(8000)
+            wav.writeframes(np.asarray(samples, dtype='<i2').tobytes())
+        return path
+
+    def test_image_sizes_keep_the_aspect_ratio(self):
+        source = self.dir / 'photo.png'
+        Image.new('RGBA', (2000, 1000), (255, 0, 0, 128)).save(source)
+        fractions = []
+        manifest = derivatives.image_derivatives(source, self.dir, progress=fractions.append)
+        self.assertEqual((manifest['width'], manifest['height']), (2000, 1000))
+        self.assertEqual(manifest['files']['thumbnail'], {'file': 'thumbnail.jpg', 'width': 256, 'height': 128})
+        self.assertEqual(manifest['files']['preview'], {'file': 'preview.jpg', 'width': 1024, 'height': 512})
+        self.assertNotIn('tiles', manifest['files'])
+        with Image.open(self.dir / 'thumbnail.jpg') as thumbnail:
+            self.assertEqual((thumbnail.format, thumbnail.mode, thumbnail.size), ('JPEG', 'RGB', (256, 128)))
+        self.assertEqual(fractions, [1.0])
+
+    def test_large_images_are_previewed_from_the_pyramid(self):
+        source = self.dir / 'panorama.jpg'
+        pixels = np.zeros((100, 5000, 3), np.uint8)
+        pixels[:, 2500:] = 255
+        exif = Image.Exif()
+        exif[0x0112] = 6  # Rotated 90 degrees clockwise
+        Image.fromarray(pixels).save(source, exif=exif)
+
+        manifest = derivatives.image_derivatives(source, self.dir)
+        self.assertEqual((manifest['width'], manifest['height']), (100, 5000))
+        self.assertEqual((manifest['files']['tiles']['width'], manifest['files']['tiles']['height']), (100, 5000))
+        self.assertNotIn('tiles_skipped', manifest)
+        with Image.open(source) as image, Image.open(self.dir / 'preview.jpg') as preview:
+            self.assertEqual(preview.size, (20, 1024))
+            expected = np.asarray(ImageOps.exif_transpose(image).resize(preview.size), dtype=int)
+            self.assertLess(np.abs(np.asarray(preview, dtype=int) - expected).mean(), 8)
+
+    def test_tiling_skipped_is_recorded(self):
+        Image.new('RGB', (5000, 100), 'red').save(self.dir / 'wide.jpg')
+        Image.new('RGB', (5000, 100), 'red').save(self.dir / 'wide.png')
+        with mock.patch.object(tiles, 'pyvips', None), mock.patch.object(tiles, 'MAX_PIXELS', 100000):
+            with self.assertLogs('projects.derivatives', 'WARNING'):
+                manifest = derivatives.image_derivatives(self.dir / 'wide.jpg', self.dir)
+            self.assertIn('pyvips', manifest['tiles_skipped'])
+            self.assertNotIn('tiles', manifest['files'])
+            # JPEG previews are decoded at a reduced scale, other formats need the whole image.
+            self.assertEqual(manifest['files']['preview']['width'], 1024)
+            with self.assertLogs('projects.derivatives', 'WARNING'), self.assertRaises(derivatives.DerivativeError):
+                derivatives.image_derivatives(self.dir / 'wide.png', self.dir)
+
+    def test_unreadable_image(self):
+        source = self.dir / 'broken.png'
+        source.write_bytes(b'not an image')
+        with self.assertRaises(derivatives.DerivativeError):
+            derivatives.image_derivatives(source, self.dir)
+
+    def test_waveform_levels(self):
+        base = derivatives.WAVEFORM_BASE_SAMPLES
+        samples = np.zeros(base * 5, dtype=np.int16)
+        samples[3] = 1000
+        samples[base * 4 + 1] = -2000
+        manifest = derivatives.audio_waveform(self.write_wav(samples), self.dir)
+
+        self.assertEqual((manifest['duration'], manifest['sample_rate']), (base * 5 / 8000, 8000))
+        levels = manifest['files']['waveform']['levels']
+        self.assertEqual([level['peaks'] for level in levels], [5, 3, 2, 1])
+        self.assertEqual([level['samples_per_peak'] for level in levels], [base, base * 2, base * 4, base * 8])
+
+        data = np.frombuffer((self.dir / 'waveform.dat').read_bytes(), dtype='<i2').reshape(-1, 2)
+        self.assertEqual(len(data), 5 + 3 + 2 + 1)
+        self.assertEqual(data[:5].tolist(), [[0, 1000], [0, 0], [0, 0], [0, 0], [-2000, 0]])
+        coarsest = levels[-1]['offset'] // 4
+        self.assertEqual(data[coarsest].tolist(), [-2000, 1000])
+
+    def test_stereo_is_mixed_down(self):
+        samples = np.tile([100, 300], derivatives.WAVEFORM_BASE_SAMPLES)
+        derivatives.audio_waveform(self.write_wav(samples, channels=2), self.dir)
+        data = np.frombuffer((self.dir / 'waveform.dat').read_bytes(), dtype='<i2')
+        self.assertEqual(data[:2].tolist(), [200, 200])
+
+    def test_manifest_is_reused(self):
+        source = self.write_wav(np.ones(10, dtype=np.int16))
+        out_dir = self.dir / 'clip.wav.d'
+        manifest = derivatives.generate('audio', source, out_dir)
+        self.assertEqual(json.loads((out_dir / derivatives.MANIFEST).read_text()), manifest)
+        source.unlink()
+        self.assertEqual(derivatives.generate('audio', source, out_dir), manifest)
+        with self.assertRaises(derivatives.DerivativeError):
+            derivatives.generate('audio', source, self.dir / 'other.d')
+
+
+class ProcessingTests(TestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        settings = override_settings(MEDIA_ROOT=media_root)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        Image.new('RGB', (400, 300), 'blue').save(Path(media_root) / 'photo.png')
+
+        owner = User.objects.create_user(username='owner', email='owner@example.com', password='pw-owner-1')
+        self.project = Project.objects.create(name='media', project_type='image', owner=owner)
+        self.media_root = Path(media_root)
+
+    def dataset(self, name, file_path, file_type):
+        return Dataset.objects.create(
+            name=name, project=self.project, file_path=file_path, file_type=file_type, processing_status='uploaded'
+        )
+
+    def test_process_datasets(self):
+        image = self.dataset('photo', 'photo.png', 'png')
+        missing = self.dataset('gone', 'gone.png', 'png')
+        text = self.dataset('notes', 'notes.txt', 'txt')
+
+        with self.assertLogs('projects.processing', 'WARNING'):
+            self.assertEqual(process_datasets(workers=1), (2, 1))
+
+        image.refresh_from_db()
+        self.assertEqual((image.processing_status, image.is_processed), ('processed', True))
+        self.assertEqual(image.metadata['derivatives']['path'], 'photo.png.d')
+        self.assertEqual((image.metadata['width'], image.metadata['height']), (400, 300))
+        self.assertTrue((self.media_root / 'photo.png.d' / 'thumbnail.jpg').is_file())
+
+        missing.refresh_from_db()
+        self.assertEqual(missing.processing_status, 'failed')
+        self.assertIn('processing_error', missing.metadata)
+        text.refresh_from_db()
+        self.assertEqual(text.processing_status, 'processed')
+        self.assertNotIn('derivatives', text.metadata or {})
+
+        # Finished datasets are not picked up again
+        self.assertEqual(process_datasets(workers=1), (0, 0))
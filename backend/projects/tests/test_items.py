@@ -0,0 +1,58 @@
+"""
+Tests for dataset items and their endpoints.
+"""
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from authentication.models import User
+from projects.models import Dataset, DatasetItem, Project
+
+
+class DatasetItemTests(TestCase):
+    def setUp(self):
+        self.owner = User.objects.create_user(username='owner', email='owner@example.com', password='pw-owner-1')
+        project = Project.objects.create(name='items', project_type='image', owner=self.owner)
+        self.dataset = Dataset.objects.create(name='items', project=project, file_path='items', file_type='png')
+        self.client = APIClient()
+        self.client.force_authenticate(self.owner)
+        self.url = f'/api/v1/datasets/{self.dataset.pk}/items/'
+
+    def test_append_continues_the_ordinals(self):
+        self.assertEqual(DatasetItem.objects.append(self.dataset, [DatasetItem(key='a'), DatasetItem(key='b')]), 2)
+        created = DatasetItem.objects.append(
+            self.dataset, (DatasetItem(key=key) for key in 'cde'), batch_size=2
+        )
+        self.assertEqual(created, 3)
+        self.assertEqual(
+            list(self.dataset.items.values_list('ordinal', 'key')),
+            [(0, 'a'), (1, 'b'), (2, 'c'), (3, 'd'), (4, 'e')],
+        )
+        self.dataset.refresh_from_db()
+        self.assertEqual(self.dataset.item_count, 5)
+
+    def test_status_counts(self):
+        DatasetItem.objects.append(self.dataset, [
+            DatasetItem(key='a'),
+            DatasetItem(key='b', status=DatasetItem.STATUS_ANNOTATED),
+            DatasetItem(key='c', status=DatasetItem.STATUS_ANNOTATED),
+        ])
+        counts = DatasetItem.objects.status_counts(self.dataset)
+        self.assertEqual(counts[DatasetItem.STATUS_PENDING], 1)
+        self.assertEqual(counts[DatasetItem.STATUS_ANNOTATED], 2)
+        self.assertEqual(counts[DatasetItem.STATUS_SKIPPED], 0)
+
+    def test_endpoints(self):
+        response = self.client.post(self.url, [{'key': 'a.png', 'size': 10}, {'key': 'b.png', 'status': 2}], format='json')
+        self.assertEqual((response.status_code, response.data['created']), (201, 2))
+        self.assertEqual(self.client.post(self.url, {'key': 'c.png'}, format='json').status_code, 400)
+
+        response = self.client.get(self.url, {'status': 'annotated'})
+        self.assertEqual([item['key'] for item in response.data['results']], ['b.png'])
+
+        response = self.client.get(f'{self.url}1/')
+        self.assertEqual((response.data['item']['key'], response.data['item']['ordinal']), ('b.png', 1))
+        self.assertEqual(self.client.get(f'{self.url}5/').status_code, 404)
+
+        response = self.client.get(f'{self.url}stats/')
+        self.assertEqual(response.data['total'], 2)
+        self.assertEqual((response.data['by_status']['pending'], response.data['by_status']['annotated']), (1, 1))
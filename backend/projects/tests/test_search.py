@@ -0,0 +1,110 @@
+"""
+Tests for annotation full-text search.
+"""
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase
+from rest_framework.test import APIClient
+
+from authentication.models import User
+from projects.models import Annotation, Dataset, Project
+from projects.search import extract, markup, parse_query, search
+
+
+class ExtractionTests(SimpleTestCase):
+    def test_extract(self):
+        content = {
+            'text': 'Hello there',
+            'segments': [{'text': 'general Kenobi', 'label': 'speaker_b'}],
+            'objects': [{'mask': {'$rle': 'abc', 'size': [2, 2]}, 'category': 'droid'}],
+            'points': {'$f32': 'AAAA'},
+        }
+        self.assertEqual(extract(content), ('Hello there general Kenobi', 'speaker_b droid'))
+
+    def test_parse_query(self):
+        self.assertEqual(parse_query('Kenobi  gen* "there"'), [('kenobi', False), ('gen', True), ('there', False)])
+        self.assertEqual(parse_query(' * -- '), [])
+
+    def test_markup_escapes_the_snippet(self):
+        self.assertEqual(markup('<b>\x02hi\x03</b>'), '&lt;b&gt;<mark>hi</mark>&lt;/b&gt;')
+
+
+class SearchTests(TestCase):
+    def setUp(self):
+        self.owner = User.objects.create_user(username='owner', email='owner@example.com', password='pw-owner-1')
+        self.project = Project.objects.create(name='calls', project_type='audio', owner=self.owner)
+        self.datasets = [
+            Dataset.objects.create(name=f'call {i}', project=self.project, file_path=f'call{i}.wav', file_type='wav')
+            for i in range(3)
+        ]
+        self.transcript = self.annotate(self.datasets[0], 'transcription', {'text': 'the weather is sunny today'})
+        self.label = self.annotate(self.datasets[1], 'classification', {'label': 'weather'})
+        self.other = self.annotate(self.datasets[2], 'transcription', {'text': 'nothing to report'})
+
+        elsewhere = Project.objects.create(name='other', project_type='audio', owner=self.owner)
+        self.annotate(
+            Dataset.objects.create(name='other', project=elsewhere, file_path='other.wav', file_type='wav'),
+            'transcription', {'text': 'weather report'},
+        )
+
+    def annotate(self, dataset, annotation_type, content):
+        return Annotation.objects.create(
+            dataset=dataset, annotator=self.owner, annotation_type=annotation_type, content=content
+        )
+
+    def ids(self, query, **kwargs):
+        return [hit[0] for hit in search(self.project.pk, query, **kwargs)]
+
+    def test_ranking_and_scope(self):
+        # Labels weigh more than text, other projects are not searched
+        self.assertEqual(self.ids('weather'), [self.label.pk, self.transcript.pk])
+        self.assertEqual(self.ids('weather', dataset_id=self.datasets[0].pk), [self.transcript.pk])
+        self.assertEqual(self.ids('weather', annotation_type='classification'), [self.label.pk])
+        self.assertEqual(self.ids('weather sunny'), [self.transcript.pk])
+        self.assertEqual(self.ids('sun'), [])
+        self.assertEqual(self.ids('sun*'), [self.transcript.pk])
+        # Scope tokens are quoted and stripped to letters, the type cannot widen the match
+        self.assertEqual(self.ids('weather', annotation_type='x) OR (p1'), [])
+        self.assertEqual(self.ids('weather', annotation_type='"'), [])
+
+        (_, score, snippet, labels), = search(self.project.pk, 'sunny')
+        self.assertGreater(score, 0)
+        self.assertIn('<mark>sunny</mark>', snippet)
+        self.assertEqual(labels, '')
+
+    def test_index_follows_writes(self):
+        self.transcript.content = {'text': 'it will rain'}
+        self.transcript.save()
+        self.assertEqual(self.ids('sunny'), [])
+        self.assertEqual(self.ids('rain'), [self.transcript.pk])
+
+        self.transcript.delete()
+        self.assertEqual(self.ids('rain'), [])
+        self.datasets[1].delete()
+        self.assertEqual(self.ids('weather'), [])
+
+    def test_rebuild_picks_up_queryset_updates(self):
+        Annotation.objects.filter(pk=self.other.pk).update(content={'text': 'storm warning'})
+        self.assertEqual(self.ids('storm'), [])
+        out = StringIO()
+        call_command('rebuild_search_index', project=[self.project.pk], stdout=out)
+        self.assertIn('Indexed 3 annotation(s)', out.getvalue())
+        self.assertEqual(self.ids('storm'), [self.other.pk])
+
+    def test_endpoint(self):
+        client = APIClient()
+        client.force_authenticate(self.owner)
+        url = f'/api/v1/projects/{self.project.pk}/search/'
+        self.assertEqual(client.get(url, {'q': '  '}).status_code, 400)
+        self.assertEqual(client.get(url, {'q': 'weather', 'page': 'x'}).status_code, 400)
+        self.assertEqual(client.get(url, {'q': 'weather', 'annotation_type': 'a"b'}).status_code, 400)
+        response = client.get(url, {'q': 'weather', 'annotation_type': 'classification'})
+        self.assertEqual([hit['annotation'] for hit in response.data['results']], [self.label.pk])
+
+        response = client.get(url, {'q': 'weather', 'page_size': 1})
+        self.assertEqual([hit['annotation'] for hit in response.data['results']], [self.label.pk])
+        self.assertEqual(response.data['results'][0]['labels'], '<mark>weather</mark>')
+        response = client.get(response.data['next'])
+        self.assertEqual([hit['annotation'] for hit in response.data['results']], [self.transcript.pk])
+        self.assertIsNone(response.data['next'])
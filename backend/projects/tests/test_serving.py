@@ -0,0 +1,111 @@
+"""
+Tests for range-aware media serving.
+"""
+import shutil
+import tempfile
+from pathlib import Path
+
+from django.test import AsyncRequestFactory, SimpleTestCase, TestCase, override_settings
+from rest_framework.test import APIClient
+
+from authentication.models import User
+from projects.models import Dataset, Project
+from projects.serving import RangeNotSatisfiable, parse_range, serve_file
+
+CONTENT = bytes(range(256)) * 4
+
+
+class ParseRangeTests(SimpleTestCase):
+    def test_ranges(self):
+        self.assertEqual(parse_range('bytes=0-99', 1024), (0, 99))
+        self.assertEqual(parse_range('bytes=1000-', 1024), (1000, 1023))
+        self.assertEqual(parse_range('bytes=1000-5000', 1024), (1000, 1023))
+        self.assertEqual(parse_range('bytes=-24', 1024), (1000, 1023))
+        self.assertEqual(parse_range('bytes=-5000', 1024), (0, 1023))
+
+    def test_ignored_headers(self):
+        for header in (None, '', 'bytes=-', 'items=0-1', 'bytes=0-1,5-6'):
+            self.assertIsNone(parse_range(header, 1024))
+
+    def test_unsatisfiable(self):
+        for header in ('bytes=1024-', 'bytes=5-4', 'bytes=-0'):
+            with self.assertRaises(RangeNotSatisfiable):
+                parse_range(header, 1024)
+
+
+class MediaViewTests(TestCase):
+    def setUp(self):
+        media_root = Path(tempfile.mkdtemp()).resolve()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        settings = override_settings(MEDIA_ROOT=media_root, MEDIA_SENDFILE_BACKEND='')
+        settings.enable()
+        self.addCleanup(settings.disable)
+        (media_root / 'clip.wav').write_bytes(CONTENT)
+        self.path = media_root / 'clip.wav'
+
+        self.owner = User.objects.create_user(username='owner', email='owner@example.com', password='pw-owner-1')
+        project = Project.objects.create(name='audio', project_type='audio', owner=self.owner)
+        self.dataset = Dataset.objects.create(name='clip', project=project, file_path='clip.wav', file_type='wav')
+        self.url = f'/api/v1/datasets/{self.dataset.pk}/media/'
+        self.client = APIClient()
+        self.client.force_authenticate(self.owner)
+
+    def get(self, url=None, **headers):
+        response = self.client.get(url or self.url, **headers)
+        body = b''.join(response.streaming_content) if response.streaming else response.content
+        return response, body
+
+    def test_whole_file(self):
+        response, body = self.get()
+        self.assertEqual((response.status_code, body), (200, CONTENT))
+        self.assertEqual(response['Content-Type'], 'audio/x-wav')
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertIn('filename="clip.wav"', response['Content-Disposition'])
+        self.assertTrue(response['ETag'] and response['Last-Modified'])
+
+    def test_ranges(self):
+        response, body = self.get(HTTP_RANGE='bytes=10-19')
+        self.assertEqual((response.status_code, body), (206, CONTENT[10:20]))
+        self.assertEqual((response['Content-Range'], response['Content-Length']), ('bytes 10-19/1024', '10'))
+
+        response, body = self.get(HTTP_RANGE='bytes=1000-')
+        self.assertEqual((response.status_code, body), (206, CONTENT[1000:]))
+        self.assertEqual(response['Content-Range'], 'bytes 1000-1023/1024')
+
+        response, _ = self.get(HTTP_RANGE='bytes=2000-')
+        self.assertEqual((response.status_code, response['Content-Range']), (416, 'bytes */1024'))
+
+    def test_validators(self):
+        etag = self.get()[0]['ETag']
+        self.assertEqual(self.get(HTTP_IF_NONE_MATCH=etag)[0].status_code, 304)
+        # A stale If-Range gets the whole, current file
+        response, body = self.get(HTTP_RANGE='bytes=0-9', HTTP_IF_RANGE='"stale"')
+        self.assertEqual((response.status_code, body), (200, CONTENT))
+        self.assertEqual(self.get(HTTP_RANGE='bytes=0-9', HTTP_IF_RANGE=etag)[0].status_code, 206)
+
+    def test_sendfile_offload(self):
+        with override_settings(MEDIA_SENDFILE_BACKEND='nginx'):
+            response, body = self.get(HTTP_RANGE='bytes=0-9')
+        self.assertEqual((response.status_code, body), (200, b''))
+        self.assertEqual(response['X-Accel-Redirect'], '/protected-media/clip.wav')
+        with override_settings(MEDIA_SENDFILE_BACKEND='xsendfile'):
+            self.assertEqual(self.get()[0]['X-Sendfile'], str(self.path))
+
+    def test_access(self):
+        self.assertEqual(self.get(f'{self.url}thumbnail/')[0].status_code, 404)
+        outside = Path(tempfile.mkdtemp()).resolve()
+        self.addCleanup(shutil.rmtree, outside, ignore_errors=True)
+        (outside / 'secret.wav').write_bytes(CONTENT)
+        Dataset.objects.filter(pk=self.dataset.pk).update(file_path=f'../{outside.name}/secret.wav')
+        self.assertEqual(self.get()[0].status_code, 404)
+
+        other = User.objects.create_user(username='other', email='other@example.com', password='pw-other-1')
+        self.client.force_authenticate(other)
+        self.assertEqual(self.get()[0].status_code, 404)
+
+    async def test_asgi_streams_the_range(self):
+        request = AsyncRequestFactory().get('/', headers={'range': 'bytes=10-19'})
+        response = serve_file(request, self.path)
+        body = b''.join([block async for block in response.streaming_content])
+        self.assertEqual((response.status_code, body), (206, CONTENT[10:20]))
+        self.assertEqual(response['Content-Range'], 'bytes 10-19/1024')
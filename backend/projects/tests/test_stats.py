@@ -0,0 +1,97 @@
+"""
+Tests for the materialized project statistics.
+"""
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from authentication.models import User
+from projects.models import Annotation, Dataset, DatasetItem, Project, ProjectStat, ProjectStatDelta
+from projects.stats import compact_project, project_stats, rebuild_project
+
+
+class ProjectStatsTests(TestCase):
+    def setUp(self):
+        self.owner = User.objects.create_user(username='owner', email='owner@example.com', password='pw-owner-1')
+        self.annotator = User.objects.create_user(username='ann', email='ann@example.com', password='pw-annot-1')
+        self.project = Project.objects.create(name='pets', project_type='image', owner=self.owner)
+        self.dataset = Dataset.objects.create(name='pets', project=self.project, file_path='pets', file_type='png')
+        DatasetItem.objects.append(self.dataset, [DatasetItem(key=f'{i}.png') for i in range(3)])
+        self.items = list(self.dataset.items.all())
+        for user in (self.owner, self.annotator):
+            for item in self.items:
+                Annotation.objects.create(
+                    dataset=self.dataset, item=item, annotator=user, annotation_type='classification',
+                    content={'label': 'cat'},
+                )
+        Annotation.objects.create(
+            dataset=self.dataset, item=self.items[0], annotator=self.owner, annotation_type='classification',
+            content={'label': 'cat'}, is_gold=True, is_verified=True,
+        )
+
+    def stats(self):
+        self.project.refresh_from_db()
+        stats = project_stats(self.project)
+        stats.pop('computed_at')
+        return stats
+
+    def test_reads_are_exact_before_and_after_compaction(self):
+        Annotation.objects.filter(annotator=self.annotator, item=self.items[0]).verify(self.owner)
+        annotation = Annotation.objects.get(annotator=self.owner, item=self.items[1], is_gold=False)
+        annotation.annotation_type = 'bounding_box'
+        annotation.content = {'objects': []}
+        annotation.save()
+        Annotation.objects.filter(annotator=self.annotator, item=self.items[2]).delete()
+
+        expected = {
+            'project': self.project.pk,
+            'datasets': 1,
+            'annotations': 6,
+            'verified': 2,
+            'verified_percentage': 33.3,
+            'gold': 1,
+            'by_annotator': [
+                {'annotator': self.owner.pk, 'username': 'owner', 'annotations': 3, 'verified': 0},
+                {'annotator': self.annotator.pk, 'username': 'ann', 'annotations': 2, 'verified': 1},
+            ],
+            'by_type': [
+                {'annotation_type': 'bounding_box', 'annotations': 1, 'verified': 0, 'gold': 0},
+                {'annotation_type': 'classification', 'annotations': 5, 'verified': 2, 'gold': 1},
+            ],
+        }
+        self.assertEqual(self.stats(), expected)
+
+        self.assertGreater(compact_project(self.project.pk), 0)
+        self.assertFalse(ProjectStatDelta.objects.exists())
+        self.assertEqual(self.stats(), expected)
+
+        rebuild_project(self.project.pk)
+        self.assertEqual(self.stats(), expected)
+
+    def test_rows_that_drop_to_zero_are_deleted(self):
+        compact_project(self.project.pk)
+        Annotation.objects.filter(annotator=self.annotator).delete()
+        compact_project(self.project.pk)
+        self.assertFalse(ProjectStat.objects.filter(annotator=self.annotator).exists())
+        self.assertEqual([entry['annotator'] for entry in self.stats()['by_annotator']], [self.owner.pk])
+
+    @override_settings(PROJECT_STATS_COMPACT_THRESHOLD=2)
+    def test_large_logs_are_compacted_on_read(self):
+        self.stats()
+        self.assertFalse(ProjectStatDelta.objects.exists())
+
+    def test_compact_command(self):
+        out = StringIO()
+        call_command('compact_stats', stdout=out)
+        self.assertIn('1 project(s)', out.getvalue())
+        self.assertFalse(ProjectStatDelta.objects.exists())
+
+    def test_endpoint_is_for_members(self):
+        client = APIClient()
+        client.force_authenticate(self.annotator)
+        self.assertEqual(client.get(f'/api/v1/projects/{self.project.pk}/stats/').status_code, 404)
+        client.force_authenticate(self.owner)
+        response = client.get(f'/api/v1/projects/{self.project.pk}/stats/')
+        self.assertEqual((response.status_code, response.data['stats']['annotations']), (200, 7))
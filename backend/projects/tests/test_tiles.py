@@ -0,0 +1,90 @@
+"""
+Tests for deep zoom tile pyramids.
+"""
+import io
+import os
+import shutil
+import tempfile
+from pathlib import Path
+from unittest import mock
+
+import numpy as np
+from django.test import SimpleTestCase
+from PIL import Image, TiffImagePlugin
+
+from projects import tiles
+
+
+class PyramidTests(SimpleTestCase):
+    def setUp(self):
+        self.dir = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.dir, ignore_errors=True)
+        x = np.arange(600, dtype=np.uint16)
+        y = np.arange(700, dtype=np.uint16)[:, None]
+        pixels = np.empty((700, 600, 3), np.uint8)
+        pixels[..., 0], pixels[..., 1], pixels[..., 2] = x * 255 // 599, y * 255 // 699, 128
+        self.image = Image.fromarray(pixels)
+        self.source = self.dir / 'source.png'
+        self.image.save(self.source)
+
+    def tile(self, archive, level, col, row):
+        return np.asarray(Image.open(io.BytesIO(bytes(archive.tile(level, col, row)))), dtype=int)
+
+    def test_every_tile_has_its_box(self):
+        fractions = []
+        description = tiles.build_pyramid(self.source, self.dir / 'tiles.dzt', progress=fractions.append, tile_size=64)
+        self.assertEqual(
+            (description['width'], description['height'], description['levels']), (600, 700, 11)
+        )
+        self.assertEqual(fractions[-1], 1.0)
+
+        archive = tiles.TileArchive(self.dir / 'tiles.dzt')
+        count = 0
+        for level in range(archive.max_level + 1):
+            level_width, level_height = tiles.level_size(600, 700, level)
+            columns, rows = tiles.level_grid(600, 700, level, 64)
+            for row in range(rows):
+                for col in range(columns):
+                    left, top, right, bottom = tiles.tile_box(level_width, level_height, col, row, 64)
+                    self.assertEqual(self.tile(archive, level, col, row).shape, (bottom - top, right - left, 3))
+                    count += 1
+        self.assertEqual(count, description['tiles'])
+        self.assertIsNone(archive.tile(archive.max_level, columns, 0))
+
+    def test_levels_match_the_downscaled_image(self):
+        tiles.build_pyramid(self.source, self.dir / 'tiles.dzt', tile_size=64)
+        archive = tiles.TileArchive(self.dir / 'tiles.dzt')
+        for level, factor in ((archive.max_level, 1), (archive.max_level - 2, 4)):
+            expected = np.asarray(self.image.reduce(factor), dtype=int)
+            for col, row in ((0, 0), (1, 2), (2, 1)):
+                left, top, right, bottom = tiles.tile_box(*tiles.level_size(600, 700, level), col, row, 64)
+                difference = np.abs(self.tile(archive, level, col, row) - expected[top:bottom, left:right])
+                self.assertLess(difference.mean(), 3)  # JPEG noise
+
+    def test_too_large_for_pillow(self):
+        with mock.patch.object(tiles, 'pyvips', None), mock.patch.object(tiles, 'MAX_PIXELS', 1000):
+            with self.assertRaises(Image.DecompressionBombError):
+                tiles.build_pyramid(self.source, self.dir / 'tiles.dzt')
+        self.assertEqual(os.listdir(self.dir), ['source.png'])
+
+    def test_uncompressed_images_are_read_in_strips(self):
+        with mock.patch.object(TiffImagePlugin, 'WRITE_LIBTIFF', True):
+            self.image.save(self.dir / 'strips.tif', compression='raw', strip_size=64 * 1024)
+        self.image.convert('P').save(self.dir / 'palette.bmp')  # Stored bottom-up
+        for name in ('strips.tif', 'palette.bmp'):
+            with Image.open(self.dir / name) as image:
+                expected = np.asarray(image.convert('RGB'))
+            with mock.patch.object(tiles, 'pyvips', None), mock.patch.object(tiles, 'MAX_PIXELS', 1000):
+                strips = tiles._strips(self.dir / name, rows=100)
+                self.assertEqual(next(strips), (600, 700))
+                np.testing.assert_array_equal(np.concatenate([np.asarray(strip) for strip in strips]), expected)
+                tiles.build_pyramid(self.dir / name, self.dir / 'tiles.dzt', tile_size=64)
+
+    def test_level_image(self):
+        tiles.build_pyramid(self.source, self.dir / 'tiles.dzt', tile_size=64)
+        archive = tiles.TileArchive(self.dir / 'tiles.dzt')
+        level = archive.level_image(archive.max_level - 1)
+        archive.close()
+        self.assertEqual(level.size, (300, 350))
+        difference = np.abs(np.asarray(level, dtype=int) - np.asarray(self.image.reduce(2), dtype=int))
+        self.assertLess(difference.mean(), 3)
@@ -0,0 +1,178 @@
+"""
+Tests for chunked uploads and the content-addressed blob store.
+"""
+import hashlib
+import shutil
+import tempfile
+from pathlib import Path
+from unittest import mock
+
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from authentication.models import User
+from projects.models import Dataset, MediaBlob, Project, UploadChunk, UploadSession
+from projects.storage import blob_absolute_path, collect_blobs, store_file
+from projects.uploads import UploadError, start_upload
+
+
+class UploadTestCase(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        settings_override = override_settings(
+            MEDIA_ROOT=self.media_root,
+            UPLOAD_TEMP_DIR=Path(self.media_root) / 'uploads',
+            MEDIA_SENDFILE_BACKEND='',
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.owner = User.objects.create_user(username='owner', email='owner@example.com', password='pw-owner-1')
+        self.other = User.objects.create_user(username='other', email='other@example.com', password='pw-other-1')
+        self.project = Project.objects.create(name='images', project_type='image', owner=self.owner)
+        self.other_project = Project.objects.create(name='theirs', project_type='image', owner=self.other)
+
+    def client_for(self, user):
+        client = APIClient()
+        client.force_authenticate(user)
+        return client
+
+    def upload(self, user, project, data, chunk_size=4, **start):
+        """Run the whole protocol; returns the completion response."""
+        client = self.client_for(user)
+        response = client.post('/api/v1/uploads/', {
+            'project': project.pk, 'filename': 'scan.png', 'file_size': len(data), **start,
+        }, format='json')
+        self.assertEqual(response.status_code, 201, response.content)
+        upload_id = response.json()['upload']['id']
+        for offset in range(0, len(data), chunk_size):
+            chunk = data[offset:offset + chunk_size]
+            response = client.generic(
+                'PUT', f'/api/v1/uploads/{upload_id}/', chunk, content_type='application/octet-stream',
+                HTTP_CONTENT_RANGE=f'bytes {offset}-{offset + len(chunk) - 1}/{len(data)}',
+            )
+            self.assertEqual(response.status_code, 200, response.content)
+        with self.captureOnCommitCallbacks(execute=True):
+            return client.post(f'/api/v1/uploads/{upload_id}/complete/')
+
+    def test_upload_round_trip(self):
+        data = b'0123456789abcdef-image'
+        response = self.upload(self.owner, self.project, data)
+        self.assertEqual(response.status_code, 200, response.content)
+        dataset = Dataset.objects.get(pk=response.json()['dataset']['id'])
+        self.assertEqual(dataset.blob.sha256, hashlib.sha256(data).hexdigest())
+        self.assertEqual(blob_absolute_path(dataset.blob.sha256).read_bytes(), data)
+
+    def test_resent_chunk_replaces_its_record(self):
+        client = self.client_for(self.owner)
+        response = client.post('/api/v1/uploads/', {
+            'project': self.project.pk, 'filename': 'scan.png', 'file_size': 8,
+        }, format='json')
+        upload_id = response.json()['upload']['id']
+        for offset, chunk in ((0, b'XXXX'), (4, b'4567'), (0, b'0123')):
+            response = client.generic(
+                'PUT', f'/api/v1/uploads/{upload_id}/', chunk, content_type='application/octet-stream',
+                HTTP_CONTENT_RANGE=f'bytes {offset}-{offset + 3}/8',
+            )
+            self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(UploadChunk.objects.filter(session_id=upload_id).count(), 2)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = client.post(f'/api/v1/uploads/{upload_id}/complete/')
+        self.assertEqual(response.status_code, 200, response.content)
+        dataset = Dataset.objects.get(pk=response.json()['dataset']['id'])
+        self.assertEqual(dataset.blob.sha256, hashlib.sha256(b'01234567').hexdigest())
+
+    def test_announced_digest_does_not_grant_stored_content(self):
+        secret = b'another tenant\'s file'
+        self.upload(self.other, self.other_project, secret)
+
+        client = self.client_for(self.owner)
+        response = client.post('/api/v1/uploads/', {
+            'project': self.project.pk, 'filename': 'scan.png', 'file_size': len(secret),
+            'sha256': hashlib.sha256(secret).hexdigest(),
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['upload']['status'], 'uploading')
+        upload_id = response.json()['upload']['id']
+
+        response = client.post(f'/api/v1/uploads/{upload_id}/complete/')
+        self.assertEqual(response.status_code, 400)
+        dataset = Dataset.objects.get(project=self.project)
+        self.assertIsNone(dataset.blob_id)
+        self.assertEqual(client.get(f'/api/v1/datasets/{dataset.pk}/media/').status_code, 404)
+
+    def test_announced_digest_must_match_received_bytes(self):
+        response = self.upload(self.owner, self.project, b'real bytes', sha256='0' * 64)
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(MediaBlob.objects.exists())
+
+    def test_file_size_is_capped(self):
+        client = self.client_for(self.owner)
+        for file_size in (2 ** 62, 10 ** 19):
+            response = client.post('/api/v1/uploads/', {
+                'project': self.project.pk, 'filename': 'scan.png', 'file_size': file_size,
+            }, format='json')
+            self.assertEqual(response.status_code, 400)
+            self.assertIn('file_size', response.json()['errors'])
+        self.assertFalse(Dataset.objects.exists())
+
+    def test_failed_reservation_leaves_no_dataset(self):
+        with mock.patch('projects.uploads.open', side_effect=OSError, create=True):
+            with self.assertRaises(UploadError):
+                start_upload(self.project, self.owner, 'scan.png', 10)
+        self.assertFalse(Dataset.objects.exists())
+        self.assertFalse(UploadSession.objects.exists())
+
+    def test_identical_uploads_share_one_blob(self):
+        data = b'same content twice'
+        first = self.upload(self.owner, self.project, data).json()['dataset']['id']
+        second = self.upload(self.owner, self.project, data).json()['dataset']['id']
+        blob = MediaBlob.objects.get()
+        self.assertEqual(blob.ref_count, 2)
+        self.assertEqual(set(blob.datasets.values_list('pk', flat=True)), {first, second})
+
+        path = blob_absolute_path(blob.sha256)
+        with self.captureOnCommitCallbacks(execute=True):
+            Dataset.objects.get(pk=first).delete()
+        self.assertTrue(path.exists())
+        with self.captureOnCommitCallbacks(execute=True):
+            Dataset.objects.get(pk=second).delete()
+        self.assertFalse(path.exists())
+        self.assertFalse(MediaBlob.objects.exists())
+
+
+@override_settings(MEDIA_ROOT=tempfile.gettempdir())
+class CollectBlobsTests(TestCase):
+    def write(self, data):
+        path = Path(tempfile.mkstemp()[1])
+        path.write_bytes(data)
+        return path
+
+    def test_collect_keeps_referenced_and_restored_blobs(self):
+        data = b'collected then stored again'
+        digest = hashlib.sha256(data).hexdigest()
+        blob = store_file(self.write(data), digest, len(data))
+        self.addCleanup(lambda: blob_absolute_path(digest).unlink(missing_ok=True))
+        self.assertEqual(collect_blobs(), 0)  # Still referenced
+
+        MediaBlob.objects.filter(pk=blob.pk).update(ref_count=0)
+        self.assertEqual(collect_blobs(), 1)
+        self.assertFalse(blob_absolute_path(digest).exists())
+
+        # Stored again after collection: a fresh file and row
+        blob = store_file(self.write(data), digest, len(data))
+        self.assertEqual(blob.ref_count, 1)
+        self.assertEqual(blob_absolute_path(digest).read_bytes(), data)
+
+    def test_acquire_restores_a_missing_file(self):
+        data = b'row outlived its file'
+        digest = hashlib.sha256(data).hexdigest()
+        store_file(self.write(data), digest, len(data))
+        self.addCleanup(lambda: blob_absolute_path(digest).unlink(missing_ok=True))
+        blob_absolute_path(digest).unlink()
+
+        blob = store_file(self.write(data), digest, len(data))
+        self.assertEqual(blob.ref_count, 2)
+        self.assertEqual(blob_absolute_path(digest).read_bytes(), data)
@@ -0,0 +1,373 @@
+"""
+Deep Zoom (DZI) tile pyramids stored in a single memory-mapped archive.
+
+``build_pyramid`` cuts an image into the tiles of a DZI pyramid: level
+``max_level`` is the full image, every level below halves it, and level 0
+is one pixel. Tiles are written back to back into one ``.dzt`` file::
+
+    tile data ... | index: (offset u64, length u32) per tile | footer
+
+The index is ordered by level, then row, then column, so the position of
+any tile's entry is computed arithmetically. ``TileArchive`` memory-maps
+the file and hands out tiles as slices of the map; the OS page cache keeps
+hot tiles in memory and server memory stays flat whatever the image size.
+
+Tiles are upright (the EXIF orientation is applied) and the image is
+read in strips. pyvips (in requirements.txt) streams any format; without
+it Pillow reads uncompressed images (raw TIFF, BMP, PPM) a strip at a
+time and decodes other formats whole, up to ``MAX_PIXELS``.
+
+Like ``projects.derivatives`` this module does not depend on Django.
+"""
+import io
+import math
+import mmap
+import os
+import struct
+import tempfile
+from contextlib import contextmanager
+from functools import lru_cache
+
+from PIL import Image, ImageOps
+
+try:
+    import pyvips
+except (ImportError, OSError):  # libvips missing; Pillow decodes compressed images whole
+    pyvips = None
+
+TILE_SIZE = 254  # 254 + 2 * overlap = 256, as recommended for DZI
+TILE_OVERLAP = 1
+TILE_FORMAT = 'jpg'
+TILE_QUALITY = 85
+MAX_PIXELS = 16384 * 16384  # Largest image Pillow decodes whole (about 800 MB as RGB)
+STRIP_ROWS = 256  # Source rows read at a time
+ORIENTATION = 0x0112  # EXIF orientation tag
+
+MAGIC = b'SMTA'
+VERSION = 1
+FOOTER = struct.Struct('<4sHHHIIQ')  # magic, version, tile size, overlap, width, height, index offset
+INDEX_ENTRY = struct.Struct('<QI')  # offset, length
+
+
+@contextmanager
+def allow_large_images(unlimited=False):
+    """
+    Raise Pillow's decompression bomb limit to ``MAX_PIXELS``.
+
+    ``unlimited`` lifts it altogether, for opening an image to read its
+    header (decoding is lazy); callers check the size before loading.
+    """
+    previous_limit = Image.MAX_IMAGE_PIXELS
+    Image.MAX_IMAGE_PIXELS = None if unlimited else MAX_PIXELS
+    try:
+        yield
+    finally:
+        Image.MAX_IMAGE_PIXELS = previous_limit
+
+
+def max_level(width, height):
+    return math.ceil(math.log2(max(width, height, 1)))
+
+
+def level_size(width, height, level):
+    """Pixel size of ``level`` in the pyramid of a ``width`` x ``height`` image."""
+    scale = 2 ** (max_level(width, height) - level)
+    return math.ceil(width / scale), math.ceil(height / scale)
+
+
+def level_grid(width, height, level, tile_size=TILE_SIZE):
+    """Number of ``(columns, rows)`` of tiles at ``level``."""
+    level_width, level_height = level_size(width, height, level)
+    return math.ceil(level_width / tile_size), math.ceil(level_height / tile_size)
+
+
+def tile_box(level_width, level_height, col, row, tile_size=TILE_SIZE, overlap=TILE_OVERLAP):
+    """Crop box of tile ``(col, row)``, including the overlap with its neighbours."""
+    left = col * tile_size - (overlap if col else 0)
+    top = row * tile_size - (overlap if row else 0)
+    right = min((col + 1) * tile_size + overlap, level_width)
+    bottom = min((row + 1) * tile_size + overlap, level_height)
+    return left, top, right, bottom
+
+
+def _encode(tile):
+    buffer = io.BytesIO()
+    tile.save(buffer, 'JPEG', quality=TILE_QUALITY)
+    return buffer.getvalue()
+
+
+def check_size(width, height):
+    """Raise ``DecompressionBombError`` if a ``width`` x ``height`` image is too large to decode whole."""
+    if width * height > MAX_PIXELS:
+        raise Image.DecompressionBombError(
+            f'Image size ({width * height} pixels) exceeds limit of {MAX_PIXELS} pixels.'
+        )
+
+
+def _raw_args(args):
+    """``(rawmode, stride, orientation)`` of a raw tile; Pillow allows leaving out the last two."""
+    args = (args,) if isinstance(args, str) else tuple(args)
+    return args[0], args[1] if len(args) > 1 else 0, args[2] if len(args) > 2 else 1
+
+
+def _reads_rows(image):
+    """Whether Pillow can decode any band of rows of ``image``: it is stored uncompressed and upright."""
+    return (
+        bool(image.tile)
+        and all(tile[0] == 'raw' for tile in image.tile)
+        and (image.getexif().get(ORIENTATION) or 1) == 1
+    )
+
+
+def _read_rows(image, fh, top, bottom):
+    """Decode rows ``top`` to ``bottom`` of an image stored as raw tiles (see ``_reads_rows``)."""
+    band = Image.new(image.mode, (image.width, bottom - top))
+    if image.palette is not None:
+        band.putpalette(image.palette)
+    band.info = dict(image.info)
+    for _, (left, first, right, last), offset, args in image.tile:
+        start, stop = max(first, top), min(last, bottom)
+        if start >= stop:
+            continue
+        rawmode, stride, orientation = _raw_args(args)
+        if not stride:
+            stride = len(Image.new(image.mode, (right - left, 1)).tobytes('raw', rawmode))
+        # Bottom-up tiles (BMP) store their last row first.
+        fh.seek(offset + (start - first if orientation > 0 else last - stop) * stride)
+        data = fh.read((stop - start) * stride)
+        band.paste(
+            Image.frombytes(image.mode, (right - left, stop - start), data, 'raw', rawmode, stride, orientation),
+            (left, start - top),
+        )
+    return band
+
+
+def _rgb(image):
+    if image.mode == 'RGB':
+        return image
+    if image.mode in ('RGBA', 'LA', 'PA') or 'transparency' in image.info:
+        background = Image.new('RGB', image.size, 'white')
+        rgba = image.convert('RGBA')
+        background.paste(rgba, mask=rgba.getchannel('A'))
+        return background
+    return image.convert('RGB')
+
+
+def _strips(source, rows=STRIP_ROWS):
+    """Yield the upright ``(width, height)`` of ``source``, then RGB strips of ``rows`` rows from the top down."""
+    if pyvips is not None:
+        image = pyvips.Image.new_from_file(str(source), access='sequential')
+        if image.get_typeof('orientation') and image.get('orientation') != 1:
+            # Rotating needs random access; libvips buffers the decoded image on disk for it.
+            image = pyvips.Image.new_from_file(str(source)).autorot()
+        if image.hasalpha():
+            image = image.flatten(background=255)
+        image = image.colourspace('srgb')
+        if image.format != 'uchar':
+            image = image.cast('uchar')
+        yield image.width, image.height
+        for top in range(0, image.height, rows):
+            strip = image.crop(0, top, image.width, min(rows, image.height - top))
+            yield Image.frombytes('RGB', (strip.width, strip.height), strip.write_to_memory())
+        return
+
+    with open(source, 'rb') as fh:
+        with allow_large_images(unlimited=True):
+            image = Image.open(fh)
+        width, height = image.size
+        if not _reads_rows(image):
+            check_size(width, height)
+            image = _rgb(ImageOps.exif_transpose(image))
+            yield image.size
+            for top in range(0, image.height, rows):
+                yield image.crop((0, top, image.width, min(top + rows, image.height)))
+            return
+
+        yield width, height
+        for top in range(0, height, rows):
+            yield _rgb(_read_rows(image, fh, top, min(top + rows, height)))
+
+
+def _stack(upper, lower):
+    """``upper`` with ``lower`` below it."""
+    if upper is None:
+        return lower
+    image = Image.new('RGB', (upper.width, upper.height + lower.height))
+    image.paste(upper, (0, 0))
+    image.paste(lower, (0, upper.height))
+    return image
+
+
+class _Level:
+    """
+    One level of a pyramid being built from the top down.
+
+    Holds only the rows its next row of tiles needs, and the odd row not
+    yet halved into the level below.
+    """
+
+    def __init__(self, size, tile_size, overlap, below):
+        self.width, self.height = size
+        self.tile_size = tile_size
+        self.overlap = overlap
+        self.below = below
+        self.columns = math.ceil(self.width / tile_size)
+        self.rows = math.ceil(self.height / tile_size)
+        self.band = None  # Rows from ``top`` on
+        self.top = 0
+        self.row = 0  # Next row of tiles
+        self.unhalved = None
+        self.received = 0
+        self.entries = []
+
+    def add(self, strip, write):
+        """Take the next rows of the level, write the tiles they complete and pass them on halved."""
+        self.band = _stack(self.band, strip)
+        self.received += strip.height
+        while self.row < self.rows and min((self.row + 1) * self.tile_size + self.overlap, self.height) <= self.received:
+            for col in range(self.columns):
+                left, top, right, bottom = tile_box(
+                    self.width, self.height, col, self.row, self.tile_size, self.overlap
+                )
+                self.entries.append(write(self.band.crop((left, top - self.top, right, bottom - self.top))))
+            self.row += 1
+        # Drop the rows above the overlap of the next row of tiles.
+        keep = max(self.row * self.tile_size - self.overlap, 0) - self.top
+        if keep > 0:
+            self.band = self.band.crop((0, keep, self.width, self.band.height)) if keep < self.band.height else None
+            self.top += keep
+
+        if self.below is not None:
+            pending = _stack(self.unhalved, strip)
+            # Halve row pairs; an odd last row is halved on its own, like the image's edge.
+            even = pending.height if self.received == self.height else pending.height - pending.height % 2
+            self.unhalved = pending.crop((0, even, self.width, pending.height)) if even < pending.height else None
+            if even:
+                self.below.add(pending.crop((0, 0, self.width, even)).reduce(2), write)
+
+
+def build_pyramid(source, path, progress=None, tile_size=TILE_SIZE, overlap=TILE_OVERLAP):
+    """
+    Write the tile archive of ``source`` to ``path``; returns its description.
+
+    The image is read in strips of ``STRIP_ROWS`` rows, each cut into the
+    tiles it completes and halved (``Image.reduce``) into the level below,
+    so every level only holds a band of rows. The source is decoded strip
+    by strip too, except for compressed images without pyvips, which
+    Pillow decodes whole up to ``MAX_PIXELS`` (``DecompressionBombError``
+    above that).
+    """
+    strips = _strips(source)
+    width, height = next(strips)
+    top = max_level(width, height)
+    total = sum(
+        columns * rows
+        for columns, rows in (level_grid(width, height, level, tile_size) for level in range(top + 1))
+    )
+
+    levels = []
+    below = None
+    for level in range(top + 1):
+        below = _Level(level_size(width, height, level), tile_size, overlap, below)
+        levels.append(below)
+
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.tmp-')
+    try:
+        with os.fdopen(fd, 'wb') as fh:
+            offset = 0
+            written = 0
+
+            # Tiles of all levels are written as they complete; the index puts them in order.
+            def write(tile):
+                nonlocal offset, written
+                data = _encode(tile)
+                fh.write(data)
+                entry = (offset, len(data))
+                offset += len(data)
+                written += 1
+                return entry
+
+            for strip in strips:
+                levels[top].add(strip, write)
+                if progress is not None:
+                    progress(written / total)
+
+            for level in levels:
+                for entry in level.entries:
+                    fh.write(INDEX_ENTRY.pack(*entry))
+            fh.write(FOOTER.pack(MAGIC, VERSION, tile_size, overlap, width, height, offset))
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+    return {
+        'width': width,
+        'height': height,
+        'tile_size': tile_size,
+        'overlap': overlap,
+        'format': TILE_FORMAT,
+        'levels': top + 1,
+        'tiles': total,
+    }
+
+
+class TileArchive:
+    """
+    Read-only, memory-mapped view of a tile archive.
+    """
+
+    def __init__(self, path):
+        with open(path, 'rb') as fh:
+            self.map = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self.tile_size, self.overlap, self.width, self.height, self.index_offset = (
+            FOOTER.unpack_from(self.map, len(self.map) - FOOTER.size)
+        )
+        if magic != MAGIC or version != VERSION:
+            raise ValueError('Not a tile archive.')
+        self.max_level = max_level(self.width, self.height)
+
+        # Index position of the first tile of every level.
+        self.level_start = []
+        position = 0
+        for level in range(self.max_level + 1):
+            self.level_start.append(position)
+            columns, rows = level_grid(self.width, self.height, level, self.tile_size)
+            position += columns * rows
+
+    def tile(self, level, col, row):
+        """Return the encoded tile as a ``memoryview``, or ``None`` if out of range."""
+        if not 0 <= level <= self.max_level:
+            return None
+        columns, rows = level_grid(self.width, self.height, level, self.tile_size)
+        if not (0 <= col < columns and 0 <= row < rows):
+            return None
+        entry = self.level_start[level] + row * columns + col
+        offset, length = INDEX_ENTRY.unpack_from(self.map, self.index_offset + entry * INDEX_ENTRY.size)
+        return memoryview(self.map)[offset:offset + length]
+
+    def level_image(self, level):
+        """Decode and assemble all tiles of ``level`` into one RGB image; meant for the small levels."""
+        level_width, level_height = level_size(self.width, self.height, level)
+        columns, rows = level_grid(self.width, self.height, level, self.tile_size)
+        image = Image.new('RGB', (level_width, level_height))
+        for row in range(rows):
+            for col in range(columns):
+                left, top, _, _ = tile_box(level_width, level_height, col, row, self.tile_size, self.overlap)
+                with Image.open(io.BytesIO(self.tile(level, col, row))) as tile:
+                    image.paste(tile.convert('RGB'), (left, top))
+        return image
+
+    def close(self):
+        self.map.close()
+
+
+@lru_cache(maxsize=64)
+def _open_archive(path, mtime_ns):
+    return TileArchive(path)
+
+
+def open_archive(path):
+    """Open (or reuse) the archive at ``path``; reopened when the file changes."""
+    return _open_archive(str(path), os.stat(path).st_mtime_ns)
@@ -0,0 +1,269 @@
+"""
+Resumable chunked upload protocol for dataset files.
+
+An upload is initiated with the declared file size, after which clients PUT
+byte ranges (in any order, in parallel) that are streamed straight into a
+preallocated temp file while being hashed. Finalizing checks that every byte
+was received, verifies the whole-file SHA-256 and hands the file to the
+content-addressed blob store (see ``projects.storage``). A digest announced
+by the client is only checked against the bytes received; content already
+stored is deduplicated after the server has hashed the upload itself.
+"""
+import hashlib
+import os
+import re
+from datetime import timedelta
+from pathlib import Path
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from sernion_mark.async_views import blocking_io
+
+from .models import Dataset, UploadChunk, UploadSession
+from .storage import store_file
+
+STREAM_BUFFER_SIZE = 64 * 1024
+
+CONTENT_RANGE_RE = re.compile(r'^bytes (\d+)-(\d+)/(\d+|\*)$')
+
+
+class UploadError(Exception):
+    """Raised when a request violates the chunked upload protocol."""
+
+
+def parse_content_range(header, file_size):
+    """
+    Parse a ``Content-Range: bytes start-end/total`` header.
+
+    Returns a half-open ``(start, end)`` tuple.
+    """
+    match = CONTENT_RANGE_RE.match((header or '').strip())
+    if not match:
+        raise UploadError('A Content-Range header of the form "bytes start-end/total" is required.')
+    start, last, total = match.groups()
+    start, end = int(start), int(last) + 1
+    if total != '*' and int(total) != file_size:
+        raise UploadError('Content-Range total does not match the declared file size.')
+    if start >= end or end > file_size:
+        raise UploadError('Content-Range is outside of the declared file size.')
+    return start, end
+
+
+def hash_file(path):
+    """Compute the SHA-256 of a file without reading it into memory."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as fh:
+        for block in iter(lambda: fh.read(STREAM_BUFFER_SIZE), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def start_upload(project, user, filename, file_size, name='', description='', sha256=''):
+    """
+    Create an upload session, its pending dataset and a sparse temp file.
+
+    ``sha256`` is the digest the client expects the finished file to have;
+    finalizing fails if the received bytes hash differently.
+    """
+    extension = os.path.splitext(filename)[1].lower()
+    allowed = settings.ALLOWED_EXTENSIONS.get(project.project_type, [])
+    if extension not in allowed:
+        raise UploadError(
+            f"File type '{extension or filename}' is not allowed for {project.project_type} projects."
+        )
+
+    if not 0 < file_size <= settings.UPLOAD_MAX_FILE_SIZE:
+        raise UploadError(f'File size must be between 1 and {settings.UPLOAD_MAX_FILE_SIZE} bytes.')
+
+    temp_dir = Path(settings.UPLOAD_TEMP_DIR)
+    temp_dir.mkdir(parents=True, exist_ok=True)
+
+    with transaction.atomic():
+        dataset = Dataset.objects.create(
+            project=project,
+            name=name or filename,
+            description=description,
+            file_path='',
+            file_size=file_size,
+            file_type=extension.lstrip('.'),
+            processing_status='uploading',
+        )
+        session = UploadSession(
+            project=project,
+            dataset=dataset,
+            uploaded_by=user,
+            filename=filename,
+            file_size=file_size,
+            chunk_size=settings.UPLOAD_CHUNK_SIZE,
+            sha256=sha256.lower(),
+            expires_at=timezone.now() + timedelta(hours=settings.UPLOAD_SESSION_EXPIRE_HOURS),
+        )
+        session.temp_path = str(temp_dir / f'{session.pk}.part')
+        # Sized inside the transaction, so a failure leaves no dataset stuck in "uploading"
+        try:
+            with open(session.temp_path, 'wb') as fh:
+                fh.truncate(file_size)
+        except (OSError, OverflowError):
+            if os.path.exists(session.temp_path):
+                os.remove(session.temp_path)
+            raise UploadError('Could not reserve space for the upload.')
+        session.save()
+    return session
+
+
+def check_writable(session):
+    """Ensure chunks may still be written to the session."""
+    if session.status != 'uploading':
+        raise UploadError(f'Upload is already {session.status}.')
+    if session.is_expired:
+        raise UploadError('Upload session has expired.')
+
+
+def _write_range(session, stream, start, end, expected_sha256):
+    """Copy the chunk into the temp file while hashing it; returns its SHA-256."""
+    if stream is None:
+        raise UploadError('Request body is empty.')
+    length = end - start
+    if length > settings.UPLOAD_MAX_CHUNK_SIZE:
+        raise UploadError(f'Chunks may not exceed {settings.UPLOAD_MAX_CHUNK_SIZE} bytes.')
+
+    digest = hashlib.sha256()
+    remaining = length
+    with open(session.temp_path, 'r+b') as fh:
+        fh.seek(start)
+        while remaining:
+            block = stream.read(min(STREAM_BUFFER_SIZE, remaining))
+            if not block:
+                break
+            fh.write(block)
+            digest.update(block)
+            remaining -= len(block)
+
+    if remaining:
+        raise UploadError('Request body is shorter than the Content-Range.')
+    checksum = digest.hexdigest()
+    if expected_sha256 and expected_sha256.lower() != checksum:
+        raise UploadError('Chunk checksum mismatch.')
+    return checksum
+
+
+def write_chunk(session, stream, start, end, expected_sha256=''):
+    """
+    Stream ``end - start`` bytes from ``stream`` into the temp file at ``start``.
+
+    The chunk is hashed while it is written and only recorded once the full
+    range has arrived (and matches ``expected_sha256`` when one was sent);
+    resending a chunk overwrites its bytes and its record.
+    """
+    check_writable(session)
+    checksum = _write_range(session, stream, start, end, expected_sha256)
+    chunk, _ = UploadChunk.objects.update_or_create(
+        session=session,
+        offset=start,
+        defaults={'length': end - start, 'sha256': checksum},
+    )
+    return chunk
+
+
+async def awrite_chunk(session, stream, start, end, expected_sha256=''):
+    """``write_chunk`` with the file I/O on the blocking I/O pool."""
+    check_writable(session)
+    checksum = await blocking_io(_write_range)(session, stream, start, end, expected_sha256)
+    chunk, _ = await UploadChunk.objects.aupdate_or_create(
+        session=session,
+        offset=start,
+        defaults={'length': end - start, 'sha256': checksum},
+    )
+    return chunk
+
+
+def received_ranges(session):
+    """Return the merged, half-open byte ranges received so far."""
+    ranges = []
+    for offset, length in session.chunks.order_by('offset').values_list('offset', 'length'):
+        end = offset + length
+        if ranges and offset <= ranges[-1][1]:
+            ranges[-1][1] = max(ranges[-1][1], end)
+        else:
+            ranges.append([offset, end])
+    return ranges
+
+
+def missing_ranges(session, ranges=None):
+    """Return the half-open byte ranges that still have to be uploaded."""
+    if ranges is None:
+        ranges = received_ranges(session)
+    missing = []
+    position = 0
+    for start, end in ranges:
+        if start > position:
+            missing.append([position, start])
+        position = max(position, end)
+    if position < session.file_size:
+        missing.append([position, session.file_size])
+    return missing
+
+
+def _check_complete(session):
+    check_writable(session)
+    if missing_ranges(session):
+        raise UploadError('Upload is incomplete.')
+
+
+def _complete(session, checksum):
+    if session.sha256 and session.sha256 != checksum:
+        raise UploadError('File checksum mismatch.')
+
+    with transaction.atomic():
+        blob = store_file(session.temp_path, checksum, session.file_size)
+        _attach_blob(session, blob)
+        session.chunks.all().delete()
+    return session
+
+
+def finalize_upload(session):
+    """Verify a fully received upload and attach the file to its dataset."""
+    _check_complete(session)
+    return _complete(session, hash_file(session.temp_path))
+
+
+async def afinalize_upload(session):
+    """``finalize_upload`` hashing the file on the blocking I/O pool."""
+    await sync_to_async(_check_complete)(session)
+    checksum = await blocking_io(hash_file)(session.temp_path)
+    return await sync_to_async(_complete)(session, checksum)
+
+
+def _attach_blob(session, blob):
+    """Point the session's dataset at ``blob`` and mark the session completed."""
+    Dataset.objects.filter(pk=session.dataset_id).update(
+        blob=blob,
+        file_path=blob.path,
+        file_size=blob.size,
+        processing_status='uploaded',
+        updated_at=timezone.now(),
+    )
+    session.sha256 = blob.sha256
+    session.status = 'completed'
+    session.completed_at = timezone.now()
+    session.save()
+
+
+def abort_upload(session):
+    """Discard a pending upload, its temp file and its placeholder dataset."""
+    if session.status != 'uploading':
+        raise UploadError(f'Upload is already {session.status}.')
+    with transaction.atomic():
+        if session.dataset_id:
+            session.dataset.delete()
+        session.status = 'aborted'
+        session.save(update_fields=['status', 'updated_at'])
+        session.chunks.all().delete()
+    try:
+        os.remove(session.temp_path)
+    except FileNotFoundError:
+        pass
+    return session
@@ -2,10 +2,42 @@
 URL patterns for projects app.
 """
 from django.urls import path
+from . import views
 
 app_name = 'projects'
 
 urlpatterns = [
-    # Placeholder for project-specific endpoints
-    # These will be implemented as needed
+    # Chunked dataset uploads
+    path('uploads/', views.UploadStartView.as_view(), name='upload_start'),
+    path('uploads/<uuid:upload_id>/', views.UploadSessionView.as_view(), name='upload_session'),
+    path('uploads/<uuid:upload_id>/complete/', views.UploadCompleteView.as_view(), name='upload_complete'),
+    
+    # Dataset media (range requests, derivatives, deep zoom tiles)
+    path('datasets/<int:dataset_id>/media/', views.DatasetMediaView.as_view(), name='dataset_media'),
+    path('datasets/<int:dataset_id>/media/<str:derivative>/', views.DatasetMediaView.as_view(), name='dataset_media_derivative'),
+    path('datasets/<int:dataset_id>/tiles/', views.DatasetTileInfoView.as_view(), name='dataset_tiles'),
+    path(
+        'datasets/<int:dataset_id>/tiles/<str:version>/<int:level>/<int:col>_<int:row>.jpg',
+        views.DatasetTileView.as_view(),
+        name='dataset_tile'
+    ),
+    
+    # Dataset items
+    path('datasets/<int:dataset_id>/items/', views.DatasetItemListView.as_view(), name='dataset_items'),
+    path('datasets/<int:dataset_id>/items/stats/', views.DatasetItemStatsView.as_view(), name='dataset_item_stats'),
+    path('datasets/<int:dataset_id>/items/<int:ordinal>/', views.DatasetItemDetailView.as_view(), name='dataset_item_detail'),
+    
+    # Project dashboard statistics
+    path('projects/<int:project_id>/stats/', views.ProjectStatsView.as_view(), name='project_stats'),
+    
+    # Annotation full-text search
+    path('projects/<int:project_id>/search/', views.ProjectSearchView.as_view(), name='project_search'),
+    
+    # Annotation task queue
+    path('projects/<int:project_id>/tasks/', views.ProjectTaskView.as_view(), name='project_tasks'),
+    path('projects/<int:project_id>/tasks/next/', views.NextTaskView.as_view(), name='next_task'),
+    path('tasks/leases/<int:lease_id>/<str:action>/', views.TaskLeaseActionView.as_view(), name='task_lease_action'),
+
+    # Annotation change feed (server-sent events)
+    path('projects/<int:project_id>/events/', views.project_events, name='project_events'),
 ]
@@ -0,0 +1,629 @@
+"""
+Views for projects app.
+"""
+import asyncio
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.shortcuts import get_object_or_404
+from django.urls import reverse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from rest_framework import exceptions, generics, permissions, status
+from rest_framework.negotiation import BaseContentNegotiation
+from rest_framework.request import Request
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+from rest_framework.views import APIView
+
+from sernion_mark.async_views import AsyncAPIView, aget_object_or_404, blocking_io
+from sernion_mark.events import get_hub
+
+from .assignment import (claim_task, complete_lease, create_tasks,
+                         release_lease, renew_lease)
+from .feed import project_channel
+from .models import Annotation, Dataset, DatasetItem, Project, TaskLease, UploadSession
+from .serializers import (DatasetItemSerializer, DatasetSerializer,
+                          TaskCreateSerializer,
+                          TaskLeaseSerializer, UploadSessionSerializer,
+                          UploadStartSerializer)
+from .search import parse_query, search
+from .serving import content_type_for, media_path, serve_file
+from .stats import project_stats
+from .tiles import open_archive
+from .uploads import (UploadError, abort_upload, afinalize_upload,
+                      awrite_chunk, parse_content_range, start_upload)
+
+
+async def aget_upload_session(request, upload_id):
+    """Fetch an upload session belonging to the requesting user."""
+    return await aget_object_or_404(UploadSession.objects.filter(uploaded_by=request.user), pk=upload_id)
+
+
+def user_datasets(user):
+    """Datasets in the user's projects."""
+    return Dataset.objects.filter(project__in=Project.objects.for_user(user)).select_related('blob')
+
+
+def get_dataset(request, dataset_id):
+    """Fetch a dataset in one of the requesting user's projects."""
+    return get_object_or_404(user_datasets(request.user), pk=dataset_id)
+
+
+ITEM_STATUSES = {
+    label.lower().replace(' ', '_'): value for value, label in DatasetItem.STATUS_CHOICES
+}
+
+
+class UploadStartView(APIView):
+    """
+    Initiate a resumable, chunked dataset upload.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request):
+        """Create an upload session and its pending dataset."""
+        serializer = UploadStartSerializer(data=request.data, context={'request': request})
+        if not serializer.is_valid():
+            return Response({
+                'success': False,
+                'errors': serializer.errors
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            session = start_upload(user=request.user, **serializer.validated_data)
+        except UploadError as e:
+            return Response({
+                'success': False,
+                'message': str(e)
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response({
+            'success': True,
+            'message': 'Upload started',
+            'upload': UploadSessionSerializer(session).data
+        }, status=status.HTTP_201_CREATED)
+
+
+def serialize_upload(session):
+    return UploadSessionSerializer(session).data
+
+
+class UploadSessionView(AsyncAPIView):
+    """
+    Inspect, append chunks to, or abort an upload session.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    async def get(self, request, upload_id):
+        """Get upload progress, including the ranges still missing."""
+        session = await aget_upload_session(request, upload_id)
+        return Response({
+            'success': True,
+            'upload': await sync_to_async(serialize_upload)(session)
+        }, status=status.HTTP_200_OK)
+
+    async def put(self, request, upload_id):
+        """
+        Write one chunk.
+
+        The raw request body is streamed to disk; the byte range is given by
+        ``Content-Range`` and an optional ``X-Chunk-Sha256`` header is checked.
+        """
+        session = await aget_upload_session(request, upload_id)
+        try:
+            start, end = parse_content_range(request.META.get('HTTP_CONTENT_RANGE'), session.file_size)
+            chunk = await awrite_chunk(
+                session,
+                request.stream,
+                start,
+                end,
+                expected_sha256=request.META.get('HTTP_X_CHUNK_SHA256', ''),
+            )
+        except UploadError as e:
+            return Response({
+                'success': False,
+                'message': str(e)
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response({
+            'success': True,
+            'offset': chunk.offset,
+            'length': chunk.length,
+            'sha256': chunk.sha256
+        }, status=status.HTTP_200_OK)
+
+    async def delete(self, request, upload_id):
+        """Abort the upload and discard everything received."""
+        session = await aget_upload_session(request, upload_id)
+        try:
+            await sync_to_async(abort_upload)(session)
+        except UploadError as e:
+            return Response({
+                'success': False,
+                'message': str(e)
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response({
+            'success': True,
+            'message': 'Upload aborted'
+        }, status=status.HTTP_200_OK)
+
+
+class UploadCompleteView(AsyncAPIView):
+    """
+    Finalize a fully received upload.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    async def post(self, request, upload_id):
+        """Verify the file and attach it to the dataset."""
+        session = await aget_upload_session(request, upload_id)
+        try:
+            session = await afinalize_upload(session)
+        except UploadError as e:
+            return Response({
+                'success': False,
+                'message': str(e),
+                'upload': await sync_to_async(serialize_upload)(session)
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        dataset = await sync_to_async(lambda: DatasetSerializer(session.dataset).data)()
+        return Response({
+            'success': True,
+            'message': 'Upload completed',
+            'upload': await sync_to_async(serialize_upload)(session),
+            'dataset': dataset
+        }, status=status.HTTP_200_OK)
+
+
+class DatasetItemListView(generics.ListAPIView):
+    """
+    List or append the items of a dataset.
+    
+    Items are listed in ordinal order with keyset pagination, so seeking deep
+    into a dataset with millions of items costs the same as the first page.
+    Filter with ``?status=pending`` (or any other status name).
+    """
+    serializer_class = DatasetItemSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    ordering = 'ordinal'
+
+    def get_queryset(self):
+        dataset = get_dataset(self.request, self.kwargs['dataset_id'])
+        queryset = DatasetItem.objects.filter(dataset=dataset)
+        item_status = self.request.query_params.get('status')
+        if item_status:
+            queryset = queryset.filter(status=ITEM_STATUSES.get(item_status, -1))
+        return queryset
+
+    def post(self, request, dataset_id):
+        """Append a JSON list of items; ordinals are assigned in order."""
+        dataset = get_dataset(request, dataset_id)
+        if not isinstance(request.data, list):
+            return Response({
+                'success': False,
+                'message': 'Expected a list of items.'
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        serializer = DatasetItemSerializer(data=request.data, many=True)
+        if not serializer.is_valid():
+            return Response({
+                'success': False,
+                'errors': serializer.errors
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        created = DatasetItem.objects.append(
+            dataset,
+            (DatasetItem(**data) for data in serializer.validated_data),
+            batch_size=settings.DATASET_ITEM_BATCH_SIZE,
+        )
+        return Response({
+            'success': True,
+            'message': f'{created} item(s) added',
+            'created': created
+        }, status=status.HTTP_201_CREATED)
+
+
+class DatasetItemDetailView(APIView):
+    """
+    Fetch a single dataset item by its ordinal.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request, dataset_id, ordinal):
+        """Get the item at ``ordinal``."""
+        dataset = get_dataset(request, dataset_id)
+        item = get_object_or_404(DatasetItem, dataset=dataset, ordinal=ordinal)
+        return Response({
+            'success': True,
+            'item': DatasetItemSerializer(item).data
+        }, status=status.HTTP_200_OK)
+
+
+class DatasetItemStatsView(APIView):
+    """
+    Per-status item counts for a dataset.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request, dataset_id):
+        """Get item totals grouped by status."""
+        dataset = get_dataset(request, dataset_id)
+        counts = DatasetItem.objects.status_counts(dataset)
+        return Response({
+            'success': True,
+            'total': dataset.item_count,
+            'by_status': {name: counts[value] for name, value in ITEM_STATUSES.items()}
+        }, status=status.HTTP_200_OK)
+
+
+class ProjectStatsView(APIView):
+    """
+    Dashboard statistics of a project.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request, project_id):
+        """Get annotation totals by annotator and type (project members only)."""
+        project = get_object_or_404(Project.objects.for_user(request.user), pk=project_id)
+        return Response({
+            'success': True,
+            'stats': project_stats(project)
+        }, status=status.HTTP_200_OK)
+
+
+class ProjectSearchView(APIView):
+    """
+    Full-text search over the annotations of a project.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+    max_page_size = 100
+
+    def get(self, request, project_id):
+        """Ranked annotations matching ``?q=`` (every term; ``term*`` for a prefix), optionally by dataset and type."""
+        project = get_object_or_404(Project.objects.for_user(request.user), pk=project_id)
+        query = request.query_params.get('q', '')
+        if not parse_query(query):
+            return Response({
+                'success': False,
+                'message': 'Search query is required'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            page = max(1, int(request.query_params.get('page', 1)))
+            page_size = int(request.query_params.get('page_size', api_settings.PAGE_SIZE))
+            page_size = max(1, min(page_size, self.max_page_size))
+            dataset_id = request.query_params.get('dataset')
+            dataset_id = int(dataset_id) if dataset_id else None
+        except ValueError:
+            return Response({
+                'success': False,
+                'message': 'page, page_size and dataset must be integers'
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        annotation_type = request.query_params.get('annotation_type') or None
+        if annotation_type is not None and annotation_type not in dict(Annotation.ANNOTATION_TYPES):
+            return Response({
+                'success': False,
+                'message': f"Unknown annotation_type '{annotation_type}'."
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        offset = (page - 1) * page_size
+        limit = min(page_size + 1, settings.SEARCH_MAX_RESULTS - offset)
+        hits = search(
+            project.pk, query, dataset_id=dataset_id, annotation_type=annotation_type,
+            limit=limit, offset=offset,
+        ) if limit > 0 else []
+        has_next = len(hits) > page_size
+        hits = hits[:page_size]
+
+        # Index rows of annotations deleted without their hooks (e.g. with their project) are skipped.
+        annotations = Annotation.objects.filter(dataset__project=project).in_bulk([hit[0] for hit in hits])
+        results = [
+            {
+                'annotation': pk,
+                'dataset': annotations[pk].dataset_id,
+                'item': annotations[pk].item_id,
+                'annotator': annotations[pk].annotator_id,
+                'annotation_type': annotations[pk].annotation_type,
+                'is_verified': annotations[pk].is_verified,
+                'is_gold': annotations[pk].is_gold,
+                'score': score,
+                'snippet': snippet,
+                'labels': labels,
+            }
+            for pk, score, snippet, labels in hits
+            if pk in annotations
+        ]
+        return Response({
+            'success': True,
+            'next': replace_query_param(request.build_absolute_uri(), 'page', page + 1) if has_next else None,
+            'results': results
+        }, status=status.HTTP_200_OK)
+
+
+class MediaNegotiation(BaseContentNegotiation):
+    """
+    Accept any ``Accept`` header.
+    
+    Media elements ask for ``audio/*``, ``image/*`` and so on; only error
+    bodies go through a renderer, so always pick the default one.
+    """
+
+    def select_parser(self, request, parsers):
+        return parsers[0] if parsers else None
+
+    def select_renderer(self, request, renderers, format_suffix=None):
+        return renderers[0], renderers[0].media_type
+
+
+class DatasetMediaView(AsyncAPIView):
+    """
+    Stream a dataset's media file or one of its derivatives.
+    
+    Supports ``Range`` requests (``206 Partial Content``) and conditional
+    requests, so audio and video players can seek without re-downloading.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+    content_negotiation_class = MediaNegotiation
+
+    async def get(self, request, dataset_id, derivative=None):
+        """Serve the original file, or ``derivative`` (e.g. ``thumbnail``)."""
+        dataset = await aget_object_or_404(user_datasets(request.user), pk=dataset_id)
+        relative = dataset.blob.path if dataset.blob_id else dataset.file_path
+        content_type = content_type_for(dataset.file_type)
+        etag = dataset.blob.sha256 if dataset.blob_id else None
+        filename = None
+
+        if derivative is not None:
+            derivatives = (dataset.metadata or {}).get('derivatives') or {}
+            entry = derivatives.get('files', {}).get(derivative)
+            if not entry:
+                return Response({
+                    'success': False,
+                    'message': 'Derivative not available'
+                }, status=status.HTTP_404_NOT_FOUND)
+            relative = f"{derivatives['path']}/{entry['file']}"
+            content_type = etag = None
+        elif not dataset.blob_id:
+            filename = dataset.file_path.rsplit('/', 1)[-1]
+
+        path = media_path(relative) if relative else None
+        if path is None or not await blocking_io(path.is_file)():
+            return Response({
+                'success': False,
+                'message': 'Media file not found'
+            }, status=status.HTTP_404_NOT_FOUND)
+        return await blocking_io(serve_file)(request, path, content_type=content_type, etag=etag, filename=filename)
+
+
+def get_tile_archive(dataset):
+    """
+    Return ``(version, archive)`` for a dataset's tile pyramid, or ``None``.
+
+    ``version`` changes whenever the archive does, so tile URLs embedding it
+    can be cached forever.
+    """
+    derivatives = (dataset.metadata or {}).get('derivatives') or {}
+    entry = derivatives.get('files', {}).get('tiles')
+    path = media_path(f"{derivatives['path']}/{entry['file']}") if entry else None
+    if path is None or not path.is_file():
+        return None
+    archive = open_archive(path)
+    version = dataset.blob.sha256[:16] if dataset.blob_id else f'{path.stat().st_mtime_ns:x}'
+    return version, archive
+
+
+class DatasetTileInfoView(APIView):
+    """
+    Deep Zoom descriptor of a large image dataset (OpenSeadragon JSON format).
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request, dataset_id):
+        """Get the tile size, overlap, image size and tile URL prefix."""
+        dataset = get_dataset(request, dataset_id)
+        tiles = get_tile_archive(dataset)
+        if tiles is None:
+            return Response({
+                'success': False,
+                'message': 'No tile pyramid for this dataset'
+            }, status=status.HTTP_404_NOT_FOUND)
+
+        version, archive = tiles
+        url = reverse('projects:dataset_tiles', kwargs={'dataset_id': dataset.pk})
+        return Response({
+            'Image': {
+                'xmlns': 'http://schemas.microsoft.com/deepzoom/2008',
+                'Url': request.build_absolute_uri(f'{url}{version}/'),
+                'Format': 'jpg',
+                'Overlap': str(archive.overlap),
+                'TileSize': str(archive.tile_size),
+                'Size': {'Width': str(archive.width), 'Height': str(archive.height)},
+            }
+        }, status=status.HTTP_200_OK)
+
+
+class DatasetTileView(APIView):
+    """
+    Serve a single Deep Zoom tile.
+    
+    Tiles are sliced out of the memory-mapped archive and their URLs carry
+    the archive version, so they are sent with a one-year ``immutable``
+    cache lifetime.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+    content_negotiation_class = MediaNegotiation
+
+    def get(self, request, dataset_id, version, level, col, row):
+        """Get tile ``(col, row)`` of ``level``."""
+        dataset = get_dataset(request, dataset_id)
+        tiles = get_tile_archive(dataset)
+        tile = None
+        if tiles is not None and tiles[0] == version:
+            tile = tiles[1].tile(level, col, row)
+        if tile is None:
+            return Response({
+                'success': False,
+                'message': 'Tile not found'
+            }, status=status.HTTP_404_NOT_FOUND)
+
+        etag = f'"{version}-{level}-{col}-{row}"'
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            response = HttpResponse(tile, content_type='image/jpeg')
+        response['ETag'] = etag
+        patch_cache_control(response, private=True, max_age=settings.MEDIA_TILE_CACHE_SECONDS, immutable=True)
+        return response
+
+
+class ProjectTaskView(APIView):
+    """
+    Generate annotation tasks for a project's datasets (owner only).
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request, project_id):
+        """Create a task for every dataset (or dataset item) without one."""
+        project = get_object_or_404(Project, pk=project_id, owner=request.user)
+        serializer = TaskCreateSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response({
+                'success': False,
+                'errors': serializer.errors
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        tasks = create_tasks(project, **serializer.validated_data)
+        return Response({
+            'success': True,
+            'message': f'{len(tasks)} task(s) created',
+            'created': len(tasks)
+        }, status=status.HTTP_201_CREATED)
+
+
+class NextTaskView(APIView):
+    """
+    Lease the next available task in a project to the current user.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request, project_id):
+        """Claim a task (or return the one already held)."""
+        project = get_object_or_404(Project.objects.for_user(request.user), pk=project_id)
+        lease = claim_task(project, request.user)
+        if lease is None:
+            return Response({
+                'success': True,
+                'message': 'No tasks available',
+                'lease': None
+            }, status=status.HTTP_200_OK)
+
+        return Response({
+            'success': True,
+            'lease': TaskLeaseSerializer(lease).data
+        }, status=status.HTTP_200_OK)
+
+
+class TaskLeaseActionView(APIView):
+    """
+    Complete, release or renew a task lease held by the current user.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+    actions = {
+        'complete': complete_lease,
+        'release': release_lease,
+        'renew': renew_lease,
+    }
+
+    def post(self, request, lease_id, action):
+        """Apply ``action`` to the lease."""
+        if action not in self.actions:
+            return Response({
+                'success': False,
+                'message': f"Unknown action. Use one of {', '.join(self.actions)}."
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        lease = get_object_or_404(
+            TaskLease.objects.select_related('task', 'task__dataset', 'task__item'),
+            pk=lease_id,
+            annotator=request.user,
+            status='active'
+        )
+        if self.actions[action](lease) is None:
+            return Response({
+                'success': False,
+                'message': 'Lease has expired. Claim a new task.'
+            }, status=status.HTTP_409_CONFLICT)
+        if action == 'release':
+            return Response({
+                'success': True,
+                'message': 'Task released'
+            }, status=status.HTTP_200_OK)
+
+        return Response({
+            'success': True,
+            'lease': TaskLeaseSerializer(lease).data
+        }, status=status.HTTP_200_OK)
+
+
+def _feed_user(request):
+    """
+    Authenticate a feed request with the API's authentication classes.
+
+    ``EventSource`` cannot set headers, so a ``?token=`` query parameter is
+    accepted in place of the ``Authorization`` header: a JWT access token or
+    an API token.
+    """
+    token = request.GET.get('token')
+    if token and 'HTTP_AUTHORIZATION' not in request.META:
+        keyword = 'Bearer' if token.count('.') == 2 else 'Token'
+        request.META['HTTP_AUTHORIZATION'] = f'{keyword} {token}'
+    request = Request(request, authenticators=[auth() for auth in api_settings.DEFAULT_AUTHENTICATION_CLASSES])
+    try:
+        return request.user
+    except exceptions.APIException:
+        return None
+
+
+async def _event_stream(channel):
+    """Server-sent events of ``channel`` until ``FEED_STREAM_SECONDS`` have passed."""
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + settings.FEED_STREAM_SECONDS
+    yield f'retry: {settings.FEED_HEARTBEAT_SECONDS * 1000}\n\n'
+    events = get_hub().listen(channel, timeout=settings.FEED_HEARTBEAT_SECONDS)
+    try:
+        async for message in events:
+            yield ': keepalive\n\n' if message is None else f'data: {message}\n\n'
+            if loop.time() >= deadline:
+                break
+    finally:
+        await events.aclose()
+
+
+async def project_events(request, project_id):
+    """
+    Stream a project's annotation changes as server-sent events.
+
+    Each open stream is a coroutine waiting on a queue, not a thread, so it
+    is only served by the ASGI application.
+    """
+    if request.method != 'GET':
+        return JsonResponse({'success': False, 'message': 'Method not allowed'}, status=405)
+    if not isinstance(request, ASGIRequest):
+        return JsonResponse({
+            'success': False,
+            'message': 'The change feed requires the ASGI server (sernion_mark.asgi).'
+        }, status=501)
+
+    user = await sync_to_async(_feed_user)(request)
+    if user is None or not user.is_authenticated:
+        return JsonResponse({'success': False, 'message': 'Authentication required'}, status=401)
+    if not await Project.objects.for_user(user).filter(pk=project_id).aexists():
+        return JsonResponse({'success': False, 'message': 'Project not found'}, status=404)
+
+    response = StreamingHttpResponse(_event_stream(project_channel(project_id)), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # Keep nginx from buffering the stream
+    return response
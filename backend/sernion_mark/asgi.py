@@ -0,0 +1,11 @@
+"""
+ASGI config for Sernion Mark project.
+"""
+
+import os
+
+from django.core.asgi import get_asgi_application
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'sernion_mark.settings')
+
+application = get_asgi_application()
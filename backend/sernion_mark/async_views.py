@@ -0,0 +1,109 @@
+"""
+Async request handling for I/O-bound API views.
+
+DRF 3.14 only dispatches to synchronous handlers. ``AsyncAPIView`` accepts
+``async def`` handlers: authentication, permission and throttle checks
+(which may hit the database) run in the request's thread-sensitive
+executor, the handler is awaited on the event loop and the response is
+finalized as usual. Under the ASGI server a request waiting on SMTP, disk
+or the database then holds no worker thread; under WSGI the same views run
+to completion through Django's async adapter.
+
+Blocking calls without an async counterpart (``smtplib``, file reads,
+hashing) go through ``blocking_io``, a thread pool of ``ASYNC_IO_THREADS``
+shared by all requests.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.http import Http404
+from rest_framework.views import APIView
+
+
+class AsyncAPIView(APIView):
+    """
+    ``APIView`` whose handlers may be coroutines.
+
+    Handlers must not touch the database synchronously: use the async ORM
+    (``aget``, ``aupdate_or_create``...) or ``sync_to_async``.
+    """
+    view_is_async = True
+
+    async def dispatch(self, request, *args, **kwargs):
+        self.args = args
+        self.kwargs = kwargs
+        request = self.initialize_request(request, *args, **kwargs)
+        self.request = request
+        self.headers = self.default_response_headers
+
+        try:
+            await sync_to_async(self.initial)(request, *args, **kwargs)
+            if request.method.lower() in self.http_method_names:
+                handler = getattr(self, request.method.lower(), self.http_method_not_allowed)
+            else:
+                handler = self.http_method_not_allowed
+            response = handler(request, *args, **kwargs)
+            if hasattr(response, '__await__'):  # ``options`` and friends stay synchronous
+                response = await response
+        except Exception as exc:
+            response = self.handle_exception(exc)
+
+        self.response = self.finalize_response(request, response, *args, **kwargs)
+        return self.response
+
+
+@lru_cache(maxsize=None)
+def _io_executor():
+    return ThreadPoolExecutor(settings.ASYNC_IO_THREADS, thread_name_prefix='blocking-io')
+
+
+def blocking_io(func):
+    """Wrap a blocking function without database access into a coroutine function."""
+    return sync_to_async(func, thread_sensitive=False, executor=_io_executor())
+
+
+async def aget_object_or_404(queryset, **kwargs):
+    """Async ``get_object_or_404`` for a queryset."""
+    try:
+        return await queryset.aget(**kwargs)
+    except queryset.model.DoesNotExist:
+        raise Http404(f'No {queryset.model._meta.object_name} matches the given query.')
+
+
+def is_asgi(request):
+    """Whether ``request`` (Django or DRF) is served by the ASGI application."""
+    return isinstance(getattr(request, '_request', request), ASGIRequest)
+
+
+def streaming_body(request, iterable, thread_sensitive=True):
+    """``iterable`` as a streaming body that suits the server handling ``request``."""
+    return aiterate(iterable, thread_sensitive) if is_asgi(request) else iterable
+
+
+async def aiterate(iterable, thread_sensitive=True):
+    """
+    Iterate a synchronous iterable off the event loop.
+
+    Django consumes a synchronous streaming body in full before sending it
+    when running under ASGI; wrapping it keeps the response streaming.
+    Iterables reading the database must stay ``thread_sensitive``.
+    """
+    iterator = iter(iterable)
+    if thread_sensitive:
+        step = sync_to_async(next)
+    else:
+        step = blocking_io(next)
+    done = object()
+    try:
+        while True:
+            item = await step(iterator, done)
+            if item is done:
+                break
+            yield item
+    finally:
+        close = getattr(iterator, 'close', None)
+        if close is not None:
+            await (sync_to_async(close) if thread_sensitive else blocking_io(close))()
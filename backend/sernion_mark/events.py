@@ -0,0 +1,226 @@
+"""
+In-process broadcast hub for server-sent change feeds.
+
+Publishers (any thread, sync code included) call ``publish(channel,
+event)``; ``Hub.listen(channel)`` is an async iterator that an ASGI
+response streams from, so an idle subscriber is a parked coroutine and a
+small queue rather than a thread.
+
+Fan-out to the subscribers of this process is done by the hub. The
+backend (``EVENT_BACKEND``) decides how published events reach the hubs:
+
+* ``LocalBackend`` - straight to this process's hub. Enough for a single
+  ASGI process serving all traffic, and for development: events published
+  by a WSGI server, another ASGI worker or a management command never
+  reach its subscribers (``check_backend`` warns about it).
+* ``RedisBackend`` - through Redis pub/sub (``EVENT_REDIS_URL``), so every
+  ASGI process sees events published by any web or worker process.
+"""
+import asyncio
+import json
+import logging
+import threading
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+
+class LocalBackend:
+    """Deliver events to subscribers in this process only."""
+
+    def __init__(self, hub, **options):
+        self.hub = hub
+
+    def publish(self, channel, message):
+        self.hub.dispatch(channel, message)
+
+    async def start(self, channel):
+        pass
+
+    async def stop(self, channel):
+        pass
+
+
+class RedisBackend:
+    """
+    Relay events between processes through Redis pub/sub.
+
+    A process holds one subscription connection for all its channels,
+    opened with the first subscriber and closed after the last one leaves.
+    A lost connection is reopened (and every channel subscribed again)
+    after ``RECONNECT_DELAY`` seconds, doubling up to ``MAX_RECONNECT_DELAY``.
+    """
+    RECONNECT_DELAY = 0.5
+    MAX_RECONNECT_DELAY = 30
+
+    def __init__(self, hub, url=None, prefix='sernion:events:', **options):
+        import redis
+
+        self.hub = hub
+        self.url = url or settings.EVENT_REDIS_URL
+        self.prefix = prefix
+        self.client = redis.Redis.from_url(self.url)
+        self._channels = set()
+        self._pubsub = None  # Of the current connection, while the relay is connected
+        self._relay_task = None
+
+    def publish(self, channel, message):
+        self.client.publish(self.prefix + channel, message)
+
+    async def start(self, channel):
+        self._channels.add(channel)
+        if self._relay_task is None or self._relay_task.done():
+            self._relay_task = asyncio.ensure_future(self._relay())
+        elif self._pubsub is not None:
+            try:
+                await self._pubsub.subscribe(self.prefix + channel)
+            except Exception:
+                pass  # The relay reconnects and subscribes to every channel
+
+    async def stop(self, channel):
+        if self.hub.subscriber_count(channel):
+            return  # Someone subscribed again meanwhile
+        self._channels.discard(channel)
+        if not self._channels and self._relay_task is not None:
+            self._relay_task.cancel()
+            self._relay_task = None
+        elif self._pubsub is not None:
+            try:
+                await self._pubsub.unsubscribe(self.prefix + channel)
+            except Exception:
+                pass
+
+    async def _relay(self):
+        import redis.asyncio
+
+        delay = self.RECONNECT_DELAY
+        while self._channels:
+            client = redis.asyncio.Redis.from_url(self.url)
+            pubsub = client.pubsub(ignore_subscribe_messages=True)
+            try:
+                subscribed = set(self._channels)
+                await pubsub.subscribe(*(self.prefix + channel for channel in subscribed))
+                self._pubsub = pubsub  # From here on start() and stop() (un)subscribe directly
+                added = self._channels - subscribed
+                if added:
+                    await pubsub.subscribe(*(self.prefix + channel for channel in added))
+                delay = self.RECONNECT_DELAY
+                async for message in pubsub.listen():  # Ends once no channel is subscribed
+                    channel, data = (
+                        value.decode() if isinstance(value, bytes) else value
+                        for value in (message['channel'], message['data'])
+                    )
+                    self.hub.dispatch(channel[len(self.prefix):], data)
+                continue
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.warning('Lost the event relay connection; reconnecting in %.1fs', delay, exc_info=True)
+            finally:
+                self._pubsub = None
+                await pubsub.aclose()
+                await client.aclose()
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, self.MAX_RECONNECT_DELAY)
+
+
+class _Subscriber:
+    __slots__ = ('loop', 'queue', 'overflowed')
+
+    def __init__(self, loop, size):
+        self.loop = loop
+        self.queue = asyncio.Queue(size)
+        self.overflowed = False
+
+    def deliver(self, message):
+        """Runs on the subscriber's event loop."""
+        try:
+            self.queue.put_nowait(message)
+        except asyncio.QueueFull:
+            self.overflowed = True  # Too slow: the stream ends and the client reconnects
+
+
+class Hub:
+    """
+    Fan events out to the local subscribers of each channel.
+    """
+
+    def __init__(self, backend_class=None, queue_size=None, **options):
+        backend_class = backend_class or import_string(settings.EVENT_BACKEND)
+        self.queue_size = queue_size or settings.EVENT_QUEUE_SIZE
+        self.backend = backend_class(self, **options)
+        self._subscribers = {}  # channel -> set of _Subscriber
+        self._lock = threading.Lock()
+
+    def publish(self, channel, event):
+        """Publish a JSON-serialisable event; never raises into the caller."""
+        try:
+            self.backend.publish(channel, json.dumps(event, cls=DjangoJSONEncoder, separators=(',', ':')))
+        except Exception:
+            logger.exception('Publishing to %s failed', channel)
+
+    def dispatch(self, channel, message):
+        """Hand a message to every local subscriber; safe from any thread."""
+        with self._lock:
+            subscribers = list(self._subscribers.get(channel, ()))
+        for subscriber in subscribers:
+            try:
+                subscriber.loop.call_soon_threadsafe(subscriber.deliver, message)
+            except RuntimeError:
+                pass  # Loop already closed; the subscriber is going away
+
+    def subscriber_count(self, channel):
+        with self._lock:
+            return len(self._subscribers.get(channel, ()))
+
+    async def listen(self, channel, timeout=None):
+        """
+        Yield messages published on ``channel``; ``None`` every ``timeout``
+        seconds without one (for keep-alives). Ends if the subscriber falls
+        ``EVENT_QUEUE_SIZE`` messages behind.
+        """
+        subscriber = _Subscriber(asyncio.get_running_loop(), self.queue_size)
+        with self._lock:
+            first = not self._subscribers.get(channel)
+            self._subscribers.setdefault(channel, set()).add(subscriber)
+        try:
+            if first:
+                await self.backend.start(channel)
+            while not (subscriber.overflowed and subscriber.queue.empty()):
+                try:
+                    yield await asyncio.wait_for(subscriber.queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    yield None
+        finally:
+            with self._lock:
+                subscribers = self._subscribers.get(channel, set())
+                subscribers.discard(subscriber)
+                last = not subscribers
+                if last:
+                    self._subscribers.pop(channel, None)
+            if last:
+                await self.backend.stop(channel)
+
+
+def check_backend(server):
+    """Warn when a ``server`` process (e.g. ``'WSGI'``) publishes events only it can see."""
+    if issubclass(import_string(settings.EVENT_BACKEND), LocalBackend):
+        logger.warning(
+            'EVENT_BACKEND is LocalBackend: change feed events published by this %s process are not '
+            'delivered to feed subscribers in other processes. Use sernion_mark.events.RedisBackend.',
+            server,
+        )
+
+
+@lru_cache(maxsize=None)
+def get_hub():
+    """The process-wide hub."""
+    return Hub()
+
+
+def publish(channel, event):
+    get_hub().publish(channel, event)
@@ -0,0 +1,114 @@
+"""
+Keyset (cursor) pagination for Sernion Mark list endpoints.
+"""
+import base64
+import json
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Paginate by seeking past the last row of the previous page.
+
+    Rows are ordered by the view's ``ordering`` (or the model's default
+    ordering) with the primary key as tiebreaker, and the next page starts
+    ``WHERE (field, id) < (last_field, last_id)``. Unlike page numbers this
+    never issues an ``OFFSET`` and skips the ``COUNT(*)`` query unless the
+    client asks for it with ``?count=true``.
+    """
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    count_query_param = 'count'
+    max_page_size = 200
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.field, self.descending = self.get_ordering(queryset, view)
+        self.count = None
+        if request.query_params.get(self.count_query_param) in ('1', 'true'):
+            self.count = queryset.count()
+
+        sort = '-' if self.descending else ''
+        queryset = queryset.order_by(f'{sort}{self.field}', f'{sort}pk')
+
+        cursor = self.decode_cursor(queryset, request)
+        if cursor is not None:
+            value, pk = cursor
+            lookup = 'lt' if self.descending else 'gt'
+            queryset = queryset.filter(
+                Q(**{f'{self.field}__{lookup}': value})
+                | Q(**{self.field: value, f'pk__{lookup}': pk})
+            )
+
+        rows = list(queryset[:self.page_size + 1])
+        self.has_next = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        self.last = rows[-1] if rows else None
+        return rows
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return api_settings.PAGE_SIZE
+        return max(1, min(size, self.max_page_size))
+
+    def get_ordering(self, queryset, view):
+        """Return the ``(field, descending)`` pair that drives the keyset."""
+        ordering = getattr(view, 'ordering', None) or queryset.query.order_by or queryset.model._meta.ordering
+        if isinstance(ordering, str):
+            ordering = [ordering]
+        field = ordering[0] if ordering else '-pk'
+        return field.lstrip('-'), field.startswith('-')
+
+    def encode_cursor(self, obj):
+        # str() keeps full datetime precision (DjangoJSONEncoder drops microseconds).
+        payload = json.dumps([getattr(obj, self.field), obj.pk], default=str)
+        return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii')
+
+    def decode_cursor(self, queryset, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            value, pk = json.loads(base64.urlsafe_b64decode(encoded.encode('ascii')))
+            if self.field != 'pk':
+                value = queryset.model._meta.get_field(self.field).to_python(value)
+            return value, pk
+        except (TypeError, ValueError, FieldDoesNotExist, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def get_next_link(self):
+        if not self.has_next or self.last is None:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(
+            remove_query_param(url, self.count_query_param),
+            self.cursor_query_param,
+            self.encode_cursor(self.last),
+        )
+
+    def get_paginated_response(self, data):
+        body = {'next': self.get_next_link(), 'results': data}
+        if self.count is not None:
+            body = {'count': self.count, **body}
+        return Response(body)
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'properties': {
+                'count': {'type': 'integer'},
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
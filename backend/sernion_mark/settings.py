@@ -74,6 +74,7 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'sernion_mark.wsgi.application'
+ASGI_APPLICATION = 'sernion_mark.asgi.application'
 
 # Database
 DATABASES = {
@@ -125,16 +126,21 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 # Custom User Model
 AUTH_USER_MODEL = 'authentication.User'
 
+# Log in with a username or an email address
+AUTHENTICATION_BACKENDS = ['authentication.backends.UsernameOrEmailBackend']
+
 # REST Framework Configuration
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
+        # JWT first: failed authentication answers 401, which clients use to refresh
+        'authentication.jwt_auth.JWTUserAuthentication',
+        'authentication.tokens.CachedTokenAuthentication',
         'rest_framework.authentication.SessionAuthentication',
-        'rest_framework.authentication.TokenAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticated',
     ),
-    'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
+    'DEFAULT_PAGINATION_CLASS': 'sernion_mark.pagination.KeysetPagination',
     'PAGE_SIZE': 20,
     'DEFAULT_RENDERER_CLASSES': (
         'rest_framework.renderers.JSONRenderer',
@@ -148,6 +154,33 @@ REST_FRAMEWORK = {
 
 # Simple Token Settings
 REST_FRAMEWORK_TOKEN_EXPIRE_HOURS = 24
+TOKEN_CACHE_SIZE = 10000  # Tokens kept in each process's LRU
+TOKEN_CACHE_LOCAL_SECONDS = 10  # In-process entry lifetime; bounds how long other processes accept a revoked token
+TOKEN_CACHE_SECONDS = 300  # Entry lifetime in the shared cache
+TOKEN_CACHE_ALIAS = 'default'
+LEGACY_API_TOKENS = env.bool('LEGACY_API_TOKENS', default=False)  # Also issue API tokens at login, registration and password change
+
+# JWT Settings
+SIMPLE_JWT = {
+    'ACCESS_TOKEN_LIFETIME': timedelta(minutes=env.int('JWT_ACCESS_TOKEN_MINUTES', default=5)),
+    'REFRESH_TOKEN_LIFETIME': timedelta(days=env.int('JWT_REFRESH_TOKEN_DAYS', default=7)),
+    'ROTATE_REFRESH_TOKENS': True,  # Each refresh token works once; reuse revokes the session
+    'UPDATE_LAST_LOGIN': False,
+    'SIGNING_KEY': SECRET_KEY,
+    'AUTH_HEADER_TYPES': ('Bearer',),
+}
+JWT_DENYLIST_REFRESH_SECONDS = 5  # How often each process reloads revoked sessions from the database
+
+# Login history is buffered in each process and written in batches
+LOGIN_HISTORY_BATCH_SIZE = 100  # Rows per write
+LOGIN_HISTORY_FLUSH_SECONDS = 5  # Buffered rows are written at least this often
+LOGIN_HISTORY_RETENTION_DAYS = 90  # Older rows are rolled up into daily per-user counts
+LOGIN_HISTORY_ROLLUP_CHUNK_SIZE = 5000  # Rows rolled up and deleted per transaction
+
+# Cache (set CACHE_URL=redis://host:6379/1 to share it between processes)
+CACHES = {
+    'default': env.cache('CACHE_URL', default='locmemcache://'),
+}
 
 # CORS Settings
 CORS_ALLOWED_ORIGINS = [
@@ -186,6 +219,66 @@ CORS_ALLOW_HEADERS = [
 FILE_UPLOAD_MAX_MEMORY_SIZE = 10485760  # 10MB
 DATA_UPLOAD_MAX_MEMORY_SIZE = 10485760  # 10MB
 
+# Chunked Upload Settings (dataset files bypass the in-memory limits above)
+UPLOAD_CHUNK_SIZE = 8388608  # 8MB suggested chunk size
+UPLOAD_MAX_CHUNK_SIZE = 67108864  # 64MB hard limit per PUT
+UPLOAD_MAX_FILE_SIZE = env.int('UPLOAD_MAX_FILE_SIZE', default=107374182400)  # 100GB largest dataset file
+UPLOAD_SESSION_EXPIRE_HOURS = 24
+UPLOAD_TEMP_DIR = MEDIA_ROOT / 'uploads'
+BLOB_STORE_DIR = 'blobs'  # Content-addressed dataset media, relative to MEDIA_ROOT
+
+# Bulk annotation ingest (NDJSON)
+ANNOTATION_INGEST_BATCH_SIZE = 1000  # Rows per bulk_create/transaction
+ANNOTATION_INGEST_MAX_ERRORS = 1000  # Per-line errors reported back (all are counted)
+
+# Annotation task queue
+TASK_LEASE_SECONDS = 900  # How long an annotator holds a claimed task
+TASK_RECLAIM_BATCH_SIZE = 1000  # Expired leases reclaimed per transaction
+
+# Streaming annotation export
+ANNOTATION_EXPORT_CHUNK_SIZE = 2000  # Rows fetched per server-side cursor round trip
+
+# Annotation revision history
+ANNOTATION_REVISION_CHECKPOINT_INTERVAL = 20  # Every n-th revision stores the full content
+
+# Annotation content validation
+ANNOTATION_SCHEMA_CACHE_SIZE = 256  # Compiled template schemas kept in memory (LRU)
+
+# Async views (mail, media, uploads, exports)
+ASYNC_IO_THREADS = env.int('ASYNC_IO_THREADS', default=32)  # Threads for blocking calls (SMTP, file reads, hashing)
+
+# Annotation change feed (server-sent events, needs the ASGI server)
+EVENT_BACKEND = env('EVENT_BACKEND', default='sernion_mark.events.LocalBackend')  # Or sernion_mark.events.RedisBackend across processes
+EVENT_REDIS_URL = env('EVENT_REDIS_URL', default='redis://localhost:6379/0')
+EVENT_QUEUE_SIZE = 100  # Events buffered per subscriber before its stream is closed
+FEED_HEARTBEAT_SECONDS = 15  # Keep-alive comment interval on idle streams
+FEED_STREAM_SECONDS = 300  # Streams are closed after this long; EventSource reconnects
+
+# Materialized project statistics
+PROJECT_STATS_COMPACT_THRESHOLD = 1000  # Pending deltas that make a read compact the project first
+
+# Annotation full-text search
+SEARCH_BACKEND = env('SEARCH_BACKEND', default='')  # '' picks by database: projects.search.SQLiteBackend (FTS5) or projects.search.PostgresBackend
+SEARCH_POSTGRES_CONFIG = 'simple'  # Text search configuration; no stemming suits mixed-language transcripts
+SEARCH_MAX_DOCUMENT_CHARS = 65536  # Extracted text (and labels) indexed per annotation
+SEARCH_MAX_RESULTS = 1000  # Deepest result reachable by paging
+
+# Dataset items
+DATASET_ITEM_BATCH_SIZE = 1000  # Items inserted per bulk INSERT
+
+# Media derivative processing (thumbnails, waveforms, keyframe sprites)
+MEDIA_PROCESSING_WORKERS = env.int('MEDIA_PROCESSING_WORKERS', default=2)  # Worker processes
+MEDIA_PROCESSING_STALE_SECONDS = 3600  # Runs without progress for this long are picked up again
+
+# Consensus merging of annotations into gold annotations
+CONSENSUS_WORKERS = env.int('CONSENSUS_WORKERS', default=2)  # Worker processes
+
+# Dataset media serving
+MEDIA_CACHE_SECONDS = 3600  # Browser cache lifetime (responses are private)
+MEDIA_TILE_CACHE_SECONDS = 31536000  # Deep zoom tiles are versioned, cache them for a year
+MEDIA_SENDFILE_BACKEND = env('MEDIA_SENDFILE_BACKEND', default='')  # '', 'nginx' (X-Accel-Redirect) or 'xsendfile'
+MEDIA_ACCEL_REDIRECT_PREFIX = '/protected-media/'  # nginx internal location aliased to MEDIA_ROOT
+
 # Allowed file extensions for uploads
 ALLOWED_EXTENSIONS = {
     'audio': ['.mp3', '.wav', '.m4a', '.aac', '.ogg'],
@@ -202,6 +295,9 @@ EMAIL_USE_TLS = env.bool('EMAIL_USE_TLS', default=True)
 EMAIL_HOST_USER = env('EMAIL_HOST_USER', default='')
 EMAIL_HOST_PASSWORD = env('EMAIL_HOST_PASSWORD', default='')
 
+# Frontend URL (links in emails)
+FRONTEND_URL = env('FRONTEND_URL', default='http://localhost:5500')
+
 # Logging Configuration
 LOGGING = {
     'version': 1,
@@ -0,0 +1,78 @@
+"""
+Tests for async API views under both the WSGI and the ASGI handlers.
+"""
+from unittest import mock
+
+from django.core import mail
+from django.http import Http404
+from django.test import AsyncClient, AsyncRequestFactory, RequestFactory, SimpleTestCase, TestCase
+
+from authentication.models import PasswordResetToken, User
+from sernion_mark.async_views import aget_object_or_404, aiterate, is_asgi
+
+RESET_URL = '/api/v1/auth/password-reset/'
+
+
+class PasswordResetTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='owner', email='owner@example.com', password='pw-owner-1')
+
+    def test_wsgi(self):
+        response = self.client.post(RESET_URL, {'email': 'owner@example.com'}, content_type='application/json')
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(len(mail.outbox), 1)
+        token = PasswordResetToken.objects.get(user=self.user).token
+        self.assertIn(token, mail.outbox[0].body)
+
+        # A new request replaces the previous token
+        self.client.post(RESET_URL, {'email': 'owner@example.com'}, content_type='application/json')
+        self.assertNotEqual(PasswordResetToken.objects.get(user=self.user).token, token)
+
+    async def test_asgi(self):
+        client = AsyncClient()
+        response = await client.post(RESET_URL, {'email': 'owner@example.com'}, content_type='application/json')
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertTrue(await PasswordResetToken.objects.filter(user=self.user).aexists())
+
+        response = await client.post(RESET_URL, {'email': 'nobody@example.com'}, content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+
+    async def test_mail_failure(self):
+        with mock.patch('authentication.views.send_mail', side_effect=OSError):
+            response = await AsyncClient().post(
+                RESET_URL, {'email': 'owner@example.com'}, content_type='application/json'
+            )
+        self.assertEqual(response.status_code, 500)
+
+    async def test_permission_checks_run_before_the_handler(self):
+        response = await AsyncClient().get('/api/v1/datasets/1/media/')
+        self.assertEqual(response.status_code, 401)
+
+    async def test_aget_object_or_404(self):
+        self.assertEqual((await aget_object_or_404(User.objects.all(), email='owner@example.com')).pk, self.user.pk)
+        with self.assertRaises(Http404):
+            await aget_object_or_404(User.objects.all(), email='nobody@example.com')
+
+
+class HelperTests(SimpleTestCase):
+    def test_is_asgi(self):
+        self.assertTrue(is_asgi(AsyncRequestFactory().get('/')))
+        self.assertFalse(is_asgi(RequestFactory().get('/')))
+
+    async def test_aiterate_closes_the_iterator(self):
+        closed = []
+
+        def blocks():
+            try:
+                yield from (b'a', b'b', b'c')
+            finally:
+                closed.append(True)
+
+        self.assertEqual([block async for block in aiterate(blocks(), thread_sensitive=False)], [b'a', b'b', b'c'])
+        self.assertEqual(closed, [True])
+
+        stream = aiterate(blocks())
+        self.assertEqual(await stream.__anext__(), b'a')
+        await stream.aclose()
+        self.assertEqual(closed, [True, True])
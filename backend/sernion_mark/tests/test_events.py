@@ -0,0 +1,120 @@
+"""
+Tests for the change feed event hub and its backends.
+"""
+import asyncio
+import time
+
+from django.conf import settings
+from django.test import SimpleTestCase, override_settings
+
+from sernion_mark.events import Hub, LocalBackend, RedisBackend, check_backend
+
+
+def redis_available():
+    import redis
+
+    try:
+        return redis.Redis.from_url(settings.EVENT_REDIS_URL, socket_connect_timeout=0.2).ping()
+    except redis.RedisError:
+        return False
+
+
+def collect(hub, channel, publish, count):
+    """Subscribe to ``channel``, call ``publish()`` and return the first ``count`` messages."""
+    async def run():
+        stream = hub.listen(channel, timeout=0.05)
+        pending = asyncio.ensure_future(stream.__anext__())  # Subscribes
+        await asyncio.sleep(0.2)
+        await asyncio.get_running_loop().run_in_executor(None, publish)  # From another thread, like a view
+        messages = [await pending]
+        async for message in stream:
+            messages.append(message)
+            if len([message for message in messages if message is not None]) == count:
+                break
+        await stream.aclose()
+        return [message for message in messages if message is not None]
+
+    return asyncio.run(asyncio.wait_for(run(), 10))
+
+
+class LocalBackendTests(SimpleTestCase):
+    def test_events_reach_subscribers_of_their_channel(self):
+        hub = Hub(LocalBackend)
+
+        def publish():
+            hub.publish('project.2', {'n': 0})
+            hub.publish('project.1', {'n': 1})
+            hub.publish('project.1', {'n': 2})
+
+        self.assertEqual(collect(hub, 'project.1', publish, 2), ['{"n":1}', '{"n":2}'])
+        self.assertEqual(hub.subscriber_count('project.1'), 0)
+
+    def test_slow_subscribers_are_dropped(self):
+        hub = Hub(LocalBackend, queue_size=2)
+
+        async def run():
+            stream = hub.listen('project.1', timeout=1)
+            task = asyncio.ensure_future(stream.__anext__())
+            await asyncio.sleep(0)
+            for n in range(5):
+                hub.publish('project.1', n)
+            first = await task
+            return [first] + [message async for message in stream]
+
+        self.assertEqual(asyncio.run(asyncio.wait_for(run(), 10)), ['0', '1'])
+
+    def test_wsgi_processes_are_warned_about_the_local_backend(self):
+        with self.assertLogs('sernion_mark.events', 'WARNING'):
+            check_backend('WSGI')
+        with override_settings(EVENT_BACKEND='sernion_mark.events.RedisBackend'):
+            with self.assertNoLogs('sernion_mark.events', 'WARNING'):
+                check_backend('WSGI')
+
+
+class RedisBackendTests(SimpleTestCase):
+    def setUp(self):
+        if not redis_available():
+            self.skipTest(f'No Redis server at {settings.EVENT_REDIS_URL}')
+
+    def test_channels_share_one_connection_closed_after_the_last_subscriber(self):
+        hub = Hub(RedisBackend, prefix='sernion:test:')
+
+        async def run():
+            first, second = hub.listen('a', timeout=0.05), hub.listen('b', timeout=0.05)
+            pending = [asyncio.ensure_future(stream.__anext__()) for stream in (first, second)]
+            await asyncio.sleep(0.3)
+            relay = hub.backend._relay_task
+            hub.publish('a', 1)
+            hub.publish('b', 2)
+            received = []
+            for stream, task in zip((first, second), pending):
+                message = await task
+                while message is None:
+                    message = await stream.__anext__()
+                received.append(message)
+            await first.aclose()
+            self.assertIs(hub.backend._relay_task, relay)
+            await second.aclose()
+            await asyncio.sleep(0)
+            return received, relay
+
+        received, relay = asyncio.run(asyncio.wait_for(run(), 10))
+        self.assertEqual(received, ['1', '2'])
+        self.assertTrue(relay.done())
+        self.assertIsNone(hub.backend._relay_task)
+
+    def test_relay_reconnects(self):
+        import redis
+
+        hub = Hub(RedisBackend, prefix='sernion:test:')
+        hub.backend.RECONNECT_DELAY = 0.1
+
+        def drop_and_publish():
+            # Kill the relay's connection (not ours), then publish once it is back
+            client = redis.Redis.from_url(settings.EVENT_REDIS_URL)
+            client.client_kill_filter(_type='pubsub')
+            time.sleep(0.5)
+            hub.publish('a', 'after')
+
+        with self.assertLogs('sernion_mark.events', 'WARNING'):
+            self.assertEqual(collect(hub, 'a', drop_and_publish, 1), ['"after"'])
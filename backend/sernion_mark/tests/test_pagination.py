@@ -0,0 +1,55 @@
+"""
+Tests for keyset (cursor) pagination.
+"""
+from datetime import timedelta
+
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from authentication.models import User
+from projects.models import Annotation, Dataset, Project
+
+
+class KeysetPaginationTests(TestCase):
+    def setUp(self):
+        self.owner = User.objects.create_user(username='owner', email='owner@example.com', password='pw-owner-1')
+        project = Project.objects.create(name='pets', project_type='image', owner=self.owner)
+        annotations = [
+            Annotation.objects.create(
+                dataset=Dataset.objects.create(name=f'pet {i}', project=project, file_path=f'pet{i}', file_type='png'), annotator=self.owner, annotation_type='classification', content={'label': str(i)}
+            )
+            for i in range(7)
+        ]
+        # Ties on the ordering field are broken by the primary key
+        now = timezone.now()
+        created = {}
+        for i, annotation in enumerate(annotations):
+            created[annotation.pk] = now - timedelta(seconds=i // 3)
+            Annotation.objects.filter(pk=annotation.pk).update(created_at=created[annotation.pk])
+        self.expected = sorted(created, key=lambda pk: (created[pk], pk), reverse=True)
+        self.client = APIClient()
+        self.client.force_authenticate(self.owner)
+
+    def test_pages_follow_the_cursor_without_offset(self):
+        seen = []
+        url = '/api/v1/annotations/?page_size=3'
+        with CaptureQueriesContext(connection) as queries:
+            while url:
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, 200)
+                self.assertNotIn('count', response.data)
+                seen.extend(row['id'] for row in response.data['results'])
+                url = response.data['next']
+        self.assertEqual(seen, self.expected)
+        self.assertFalse(any('OFFSET' in query['sql'] or 'COUNT(' in query['sql'] for query in queries))
+
+    def test_count_on_request(self):
+        response = self.client.get('/api/v1/annotations/?page_size=2&count=true')
+        self.assertEqual((response.data['count'], len(response.data['results'])), (7, 2))
+        self.assertNotIn('count=', response.data['next'])
+
+    def test_invalid_cursor(self):
+        self.assertEqual(self.client.get('/api/v1/annotations/?cursor=garbage').status_code, 404)
@@ -23,7 +23,7 @@ urlpatterns = [
     path('api/docs/', lambda request: HttpResponse("API Documentation - Coming Soon"), name='api-docs'),
     
     # Token endpoints
-    path('api/token/', include('authentication.token_urls')),
+    path('api/token/', include('authentication.jwt_urls')),
 ]
 
 # Serve media files in development
@@ -9,3 +9,7 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'sernion_mark.settings')
 
 application = get_wsgi_application()
+
+from sernion_mark.events import check_backend  # noqa: E402 (needs the settings)
+
+check_backend('WSGI')  # The feed is served by the ASGI application only
@@ -46,8 +46,8 @@ def test_user_registration():
             data = response.json()
             print(f"✅ Registration successful: {data['message']}")
             print(f"   User: {data['user']['username']}")
-            print(f"   Token: {data['token'][:20]}...")
-            return data['token']
+            print(f"   Token: {data['tokens']['access'][:20]}...")
+            return data['tokens']['access']
         else:
             print(f"❌ Registration failed: {response.status_code}")
             print(f"   Response: {response.text}")
@@ -75,8 +75,8 @@ def test_user_login():
             data = response.json()
             print(f"✅ Login successful: {data['message']}")
             print(f"   User: {data['user']['username']}")
-            print(f"   Token: {data['token'][:20]}...")
-            return data['token']
+            print(f"   Token: {data['tokens']['access'][:20]}...")
+            return data['tokens']['access']
         else:
             print(f"❌ Login failed: {response.status_code}")
             print(f"   Response: {response.text}")
@@ -90,7 +90,7 @@ def test_protected_endpoint(token):
     print("\n🔒 Testing Protected Endpoint...")
     try:
         headers = {
-            'Authorization': f'Token {token}',
+            'Authorization': f'Bearer {token}',
             'Content-Type': 'application/json'
         }
         
@@ -117,7 +117,7 @@ def test_user_profile(token):
     print("\n👤 Testing User Profile...")
     try:
         headers = {
-            'Authorization': f'Token {token}',
+            'Authorization': f'Bearer {token}',
             'Content-Type': 'application/json'
         }
         
@@ -145,7 +145,7 @@ def test_logout(token):
     print("\n🚪 Testing Logout...")
     try:
         headers = {
-            'Authorization': f'Token {token}',
+            'Authorization': f'Bearer {token}',
             'Content-Type': 'application/json'
         }
         
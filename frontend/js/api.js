@@ -95,7 +95,7 @@ class SernionMarkAPI {
 
             if (response.ok) {
                 const data = await response.json();
-                this.setTokens(data.access, this.refreshToken);
+                this.setTokens(data.access, data.refresh || this.refreshToken);  // Refresh tokens rotate
                 return true;
             }
         } catch (error) {
@@ -174,10 +174,17 @@ class SernionMarkAPI {
     }
 
     async changePassword(passwordData) {
-        return await this.makeRequest('/user/change-password/', {
+        const response = await this.makeRequest('/user/change-password/', {
             method: 'POST',
             body: JSON.stringify(passwordData)
         });
+
+        if (response.success) {
+            // Other sessions are signed out; this one continues with new tokens
+            this.setTokens(response.tokens.access, response.tokens.refresh);
+        }
+
+        return response;
     }
 
     // Password Reset Methods
@@ -200,6 +207,87 @@ class SernionMarkAPI {
         });
     }
 
+    // Dataset Upload Methods
+
+    // Upload a file through the resumable chunked upload protocol.
+    // Chunks are sent in parallel; an interrupted upload can be resumed by
+    // passing the previous upload id, only missing ranges are re-sent.
+    // Passing the file's SHA-256 lets the server verify the assembled file.
+    async uploadDataset(file, { project, name = '', description = '', sha256 = null, uploadId = null, parallel = 4, onProgress = null } = {}) {
+        let upload;
+        if (uploadId) {
+            upload = (await this.makeRequest(`/uploads/${uploadId}/`)).upload;
+        } else {
+            upload = (await this.makeRequest('/uploads/', {
+                method: 'POST',
+                body: JSON.stringify({
+                    project,
+                    name,
+                    description,
+                    filename: file.name,
+                    file_size: file.size,
+                    ...(sha256 ? { sha256 } : {})
+                })
+            })).upload;
+        }
+
+        // Resumed after it was finalized: nothing left to transfer
+        if (upload.status === 'completed') {
+            return { success: true, upload };
+        }
+
+        const chunks = [];
+        for (const [start, end] of upload.missing_ranges) {
+            for (let offset = start; offset < end; offset += upload.chunk_size) {
+                chunks.push([offset, Math.min(offset + upload.chunk_size, end)]);
+            }
+        }
+
+        let sent = upload.received_bytes;
+        const sendNext = async () => {
+            while (chunks.length) {
+                const [start, end] = chunks.shift();
+                await this.makeRequest(`/uploads/${upload.id}/`, {
+                    method: 'PUT',
+                    headers: {
+                        ...this.getHeaders(),
+                        'Content-Type': 'application/octet-stream',
+                        'Content-Range': `bytes ${start}-${end - 1}/${file.size}`
+                    },
+                    body: file.slice(start, end)
+                });
+                sent += end - start;
+                if (onProgress) {
+                    onProgress(sent, file.size, upload.id);
+                }
+            }
+        };
+        await Promise.all(Array.from({ length: parallel }, sendNext));
+
+        return await this.makeRequest(`/uploads/${upload.id}/complete/`, {
+            method: 'POST'
+        });
+    }
+
+    // Project Methods
+
+    async getProjectStats(projectId) {
+        return await this.makeRequest(`/projects/${projectId}/stats/`);
+    }
+
+    // Full-text search over a project's annotations; results are ranked and
+    // `next` is the URL of the following page (null on the last one)
+    async searchAnnotations(projectId, query, { dataset = null, annotationType = null, page = 1, pageSize = 20 } = {}) {
+        const params = new URLSearchParams({ q: query, page, page_size: pageSize });
+        if (dataset) {
+            params.set('dataset', dataset);
+        }
+        if (annotationType) {
+            params.set('annotation_type', annotationType);
+        }
+        return await this.makeRequest(`/projects/${projectId}/search/?${params}`);
+    }
+
     // Health Check
     async healthCheck() {
         return await this.makeRequest('/health/');